@@ -0,0 +1,68 @@
+"""
+统计汇总脚本
+查看最近的统计汇总，或根据现有数据重新汇总（启用统计之前的历史数据、修改统计时区之后）
+
+使用方法：
+    python analytics_db.py [选项]
+
+示例：
+    python analytics_db.py                    # 查看最近 7 天的统计
+    python analytics_db.py --days 30
+    python analytics_db.py --rebuild          # 重新汇总全部数据（期间阻塞写入，请在低峰期执行）
+"""
+import argparse
+import sys
+
+from core.database import SessionLocal
+from services.analytics import get_analytics, rebuild_analytics
+
+
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="统计汇总工具")
+    parser.add_argument("--rebuild", action="store_true", help="清空并根据现有数据重新汇总")
+    parser.add_argument("--batch-size", type=int, default=2000, help="重新汇总时每批读取的消息数")
+    parser.add_argument("--days", type=int, default=7, help="显示最近的天数")
+    return parser.parse_args(argv)
+
+
+def show_summary(days: int) -> None:
+    """打印最近的统计"""
+    db = SessionLocal()
+    try:
+        result = get_analytics(db, days)
+    finally:
+        db.close()
+
+    print(f"\n{result['start']} ~ {result['end']}：")
+    print(f"  {'日期':<12}{'活跃用户':>8}{'新用户':>8}{'新对话':>8}{'消息':>8}{'平均回复长度':>12}")
+    for day in result["daily"]:
+        print(
+            f"  {day['day']:<12}{day['active_users']:>10}{day['new_users']:>9}"
+            f"{day['conversations']:>9}{day['messages']:>10}{day['avg_reply_length']:>14}"
+        )
+    totals = result["totals"]
+    print(
+        f"  合计：活跃用户 {totals['active_users']}，新用户 {totals['new_users']}，"
+        f"新对话 {totals['conversations']}，消息 {totals['messages']}，平均回复长度 {totals['avg_reply_length']}"
+    )
+    if result["diseases"]:
+        print("  疾病：" + "，".join(f"{d['disease']} {d['conversations']}" for d in result["diseases"]))
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    print("=" * 50)
+    print("统计汇总工具")
+    print("=" * 50)
+
+    if args.rebuild:
+        print("正在重新汇总...")
+        stats = rebuild_analytics(
+            batch_size=args.batch_size,
+            progress=lambda scanned: print(f"  - 已读取 {scanned} 条消息"),
+        )
+        print(f"[OK] 重新汇总完成：{stats['days']} 天，{stats['messages']} 条消息")
+
+    show_summary(args.days)
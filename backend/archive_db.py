@@ -0,0 +1,73 @@
+"""
+对话归档脚本
+将长期未使用或模型切换后失效的对话分批迁移到归档数据库
+
+使用方法：
+    python archive_db.py [选项]
+
+示例：
+    python archive_db.py                      # 按 .env 中的配置归档
+    python archive_db.py --days 90            # 归档 90 天内无新消息的对话
+    python archive_db.py --batch-size 50 --max-batches 10
+
+归档后的对话仍可通过原有接口查看和删除，但不能继续发送消息。
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from core.config import get_settings
+from core.database import archive_enabled, engine
+from services.archive import archive_conversations
+
+
+def show_page_usage():
+    """显示主库页使用情况"""
+    with engine.connect() as conn:
+        page_count = conn.execute(text("PRAGMA page_count")).scalar()
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        freelist = conn.execute(text("PRAGMA freelist_count")).scalar()
+
+    print("\n主库页使用情况：")
+    print(f"  - 总页数: {page_count}（{page_count * page_size / 1024 / 1024:.1f} MB）")
+    print(f"  - 空闲页: {freelist}（可通过 VACUUM 或增量回收释放）")
+
+
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="对话归档工具")
+    parser.add_argument("--days", type=int, help="超过该天数无新消息即归档（默认读取 ARCHIVE_AFTER_DAYS）")
+    parser.add_argument("--skip-inactive", action="store_true", help="不归档模型切换后失效的对话")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批归档的对话数")
+    parser.add_argument("--max-batches", type=int, help="最多执行的批次数")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    print("=" * 50)
+    print("对话归档工具")
+    print("=" * 50)
+
+    if not archive_enabled():
+        print("[ERROR] 未启用归档，请在 .env 中设置 ARCHIVE_DATABASE_PATH")
+        sys.exit(1)
+
+    print(f"归档数据库: {get_settings().ARCHIVE_DATABASE_PATH}")
+
+    stats = archive_conversations(
+        batch_size=args.batch_size,
+        max_batches=args.max_batches,
+        older_than_days=args.days,
+        include_inactive=False if args.skip_inactive else None,
+        progress=lambda s: print(f"  - 第 {s['batches']} 批：累计 {s['conversations']} 个对话，{s['messages']} 条消息"),
+    )
+
+    if stats["conversations"] == 0:
+        print("[OK] 没有需要归档的对话")
+    else:
+        print(f"[OK] 共归档 {stats['conversations']} 个对话，{stats['messages']} 条消息")
+
+    show_page_usage()
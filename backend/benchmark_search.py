@@ -0,0 +1,146 @@
+"""
+全文检索性能基准脚本
+在临时数据库中批量生成对话与消息，测量索引补建耗时与检索延迟（个人检索、管理员检索、深度翻页）
+
+使用方法：
+    python benchmark_search.py [--messages 1000000] [--users 2000] [--repeat 20] [--db 路径]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+
+SAMPLES = [
+    "患者主诉头晕乏力，舌淡苔白，脉细弱",
+    "夜间盗汗明显，五心烦热，口干咽燥",
+    "胸闷气短，活动后加重，舌暗有瘀点",
+    "空腹血糖偏高，多饮多尿，形体消瘦",
+    "腰膝酸软，畏寒肢冷，小便清长",
+    "胃脘胀痛，嗳气反酸，食后加重",
+    "建议健脾益气，注意饮食清淡，规律作息",
+    "证属肝阳上亢，治宜平肝潜阳",
+]
+QUERIES = ["盗汗", "舌淡苔白", "血糖", "平肝潜阳", "肝阳上亢 头晕"]
+
+
+def seed(path: str, messages: int, users: int, per_conversation: int) -> None:
+    """通过 sqlite3 批量写入（触发器只登记待索引行，不依赖应用函数）"""
+
+    rng = random.Random(42)
+    conversations = max(messages // per_conversation, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO users (id, username, hashed_password, role, is_banned, created_at) "
+        "VALUES (?, ?, 'x', 'user', 0, CURRENT_TIMESTAMP)",
+        ((i, f"bench{i}") for i in range(1, users + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO conversations (id, user_id, title, is_active, created_at) "
+        "VALUES (?, ?, ?, 1, CURRENT_TIMESTAMP)",
+        ((i, rng.randint(1, users), rng.choice(SAMPLES)[:12]) for i in range(1, conversations + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO messages (conversation_id, role, content, created_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+        (
+            (i // per_conversation + 1, "user" if i % 2 == 0 else "assistant",
+             "，".join(rng.sample(SAMPLES, 3)))
+            for i in range(conversations * per_conversation)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def percentiles(func: Callable[[], object], repeat: int) -> List[float]:
+    """返回 p50 / p95 / 最大耗时（毫秒）"""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return [timings[len(timings) // 2], timings[min(int(len(timings) * 0.95), len(timings) - 1)], timings[-1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索性能基准")
+    parser.add_argument("--messages", type=int, default=1000000, help="消息条数")
+    parser.add_argument("--users", type=int, default=2000, help="用户数")
+    parser.add_argument("--per-conversation", type=int, default=20, help="每个对话的消息数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的重复次数")
+    parser.add_argument("--pages", type=int, default=10, help="深度翻页测试的页数")
+    parser.add_argument("--db", help="数据库路径（默认在临时目录中新建）")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="cdhcprs-bench-"), "bench.db")
+    if os.path.exists(path):
+        print(f"[ERROR] 数据库已存在，请指定新的路径: {path}")
+        sys.exit(1)
+    # 配置在导入应用模块时读取
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["ARCHIVE_DATABASE_PATH"] = ""
+    os.environ["METRICS_DIR"] = ""
+    os.environ["TRACE_EXPORT_FILE"] = ""
+    os.environ["QUERY_INSPECTOR_ENABLED"] = "False"  # 不输出补建索引时的慢查询日志
+
+    from core.database import Base, SessionLocal, engine
+    from services.search import init_search_index, search_conversations, sync_search_index
+
+    Base.metadata.create_all(bind=engine)
+    init_search_index()
+
+    print("=" * 60)
+    print(f"消息 {args.messages}，用户 {args.users}，每个对话 {args.per_conversation} 条消息")
+    print(f"数据库: {path}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    seed(path, args.messages, args.users, args.per_conversation)
+    print(f"  写入数据          {time.perf_counter() - start:8.1f} s")
+    start = time.perf_counter()
+    indexed = sync_search_index(batch_size=5000)
+    print(f"  补建索引          {time.perf_counter() - start:8.1f} s  ({indexed})")
+
+    worst = 0.0
+    db = SessionLocal()
+    try:
+        print("\n检索延迟（毫秒，p50 / p95 / max）：")
+        rng = random.Random(7)
+        for query in QUERIES:
+            user_id = rng.randint(1, args.users)
+            for label, owner in (("个人", user_id), ("管理员", None)):
+                p50, p95, peak = percentiles(lambda: search_conversations(db, query, owner), args.repeat)
+                worst = max(worst, p95)
+                print(f"  {label:<4} {query:<10} {p50:8.2f} {p95:8.2f} {peak:8.2f}")
+
+        cursor = None
+        timings = []
+        for _ in range(args.pages):
+            start = time.perf_counter()
+            page = search_conversations(db, QUERIES[0], None, cursor)
+            timings.append((time.perf_counter() - start) * 1000)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        worst = max(worst, max(timings))
+        print(f"\n管理员翻页 {len(timings)} 页：首页 {timings[0]:.2f} ms，末页 {timings[-1]:.2f} ms")
+    finally:
+        db.close()
+
+    if worst < 100:
+        print(f"[OK] 最慢 p95 {worst:.2f} ms，低于 100 ms")
+    else:
+        print(f"[WARN] 最慢 p95 {worst:.2f} ms，超过 100 ms")
+
+
+if __name__ == "__main__":
+    main()
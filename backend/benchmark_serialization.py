@@ -0,0 +1,118 @@
+"""
+序列化性能基准脚本
+对比消息列表在不同序列化路径下的耗时与响应体积（不访问数据库）
+
+使用方法：
+    python benchmark_serialization.py [--rows 2000] [--content-size 800] [--repeat 20]
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from core.serialization import MESSAGE_FIELDS, orjson, serialize_rows
+from models.message import Message
+from schemas.message import MessageResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_rows(count: int, content_size: int) -> List[Message]:
+    """构造内存中的消息对象"""
+
+    started = datetime(2024, 1, 1, 8, 0, 0)
+    sample = "患者主诉头晕乏力，舌淡苔白，脉细弱。建议健脾益气，注意饮食清淡。Markdown **加粗** 与列表：\n- 一\n- 二\n"
+    content = (sample * (content_size // len(sample) + 1))[:content_size]
+    return [
+        Message(
+            id=i + 1,
+            conversation_id=1,
+            role="user" if i % 2 == 0 else "assistant",
+            content=content,
+            created_at=started + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def measure(func, repeat: int) -> float:
+    """返回多次执行的最短耗时（毫秒）"""
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="序列化性能基准")
+    parser.add_argument("--rows", type=int, default=2000, help="消息条数")
+    parser.add_argument("--content-size", type=int, default=800, help="每条消息的字符数")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows, args.content_size)
+    adapter = TypeAdapter(List[MessageResponse])
+
+    def pydantic_stdlib():
+        # 旧版 FastAPI / 自定义响应类：逐行实例化模型 -> dict -> json.dumps
+        data = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def pydantic_dump_json():
+        # 新版 FastAPI 默认路径：逐行实例化模型后由 pydantic-core 直接输出字节
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    def pydantic_orjson():
+        data = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return orjson.dumps(data)
+
+    def bypass():
+        return serialize_rows(rows, MESSAGE_FIELDS)
+
+    cases = [
+        ("Pydantic 模型 + json.dumps", pydantic_stdlib),
+        ("Pydantic 模型 + dump_json", pydantic_dump_json),
+    ]
+    if orjson is not None:
+        cases.append(("Pydantic 模型 + orjson", pydantic_orjson))
+    cases.append((f"ORM 行直接序列化（{'orjson' if orjson else 'json'}）", bypass))
+
+    print("=" * 60)
+    print(f"消息条数: {args.rows}，每条 {args.content_size} 字符，重复 {args.repeat} 次取最短耗时")
+    print("=" * 60)
+
+    baseline = None
+    for label, func in cases:
+        elapsed = measure(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"  {label:<32} {elapsed:8.2f} ms  ({baseline / elapsed:4.1f}x)")
+
+    # 输出一致性检查
+    expected = json.loads(pydantic_stdlib())
+    if json.loads(bypass()) == expected:
+        print("[OK] 快速路径输出与 Pydantic 路径一致")
+    else:
+        print("[ERROR] 快速路径输出与 Pydantic 路径不一致")
+
+    body = bypass()
+    print("\n响应体积：")
+    print(f"  原始   {len(body) / 1024:10.1f} KB")
+    gzip_ms = measure(lambda: gzip.compress(body, compresslevel=6), 3)
+    print(f"  gzip   {len(gzip.compress(body, compresslevel=6)) / 1024:10.1f} KB  ({gzip_ms:.2f} ms)")
+    if brotli is not None:
+        brotli_ms = measure(lambda: brotli.compress(body, quality=4), 3)
+        print(f"  brotli {len(brotli.compress(body, quality=4)) / 1024:10.1f} KB  ({brotli_ms:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
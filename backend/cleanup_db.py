@@ -1,126 +1,137 @@
 """
 数据库清理脚本
-清理孤立的消息记录（对应的对话已被删除）
+分批清理孤立的消息记录（对应的对话已被删除），并按保留策略删除过期对话
+
+每批删除使用独立的短事务，批次之间让出写锁，可在服务运行期间执行；
+中断后使用 --state-file 可从上次的位置继续。
 
 使用方法：
-    python cleanup_db.py [数据库路径]
+    python cleanup_db.py [数据库路径] [选项]
 
 示例：
-    python cleanup_db.py                    # 使用默认路径 ./cdhcprs.db
-    python cleanup_db.py /path/to/db.db    # 使用指定路径
+    python cleanup_db.py                          # 使用 .env 中的 DATABASE_URL
+    python cleanup_db.py /path/to/db.db           # 使用指定路径
+    python cleanup_db.py --dry-run                # 仅统计，不删除
+    python cleanup_db.py --retention-days 365     # 同时删除一年内无新消息的对话
+    python cleanup_db.py --state-file cleanup_state.json   # 支持断点续跑
 """
-import sys
-import sqlite3
+import argparse
 import os
+import sys
 
 
-def get_database_path():
-    """获取数据库路径"""
-    if len(sys.argv) > 1:
-        return sys.argv[1]
-    return "cdhcprs.db"
-
-
-def cleanup_orphaned_messages(db_path):
-    """清理孤立的消息记录"""
-    if not os.path.exists(db_path):
-        print(f"[ERROR] 数据库文件不存在: {db_path}")
-        return
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据库清理工具")
+    parser.add_argument("db_path", nargs="?", help="数据库文件路径（默认读取 DATABASE_URL）")
+    parser.add_argument("--dry-run", action="store_true", help="仅统计待清理的数据，不执行删除")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批删除的记录数")
+    parser.add_argument("--sleep", type=float, default=0.05, help="批次间隔（秒）")
+    parser.add_argument("--retention-days", type=int, help="对话保留天数（默认读取 RETENTION_DAYS，0 表示不清理）")
+    parser.add_argument("--state-file", help="断点文件路径，用于中断后继续")
+    return parser.parse_args(argv)
 
-    try:
-        print("开始清理孤立的消息记录...")
 
-        # 查找所有孤立的消息（conversation_id 不存在于 conversations 表中）
-        cursor.execute("""
-            SELECT m.id, m.conversation_id
-            FROM messages m
-            LEFT JOIN conversations c ON m.conversation_id = c.id
-            WHERE c.id IS NULL
-        """)
+args = parse_args(sys.argv[1:])
+if args.db_path:
+    # 需在导入数据库模块之前设置
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db_path)}"
 
-        orphaned_messages = cursor.fetchall()
-        count = len(orphaned_messages)
+from sqlalchemy import text  # noqa: E402
 
-        if count == 0:
-            print("[OK] 没有发现孤立的消息记录")
-            return
+from core.config import get_settings  # noqa: E402
+from core.database import engine  # noqa: E402
+from services.cleanup import purge_expired_conversations, purge_orphaned_messages  # noqa: E402
 
-        print(f"[INFO] 发现 {count} 条孤立的消息记录")
 
-        # 删除孤立的消息
-        for msg_id, conv_id in orphaned_messages:
-            print(f"  - 删除消息 ID: {msg_id}, 对话 ID: {conv_id}")
-            cursor.execute("DELETE FROM messages WHERE id = ?", (msg_id,))
+def get_database_path():
+    """获取数据库路径"""
+    return engine.url.database
 
-        conn.commit()
-        print(f"[OK] 成功清理 {count} 条孤立的消息记录")
 
-    except Exception as e:
-        print(f"[ERROR] 清理失败: {e}")
-        conn.rollback()
-        raise
-    finally:
-        cursor.close()
-        conn.close()
+def report_progress(task, stats):
+    """输出批次进度"""
+    labels = {
+        "orphaned_messages": "孤立消息",
+        "expired_conversations": "过期对话",
+        "expired_archived_conversations": "过期归档对话",
+    }
+    action = "发现" if args.dry_run else "删除"
+    count = stats["matched"] if args.dry_run else stats["deleted"]
+    print(f"  - [{labels.get(task, task)}] 第 {stats['batches']} 批，累计{action} {count} 条，当前 ID: {stats['cursor']}")
 
 
-def verify_foreign_keys(db_path):
-    """验证外键约束是否已启用"""
-    if not os.path.exists(db_path):
-        print(f"[ERROR] 数据库文件不存在: {db_path}")
+def cleanup_orphaned_messages():
+    """清理孤立的消息记录"""
+    print("开始清理孤立的消息记录...")
+
+    stats = purge_orphaned_messages(
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        sleep_seconds=args.sleep,
+        state_file=args.state_file,
+        progress=report_progress,
+    )
+
+    if stats["matched"] == 0:
+        print("[OK] 没有发现孤立的消息记录")
+    elif args.dry_run:
+        print(f"[INFO] 发现 {stats['matched']} 条孤立的消息记录（未删除）")
+    else:
+        print(f"[OK] 成功清理 {stats['deleted']} 条孤立的消息记录")
+
+
+def cleanup_expired_conversations():
+    """按保留策略清理过期对话"""
+    retention_days = args.retention_days
+    if retention_days is None:
+        retention_days = get_settings().RETENTION_DAYS
+
+    if retention_days <= 0:
+        print("\n[INFO] 未设置对话保留天数，跳过过期对话清理")
         return
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    try:
-        print("\n检查外键约束状态...")
-        cursor.execute("PRAGMA foreign_keys")
-        result = cursor.fetchone()
+    print(f"\n开始清理 {retention_days} 天内无新消息的对话...")
 
-        if result and result[0] == 1:
-            print("[OK] 外键约束已启用")
-        else:
-            print("[WARNING] 外键约束未启用！")
-            print("  提示：从现在开始，应用程序会自动启用外键约束")
+    stats = purge_expired_conversations(
+        retention_days=retention_days,
+        batch_size=max(args.batch_size // 5, 1),
+        dry_run=args.dry_run,
+        sleep_seconds=args.sleep,
+        state_file=args.state_file,
+        progress=report_progress,
+    )
 
-    finally:
-        cursor.close()
-        conn.close()
+    matched = stats["matched"] + stats.get("archived_matched", 0)
+    deleted = stats["deleted"] + stats.get("archived_deleted", 0)
+    if matched == 0:
+        print("[OK] 没有过期的对话")
+    elif args.dry_run:
+        print(f"[INFO] 发现 {matched} 个过期对话（未删除）")
+    else:
+        print(f"[OK] 成功删除 {deleted} 个过期对话")
 
 
-def show_statistics(db_path):
-    """显示数据库统计信息"""
-    if not os.path.exists(db_path):
-        return
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    try:
-        print("\n数据库统计信息：")
-
-        # 统计对话数
-        cursor.execute("SELECT COUNT(*) FROM conversations")
-        conv_count = cursor.fetchone()[0]
-        print(f"  - 对话总数: {conv_count}")
+def verify_foreign_keys():
+    """验证外键约束是否已启用"""
+    print("\n检查外键约束状态...")
+    with engine.connect() as conn:
+        result = conn.execute(text("PRAGMA foreign_keys")).scalar()
 
-        # 统计消息数
-        cursor.execute("SELECT COUNT(*) FROM messages")
-        msg_count = cursor.fetchone()[0]
-        print(f"  - 消息总数: {msg_count}")
+    if result == 1:
+        print("[OK] 外键约束已启用")
+    else:
+        print("[WARNING] 外键约束未启用！")
+        print("  提示：从现在开始，应用程序会自动启用外键约束")
 
-        # 统计用户数
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        print(f"  - 用户总数: {user_count}")
 
-    finally:
-        cursor.close()
-        conn.close()
+def show_statistics():
+    """显示数据库统计信息"""
+    print("\n数据库统计信息：")
+    with engine.connect() as conn:
+        for table, label in [("conversations", "对话总数"), ("messages", "消息总数"), ("users", "用户总数")]:
+            count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            print(f"  - {label}: {count}")
 
 
 if __name__ == "__main__":
@@ -130,9 +141,16 @@ if __name__ == "__main__":
 
     db_path = get_database_path()
     print(f"数据库路径: {db_path}")
+    if args.dry_run:
+        print("[INFO] 试运行模式，不会删除任何数据")
+
+    if not db_path or not os.path.exists(db_path):
+        print(f"[ERROR] 数据库文件不存在: {db_path}")
+        sys.exit(1)
 
-    verify_foreign_keys(db_path)
-    cleanup_orphaned_messages(db_path)
-    show_statistics(db_path)
+    verify_foreign_keys()
+    cleanup_orphaned_messages()
+    cleanup_expired_conversations()
+    show_statistics()
 
     print("\n清理完成！")
@@ -0,0 +1,176 @@
+"""
+消息压缩迁移脚本
+分批压缩数据库中已有的长消息，并统计节省的空间
+
+使用方法：
+    python compress_messages.py [选项]
+
+示例：
+    python compress_messages.py                          # 按 .env 中的配置分批压缩
+    python compress_messages.py --codec zlib             # 指定压缩算法
+    python compress_messages.py --batch-size 200 --sleep 0.1
+    python compress_messages.py --train-dict zstd.dict   # 从已有消息训练 zstd 字典
+
+注意：
+    zstd 字典一旦用于压缩数据就不能替换，否则旧数据将无法解压。
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import text
+
+from core.compression import (
+    CODEC_ZSTD,
+    compress_text,
+    decompress_value,
+    reset_zstd_dict,
+    resolve_codec,
+    zstandard,
+)
+from core.config import get_settings
+from core.database import engine
+from services.search import index_pending_rows
+
+
+def format_size(num_bytes):
+    """格式化字节数"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def train_dictionary(dict_path, dict_size, sample_count, force=False):
+    """从最近的消息中采样训练 zstd 字典"""
+    if zstandard is None:
+        print("[ERROR] 训练字典需要安装 zstandard：uv sync --extra perf")
+        return False
+
+    if os.path.exists(dict_path) and not force:
+        print(f"[ERROR] 字典文件已存在: {dict_path}")
+        print("  已压缩的数据依赖原字典，如确认需要覆盖请加 --force")
+        return False
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT content FROM messages ORDER BY id DESC LIMIT :limit"),
+            {"limit": sample_count},
+        ).all()
+
+    samples = [decompress_value(row[0]).encode("utf-8") for row in rows if row[0]]
+    if len(samples) < 10:
+        print(f"[ERROR] 样本数量不足（{len(samples)} 条），无法训练字典")
+        return False
+
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    with open(dict_path, "wb") as f:
+        f.write(dictionary.as_bytes())
+
+    reset_zstd_dict()
+    print(f"[OK] 已使用 {len(samples)} 条消息训练字典: {dict_path} ({format_size(len(dictionary.as_bytes()))})")
+    print(f"  请在 .env 中设置 MESSAGE_COMPRESSION=zstd 与 MESSAGE_COMPRESSION_DICT={dict_path}")
+    return True
+
+
+def compress_existing_messages(codec_name=None, batch_size=500, sleep_seconds=0.05):
+    """
+    分批压缩已有消息
+
+    每批使用独立的短事务，批次之间让出写锁，避免阻塞在线写入。
+    """
+    settings = get_settings()
+    codec = resolve_codec(codec_name)
+    if codec is None:
+        print("[ERROR] 未启用消息压缩，请设置 MESSAGE_COMPRESSION 或使用 --codec 参数")
+        return
+
+    if codec == CODEC_ZSTD and not settings.MESSAGE_COMPRESSION_DICT:
+        print("[INFO] 未配置 zstd 字典，将使用无字典压缩")
+
+    threshold = settings.MESSAGE_COMPRESSION_THRESHOLD
+    print(f"开始压缩消息（阈值 {threshold} 字节，每批 {batch_size} 条）...")
+
+    last_id = 0
+    scanned = 0
+    compressed = 0
+    bytes_before = 0
+    bytes_after = 0
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, content FROM messages "
+                    "WHERE id > :last_id AND typeof(content) = 'text' "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+
+            if not rows:
+                break
+
+            updates = []
+            for msg_id, content in rows:
+                result = compress_text(content, codec, threshold)
+                if isinstance(result, bytes):
+                    bytes_before += len(content.encode("utf-8"))
+                    bytes_after += len(result)
+                    updates.append({"id": msg_id, "content": result})
+
+            if updates:
+                conn.execute(
+                    text("UPDATE messages SET content = :content WHERE id = :id"),
+                    updates,
+                )
+                # 修改内容的触发器会把消息登记为待索引，在同一事务内重新建立索引
+                index_pending_rows(conn, "messages", [update["id"] for update in updates])
+
+        scanned += len(rows)
+        compressed += len(updates)
+        last_id = rows[-1][0]
+        print(f"  - 已扫描 {scanned} 条，已压缩 {compressed} 条，当前 ID: {last_id}")
+
+        if sleep_seconds > 0:
+            time.sleep(sleep_seconds)
+
+    if compressed == 0:
+        print("[OK] 没有需要压缩的消息")
+        return
+
+    saved = bytes_before - bytes_after
+    ratio = bytes_after / bytes_before if bytes_before else 1
+    print(f"[OK] 共压缩 {compressed} 条消息")
+    print(f"  - 压缩前: {format_size(bytes_before)}")
+    print(f"  - 压缩后: {format_size(bytes_after)}（{ratio:.1%}）")
+    print(f"  - 节省空间: {format_size(saved)}")
+    print("  提示：运行 VACUUM 后数据库文件才会实际缩小")
+
+
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="消息压缩迁移工具")
+    parser.add_argument("--codec", choices=["zlib", "zstd"], help="压缩算法（默认读取 MESSAGE_COMPRESSION）")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的消息数")
+    parser.add_argument("--sleep", type=float, default=0.05, help="批次间隔（秒）")
+    parser.add_argument("--train-dict", metavar="PATH", help="训练 zstd 字典并保存到指定路径")
+    parser.add_argument("--dict-size", type=int, default=112640, help="字典大小（字节）")
+    parser.add_argument("--samples", type=int, default=5000, help="训练字典使用的样本消息数")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的字典文件")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    print("=" * 50)
+    print("消息压缩工具")
+    print("=" * 50)
+
+    if args.train_dict:
+        train_dictionary(args.train_dict, args.dict_size, args.samples, args.force)
+    else:
+        compress_existing_messages(args.codec, args.batch_size, args.sleep)
@@ -0,0 +1,45 @@
+"""
+请求活跃度跟踪模块
+记录当前进行中的 HTTP 请求（含流式响应）数量，供后台任务判断是否处于低峰期
+"""
+import time
+from typing import Tuple
+
+
+class ActivityTracker:
+    """进行中请求计数（仅在事件循环线程中修改，无需加锁）"""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.last_request_at = 0.0
+
+    def idle_seconds(self) -> float:
+        """距离最近一次请求结束或开始的秒数"""
+
+        if self.in_flight > 0:
+            return 0.0
+        return time.monotonic() - self.last_request_at
+
+
+tracker = ActivityTracker()
+
+
+class ActivityMiddleware:
+    """ASGI 中间件：流式响应发送完毕后才计为请求结束（长连接推送等路径不计入）"""
+
+    def __init__(self, app, exclude_paths: Tuple[str, ...] = ()) -> None:
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        tracker.in_flight += 1
+        tracker.last_request_at = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            tracker.in_flight -= 1
+            tracker.last_request_at = time.monotonic()
@@ -0,0 +1,175 @@
+"""
+消息内容压缩模块
+对超过阈值的长文本进行透明压缩，压缩后以 BLOB 形式存储在原 TEXT 列中
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Optional, Union
+
+from sqlalchemy.types import Text, TypeDecorator
+
+from .config import get_settings
+
+try:  # zstd 为可选依赖：uv sync --extra perf
+    import zstandard
+except ImportError:  # pragma: no cover - 未安装时退回 zlib
+    zstandard = None
+
+
+# 压缩数据头：魔数 + 编码类型（1 字节）
+MAGIC = b"\x1bCZ"
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+_CODEC_NAMES = {"zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+_zstd_dict = None
+_zstd_dict_loaded = False
+
+
+class CompressionError(RuntimeError):
+    """自定义异常：压缩数据无法解码"""
+
+
+def _load_zstd_dict():
+    """加载（并缓存）训练好的 zstd 字典"""
+
+    global _zstd_dict, _zstd_dict_loaded
+
+    if _zstd_dict_loaded:
+        return _zstd_dict
+
+    _zstd_dict_loaded = True
+    path = get_settings().MESSAGE_COMPRESSION_DICT
+    if zstandard is not None and path and os.path.exists(path):
+        with open(path, "rb") as f:
+            _zstd_dict = zstandard.ZstdCompressionDict(f.read())
+    return _zstd_dict
+
+
+def reset_zstd_dict() -> None:
+    """清除字典缓存（重新训练字典后调用）"""
+
+    global _zstd_dict, _zstd_dict_loaded
+    _zstd_dict = None
+    _zstd_dict_loaded = False
+
+
+def resolve_codec(name: Optional[str] = None) -> Optional[int]:
+    """
+    解析配置中的压缩算法
+
+    Args:
+        name: 算法名称（zlib/zstd/none），为空时读取配置
+
+    Returns:
+        编码类型，None 表示不压缩
+    """
+    if name is None:
+        name = get_settings().MESSAGE_COMPRESSION
+
+    codec = _CODEC_NAMES.get((name or "").strip().lower())
+    if codec == CODEC_ZSTD and zstandard is None:
+        # 未安装 zstandard 时退回 zlib
+        return CODEC_ZLIB
+    return codec
+
+
+def compress_text(
+    text: str,
+    codec: Optional[int] = None,
+    threshold: Optional[int] = None,
+) -> Union[str, bytes]:
+    """
+    按配置压缩文本
+
+    Args:
+        text: 原始文本
+        codec: 编码类型，为空时读取配置
+        threshold: 压缩阈值（UTF-8 字节数），为空时读取配置
+
+    Returns:
+        压缩后的字节串；未达到阈值或压缩无收益时返回原文本
+    """
+    if codec is None:
+        codec = resolve_codec()
+    if codec is None:
+        return text
+
+    if threshold is None:
+        threshold = get_settings().MESSAGE_COMPRESSION_THRESHOLD
+
+    raw = text.encode("utf-8")
+    if len(raw) < threshold:
+        return text
+
+    if codec == CODEC_ZSTD:
+        compressor = zstandard.ZstdCompressor(level=9, dict_data=_load_zstd_dict())
+        payload = compressor.compress(raw)
+    else:
+        payload = zlib.compress(raw, 6)
+
+    data = MAGIC + bytes([codec]) + payload
+    if len(data) >= len(raw):
+        return text
+    return data
+
+
+def decompress_value(value: Union[str, bytes, None]) -> Optional[str]:
+    """
+    还原数据库中存储的内容
+
+    Args:
+        value: 数据库中的原始值（文本或压缩后的字节串）
+
+    Returns:
+        原始文本
+    """
+    if value is None or isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    if not value.startswith(MAGIC):
+        return value.decode("utf-8")
+
+    codec = value[len(MAGIC)]
+    payload = value[len(MAGIC) + 1:]
+
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise CompressionError("消息使用 zstd 压缩，请先安装 zstandard")
+        decompressor = zstandard.ZstdDecompressor(dict_data=_load_zstd_dict())
+        return decompressor.decompress(payload).decode("utf-8")
+
+    raise CompressionError(f"未知的压缩类型: {codec}")
+
+
+def is_compressed(value: Union[str, bytes, None]) -> bool:
+    """判断数据库中的值是否为压缩数据"""
+
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC
+
+
+class CompressedText(TypeDecorator):
+    """
+    透明压缩的文本列类型
+
+    写入时超过阈值的文本被压缩为 BLOB，读取时自动解压，
+    未压缩的历史数据保持 TEXT 原样读取。
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_value(value)
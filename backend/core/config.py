@@ -12,9 +12,111 @@ class Settings(BaseSettings):
     BACKEND_HOST: str = "127.0.0.1"
     BACKEND_PORT: int = 8001
 
+    # 生产部署配置（python run.py --prod）
+    # 设置、ETag 版本、推送事件、后台任务记录保存在数据库中，各 worker 一致；以下状态仍在进程内：
+    # - 监控指标：各 worker 写入 METRICS_DIR 后汇总
+    # - 每日 token 配额计数（QuotaTracker）：其他 worker 的用量最多延迟 TOKEN_QUOTA_SYNC_SECONDS 计入
+    # - 进行中请求数（ActivityTracker）：维护任务只统计执行定时任务的 worker，
+    #   MAINTENANCE_MAX_ACTIVE_REQUESTS 相当于单个 worker 的阈值
+    # - 后台任务执行器：每个 worker 各自串行执行，多个 worker 可能同时运行批量任务
+    SERVER_WORKERS: int = 0  # worker 进程数，0 表示按 CPU 核数自动确定（最多 8 个）
+    SERVER_KEEPALIVE_SECONDS: int = 5  # HTTP keep-alive 超时（秒）
+    SERVER_BACKLOG: int = 2048  # 监听队列长度
+    SERVER_MAX_REQUESTS: int = 0  # 每个 worker 处理该数量请求后自动重启（限制内存增长），0 表示不限制
+    SERVER_MAX_REQUESTS_JITTER: int = 100  # 重启阈值的随机抖动，避免所有 worker 同时重启
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # 停止或回收 worker 时等待进行中请求（含推送长连接）的最长时间（秒）
+    SCHEDULER_LOCK_FILE: str = ""  # 定时任务选举锁文件，留空则使用数据库文件旁的 .scheduler.lock
+
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./cdhcprs.db"
 
+    # SQLite 连接配置
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL 模式下读写互不阻塞
+    SQLITE_WAL_AUTOCHECKPOINT: int = 1000  # WAL 达到该页数时自动检查点
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 等待写锁的超时时间（毫秒）
+
+    # 数据库维护配置
+    MAINTENANCE_INTERVAL_MINUTES: float = 60  # 维护任务执行间隔（分钟），0 表示不启用
+    MAINTENANCE_WINDOW: str = "02:00-05:00"  # 低峰期时间窗口（本地时间），留空表示任意时间
+    MAINTENANCE_MAX_ACTIVE_REQUESTS: int = 2  # 进行中请求超过该数量时跳过本轮维护（多 worker 时只统计执行维护的 worker）
+    MAINTENANCE_TIME_BUDGET_SECONDS: float = 2.0  # 每轮维护的时间预算（秒）
+    MAINTENANCE_VACUUM_PAGES: int = 200  # 每次增量回收的页数
+
+    # 归档配置
+    ARCHIVE_DATABASE_PATH: str = ""  # 归档数据库文件路径，留空则不启用归档
+    ARCHIVE_AFTER_DAYS: int = 180  # 超过该天数无新消息的对话将被归档
+    ARCHIVE_INACTIVE: bool = True  # 是否归档模型切换后失效的对话
+
+    # 数据清理配置
+    RETENTION_DAYS: int = 0  # 对话保留天数（按最后一条消息计算），0 表示永久保留
+    CLEANUP_INTERVAL_HOURS: float = 0  # 应用内定时清理间隔（小时），0 表示不启用
+    CLEANUP_BATCH_SIZE: int = 1000  # 每批删除的消息数
+    BULK_DELETE_BATCH_SIZE: int = 50  # 批量删除对话时每批（一个短事务）删除的对话数
+    BULK_USER_BATCH_SIZE: int = 20  # 批量封禁/删除用户时每批处理的用户数（删除用户会连带删除其全部对话）
+
+    # 消息压缩配置
+    MESSAGE_COMPRESSION: str = "none"  # none / zlib / zstd（zstd 需安装 zstandard）
+    MESSAGE_COMPRESSION_THRESHOLD: int = 1024  # 超过该字节数的消息才压缩
+    MESSAGE_COMPRESSION_DICT: str = ""  # zstd 训练字典路径（可选）
+
+    # 响应压缩配置（brotli 需安装 brotli，未安装时仅使用 gzip）
+    RESPONSE_COMPRESSION: bool = True  # 是否按 Accept-Encoding 压缩响应（流式响应不压缩）
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024  # 超过该字节数的响应才压缩
+    RESPONSE_GZIP_LEVEL: int = 6  # gzip 压缩级别（1-9）
+    RESPONSE_BROTLI_QUALITY: int = 4  # brotli 压缩质量（0-11，越高越慢）
+
+    # 事件推送配置
+    EVENTS_ENABLED: bool = True  # 是否提供 /api/chat/events 推送（SSE），关闭后前端退回定时轮询
+    EVENTS_HEARTBEAT_SECONDS: float = 15  # 空闲连接的心跳间隔（秒），需小于反向代理的读取超时
+    EVENTS_POLL_SECONDS: float = 1.0  # 各 worker 轮询事件日志、转发其他 worker 事件的间隔（秒）
+    EVENTS_MAX_CONNECTION_SECONDS: float = 600  # 单个推送连接的最长时长（秒），到期后客户端自动重连，0 表示不限制
+    EVENTS_QUEUE_SIZE: int = 100  # 每个连接积压的事件上限，超过后通知客户端重新同步
+    EVENTS_RETENTION_MINUTES: float = 10  # 事件日志保留时间（分钟）
+
+    # 统计汇总配置
+    ANALYTICS_ENABLED: bool = True  # 是否在写入消息时增量更新统计汇总表
+    ANALYTICS_UTC_OFFSET_HOURS: float = 8  # 统计按天划分所用的时区（相对 UTC 的小时数）
+
+    # 知识库配置
+    KNOWLEDGE_BASE_FILES: str = ""  # 追加的知识库数据文件（JSON，逗号分隔），同 ID 的疾病以后面的文件为准
+
+    # 全文检索配置
+    SEARCH_MAX_CANDIDATES: int = 2000  # 消息与标题各取最近的若干条命中参与相关度排序，0 表示对全部命中排序
+
+    # Token 用量配置
+    TOKEN_DAILY_QUOTA: int = 0  # 每个用户每天可用的 token 数（提示词 + 生成），0 表示不限制，可按用户单独设置
+    TOKEN_QUOTA_SYNC_SECONDS: float = 30  # 内存中的用量计数与数据库重新同步的间隔（秒）
+
+    # SQL 查询检查配置
+    QUERY_INSPECTOR_ENABLED: bool = True  # 是否记录慢查询并统计每个请求的查询次数
+    SLOW_QUERY_MS: float = 100  # 超过该耗时（毫秒）的语句记入慢查询日志，0 表示不记录
+    SLOW_QUERY_EXPLAIN: bool = True  # 慢查询日志是否附带执行计划
+    QUERY_COUNT_WARN: int = 30  # 单个请求的查询次数超过该值时记录警告，0 表示不检查
+    QUERY_REPEAT_WARN: int = 5  # 同一语句在单个请求中执行达到该次数时提示疑似 N+1，0 表示不检查
+
+    # 运行指标配置
+    METRICS_ENABLED: bool = False  # 是否提供 /api/metrics（Prometheus 文本格式）
+    METRICS_TOKEN: str = ""  # 访问令牌（Authorization: Bearer <token>），留空则任何人都可访问，启用时务必设置
+    METRICS_DIR: str = ""  # 多 worker 部署时各进程共享的快照目录，留空则只导出当前进程
+    METRICS_FLUSH_SECONDS: float = 5  # 各进程写入快照的间隔（秒）
+
+    # 请求追踪配置
+    TRACING_ENABLED: bool = True  # 是否记录请求耗时片段并返回 Server-Timing 响应头
+    TRACE_EXPORT_FILE: str = ""  # 追踪导出文件（OTLP/JSON，每行一个请求），留空则不导出
+    TRACE_SAMPLE_RATE: float = 0.1  # 导出采样率（0-1），携带 traceparent 的请求按其采样标记
+    TRACE_FILE_MAX_MB: int = 50  # 单个导出文件的最大大小（MB），超过后滚动
+    TRACE_FILE_BACKUPS: int = 5  # 保留的历史导出文件数
+
+    # 性能分析配置
+    PROFILING_ENABLED: bool = True  # 是否提供管理员按需 CPU / 内存分析接口
+    PROFILING_MAX_SECONDS: float = 120  # 单次 CPU 采样的最长时长（秒）
+    PROFILING_TRACEMALLOC_FRAMES: int = 25  # tracemalloc 默认记录的调用栈深度
+
+    # Logo 处理配置（需安装 Pillow，未安装时原样保存）
+    LOGO_MAX_DIMENSION: int = 512  # Logo 最大边长（像素），超过时等比缩小，0 表示不缩放
+    LOGO_CONVERT_WEBP: bool = False  # 是否将位图 Logo 重新编码为 WebP
+    LOGO_WEBP_QUALITY: int = 85  # WebP 编码质量（1-100）
+
     # JWT 配置
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
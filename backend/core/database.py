@@ -1,25 +1,65 @@
 """
 数据库连接配置模块
 """
+import os
+import tempfile
+
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import get_settings
+from .fts import register_sqlite_functions
+from .metrics import instrument_engine
+from .query_inspector import instrument_engine as instrument_queries
 
 settings = get_settings()
 
+# 归档数据库在连接中的附加名称
+ARCHIVE_SCHEMA = "archive"
+
 # 创建数据库引擎
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False}  # SQLite 需要此配置
 )
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+if settings.QUERY_INSPECTOR_ENABLED:
+    instrument_queries(engine, slow_query_ms=settings.SLOW_QUERY_MS, explain=settings.SLOW_QUERY_EXPLAIN)
+
+
+def scheduler_lock_path() -> str:
+    """定时任务选举锁文件路径（默认位于数据库文件旁，使同一数据库的所有 worker 只选出一个执行者）"""
+    if settings.SCHEDULER_LOCK_FILE:
+        return settings.SCHEDULER_LOCK_FILE
+    database = engine.url.database
+    if database and database != ":memory:":
+        return f"{os.path.abspath(database)}.scheduler.lock"
+    return os.path.join(tempfile.gettempdir(), "cdhcprs-scheduler.lock")
+
+
+def archive_enabled() -> bool:
+    """是否启用了归档数据库"""
+    return bool(settings.ARCHIVE_DATABASE_PATH)
+
+
 # 启用 SQLite 外键约束
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
-    """在每次连接时启用外键约束"""
+    """在每次连接时启用外键约束、设置日志模式，注册全文检索函数，并附加归档数据库"""
+    register_sqlite_functions(dbapi_conn)
     cursor = dbapi_conn.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    # 仅对新建数据库生效，已有数据库需执行一次 VACUUM（python maintain_db.py --enable-incremental-vacuum）
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    if settings.SQLITE_JOURNAL_MODE:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA wal_autocheckpoint={int(settings.SQLITE_WAL_AUTOCHECKPOINT)}")
+    if archive_enabled():
+        archive_path = os.path.abspath(settings.ARCHIVE_DATABASE_PATH)
+        cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
     cursor.close()
 
 # 创建会话工厂
@@ -28,6 +68,9 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 创建基类
 Base = declarative_base()
 
+# 归档表基类（位于附加的归档数据库中，需单独建表）
+ArchiveBase = declarative_base()
+
 
 def get_db():
     """
@@ -39,4 +82,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
@@ -0,0 +1,141 @@
+"""
+事件推送模块
+进程内的发布/订阅：每个推送连接（SSE）持有一个有界队列，发布时按用户直接投递，
+空闲连接只占用一个等待中的协程；队列满时丢弃积压并通知客户端重新同步
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Set
+
+from .metrics import EVENT_STREAMS, EVENTS_PUBLISHED
+
+# 客户端断线后的重连等待（毫秒），客户端在此基础上做指数退避
+RETRY_MS = 3000
+
+
+class Subscription:
+    """一个推送连接的订阅"""
+
+    def __init__(self, user_id: int, queue_size: int) -> None:
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, event: Dict[str, object]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 客户端消费过慢：丢弃积压的事件，只保留一条重新同步的通知
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "data": {}})
+
+
+class EventBroker:
+    """按用户分组的订阅表（只在事件循环线程中修改，发布可来自任意线程）"""
+
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """在事件循环中为用户建立订阅"""
+
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        EVENT_STREAMS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscribers[subscription.user_id]
+        EVENT_STREAMS.dec()
+
+    def publish(self, event: Dict[str, object], user_id: Optional[int] = None) -> None:
+        """
+        发布事件（线程安全）
+
+        Args:
+            event: 事件（type 与 data）
+            user_id: 接收用户，为空表示广播
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        if _running_loop() is loop:
+            self._dispatch(event, user_id)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, event, user_id)
+
+    def _dispatch(self, event: Dict[str, object], user_id: Optional[int]) -> None:
+        if user_id is None:
+            targets = [s for subscriptions in self._subscribers.values() for s in subscriptions]
+        else:
+            targets = list(self._subscribers.get(user_id, ()))
+        for subscription in targets:
+            subscription.deliver(event)
+        if targets:
+            EVENTS_PUBLISHED.inc(len(targets), type=event["type"])
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def format_sse(event: Dict[str, object]) -> str:
+    """格式化为 text/event-stream 消息"""
+
+    data = json.dumps(event.get("data", {}), ensure_ascii=False, default=str)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def event_stream(
+    broker: EventBroker,
+    user_id: int,
+    heartbeat_seconds: float,
+    max_seconds: float = 0,
+) -> AsyncIterator[str]:
+    """
+    用户的 SSE 消息流：连接后先发送 ready，之后转发事件，空闲时定期发送心跳注释
+
+    超过 max_seconds 后主动结束（客户端立即重连），使连接在 worker 间重新分布，
+    并保证 worker 回收、重启时不会被长连接一直阻塞；连接断开时 Starlette 取消生成器，
+    finally 中注销订阅
+    """
+    subscription = broker.subscribe(user_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds if max_seconds > 0 else None
+    try:
+        yield f"retry: {RETRY_MS}\n" + format_sse({"type": "ready", "data": {}})
+        while True:
+            timeout = heartbeat_seconds
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                timeout = min(timeout, remaining)
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+broker = EventBroker()
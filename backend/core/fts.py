@@ -0,0 +1,84 @@
+"""
+全文检索分词模块
+SQLite FTS5 内置分词器无法切分中文，这里将中文连续文本展开为字符二元组（bigram），
+再交给 unicode61 分词器按空格切分；查询时用同样的规则构造短语查询
+"""
+import re
+from typing import List, Optional
+
+from .compression import decompress_value
+
+# 中日韩统一表意文字（含扩展 A 与兼容区）
+_CJK_RANGE = "㐀-䶿一-鿿豈-﫿"
+_TOKEN_RE = re.compile(f"([{_CJK_RANGE}]+)|([^\\W{_CJK_RANGE}]+)")
+
+# 注册到 SQLite 连接上的函数名（旧版索引的触发器调用）
+INDEX_TEXT_FUNCTION = "cdh_fts_text"
+
+
+def _bigrams(run: str) -> List[str]:
+    """
+    将中文连续文本切分为二元组
+
+    末尾单字额外保留一次，使单字查询可通过前缀匹配命中每个位置
+    """
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def to_index_text(value) -> str:
+    """
+    将消息内容转换为用于建立索引的文本
+
+    Args:
+        value: 数据库中的原始值（可能是压缩后的字节串）
+
+    Returns:
+        以空格分隔的索引词
+    """
+    content = decompress_value(value) or ""
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(content.lower()):
+        if cjk:
+            tokens.extend(_bigrams(cjk))
+        else:
+            tokens.append(word)
+    return " ".join(tokens)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    将用户输入转换为 FTS5 MATCH 表达式
+
+    各关键词之间为 AND 关系；中文关键词转换为二元组短语，
+    单个汉字与英文/数字使用前缀匹配
+
+    Returns:
+        MATCH 表达式，输入中没有可检索的词时返回 None
+    """
+    terms: List[str] = []
+    for cjk, word in _TOKEN_RE.findall(query.lower()):
+        if cjk and len(cjk) > 1:
+            bigrams = [cjk[i:i + 2] for i in range(len(cjk) - 1)]
+            terms.append('"' + " ".join(bigrams) + '"')
+        else:
+            terms.append(f'"{cjk or word}"*')
+    return " ".join(terms) if terms else None
+
+
+def extract_terms(query: str) -> List[str]:
+    """提取用于生成摘要高亮的关键词（按长度降序）"""
+
+    terms = [cjk or word for cjk, word in _TOKEN_RE.findall(query.lower())]
+    return sorted(set(terms), key=len, reverse=True)
+
+
+def register_sqlite_functions(dbapi_conn) -> None:
+    """
+    在 SQLite 连接上注册生成索引文本的函数
+
+    当前的同步触发器只使用 SQL，不再调用该函数；保留注册是为了兼容尚未执行 init_db.py 迁移的旧版索引
+    """
+
+    dbapi_conn.create_function(INDEX_TEXT_FUNCTION, 1, to_index_text, deterministic=True)
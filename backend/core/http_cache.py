@@ -0,0 +1,67 @@
+"""
+HTTP 条件请求模块
+根据廉价的版本标记生成 ETag，客户端携带 If-None-Match 且未变化时返回 304
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+from .metrics import HTTP_CACHE_REQUESTS
+
+# 私有数据：浏览器可缓存，但每次使用前必须向服务器验证
+PRIVATE_REVALIDATE = "private, no-cache"
+PUBLIC_REVALIDATE = "public, no-cache"
+PUBLIC_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def make_etag(*parts: object, weak: bool = True) -> str:
+    """
+    根据版本标记生成 ETag
+
+    Args:
+        parts: 能唯一确定响应内容的版本标记（如最大 ID、数量）
+        weak: 是否生成弱 ETag（同一内容的不同序列化视为等价）
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按弱比较规则判断 If-None-Match 是否命中（同时记录缓存命中率指标）"""
+
+    matched = _etag_matches(if_none_match, etag)
+    HTTP_CACHE_REQUESTS.inc(result="hit" if matched else "miss")
+    return matched
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_REVALIDATE) -> Response:
+    """304 响应（仍需携带 ETag 与缓存策略）"""
+
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str = PRIVATE_REVALIDATE) -> None:
+    """为正常响应设置 ETag 与缓存策略"""
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
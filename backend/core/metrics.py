@@ -0,0 +1,497 @@
+"""
+运行指标模块
+提供 Prometheus 文本格式的计数器、仪表盘与直方图，并采集 HTTP、数据库与大模型调用指标
+
+写入路径不加锁：每个线程写入自己的分片，导出时再合并；
+多个 uvicorn worker 时，各进程定期把快照写入 METRICS_DIR，导出时合并所有进程的快照；
+已退出进程（如被回收的 worker）的快照在导出时并入一个累计快照，避免目录中的文件持续增加。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from core.scheduler import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# 请求、查询与大模型调用共用的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    """指标基类：按线程分片存储，写入无需加锁"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, object]] = []
+        self._shards_lock = threading.Lock()  # 仅在线程首次写入时使用
+        registry.register(self)
+
+    def _shard(self) -> Dict[LabelValues, object]:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.values = shard
+        return shard
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _merge(self, target, value):
+        return target + value
+
+    def collect(self) -> Dict[LabelValues, object]:
+        """合并各线程分片的当前值"""
+
+        with self._shards_lock:
+            shards = list(self._shards)
+
+        merged: Dict[LabelValues, object] = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                merged[key] = self._merge(merged[key], value) if key in merged else self._copy(value)
+        return merged
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """可增减的仪表盘（多进程时只合并存活进程的值）"""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """直方图：每个标签组合存储各分桶计数（非累计）与总和"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        shard = self._shard()
+        key = self._key(labels)
+        data = shard.get(key)
+        if data is None:
+            data = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def _merge(self, target, value):
+        return [a + b for a, b in zip(target, value)]
+
+    def _copy(self, value):
+        return list(value)
+
+
+class MetricsRegistry:
+    """指标注册表：生成快照、合并多进程快照并输出 Prometheus 文本格式"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        """当前进程的指标快照（可 JSON 序列化）"""
+
+        return {
+            name: [[list(key), value] for key, value in metric.collect().items()]
+            for name, metric in self._metrics.items()
+        }
+
+    def merge(self, snapshots: Iterable[Tuple[Dict[str, List[list]], bool]]) -> Dict[str, Dict[LabelValues, object]]:
+        """
+        合并多个进程的快照
+
+        Args:
+            snapshots: (快照, 进程是否存活)，已退出进程的仪表盘值不计入
+        """
+        merged: Dict[str, Dict[LabelValues, object]] = {name: {} for name in self._metrics}
+        for snapshot, alive in snapshots:
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                target = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    target[key] = metric._merge(target[key], value) if key in target else metric._copy(value)
+        return merged
+
+    def render(self, merged: Dict[str, Dict[LabelValues, object]]) -> str:
+        """输出 Prometheus 文本格式（0.0.4）"""
+
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(list(metric.buckets) + [float("inf")], value[:-1]):
+                    cumulative += count
+                    bucket_labels = labels + [("le", "+Inf" if bound == float("inf") else _format_value(bound))]
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+
+# ========== HTTP ==========
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP 请求数", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（流式响应计到发送完毕）", ("method", "route")
+)
+HTTP_CACHE_REQUESTS = Counter(
+    "http_conditional_requests_total", "带 ETag 的读接口命中情况（hit 表示返回 304）", ("result",)
+)
+
+EVENT_STREAMS = Gauge("event_stream_connections", "当前进程中保持连接的事件推送（SSE）数")
+EVENTS_PUBLISHED = Counter("events_published_total", "推送给客户端的事件数", ("type",))
+
+# ========== 数据库 ==========
+
+DB_QUERIES = Counter("db_queries_total", "数据库语句执行次数", ("operation",))
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "数据库语句耗时",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "数据库语句执行失败次数", ("operation",))
+
+# ========== 大模型 ==========
+
+LLM_REQUESTS = Counter("llm_requests_total", "大模型调用次数", ("provider", "operation", "outcome"))
+LLM_ACTIVE_STREAMS = Gauge("llm_active_streams", "进行中的流式生成数", ("provider",))
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "流式生成首个内容片段的等待时间（prompt_cache 为前缀缓存命中情况 hit/miss/unknown）",
+    ("provider", "prompt_cache"),
+)
+LLM_STREAM_DURATION = Histogram("llm_stream_duration_seconds", "流式生成总耗时", ("provider",))
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "大模型 token 用量（kind 为 prompt_cached/prompt_uncached/completion，供应商未返回用量时为估算值）",
+    ("provider", "operation", "kind"),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_stream_tokens_per_second",
+    "流式生成速度（按内容片段数估算 token 数，从首个片段开始计时）",
+    ("provider",),
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300),
+)
+
+
+def db_operation(statement: str) -> str:
+    """语句类型（SELECT/INSERT/...），作为低基数标签"""
+
+    head = statement.lstrip().split(None, 1)
+    operation = head[0].upper() if head else ""
+    if operation in {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "WITH", "CREATE", "BEGIN", "COMMIT"}:
+        return operation
+    return "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """通过 SQLAlchemy 引擎事件记录每条语句的次数与耗时"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        operation = db_operation(statement)
+        DB_QUERIES.inc(operation=operation)
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        stack = context.connection.info.get("query_start_time") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.inc(operation=db_operation(context.statement or ""))
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：按路由模板统计请求数与耗时（未匹配的路径归为一类，避免标签膨胀）"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "<unmatched>"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route_path, status=status_code)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=method, route=route_path)
+
+
+# ========== 多进程汇总 ==========
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 已退出进程的计数器与直方图累计值（仪表盘不保留）
+DEAD_SNAPSHOT = "metrics-dead.json"
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def _snapshot_pid(filename: str) -> Optional[int]:
+    """从快照文件名（metrics-<pid>.json 或写入中的 .tmp）解析进程号"""
+
+    if not filename.startswith("metrics-"):
+        return None
+    for suffix in (".json", ".json.tmp"):
+        if filename.endswith(suffix):
+            pid = filename[len("metrics-"):-len(suffix)]
+            return int(pid) if pid.isdigit() else None
+    return None
+
+
+def _load_snapshot(path: str) -> Dict[str, List[list]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_snapshot(directory: str) -> None:
+    """把当前进程的快照写入共享目录（先写临时文件再原子替换）"""
+
+    pid = os.getpid()
+    path = _snapshot_path(directory, pid)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def clear_snapshots(directory: str) -> None:
+    """删除共享目录中的旧快照（服务整体重启前调用，避免累计上一次运行的计数）"""
+
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith("metrics-") and filename.endswith((".json", ".tmp", ".lock")):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+
+
+def fold_dead_snapshots(directory: str) -> int:
+    """
+    把已退出进程的快照并入累计快照并删除原文件
+
+    多个进程同时导出时只有获得锁的进程执行合并，其余进程本次跳过
+
+    Returns:
+        合并的快照数量
+    """
+    lock = LeaderLock(os.path.join(directory, "metrics-dead.lock"))
+    if not lock.acquire():
+        return 0
+    try:
+        dead = []
+        for filename in os.listdir(directory):
+            pid = _snapshot_pid(filename)
+            if pid is not None and not _pid_alive(pid):
+                dead.append(filename)
+        if not dead:
+            return 0
+
+        dead_path = os.path.join(directory, DEAD_SNAPSHOT)
+        snapshots = []
+        if os.path.exists(dead_path):
+            snapshots.append((_load_snapshot(dead_path), False))
+        folded = []
+        for filename in dead:
+            if filename.endswith(".json"):
+                try:
+                    snapshots.append((_load_snapshot(os.path.join(directory, filename)), False))
+                except (ValueError, OSError):
+                    continue
+            folded.append(filename)
+
+        merged = registry.merge(snapshots)
+        tmp_path = f"{dead_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({name: [[list(key), value] for key, value in samples.items()] for name, samples in merged.items()}, f)
+        os.replace(tmp_path, dead_path)
+        for filename in folded:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                pass
+        return len(folded)
+    finally:
+        lock.release()
+
+
+def render_metrics(directory: Optional[str] = None) -> str:
+    """
+    导出指标
+
+    Args:
+        directory: 多进程快照目录，为空时只导出当前进程
+    """
+    if not directory:
+        return registry.render(registry.merge([(registry.snapshot(), True)]))
+
+    os.makedirs(directory, exist_ok=True)
+    write_snapshot(directory)
+    fold_dead_snapshots(directory)
+
+    snapshots = []
+    for filename in os.listdir(directory):
+        if filename == DEAD_SNAPSHOT:
+            pid = None
+        elif filename.endswith(".json"):
+            pid = _snapshot_pid(filename)
+            if pid is None:
+                continue
+        else:
+            continue
+        try:
+            snapshots.append((_load_snapshot(os.path.join(directory, filename)), pid is not None and _pid_alive(pid)))
+        except (ValueError, OSError):
+            # 正在被其他进程替换或内容不完整，本次跳过
+            continue
+    return registry.render(registry.merge(snapshots))
+
+
+class SnapshotWriter:
+    """定期把当前进程的快照写入共享目录（每个 worker 各自运行）"""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._directory = ""
+
+    async def _run_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(write_snapshot, self._directory)
+            except OSError:
+                logger.exception("写入指标快照失败")
+
+    def start(self, directory: str, interval: float) -> None:
+        """启动定期写入（未配置目录时不启动）"""
+
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._task = asyncio.create_task(self._run_forever(interval), name="metrics:snapshot")
+
+    async def stop(self) -> None:
+        """停止定期写入，并在退出前写入最终快照（保留计数器的累计值）"""
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        write_snapshot(self._directory)
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,219 @@
+"""
+运行时性能分析模块
+按需对当前进程进行采样式 CPU 分析（输出火焰图可用的折叠栈）和 tracemalloc 内存分析；
+未启动分析时不注册任何钩子、不运行任何线程，对正常请求没有额外开销
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+# 叶子帧位于这些函数时视为线程空闲（等待锁、事件循环 select 等）
+_IDLE_FUNCTIONS = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("concurrent/futures/thread.py", "_worker"),
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(code) -> bool:
+    filename = code.co_filename.replace("\\", "/")
+    return any(filename.endswith(suffix) and code.co_name == name for suffix, name in _IDLE_FUNCTIONS)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """输出折叠栈文本（每行 "帧;帧;帧 数值"），可直接用于 flamegraph.pl / speedscope"""
+
+    return "".join(f"{stack} {value}\n" for stack, value in stacks.most_common())
+
+
+class CpuProfiler:
+    """采样式 CPU 分析器：在后台线程中定时读取所有线程的调用栈并计数"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.seconds = 0.0
+        self.interval = 0.0
+        self.include_idle = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.01, include_idle: bool = False) -> bool:
+        """
+        开始采样（持续 seconds 秒后自动停止）
+
+        Returns:
+            已有分析在运行时返回 False
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.seconds = seconds
+            self.interval = interval
+            self.include_idle = include_idle
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="cpu-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        """提前结束采样"""
+
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        try:
+            while time.monotonic() < deadline and not self._stop_event.wait(self.interval):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    if not self.include_idle and _is_idle(frame.f_code):
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, str(thread_id)))
+                    self._stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+        finally:
+            self.finished_at = time.time()
+
+    def collapsed(self) -> str:
+        """最近一次采样的折叠栈（值为采样次数）"""
+
+        return format_collapsed(Counter(self._stacks))
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "pid": os.getpid(),
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "seconds": self.seconds,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+        }
+
+
+class MemoryProfiler:
+    """tracemalloc 封装：按需开启跟踪、拍摄快照并与上一次快照比较"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25) -> bool:
+        """开启跟踪（已开启时返回 False）"""
+
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return False
+            self._last = None
+            tracemalloc.start(frames)
+            return True
+
+    def stop(self) -> None:
+        """停止跟踪并释放快照"""
+
+        with self._lock:
+            self._last = None
+            tracemalloc.stop()
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, object]:
+        """
+        拍摄快照，返回占用最多的分配位置及其相对上一次快照的变化
+
+        Args:
+            limit: 返回的分配位置数量
+            group_by: 分组方式（lineno 按行，traceback 按完整调用栈）
+
+        Raises:
+            RuntimeError: 未开启跟踪
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("内存跟踪未开启")
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ))
+            previous, self._last = self._last, snapshot
+
+        if previous is not None:
+            stats = snapshot.compare_to(previous, group_by)
+        else:
+            stats = snapshot.statistics(group_by)
+
+        top: List[Dict[str, object]] = []
+        for stat in stats[:limit]:
+            frames = list(stat.traceback)
+            site = " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in reversed(frames[-5:]))
+            top.append({
+                "site": site,
+                "size": stat.size,
+                "count": stat.count,
+                "size_diff": getattr(stat, "size_diff", stat.size),
+                "count_diff": getattr(stat, "count_diff", stat.count),
+            })
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "compared": previous is not None,
+            "traced_current": current,
+            "traced_peak": peak,
+            "total_size": sum(stat.size for stat in snapshot.statistics("filename")),
+            "top": top,
+        }
+
+    def collapsed(self) -> str:
+        """最近一次快照按调用栈折叠的结果（值为仍占用的字节数）"""
+
+        snapshot = self._last
+        if snapshot is None:
+            return ""
+        stacks: Counter = Counter()
+        for stat in snapshot.statistics("traceback"):
+            labels = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+            stacks[";".join(labels)] += stat.size
+        return format_collapsed(stacks)
+
+
+cpu_profiler = CpuProfiler()
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,189 @@
+"""
+SQL 查询检查模块
+记录慢查询（附执行计划），统计每个请求的查询次数并标记重复语句（N+1 模式），
+并提供在测试中限制查询次数的断言工具
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """一个请求（或一次断言范围）内的查询统计"""
+
+    count: int = 0
+    duration: float = 0.0
+    statements: Counter = field(default_factory=Counter)  # 语句文本 -> 次数
+    executions: Counter = field(default_factory=Counter)  # (语句, 参数) -> 次数
+
+    def record(self, statement: str, parameters, elapsed: float) -> None:
+        self.count += 1
+        self.duration += elapsed
+        self.statements[statement] += 1
+        try:
+            self.executions[(statement, repr(parameters))] += 1
+        except Exception:  # noqa: BLE001 - 参数无法表示时只按语句统计
+            pass
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """执行次数不少于 threshold 的语句（参数不同，通常是循环中逐条查询）"""
+
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def duplicates(self) -> List[Tuple[str, int]]:
+        """语句与参数完全相同、被重复执行的查询"""
+
+        return [(statement, count) for (statement, _), count in self.executions.most_common() if count > 1]
+
+
+_request_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+_collectors: List[QueryStats] = []
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """当前请求的查询统计（不在请求中时为 None）"""
+
+    return _request_stats.get()
+
+
+def _short(statement: str, limit: int = 300) -> str:
+    compact = " ".join(statement.split())
+    return compact if len(compact) <= limit else compact[:limit] + "..."
+
+
+def _explain(cursor, statement: str, parameters) -> str:
+    """在同一连接上获取 SQLite 执行计划（不触发引擎事件）"""
+
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    except Exception as exc:  # noqa: BLE001
+        return f"(无法获取执行计划: {exc})"
+    return "; ".join(str(row[-1]) for row in rows)
+
+
+def instrument_engine(engine, slow_query_ms: float = 100.0, explain: bool = True) -> None:
+    """
+    在引擎上注册查询检查
+
+    Args:
+        engine: SQLAlchemy 引擎
+        slow_query_ms: 超过该耗时（毫秒）的语句记入慢查询日志，0 表示不记录
+        explain: 慢 SELECT 是否附带执行计划
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inspector_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["inspector_start_time"].pop()
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(statement, parameters, elapsed)
+        for collector in list(_collectors):
+            collector.record(statement, parameters, elapsed)
+
+        if slow_query_ms > 0 and elapsed * 1000 >= slow_query_ms:
+            plan = ""
+            if explain and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                plan = f"\n  执行计划: {_explain(cursor, statement, parameters)}"
+            logger.warning("慢查询 %.1f ms: %s%s", elapsed * 1000, _short(statement), plan)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        stack = context.connection.info.get("inspector_start_time") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+class QueryInspectorMiddleware:
+    """ASGI 中间件：统计每个请求的查询次数，超过阈值或出现重复语句时记录警告"""
+
+    def __init__(self, app, max_queries: int = 30, repeat_threshold: int = 5, expose_header: bool = False) -> None:
+        self.app = app
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+        self.expose_header = expose_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if self.expose_header and message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-query-count", str(stats.count).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            self.report(scope, stats)
+
+    def report(self, scope, stats: QueryStats) -> None:
+        route = scope.get("route")
+        target = f"{scope.get('method', '')} {getattr(route, 'path', None) or scope.get('path', '')}"
+
+        if self.max_queries > 0 and stats.count > self.max_queries:
+            logger.warning("%s 执行了 %d 条查询（%.1f ms），超过阈值 %d", target, stats.count, stats.duration * 1000, self.max_queries)
+
+        for statement, count in stats.duplicates():
+            logger.warning("%s 重复执行相同查询 %d 次: %s", target, count, _short(statement))
+
+        if self.repeat_threshold > 0:
+            for statement, count in stats.repeated(self.repeat_threshold):
+                logger.warning("%s 疑似 N+1 查询，同一语句执行 %d 次: %s", target, count, _short(statement))
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """
+    统计代码块内（所有线程）执行的查询
+
+    用法：
+        with capture_queries() as stats:
+            client.get("/api/chat/conversations")
+        print(stats.count)
+    """
+    stats = QueryStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    断言代码块内执行的查询不超过 limit 条（用于测试）
+
+    Raises:
+        AssertionError: 查询次数超过限制，消息中列出执行的语句
+    """
+    with capture_queries() as stats:
+        yield stats
+
+    if stats.count > limit:
+        listing = "\n".join(f"  {count} x {_short(statement, 200)}" for statement, count in stats.statements.most_common())
+        raise AssertionError(f"预期最多 {limit} 条查询，实际执行了 {stats.count} 条：\n{listing}")
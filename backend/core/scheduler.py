@@ -0,0 +1,151 @@
+"""
+应用内定时任务模块
+在事件循环中按固定间隔调度后台任务，任务本身在线程池中执行，不阻塞请求处理；
+多 worker 部署时通过文件锁选出唯一的执行进程
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """非阻塞的进程间文件锁：持有锁的进程负责执行定时任务，进程退出时由系统自动释放"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """尝试获取锁（不等待），成功返回 True"""
+
+        if self._file is not None:
+            return True
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+
+@dataclass
+class PeriodicJob:
+    """定时任务定义"""
+
+    name: str
+    interval_seconds: float
+    func: Callable[[], object]
+    initial_delay: float = 60.0
+    last_result: Optional[object] = field(default=None, init=False)
+
+
+class Scheduler:
+    """简单的定时任务调度器（同一时刻每个任务最多运行一个实例）"""
+
+    def __init__(self) -> None:
+        self._jobs: Dict[str, PeriodicJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._lock: Optional[LeaderLock] = None
+
+    def add_job(self, job: PeriodicJob) -> None:
+        """注册定时任务（需在 start 之前调用）"""
+
+        self._jobs[job.name] = job
+
+    @property
+    def jobs(self) -> List[PeriodicJob]:
+        return list(self._jobs.values())
+
+    async def _run_forever(self, job: PeriodicJob) -> None:
+        await asyncio.sleep(job.initial_delay)
+        while True:
+            try:
+                job.last_result = await asyncio.to_thread(job.func)
+                logger.info("定时任务 %s 完成: %s", job.name, job.last_result)
+            except Exception:  # noqa: BLE001
+                logger.exception("定时任务 %s 执行失败", job.name)
+            await asyncio.sleep(job.interval_seconds)
+
+    def _start_jobs(self) -> None:
+        for job in self._jobs.values():
+            self._tasks.append(asyncio.create_task(self._run_forever(job), name=f"job:{job.name}"))
+
+    async def _elect(self, lock: LeaderLock, retry_seconds: float) -> None:
+        # 未抢到锁的进程定期重试，执行进程被回收或退出后由其他 worker 接替
+        while not lock.acquire():
+            await asyncio.sleep(retry_seconds)
+        logger.info("进程 %d 负责执行定时任务", os.getpid())
+        self._start_jobs()
+
+    def start(self, lock_path: Optional[str] = None, retry_seconds: float = 30.0) -> None:
+        """
+        在当前事件循环中启动所有任务
+
+        Args:
+            lock_path: 多进程选举使用的锁文件，为空时直接在本进程执行
+            retry_seconds: 未获得锁时的重试间隔（秒）
+        """
+        if not self._jobs:
+            return
+        if not lock_path:
+            self._start_jobs()
+            return
+
+        self._lock = LeaderLock(lock_path)
+        self._tasks.append(asyncio.create_task(self._elect(self._lock, retry_seconds), name="scheduler:elect"))
+
+    async def stop(self) -> None:
+        """取消所有任务并释放锁（已在线程中运行的任务会继续执行到结束）"""
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._lock is not None:
+            self._lock.release()
+            self._lock = None
+
+
+scheduler = Scheduler()
@@ -0,0 +1,76 @@
+"""
+JSON 序列化模块
+优先使用 orjson（可选依赖），并提供将 ORM 行直接序列化为字节的快速路径，
+避免大列表逐行实例化 Pydantic 模型
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, Optional, Sequence
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:  # orjson 为可选依赖：uv sync --extra perf
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时退回标准库 json
+    orjson = None
+
+
+# 与对应响应 Schema 的字段顺序保持一致
+MESSAGE_FIELDS = ("role", "content", "id", "conversation_id", "created_at")
+CONVERSATION_FIELDS = ("title", "id", "user_id", "is_active", "created_at")
+
+
+def _default(value: Any) -> Any:
+    """标准库 json 无法处理的类型"""
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为 UTF-8 JSON 字节（输出格式与 Starlette JSONResponse 一致）"""
+
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_default,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 orjson 渲染的 JSON 响应（未安装 orjson 时与 JSONResponse 相同）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def serialize_rows(rows: Iterable[Any], fields: Sequence[str]) -> bytes:
+    """将 ORM 对象按字段列表直接序列化为 JSON 数组"""
+
+    return dumps([{field: getattr(row, field) for field in fields} for row in rows])
+
+
+def rows_response(
+    rows: Iterable[Any],
+    fields: Sequence[str],
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    以 JSON 数组返回 ORM 对象列表（跳过 response_model 校验）
+
+    仅用于字段均为基础类型、且数据来自数据库无需再校验的只读列表接口；
+    路由上保留 response_model 以生成接口文档
+    """
+    return Response(
+        content=serialize_rows(rows, fields),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,274 @@
+"""
+请求追踪模块
+为每个请求记录轻量级的耗时片段（span），以 Server-Timing 响应头返回，
+并按采样率导出为 OpenTelemetry OTLP/JSON 格式的本地滚动 JSONL 文件
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "cdhcprs-backend"
+
+
+@dataclass
+class Span:
+    """耗时片段"""
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, object] = field(default_factory=dict)
+    error: bool = False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+@dataclass
+class Trace:
+    """一次请求内的全部片段"""
+
+    trace_id: str
+    sampled: bool
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def current_trace() -> Optional[Trace]:
+    """当前请求的追踪上下文（未启用追踪时为 None）"""
+
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    记录一个耗时片段（当前请求未启用追踪时不做任何事）
+
+    用法：
+        with span("chat.prompt", messages=len(history)):
+            ...
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        span_id=_new_id(8),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 流式响应被取消时，生成器可能在其他上下文中关闭
+            pass
+        trace.spans.append(current)
+
+
+def traced(name: Optional[str] = None):
+    """装饰器：把函数调用记录为耗时片段（支持同步与异步函数，保留签名供 FastAPI 依赖注入使用）"""
+
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def server_timing(trace: Trace, root: Optional[Span] = None) -> str:
+    """
+    生成 Server-Timing 头（同名片段合并耗时，desc 中注明次数）
+
+    只包含已结束的片段；流式响应在发送响应头时仅包含生成前的片段
+    """
+    totals: Dict[str, Tuple[float, int]] = {}
+    for item in list(trace.spans):
+        if item is root:
+            continue
+        duration, count = totals.get(item.name, (0.0, 0))
+        totals[item.name] = (duration + item.duration_ms, count + 1)
+
+    entries = []
+    for name, (duration, count) in totals.items():
+        desc = f';desc="x{count}"' if count > 1 else ""
+        entries.append(f"{name};dur={duration:.2f}{desc}")
+    if root is not None:
+        entries.append(f"total;dur={(time.time_ns() - root.start_ns) / 1e6:.2f}")
+    return ", ".join(entries)
+
+
+# ========== 导出 ==========
+
+def _otlp_value(value: object) -> Dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, object]:
+    """转换为 OTLP/JSON 的 ExportTraceServiceRequest 结构"""
+
+    spans = []
+    root = trace.spans[-1] if trace.spans else None  # 请求根片段最后结束
+    for item in trace.spans:
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "parentSpanId": item.parent_id or "",
+            "name": item.name,
+            "kind": 2 if item is root else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+            "status": {"code": 2 if item.error else 1},  # ERROR / OK
+        })
+
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+class JsonlExporter:
+    """把采样的追踪写入按大小滚动的 JSONL 文件（每行一个请求）"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def export(self, trace: Trace) -> None:
+        record = logging.LogRecord(__name__, logging.INFO, "", 0, json.dumps(to_otlp(trace), ensure_ascii=False), None, None)
+        self._handler.handle(record)
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+def _parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    """解析 W3C traceparent 头：返回 (trace_id, parent_span_id, sampled)"""
+
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+class TracingMiddleware:
+    """ASGI 中间件：为每个 HTTP 请求建立追踪上下文，添加 Server-Timing 头并导出采样的追踪"""
+
+    def __init__(self, app, sample_rate: float = 0.0, exporter: Optional[JsonlExporter] = None) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        parent = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if parent:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = _new_id(16), None, random.random() < self.sample_rate
+
+        trace = Trace(trace_id=trace_id, sampled=sampled and self.exporter is not None)
+        root = Span(
+            name=f"{scope.get('method', '')} {scope.get('path', '')}",
+            span_id=_new_id(8),
+            parent_id=parent_id,
+            start_ns=time.time_ns(),
+        )
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                timing = server_timing(trace, root)
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            root.error = True
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope.get('method', '')} {route.path}"
+            root.attributes.update({"http.method": scope.get("method", ""), "http.target": scope.get("path", "")})
+            trace.spans.append(root)
+            if trace.sampled:
+                try:
+                    self.exporter.export(trace)
+                except OSError:
+                    logger.exception("导出追踪数据失败")
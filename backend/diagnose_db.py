@@ -1,10 +1,65 @@
 """
 数据库诊断脚本
-检查是否存在孤立消息和ID复用问题
+检查是否存在孤立消息和ID复用问题，并可生成性能报告
+
+使用方法：
+    python diagnose_db.py [数据库路径] [选项]
+
+示例：
+    python diagnose_db.py                       # 完整性诊断
+    python diagnose_db.py --perf                # 性能报告（文本）
+    python diagnose_db.py --perf --json         # 性能报告（JSON，输出到标准输出）
+    python diagnose_db.py --perf --json report.json   # 性能报告写入文件，便于跟踪趋势
 """
+import argparse
+import json
 import sys
 import sqlite3
 import os
+from datetime import datetime
+
+from core.fts import register_sqlite_functions
+
+
+# 服务层实际发出的查询（与 SQLAlchemy 生成的语句结构一致），用于 EXPLAIN QUERY PLAN
+SERVICE_QUERIES = [
+    ("auth.get_current_user", "SELECT * FROM users WHERE users.username = ? LIMIT 1", ("admin",)),
+    ("admin.get_all_users", "SELECT * FROM users ORDER BY users.created_at DESC", ()),
+    ("admin.search_users",
+     "SELECT * FROM users WHERE users.role = ? AND users.is_banned = ? ORDER BY users.id DESC LIMIT 21", ("user", 0)),
+    ("admin.search_users_prefix",
+     "SELECT * FROM users WHERE lower(users.username) >= ? AND lower(users.username) < ? "
+     "ORDER BY users.id DESC LIMIT 21",
+     ("ali", "alj")),
+    ("admin.search_users_contains",
+     "SELECT * FROM users WHERE users.id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?) "
+     "ORDER BY users.id DESC LIMIT 21", ('"lic"',)),
+    ("admin.update_user_ban_status", "SELECT * FROM users WHERE users.id = ? LIMIT 1", (1,)),
+    ("chat.get_user_conversations",
+     "SELECT * FROM conversations WHERE conversations.user_id = ? ORDER BY conversations.created_at DESC", (1,)),
+    ("chat.get_conversation_by_id", "SELECT * FROM conversations WHERE conversations.id = ? LIMIT 1", (1,)),
+    ("chat.get_conversation_messages",
+     "SELECT * FROM messages WHERE messages.conversation_id = ? ORDER BY messages.created_at ASC", (1,)),
+    ("chat.delete_conversation", "DELETE FROM messages WHERE messages.conversation_id = ?", (1,)),
+    ("admin.get_all_conversations", "SELECT * FROM conversations ORDER BY conversations.created_at DESC", ()),
+    ("admin.disable_all_conversations", "UPDATE conversations SET is_active = 0", ()),
+    ("settings.get_setting", "SELECT * FROM system_settings WHERE system_settings.key = ?", ("system_prompt",)),
+    ("settings.get_all_settings", "SELECT * FROM system_settings", ()),
+    ("search.search_conversations",
+     "SELECT rowid, bm25(messages_fts, 1.0, 0.0) AS score FROM messages_fts "
+     "WHERE messages_fts MATCH ? AND rowid <= ? ORDER BY rowid DESC LIMIT 2000",
+     ('owner : u1 AND body : ("高血")', 2 ** 62)),
+    ("archive.find_candidates",
+     "SELECT c.id FROM conversations c WHERE c.id > ? AND (COALESCE((SELECT m.created_at FROM messages m "
+     "WHERE m.conversation_id = c.id ORDER BY m.id DESC LIMIT 1), c.created_at) < ? "
+     "OR c.is_active = 0) ORDER BY c.id LIMIT 100", (0, "2000-01-01")),
+    ("cleanup.purge_orphaned_messages",
+     "SELECT m.id FROM messages m WHERE m.id > ? AND NOT EXISTS "
+     "(SELECT 1 FROM conversations c WHERE c.id = m.conversation_id) ORDER BY m.id LIMIT 1000", (0,)),
+]
+
+# sqlite_stat1 记录的行数与实际行数偏差超过该比例视为过期
+STALE_STAT_RATIO = 0.2
 
 
 def diagnose_database(db_path="cdhcprs.db"):
@@ -135,6 +190,269 @@ def diagnose_database(db_path="cdhcprs.db"):
         conn.close()
 
 
+def _distribution(values):
+    """计算分布统计（min/avg/p50/p90/p99/max）"""
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def percentile(p):
+        return values[min(int(len(values) * p), len(values) - 1)]
+
+    return {
+        "count": len(values),
+        "min": values[0],
+        "avg": round(sum(values) / len(values), 2),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": values[-1],
+    }
+
+
+def collect_performance_report(db_path):
+    """
+    收集性能报告数据
+
+    Returns:
+        可直接序列化为 JSON 的字典
+    """
+    conn = sqlite3.connect(db_path)
+    register_sqlite_functions(conn)  # 全文索引触发器依赖该函数，否则无法分析 DELETE 语句
+    cursor = conn.cursor()
+    report = {"database": os.path.abspath(db_path), "generated_at": datetime.now().isoformat(timespec="seconds")}
+
+    try:
+        # 1. 页与缓存设置
+        pragmas = {}
+        for name in ("page_size", "page_count", "freelist_count", "cache_size", "mmap_size",
+                     "journal_mode", "synchronous", "auto_vacuum", "wal_autocheckpoint", "temp_store"):
+            pragmas[name] = cursor.execute(f"PRAGMA {name}").fetchone()[0]
+        page_count = pragmas["page_count"] or 1
+        pragmas["file_size_bytes"] = pragmas["page_size"] * pragmas["page_count"]
+        pragmas["freelist_ratio"] = round(pragmas["freelist_count"] / page_count, 4)
+        cache_size = pragmas["cache_size"]
+        pragmas["cache_bytes"] = -cache_size * 1024 if cache_size < 0 else cache_size * pragmas["page_size"]
+        pragmas["cache_coverage"] = round(min(pragmas["cache_bytes"] / max(pragmas["file_size_bytes"], 1), 1), 4)
+        report["pragmas"] = pragmas
+
+        # 2. 表与索引大小（依赖 SQLITE_ENABLE_DBSTAT_VTAB）
+        try:
+            rows = cursor.execute("""
+                SELECT d.name, m.type, m.tbl_name, SUM(d.pgsize), COUNT(*),
+                       SUM(d.unused), SUM(d.ncell)
+                FROM dbstat d LEFT JOIN sqlite_master m ON m.name = d.name
+                GROUP BY d.name ORDER BY SUM(d.pgsize) DESC
+            """).fetchall()
+            report["objects"] = [
+                {
+                    "name": name,
+                    "type": obj_type or "internal",
+                    "table": tbl_name,
+                    "bytes": size,
+                    "pages": pages,
+                    "unused_ratio": round(unused / size, 4) if size else 0,
+                    "cells": cells,
+                }
+                for name, obj_type, tbl_name, size, pages, unused, cells in rows
+            ]
+        except sqlite3.OperationalError as exc:
+            report["objects"] = None
+            report["objects_error"] = f"dbstat 不可用: {exc}"
+
+        # 3. 行数分布
+        counts = {}
+        for table in ("users", "conversations", "messages"):
+            counts[table] = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        report["row_counts"] = counts
+        report["distributions"] = {
+            "messages_per_conversation": _distribution([
+                row[0] for row in cursor.execute(
+                    "SELECT COUNT(*) FROM messages GROUP BY conversation_id"
+                )
+            ]),
+            "conversations_per_user": _distribution([
+                row[0] for row in cursor.execute(
+                    "SELECT COUNT(*) FROM conversations GROUP BY user_id"
+                )
+            ]),
+            "message_bytes": _distribution([
+                row[0] for row in cursor.execute(
+                    "SELECT length(CAST(content AS BLOB)) FROM messages"
+                )
+            ]),
+        }
+
+        # 4. 统计信息是否过期
+        has_stat = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        ).fetchone()
+        statistics = {"analyzed": bool(has_stat), "tables": {}}
+        if has_stat:
+            for tbl, stat in cursor.execute(
+                "SELECT tbl, MAX(CAST(substr(stat, 1, instr(stat || ' ', ' ') - 1) AS INTEGER)) "
+                "FROM sqlite_stat1 GROUP BY tbl"
+            ):
+                actual = counts.get(tbl)
+                if actual is None:
+                    actual = cursor.execute(f'SELECT COUNT(*) FROM "{tbl}"').fetchone()[0]
+                drift = abs(actual - stat) / max(actual, stat, 1)
+                statistics["tables"][tbl] = {
+                    "stat_rows": stat,
+                    "actual_rows": actual,
+                    "drift": round(drift, 4),
+                    "stale": drift > STALE_STAT_RATIO,
+                }
+        statistics["stale"] = (not has_stat) or any(t["stale"] for t in statistics["tables"].values())
+        report["statistics"] = statistics
+
+        # 5. 服务层查询的执行计划
+        plans = []
+        for name, sql, params in SERVICE_QUERIES:
+            try:
+                steps = [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+                full_scan = any(
+                    step.startswith("SCAN") and "USING" not in step and "VIRTUAL TABLE" not in step
+                    for step in steps
+                )
+                plans.append({
+                    "name": name,
+                    "sql": sql,
+                    "plan": steps,
+                    "full_scan": full_scan,
+                    "temp_btree": any("TEMP B-TREE" in step for step in steps),
+                })
+            except sqlite3.OperationalError as exc:
+                plans.append({"name": name, "sql": sql, "error": str(exc)})
+        report["query_plans"] = plans
+
+    finally:
+        cursor.close()
+        conn.close()
+
+    return report
+
+
+def _format_bytes(num_bytes):
+    """格式化字节数"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_performance_report(report):
+    """以文本形式输出性能报告"""
+    print("=" * 60)
+    print("数据库性能报告")
+    print("=" * 60)
+    print(f"数据库路径: {report['database']}")
+    print(f"生成时间: {report['generated_at']}\n")
+
+    pragmas = report["pragmas"]
+    print("1. 页与缓存设置：")
+    print(f"   文件大小: {_format_bytes(pragmas['file_size_bytes'])}（{pragmas['page_count']} 页 × {pragmas['page_size']} B）")
+    print(f"   空闲页: {pragmas['freelist_count']}（碎片率 {pragmas['freelist_ratio']:.1%}）")
+    if pragmas["freelist_ratio"] > 0.1:
+        print("✗ 空闲页比例较高，建议执行 VACUUM 或启用增量回收")
+    print(f"   页缓存: {_format_bytes(pragmas['cache_bytes'])}（可覆盖文件的 {pragmas['cache_coverage']:.0%}）")
+    print(f"   mmap_size: {pragmas['mmap_size']}, journal_mode: {pragmas['journal_mode']}, "
+          f"synchronous: {pragmas['synchronous']}, auto_vacuum: {pragmas['auto_vacuum']}")
+    print()
+
+    print("2. 表与索引大小：")
+    if report["objects"] is None:
+        print(f"   {report['objects_error']}")
+    else:
+        for obj in report["objects"][:15]:
+            print(f"   {obj['name']:<40} {obj['type']:<8} {_format_bytes(obj['bytes']):>10}  "
+                  f"未用空间 {obj['unused_ratio']:.0%}")
+    print()
+
+    print("3. 行数分布：")
+    for table, count in report["row_counts"].items():
+        print(f"   {table}: {count}")
+    labels = {
+        "messages_per_conversation": "每个对话的消息数",
+        "conversations_per_user": "每个用户的对话数",
+        "message_bytes": "单条消息字节数",
+    }
+    for key, dist in report["distributions"].items():
+        if dist["count"] == 0:
+            print(f"   {labels[key]}: 无数据")
+            continue
+        print(f"   {labels[key]}: avg {dist['avg']}, p50 {dist['p50']}, p90 {dist['p90']}, "
+              f"p99 {dist['p99']}, max {dist['max']}")
+    print()
+
+    print("4. 统计信息（sqlite_stat1）：")
+    statistics = report["statistics"]
+    if not statistics["analyzed"]:
+        print("✗ 从未执行 ANALYZE，查询规划器缺少统计信息")
+    else:
+        for tbl, info in statistics["tables"].items():
+            mark = "✗" if info["stale"] else "✓"
+            print(f"{mark} {tbl}: 统计 {info['stat_rows']} 行，实际 {info['actual_rows']} 行（偏差 {info['drift']:.0%}）")
+    print()
+
+    print("5. 查询执行计划：")
+    for plan in report["query_plans"]:
+        if "error" in plan:
+            print(f"   - {plan['name']}: 无法分析（{plan['error']}）")
+            continue
+        flags = []
+        if plan["full_scan"]:
+            flags.append("全表扫描")
+        if plan["temp_btree"]:
+            flags.append("临时排序")
+        mark = "✗" if flags else "✓"
+        print(f"{mark} {plan['name']}{'（' + '、'.join(flags) + '）' if flags else ''}")
+        for step in plan["plan"]:
+            print(f"     {step}")
+    print()
+
+    print("=" * 60)
+    print("建议措施：")
+    print("=" * 60)
+    if statistics["stale"]:
+        print("- 执行 ANALYZE 或 PRAGMA optimize 更新统计信息")
+    if pragmas["freelist_ratio"] > 0.1:
+        print("- 执行 VACUUM（或 PRAGMA incremental_vacuum）回收空闲页")
+    if pragmas["cache_coverage"] < 0.25:
+        print("- 增大 cache_size / mmap_size，或归档历史对话以缩小热数据")
+    if any(plan.get("full_scan") for plan in report["query_plans"]):
+        print("- 检查全表扫描的查询是否需要新增索引或分页")
+
+
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据库诊断工具")
+    parser.add_argument("db_path", nargs="?", default="cdhcprs.db", help="数据库文件路径")
+    parser.add_argument("--perf", action="store_true", help="生成性能报告")
+    parser.add_argument("--json", nargs="?", const="-", metavar="FILE",
+                        help="以 JSON 输出性能报告（可指定文件，默认标准输出）")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    db_path = sys.argv[1] if len(sys.argv) > 1 else "cdhcprs.db"
-    diagnose_database(db_path)
+    args = parse_args(sys.argv[1:])
+
+    if not (args.perf or args.json):
+        diagnose_database(args.db_path)
+        sys.exit(0)
+
+    if not os.path.exists(args.db_path):
+        print(f"[ERROR] 数据库文件不存在: {args.db_path}")
+        sys.exit(1)
+
+    report = collect_performance_report(args.db_path)
+    if args.json == "-":
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        print_performance_report(report)
+        if args.json:
+            print(f"\nJSON 报告已写入: {args.json}")
@@ -2,8 +2,14 @@
 数据库初始化脚本
 创建所有表并插入默认数据
 """
+from sqlalchemy.schema import CreateIndex
 from core.database import engine, Base, SessionLocal
 from models import User, SystemSetting
+from services.archive import init_archive_database
+from services.assets import migrate_legacy_logo
+from services.events import migrate_events_table
+from services.jobs import migrate_jobs_table
+from services.search import init_search_index, init_user_search_index
 import bcrypt
 
 
@@ -20,8 +26,29 @@ def init_database():
 
     # 创建所有表
     Base.metadata.create_all(bind=engine)
+    # create_all 会跳过已存在的表，新增的索引需单独补建
+    # （表达式索引无法通过反射检查是否存在，因此使用 IF NOT EXISTS）
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
     print("[OK] 数据库表创建成功")
 
+    if migrate_events_table():
+        print("[OK] 事件表已迁移为自增 ID")
+
+    if migrate_jobs_table():
+        print("[OK] 任务表已添加 owner 列")
+
+    if init_archive_database():
+        print("[OK] 归档数据库表创建成功")
+
+    if init_search_index():
+        print("[OK] 全文索引创建成功")
+
+    if init_user_search_index():
+        print("[OK] 用户名子串索引创建成功")
+
     # 创建数据库会话
     db = SessionLocal()
 
@@ -87,6 +114,9 @@ def init_database():
 
         # 提交更改
         db.commit()
+
+        if migrate_legacy_logo(db):
+            print("[OK] 旧版 Logo 已迁移为静态资源")
         print("\n数据库初始化完成！")
         print("\n默认管理员账户信息：")
         print("  用户名: admin")
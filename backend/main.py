@@ -3,11 +3,89 @@
 """
 from __future__ import annotations
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException, status
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from core.activity import ActivityMiddleware
 from core.config import get_settings
-from routers import admin, auth, chat, public
+from core.database import scheduler_lock_path
+from core.events import broker
+from core.http_compression import CompressionMiddleware
+from core.metrics import MetricsMiddleware, render_metrics, snapshot_writer
+from core.profiling import cpu_profiler
+from core.query_inspector import QueryInspectorMiddleware
+from core.scheduler import PeriodicJob, scheduler
+from core.tracing import JsonlExporter, TracingMiddleware
+from core.serialization import FastJSONResponse, orjson
+from routers import admin, auth, chat, knowledge, profiling, public
+from services.cleanup import run_cleanup
+from services.events import event_relay, prune_events
+from services.jobs import fail_orphaned_jobs
+from services.knowledge import get_knowledge_base
+from services.maintenance import run_maintenance
+
+
+def register_jobs() -> None:
+    """根据配置注册应用内定时任务"""
+
+    settings = get_settings()
+
+    if settings.CLEANUP_INTERVAL_HOURS > 0:
+        scheduler.add_job(
+            PeriodicJob(
+                name="cleanup",
+                interval_seconds=settings.CLEANUP_INTERVAL_HOURS * 3600,
+                func=run_cleanup,
+            )
+        )
+
+    if settings.EVENTS_ENABLED:
+        scheduler.add_job(
+            PeriodicJob(
+                name="events_prune",
+                interval_seconds=settings.EVENTS_RETENTION_MINUTES * 60,
+                func=prune_events,
+            )
+        )
+
+    if settings.MAINTENANCE_INTERVAL_MINUTES > 0:
+        scheduler.add_job(
+            PeriodicJob(
+                name="maintenance",
+                interval_seconds=settings.MAINTENANCE_INTERVAL_MINUTES * 60,
+                func=run_maintenance,
+            )
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动与停止定时任务"""
+
+    settings = get_settings()
+
+    # 启动时构建知识库索引，避免首个补全请求等待
+    get_knowledge_base()
+    # 后台任务在进程内执行，上次运行时未完成的任务已随旧进程丢失
+    fail_orphaned_jobs()
+    register_jobs()
+    # 多 worker 部署时只有获得锁的进程执行定时任务
+    scheduler.start(lock_path=scheduler_lock_path())
+    if settings.METRICS_ENABLED:
+        snapshot_writer.start(settings.METRICS_DIR, settings.METRICS_FLUSH_SECONDS)
+    if settings.EVENTS_ENABLED:
+        broker.queue_size = settings.EVENTS_QUEUE_SIZE
+        event_relay.start(settings.EVENTS_POLL_SECONDS)
+    yield
+    await event_relay.stop()
+    await scheduler.stop()
+    await snapshot_writer.stop()
+    cpu_profiler.stop()
 
 
 def create_app() -> FastAPI:
@@ -19,6 +97,9 @@ def create_app() -> FastAPI:
         title=settings.APP_NAME,
         description="基于大语言模型的慢性病诊疗方案推荐系统",
         version="1.0.0",
+        lifespan=lifespan,
+        # 未安装 orjson 时保留 FastAPI 默认响应类（可使用 Pydantic 直接输出字节的路径）
+        default_response_class=FastJSONResponse if orjson is not None else Default(JSONResponse),
     )
 
     app.add_middleware(
@@ -28,11 +109,41 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # 推送长连接不计入进行中的请求，否则维护任务会一直认为处于高峰期
+    app.add_middleware(ActivityMiddleware, exclude_paths=("/api/chat/events",))
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+    if settings.QUERY_INSPECTOR_ENABLED:
+        app.add_middleware(
+            QueryInspectorMiddleware,
+            max_queries=settings.QUERY_COUNT_WARN,
+            repeat_threshold=settings.QUERY_REPEAT_WARN,
+            expose_header=settings.DEBUG,
+        )
+    if settings.TRACING_ENABLED:
+        exporter = None
+        if settings.TRACE_EXPORT_FILE:
+            exporter = JsonlExporter(
+                settings.TRACE_EXPORT_FILE,
+                max_bytes=settings.TRACE_FILE_MAX_MB * 1024 * 1024,
+                backup_count=settings.TRACE_FILE_BACKUPS,
+            )
+        app.add_middleware(TracingMiddleware, sample_rate=settings.TRACE_SAMPLE_RATE, exporter=exporter)
+    if settings.RESPONSE_COMPRESSION:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+            gzip_level=settings.RESPONSE_GZIP_LEVEL,
+            brotli_quality=settings.RESPONSE_BROTLI_QUALITY,
+        )
 
     app.include_router(auth.router)
     app.include_router(public.router)
+    app.include_router(knowledge.router)
     app.include_router(chat.router)
     app.include_router(admin.router)
+    if settings.PROFILING_ENABLED:
+        app.include_router(profiling.router)
 
     return app
 
@@ -62,6 +173,21 @@ def health_check():
     }
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics(authorization: Optional[str] = Header(None)):
+    """运行指标（Prometheus 文本格式）"""
+    settings = get_settings()
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="指标接口未启用")
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无效的指标访问令牌")
+
+    return PlainTextResponse(
+        render_metrics(settings.METRICS_DIR),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 def main() -> None:
     """主函数（用于 uv 兼容提示）"""
     print("请使用 'uvicorn main:app --reload' 启动服务器")
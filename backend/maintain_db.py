@@ -0,0 +1,53 @@
+"""
+数据库维护脚本
+立即执行一轮维护（统计信息更新、增量回收、全文索引合并、WAL 检查点）
+
+使用方法：
+    python maintain_db.py [选项]
+
+示例：
+    python maintain_db.py                              # 执行一轮维护（忽略低峰期判断）
+    python maintain_db.py --time-budget 30             # 指定时间预算（秒）
+    python maintain_db.py --enable-incremental-vacuum  # 将已有数据库切换为增量回收模式
+
+应用运行时会按 MAINTENANCE_INTERVAL_MINUTES 在低峰期自动执行维护，
+通常无需手动运行本脚本。
+"""
+import argparse
+import sys
+
+from services.maintenance import enable_incremental_vacuum, run_maintenance
+
+
+def parse_args(argv):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="数据库维护工具")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="时间预算（秒）")
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="切换为 auto_vacuum=INCREMENTAL（会执行完整 VACUUM，请在停机时运行）",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    print("=" * 50)
+    print("数据库维护工具")
+    print("=" * 50)
+
+    if args.enable_incremental_vacuum:
+        print("正在执行 VACUUM，期间数据库不可写入...")
+        if enable_incremental_vacuum():
+            print("[OK] 已切换为增量回收模式")
+        else:
+            print("[OK] 数据库已是增量回收模式")
+
+    result = run_maintenance(force=True, time_budget=args.time_budget)
+    print(f"[OK] 已执行: {', '.join(result['steps']) or '无'}")
+    print(f"  - 回收空闲页: {result['freed_pages']}")
+    if result.get("checkpoint"):
+        print(f"  - WAL 检查点: {result['checkpoint']}")
+    print(f"  - 耗时: {result['elapsed']} 秒")
@@ -3,6 +3,16 @@ from .user import User
 from .conversation import Conversation
 from .message import Message
 from .system_setting import SystemSetting
+from .archive import ArchivedConversation, ArchivedMessage, ArchivedPatientProfile, ArchivedPatientProfileChange
+from .asset import Asset
+from .job import BackgroundJob
+from .event import Event
+from .analytics import DailyStat, DailyActiveUser, ConversationDisease, DiseaseDailyStat
+from .usage import TokenUsage, TokenUsageDaily, UserTokenQuota
+from .profile import PatientProfile, PatientProfileChange
 
-__all__ = ["User", "Conversation", "Message", "SystemSetting"]
+__all__ = ["User", "Conversation", "Message", "SystemSetting", "ArchivedConversation", "ArchivedMessage", "Asset", "BackgroundJob", "Event",
+           "DailyStat", "DailyActiveUser", "ConversationDisease", "DiseaseDailyStat",
+           "TokenUsage", "TokenUsageDaily", "UserTokenQuota",
+           "PatientProfile", "PatientProfileChange", "ArchivedPatientProfile", "ArchivedPatientProfileChange"]
 
@@ -0,0 +1,55 @@
+"""
+统计汇总数据模型
+按天累加的汇总表，在写入用户、对话与消息时增量更新，管理员统计接口只读取汇总表
+"""
+from sqlalchemy import Column, Integer, String
+from core.database import Base
+
+
+class DailyStat(Base):
+    """每日汇总"""
+
+    __tablename__ = "analytics_daily"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD（按 ANALYTICS_UTC_OFFSET_HOURS 划分）
+    active_users = Column(Integer, default=0, server_default="0", nullable=False)  # 当天发送过消息的用户数
+    new_users = Column(Integer, default=0, server_default="0", nullable=False)
+    conversations = Column(Integer, default=0, server_default="0", nullable=False)  # 新建对话数
+    messages = Column(Integer, default=0, server_default="0", nullable=False)
+    user_messages = Column(Integer, default=0, server_default="0", nullable=False)
+    assistant_messages = Column(Integer, default=0, server_default="0", nullable=False)
+    assistant_chars = Column(Integer, default=0, server_default="0", nullable=False)  # 回复总字数，用于计算平均回复长度
+
+    def __repr__(self):
+        return f"<DailyStat(day='{self.day}', messages={self.messages})>"
+
+
+class DailyActiveUser(Base):
+    """每日活跃用户去重表（用于增量维护 DailyStat.active_users）"""
+
+    __tablename__ = "analytics_daily_users"
+
+    day = Column(String, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+
+class ConversationDisease(Base):
+    """对话涉及的疾病去重表（同一对话多次提交问诊档案只计一次）"""
+
+    __tablename__ = "analytics_conversation_diseases"
+
+    conversation_id = Column(Integer, primary_key=True)
+    disease = Column(String, primary_key=True)
+
+
+class DiseaseDailyStat(Base):
+    """每日各疾病的对话数"""
+
+    __tablename__ = "analytics_disease_daily"
+
+    day = Column(String, primary_key=True)
+    disease = Column(String, primary_key=True)
+    conversations = Column(Integer, default=0, server_default="0", nullable=False)
+
+    def __repr__(self):
+        return f"<DiseaseDailyStat(day='{self.day}', disease='{self.disease}', conversations={self.conversations})>"
@@ -0,0 +1,78 @@
+"""
+归档数据模型
+归档表位于附加的归档数据库中，结构与 conversations/messages/patient_profiles/patient_profile_changes 保持一致
+"""
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime
+from sqlalchemy.sql import func
+from core.compression import CompressedText
+from core.database import ArchiveBase, ARCHIVE_SCHEMA
+
+
+class ArchivedConversation(ArchiveBase):
+    """归档对话模型（只读）"""
+
+    __tablename__ = "conversations"
+    __table_args__ = {"schema": ARCHIVE_SCHEMA}
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    title = Column(String, nullable=False)
+    is_active = Column(Boolean, default=False, nullable=False)  # 归档对话不可继续发送消息
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    is_archived = True
+
+    def __repr__(self):
+        return f"<ArchivedConversation(id={self.id}, user_id={self.user_id}, title='{self.title}')>"
+
+
+class ArchivedMessage(ArchiveBase):
+    """归档消息模型（只读）"""
+
+    __tablename__ = "messages"
+    __table_args__ = {"schema": ARCHIVE_SCHEMA}
+
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(Integer, nullable=False, index=True)
+    role = Column(String, nullable=False)
+    content = Column(CompressedText, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedMessage(id={self.id}, conversation_id={self.conversation_id}, role='{self.role}')>"
+
+
+class ArchivedPatientProfile(ArchiveBase):
+    """归档问诊档案模型（只读）"""
+
+    __tablename__ = "patient_profiles"
+    __table_args__ = {"schema": ARCHIVE_SCHEMA}
+
+    conversation_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    data = Column(Text, nullable=False)
+    baseline = Column(Text, nullable=False)
+    version = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedPatientProfile(conversation_id={self.conversation_id}, version={self.version})>"
+
+
+class ArchivedPatientProfileChange(ArchiveBase):
+    """归档问诊档案修改记录（after_message_id 对应归档库中重新分配的消息 ID）"""
+
+    __tablename__ = "patient_profile_changes"
+    __table_args__ = {"schema": ARCHIVE_SCHEMA}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(Integer, nullable=False, index=True)
+    version = Column(Integer, nullable=False)
+    after_message_id = Column(Integer, nullable=False)
+    diff = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ArchivedPatientProfileChange(conversation_id={self.conversation_id}, version={self.version})>"
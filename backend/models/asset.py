@@ -0,0 +1,21 @@
+"""
+静态资源数据模型
+以内容哈希为主键存储二进制资源（如网站 Logo），内容不可变
+"""
+from sqlalchemy import Column, String, LargeBinary, DateTime
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class Asset(Base):
+    """静态资源模型"""
+
+    __tablename__ = "assets"
+
+    digest = Column(String, primary_key=True)  # 内容的 SHA-256 十六进制摘要
+    content_type = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<Asset(digest='{self.digest[:12]}', content_type='{self.content_type}')>"
@@ -18,6 +18,8 @@ class Conversation(Base):
     title = Column(String, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)  # 模型切换后变为 False
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    is_archived = False  # 归档对话见 models/archive.py
     
     # 关系
     # user = relationship("User", back_populates="conversations")
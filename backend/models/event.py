@@ -0,0 +1,24 @@
+"""
+推送事件数据模型
+事件日志供各 worker 转发给本进程的推送连接，只保留最近一段时间
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class Event(Base):
+    """推送事件模型"""
+
+    __tablename__ = "events"
+    __table_args__ = {'sqlite_autoincrement': True}  # ID 是各 worker 的转发游标，清理后不能从 1 重新分配
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=True)  # 接收用户，为空表示广播给所有用户
+    type = Column(String, nullable=False)
+    data = Column(Text, nullable=False, default="{}")  # 事件数据（JSON）
+    origin = Column(String, nullable=False)  # 产生事件的进程标识，该进程已在本地直接推送
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<Event(id={self.id}, type='{self.type}', user_id={self.user_id})>"
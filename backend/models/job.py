@@ -0,0 +1,30 @@
+"""
+后台任务数据模型
+记录批量操作等后台任务的状态与进度，多个 worker 均可查询
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class BackgroundJob(Base):
+    """后台任务模型"""
+
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # 任务类型，如 'delete_conversations'
+    user_id = Column(Integer, nullable=False, index=True)  # 发起任务的用户
+    status = Column(String, default="pending", nullable=False)  # pending / running / succeeded / failed
+    total = Column(Integer, default=0, nullable=False)  # 预计处理的数量
+    processed = Column(Integer, default=0, nullable=False)  # 已处理的数量
+    params = Column(Text, nullable=False, default="{}")  # 任务参数（JSON）
+    result = Column(Text, nullable=True)  # 任务结果（JSON）
+    error = Column(Text, nullable=True)
+    owner = Column(String, nullable=True)  # 执行任务的进程标识，进程退出后未完成的任务由启动的 worker 标记为失败
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, kind='{self.kind}', status='{self.status}')>"
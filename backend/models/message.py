@@ -1,9 +1,10 @@
 """
 消息数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from core.compression import CompressedText
 from core.database import Base
 
 
@@ -15,7 +16,7 @@ class Message(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
     role = Column(String, nullable=False)  # 'user' 或 'assistant'
-    content = Column(Text, nullable=False)  # Markdown 格式的消息内容
+    content = Column(CompressedText, nullable=False)  # Markdown 格式的消息内容（超过阈值时透明压缩）
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     # 关系
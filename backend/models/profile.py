@@ -0,0 +1,43 @@
+"""
+问诊档案数据模型
+每个对话一份结构化档案（基本信息、疾病史、近期症状），随对话删除；
+首次发送消息后档案已进入提示词前缀，之后的修改以差异记录追加到对话中
+"""
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class PatientProfile(Base):
+    """问诊档案模型"""
+
+    __tablename__ = "patient_profiles"
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    data = Column(Text, nullable=False)  # 当前档案（规范化后的 JSON）
+    baseline = Column(Text, nullable=False, default="{}")  # 放在提示词前缀中的档案（首次发送消息前的最后一版）
+    version = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<PatientProfile(conversation_id={self.conversation_id}, version={self.version})>"
+
+
+class PatientProfileChange(Base):
+    """对话开始后的档案修改记录（差异文本附加在修改后的第一条用户消息之前）"""
+
+    __tablename__ = "patient_profile_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(
+        Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    version = Column(Integer, nullable=False)
+    after_message_id = Column(Integer, nullable=False)  # 修改时对话中最后一条消息的 ID
+    diff = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<PatientProfileChange(conversation_id={self.conversation_id}, version={self.version})>"
@@ -0,0 +1,65 @@
+"""
+Token 用量数据模型
+每次流式生成记录一行明细，同时在同一事务内累加按天、用户、供应商与模型汇总的用量表；
+删除对话或用户后用量记录保留，用于成本核算
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Index
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class TokenUsage(Base):
+    """单次生成的 token 用量"""
+
+    __tablename__ = "token_usage"
+    __table_args__ = (
+        Index("ix_token_usage_conversation_id", "conversation_id"),
+        Index("ix_token_usage_created_at", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    message_id = Column(Integer, nullable=True)  # 助手消息 ID
+    conversation_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    cached_tokens = Column(Integer, default=0, nullable=False)  # 命中前缀缓存的提示词 token 数
+    estimated = Column(Boolean, default=False, nullable=False)  # 供应商未返回用量，按字符数估算
+    first_token_ms = Column(Float, nullable=True)
+    latency_ms = Column(Float, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<TokenUsage(id={self.id}, message_id={self.message_id}, model='{self.model}')>"
+
+
+class TokenUsageDaily(Base):
+    """每日用量汇总（按用户、供应商与模型）"""
+
+    __tablename__ = "token_usage_daily"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD（按 ANALYTICS_UTC_OFFSET_HOURS 划分）
+    user_id = Column(Integer, primary_key=True)
+    provider = Column(String, primary_key=True)
+    model = Column(String, primary_key=True)
+    requests = Column(Integer, default=0, server_default="0", nullable=False)
+    estimated_requests = Column(Integer, default=0, server_default="0", nullable=False)
+    prompt_tokens = Column(Integer, default=0, server_default="0", nullable=False)
+    completion_tokens = Column(Integer, default=0, server_default="0", nullable=False)
+    cached_tokens = Column(Integer, default=0, server_default="0", nullable=False)
+    latency_ms = Column(Float, default=0, server_default="0", nullable=False)  # 总耗时之和，用于计算平均耗时
+
+    def __repr__(self):
+        return f"<TokenUsageDaily(day='{self.day}', user_id={self.user_id}, model='{self.model}')>"
+
+
+class UserTokenQuota(Base):
+    """用户单独设置的每日 token 配额（未设置时使用 TOKEN_DAILY_QUOTA）"""
+
+    __tablename__ = "user_token_quotas"
+
+    user_id = Column(Integer, primary_key=True)
+    daily_tokens = Column(Integer, nullable=False)  # 0 表示不限制
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
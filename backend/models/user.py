@@ -1,7 +1,7 @@
 """
 用户数据模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from core.database import Base
 
@@ -10,6 +10,11 @@ class User(Base):
     """用户模型"""
     
     __tablename__ = "users"
+    __table_args__ = (
+        # 管理员用户检索：按角色/封禁状态筛选后按 ID 倒序分页（SQLite 索引末尾隐含 rowid），按注册时间范围筛选
+        Index("ix_users_role_is_banned", "role", "is_banned"),
+        Index("ix_users_created_at", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -21,3 +26,7 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', role='{self.role}')>"
 
+
+# 用户名前缀检索不区分大小写（与子串检索一致），按 lower(username) 的范围条件使用该索引
+Index("ix_users_username_lower", func.lower(User.username))
+
@@ -1,16 +1,20 @@
 """
 管理员路由
 """
-from typing import List
-import base64
+from datetime import datetime
+from typing import List, Literal, Optional, Union
 import os
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
 from sqlalchemy.orm import Session
 
 from core.database import get_db
-from schemas.conversation import ConversationResponse
+from core.serialization import CONVERSATION_FIELDS, MESSAGE_FIELDS, rows_response
+from schemas.analytics import AnalyticsResponse
+from schemas.conversation import AdminConversationBulkDelete, ConversationResponse
+from schemas.job import BulkPreviewResponse, JobResponse
 from schemas.message import MessageResponse
+from schemas.search import SearchResponse
 from schemas.settings import (
     AdminSettings,
     AdminSettingsUpdate,
@@ -20,19 +24,34 @@ from schemas.settings import (
     TestConnectionResponse,
     LogoUploadResponse,
 )
-from schemas.user import UserResponse, UserUpdate
+from schemas.usage import ConversationUsageResponse, TokenQuotaResponse, TokenQuotaUpdate, UsageResponse
+from schemas.user import AdminUserBulkAction, UserResponse, UserSearchResponse, UserUpdate
 from services.admin import (
     delete_conversation_by_admin,
     delete_user,
     get_all_conversations,
     get_all_users,
     get_conversation_messages_by_admin,
+    search_users,
     update_system_settings_with_model_check,
     update_user_ban_status,
 )
+from services.analytics import get_analytics
 from services.auth import get_current_admin_user
+from services.bulk import (
+    conversation_filters,
+    preview_conversations,
+    preview_users,
+    start_delete_conversations_job,
+    start_user_bulk_job,
+    user_filters,
+)
+from services.jobs import get_job, job_to_dict
 from services.llm import list_llm_models, test_llm_connection
-from services.settings import get_all_settings, update_setting
+from services.assets import replace_logo
+from services.search import search_conversations
+from services.settings import get_all_settings
+from services.usage import get_conversation_usage, get_usage, get_user_quota, set_user_quota
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
@@ -59,6 +78,51 @@ def get_users(
     return users
 
 
+@router.get("/users/search", response_model=UserSearchResponse)
+def search_user_list(
+    q: Optional[str] = Query(None, min_length=1, max_length=50, description="用户名关键词"),
+    match: Literal["prefix", "contains"] = Query("prefix", description="匹配方式 (prefix/contains)"),
+    role: Optional[Literal["user", "admin"]] = Query(None, description="角色"),
+    is_banned: Optional[bool] = Query(None, description="封禁状态"),
+    registered_after: Optional[datetime] = Query(None, description="注册时间不早于"),
+    registered_before: Optional[datetime] = Query(None, description="注册时间早于"),
+    before_id: Optional[int] = Query(None, ge=1, description="游标（上一页返回的 next_cursor）"),
+    limit: int = Query(20, ge=1, le=100),
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    检索用户（服务端筛选与游标分页）
+
+    Args:
+        q: 用户名关键词
+        match: 匹配方式
+        role: 角色
+        is_banned: 封禁状态
+        registered_after: 注册时间不早于
+        registered_before: 注册时间早于
+        before_id: 游标
+        limit: 每页条数
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        当前页用户、匹配总数与下一页游标
+    """
+
+    return search_users(
+        db,
+        q=q,
+        match=match,
+        role=role,
+        is_banned=is_banned,
+        registered_after=registered_after,
+        registered_before=registered_before,
+        before_id=before_id,
+        limit=limit,
+    )
+
+
 @router.put("/users/{user_id}", response_model=UserResponse)
 def update_user(
     user_id: int,
@@ -108,6 +172,83 @@ def remove_user(
     return None
 
 
+@router.get("/users/{user_id}/token-quota", response_model=TokenQuotaResponse)
+def get_token_quota(
+    user_id: int,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    获取用户的每日 token 配额与当天已用量
+
+    Args:
+        user_id: 用户 ID
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        配额设置与当天已用量
+    """
+
+    return get_user_quota(db, user_id)
+
+
+@router.put("/users/{user_id}/token-quota", response_model=TokenQuotaResponse)
+def update_token_quota(
+    user_id: int,
+    quota_data: TokenQuotaUpdate,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    单独设置用户的每日 token 配额
+
+    Args:
+        user_id: 用户 ID
+        quota_data: 每日 token 数（0 表示不限制，null 表示恢复默认配额）
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        更新后的配额设置与当天已用量
+    """
+
+    return set_user_quota(db, user_id, quota_data.daily_tokens)
+
+
+@router.post(
+    "/users/bulk",
+    response_model=Union[JobResponse, BulkPreviewResponse],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def bulk_update_users(
+    action_data: AdminUserBulkAction,
+    response: Response,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    批量封禁/解封/删除用户（后台分批执行，立即返回任务；管理员账户不受影响）
+
+    Args:
+        action_data: 操作与用户筛选条件（各条件取交集）
+        response: 响应对象（试运行时返回 200）
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        后台任务，可通过 /api/admin/jobs/{job_id} 查询进度；试运行时返回将受影响的用户数量
+    """
+
+    filters = user_filters(action_data)
+    if action_data.dry_run:
+        response.status_code = status.HTTP_200_OK
+        return preview_users(db, action_data.action, filters)
+
+    job = start_user_bulk_job(db, current_admin, action_data.action, filters)
+    return job_to_dict(job)
+
+
 # ========== 对话管理 ==========
 
 @router.get("/conversations", response_model=List[ConversationResponse])
@@ -127,7 +268,32 @@ def get_conversations(
     """
 
     conversations = get_all_conversations(db)
-    return conversations
+    return rows_response(conversations, CONVERSATION_FIELDS)
+
+
+@router.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200, description="检索关键词"),
+    cursor: Optional[str] = Query(None, max_length=100, description="游标（上一页返回的 next_cursor）"),
+    limit: int = Query(20, ge=1, le=100),
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    检索所有用户的对话与消息
+
+    Args:
+        q: 检索关键词（空格分隔）
+        cursor: 游标
+        limit: 每页条数
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        按相关度排序的检索结果
+    """
+
+    return search_conversations(db, q, None, cursor, limit)
 
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
@@ -149,7 +315,28 @@ def get_conversation_messages(
     """
 
     messages = get_conversation_messages_by_admin(db, conversation_id)
-    return messages
+    return rows_response(messages, MESSAGE_FIELDS)
+
+
+@router.get("/conversations/{conversation_id}/usage", response_model=ConversationUsageResponse)
+def get_conversation_token_usage(
+    conversation_id: int,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    查看对话中每次生成的 token 用量（对话删除后仍可查询）
+
+    Args:
+        conversation_id: 对话 ID
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        合计与每次生成的用量明细
+    """
+
+    return get_conversation_usage(db, conversation_id)
 
 
 @router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -171,6 +358,114 @@ def delete_conversation(
     return None
 
 
+@router.post(
+    "/conversations/bulk-delete",
+    response_model=Union[JobResponse, BulkPreviewResponse],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def bulk_delete_conversations(
+    delete_data: AdminConversationBulkDelete,
+    response: Response,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    批量删除对话（后台分批执行，立即返回任务）
+
+    Args:
+        delete_data: 对话 ID 列表和/或筛选条件（各条件取交集）
+        response: 响应对象（试运行时返回 200）
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        后台任务，可通过 /api/admin/jobs/{job_id} 查询进度；试运行时返回匹配数量
+    """
+
+    filters = conversation_filters(
+        user_id=delete_data.user_id,
+        conversation_ids=delete_data.conversation_ids,
+        users=delete_data.users,
+        created_after=delete_data.created_after,
+        created_before=delete_data.created_before,
+    )
+    if delete_data.dry_run:
+        response.status_code = status.HTTP_200_OK
+        return preview_conversations(db, filters)
+
+    job = start_delete_conversations_job(db, current_admin, filters)
+    return job_to_dict(job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job_status(
+    job_id: int,
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    查询后台任务进度
+
+    Args:
+        job_id: 任务 ID
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        任务状态
+    """
+
+    return job_to_dict(get_job(db, job_id, current_admin))
+
+
+# ========== 统计 ==========
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+def analytics(
+    days: int = Query(30, ge=1, le=366, description="统计最近的天数（含今天）"),
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    获取运营统计（每日活跃用户、消息数、新建对话、平均回复长度与各疾病的对话数）
+
+    Args:
+        days: 天数
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        统计结果（只读取按天汇总的统计表）
+    """
+
+    return get_analytics(db, days)
+
+
+@router.get("/usage", response_model=UsageResponse)
+def token_usage(
+    days: int = Query(30, ge=1, le=366, description="统计最近的天数（含今天）"),
+    group_by: Literal["user", "conversation", "provider", "model", "day"] = Query("user", description="分组方式"),
+    limit: int = Query(50, ge=1, le=500, description="返回的分组数上限"),
+    current_admin=Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """
+    获取 token 用量（按用户、对话、供应商、模型或日期分组）
+
+    Args:
+        days: 天数
+        group_by: 分组方式（user/conversation/provider/model/day）
+        limit: 分组数上限（按总用量降序，按日期分组时按日期排列）
+        current_admin: 当前管理员
+        db: 数据库会话
+
+    Returns:
+        区间合计与各分组的用量
+    """
+
+    return get_usage(db, days, group_by, limit)
+
+
 # ========== 系统设置 ==========
 
 @router.get("/settings", response_model=AdminSettings)
@@ -335,7 +630,7 @@ async def upload_logo(
         db: 数据库会话
 
     Returns:
-        Base64 编码的图片数据
+        Logo 的访问地址（包含内容哈希）
     """
 
     # 验证文件类型
@@ -354,12 +649,8 @@ async def upload_logo(
             detail="文件大小不能超过 2MB"
         )
 
-    # 转换为 Base64
-    base64_data = base64.b64encode(content).decode('utf-8')
-    data_url = f"data:{file.content_type};base64,{base64_data}"
-
-    # 保存到数据库
-    update_setting(db, "website_logo", data_url)
+    # 按配置缩放/转码后以二进制资源保存，并更新网站设置
+    logo_url = replace_logo(db, content, file.content_type)
 
-    return LogoUploadResponse(logo_url=data_url)
+    return LogoUploadResponse(logo_url=logo_url)
 
@@ -3,20 +3,39 @@
 """
 import json
 import random
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from core.config import get_settings
 from core.database import get_db
-from schemas.conversation import ConversationCreate, ConversationResponse
-from schemas.message import MessageCreate, MessageResponse
+from core.events import broker, event_stream
+from core.http_cache import etag_matches, make_etag, not_modified, set_cache_headers
+from core.tracing import span
+from core.serialization import CONVERSATION_FIELDS, MESSAGE_FIELDS, rows_response
+from schemas.conversation import ConversationBulkDelete, ConversationCreate, ConversationResponse
+from schemas.job import JobResponse
+from schemas.message import MessageCreate, MessageLatestResponse, MessageResponse, MessageSyncResponse
+from schemas.profile import PatientProfileResponse, PatientProfileUpdate
+from schemas.search import SearchResponse
 from services.auth import get_current_user
 from services.chat import (
     create_conversation, get_user_conversations, get_conversation_by_id,
-    get_conversation_messages, create_message, delete_conversation
+    list_conversation_messages, create_message, delete_conversation,
+    get_user_conversations_version, get_conversation_messages_version,
+    get_latest_message_info, sync_conversation_messages
 )
-from services.settings import get_setting
-from services.llm import stream_llm_response, generate_suggested_questions
+from services.bulk import conversation_filters, start_delete_conversations_job
+from services.export import iter_user_export
+from services.jobs import get_job, job_to_dict
+from services.search import search_conversations
+from services.settings import get_setting_values
+from services.llm import LLMUsage, stream_llm_response, generate_suggested_questions
+from services.profile import get_profile_prompt, profile_to_dict, resolve_profile, save_profile
+from services.prompt import build_prompt, compose_user_message, select_recent_rounds
+from services.usage import check_token_quota, record_usage
 
 router = APIRouter(prefix="/api/chat", tags=["对话"])
 
@@ -44,6 +63,7 @@ def create_new_conversation(
 
 @router.get("/conversations", response_model=List[ConversationResponse])
 def get_conversations(
+    if_none_match: Optional[str] = Header(None),
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -51,14 +71,156 @@ def get_conversations(
     获取用户的所有对话
     
     Args:
+        if_none_match: 浏览器缓存的 ETag
         current_user: 当前用户
         db: 数据库会话
         
     Returns:
-        对话列表
+        对话列表，未变化时返回 304
     """
+    etag = make_etag("conversations", current_user.id, *get_user_conversations_version(db, current_user))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     conversations = get_user_conversations(db, current_user)
-    return conversations
+    response = rows_response(conversations, CONVERSATION_FIELDS)
+    set_cache_headers(response, etag)
+    return response
+
+
+@router.post("/conversations/bulk-delete", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def bulk_delete_conversations(
+    delete_data: ConversationBulkDelete,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    批量删除对话（后台分批执行，立即返回任务）
+    
+    Args:
+        delete_data: 要删除的对话 ID 列表或全部
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        后台任务，可通过 /api/chat/jobs/{job_id} 查询进度
+    """
+    filters = conversation_filters(
+        user_id=current_user.id,
+        conversation_ids=None if delete_data.all else delete_data.conversation_ids,
+    )
+    job = start_delete_conversations_job(db, current_user, filters)
+    return job_to_dict(job)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job_status(
+    job_id: int,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    查询后台任务进度
+    
+    Args:
+        job_id: 任务 ID
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        任务状态
+    """
+    return job_to_dict(get_job(db, job_id, current_user))
+
+
+@router.get("/events")
+async def subscribe_events(
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    订阅推送事件（Server-Sent Events）
+    
+    事件类型：conversation.created / conversation.deleted / conversations.changed、
+    conversations.invalidated（模型切换导致对话失效）、message.created（其他设备上的新消息）、
+    resync（事件积压被丢弃，客户端需重新加载）；空闲时定期发送心跳注释
+    
+    Args:
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        text/event-stream 流式响应
+    """
+    settings = get_settings()
+    if not settings.EVENTS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="事件推送未启用"
+        )
+
+    # 长连接期间不再使用数据库，立即归还连接
+    db.close()
+
+    return StreamingResponse(
+        event_stream(
+            broker,
+            current_user.id,
+            heartbeat_seconds=settings.EVENTS_HEARTBEAT_SECONDS,
+            max_seconds=settings.EVENTS_MAX_CONNECTION_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200, description="检索关键词"),
+    cursor: Optional[str] = Query(None, max_length=100, description="游标（上一页返回的 next_cursor）"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    检索当前用户的对话与消息
+    
+    Args:
+        q: 检索关键词（空格分隔）
+        cursor: 游标
+        limit: 每页条数
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        按相关度排序的检索结果
+    """
+    return search_conversations(db, q, current_user.id, cursor, limit)
+
+
+@router.get("/export")
+def export_conversations(
+    after_id: Optional[int] = Query(None, ge=0, description="续传：只导出 ID 大于该值的对话"),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    流式导出用户的全部对话与消息（NDJSON，每行一条记录）
+    
+    Args:
+        after_id: 只导出 ID 大于该值的对话（用于中断后续传）
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        NDJSON 流式响应
+    """
+    filename = f"conversations-{datetime.now().strftime('%Y%m%d')}.ndjson"
+    return StreamingResponse(
+        iter_user_export(db, current_user, after_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
@@ -85,22 +247,133 @@ def get_conversation(
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
 def get_messages(
     conversation_id: int,
+    if_none_match: Optional[str] = Header(None),
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     获取对话的所有消息
     
+    Args:
+        conversation_id: 对话 ID
+        if_none_match: 浏览器缓存的 ETag
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        消息列表，未变化时返回 304
+    """
+    conversation = get_conversation_by_id(db, conversation_id, current_user)
+    etag = make_etag("messages", conversation_id, *get_conversation_messages_version(db, conversation))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    messages = list_conversation_messages(db, conversation)
+    response = rows_response(messages, MESSAGE_FIELDS)
+    set_cache_headers(response, etag)
+    return response
+
+
+@router.get("/conversations/{conversation_id}/messages/latest", response_model=MessageLatestResponse)
+def get_latest_message(
+    conversation_id: int,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    探测对话的最新消息 ID（用于判断本地缓存是否需要同步）
+    
     Args:
         conversation_id: 对话 ID
         current_user: 当前用户
         db: 数据库会话
         
     Returns:
-        消息列表
+        最后一条消息 ID、消息总数及是否归档
     """
-    messages = get_conversation_messages(db, conversation_id, current_user)
-    return messages
+    return get_latest_message_info(db, conversation_id, current_user)
+
+
+@router.get("/conversations/{conversation_id}/messages/sync", response_model=MessageSyncResponse)
+def sync_messages(
+    conversation_id: int,
+    after_id: int = Query(0, ge=0, description="本地最后一条消息的 ID，0 表示全量同步"),
+    known_count: Optional[int] = Query(None, ge=0, description="本地已缓存的消息数量，用于检测删除/截断"),
+    limit: int = Query(200, ge=1, le=500),
+    archived: bool = Query(False, description="游标是否取自已归档的对话（上次同步返回的 is_archived）"),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    增量同步对话消息（只返回 ID 大于游标的消息）
+    
+    Args:
+        conversation_id: 对话 ID
+        after_id: 游标（本地最后一条消息的 ID）
+        known_count: 本地已缓存的消息数量
+        limit: 单次返回的最大消息数
+        archived: 游标是否取自已归档的对话
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        新消息列表及同步状态（reset 为 true 时需丢弃本地缓存）
+    """
+    return sync_conversation_messages(
+        db, conversation_id, current_user, after_id, known_count, limit, archived
+    )
+
+
+@router.get("/conversations/{conversation_id}/profile", response_model=Optional[PatientProfileResponse])
+def get_conversation_profile(
+    conversation_id: int,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取对话的问诊档案
+    
+    Args:
+        conversation_id: 对话 ID
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        问诊档案，尚未填写时返回 null
+    """
+    conversation = get_conversation_by_id(db, conversation_id, current_user)
+    profile = resolve_profile(db, conversation)
+    return profile_to_dict(profile) if profile else None
+
+
+@router.put("/conversations/{conversation_id}/profile", response_model=PatientProfileResponse)
+def update_conversation_profile(
+    conversation_id: int,
+    profile_data: PatientProfileUpdate,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    保存对话的问诊档案（整体替换；对话开始后只把修改的部分发送给大模型）
+    
+    Args:
+        conversation_id: 对话 ID
+        profile_data: 问诊档案
+        current_user: 当前用户
+        db: 数据库会话
+        
+    Returns:
+        保存后的问诊档案
+    """
+    conversation = get_conversation_by_id(db, conversation_id, current_user)
+    if conversation.is_archived:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="对话已归档，请开启新的对话"
+        )
+
+    profile, changed = save_profile(db, conversation, profile_data.model_dump())
+    return profile_to_dict(profile, changed)
 
 
 @router.post("/conversations/{conversation_id}/messages")
@@ -124,35 +397,50 @@ async def send_message(
     """
     # 验证对话权限和状态
     conversation = get_conversation_by_id(db, conversation_id, current_user)
+
+    if conversation.is_archived:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="对话已归档，请开启新的对话"
+        )
     
     if not conversation.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="系统模型已更新，请开启新的对话"
         )
-    
+
+    check_token_quota(db, current_user)
+
+    # 本请求会多次提交（用户消息、助手消息、用量），已加载的用户与对话不会被修改，提交后无需重新查询
+    db.expire_on_commit = False
+
     # 构建用户消息内容
-    user_content = message_data.content
-    if message_data.user_info:
-        user_content = f"[用户信息]\n{message_data.user_info}\n\n[问题]\n{user_content}"
+    user_content = compose_user_message(message_data.content, message_data.user_info)
     
     # 保存用户消息
-    create_message(db, conversation_id, "user", user_content)
-    
-    # 获取历史消息
-    messages = get_conversation_messages(db, conversation_id, current_user)
-    message_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in messages
-    ]
+    create_message(db, conversation_id, "user", user_content, current_user.id)
     
-    # 获取系统设置
-    system_prompt = get_setting(db, "system_prompt") or "你是一位专业的中医医生。"
-    llm_provider = get_setting(db, "llm_provider") or "deepseek"
-    llm_api_key = (get_setting(db, "llm_api_key") or "").strip()
-    llm_model_id = (get_setting(db, "llm_model_id") or "").strip()
-    llm_model_name = (get_setting(db, "llm_model_name") or "").strip()
-    llm_base_url = (get_setting(db, "llm_base_url") or "").strip()
+    with span("chat.prompt") as prompt_span:
+        # 获取系统设置（一次查询）
+        settings = get_setting_values(db, [
+            "system_prompt", "llm_provider", "llm_api_key", "llm_model_id", "llm_model_name", "llm_base_url",
+        ])
+
+        # 系统提示词与问诊档案在前、历史消息按时间顺序在后，保持前缀稳定以命中供应商的前缀缓存
+        messages = list_conversation_messages(db, conversation)
+        profile_block, profile_changes = get_profile_prompt(db, conversation_id)
+        system_prompt, message_history = build_prompt(
+            settings["system_prompt"] or "你是一位专业的中医医生。", messages, profile_block, profile_changes
+        )
+        llm_provider = settings["llm_provider"] or "deepseek"
+        llm_api_key = (settings["llm_api_key"] or "").strip()
+        llm_model_id = (settings["llm_model_id"] or "").strip()
+        llm_model_name = (settings["llm_model_name"] or "").strip()
+        llm_base_url = (settings["llm_base_url"] or "").strip()
+
+        if prompt_span is not None:
+            prompt_span.attributes["chat.history_messages"] = len(message_history)
 
     if not llm_api_key:
         raise HTTPException(
@@ -166,20 +454,45 @@ async def send_message(
     # 流式生成响应
     async def generate_response():
         full_response = ""
-
-        async for chunk in stream_llm_response(
+        usage = LLMUsage()
+        llm_stream = stream_llm_response(
             provider=llm_provider,
             api_key=llm_api_key,
             model=model_identifier,
             system_prompt=system_prompt,
             messages=message_history,
             base_url=base_url,
-        ):
-            full_response += chunk
-            yield chunk
-        
-        # 保存助手消息
-        create_message(db, conversation_id, "assistant", full_response)
+            usage=usage,
+        )
+
+        try:
+            with span("llm.stream", **{"llm.provider": llm_provider, "llm.model": model_identifier}) as stream_span:
+                async for chunk in llm_stream:
+                    if stream_span is not None and not full_response:
+                        stream_span.attributes["llm.time_to_first_token_ms"] = round(
+                            (time.time_ns() - stream_span.start_ns) / 1e6, 2
+                        )
+                    full_response += chunk
+                    yield chunk
+
+                if stream_span is not None:
+                    stream_span.attributes["llm.prompt_tokens"] = usage.prompt_tokens
+                    stream_span.attributes["llm.completion_tokens"] = usage.completion_tokens
+                    stream_span.attributes["llm.cached_tokens"] = usage.cached_tokens
+        finally:
+            # 客户端中途断开时生成器在 yield 处被关闭：先关闭上游流，由其按已生成的内容估算用量，
+            # 已消耗的 token 照常计量（finally 只执行一次，不会重复记录）
+            await llm_stream.aclose()
+
+            # 只保存完整生成的助手消息
+            message_id = None
+            if usage.outcome != "cancelled":
+                message_id = create_message(db, conversation_id, "assistant", full_response, current_user.id).id
+            if usage.outcome != "config_error":
+                record_usage(
+                    db, usage, current_user.id, conversation_id, llm_provider, model_identifier,
+                    message_id=message_id,
+                )
     
     return StreamingResponse(generate_response(), media_type="text/plain")
 
@@ -222,43 +535,36 @@ async def get_suggested_questions_endpoint(
     # 验证对话权限
     conversation = get_conversation_by_id(db, conversation_id, current_user)
 
+    # 一次查询读取全部相关设置
+    settings = get_setting_values(db, [
+        "suggested_questions_enabled", "suggested_questions_count", "suggested_questions_max_rounds",
+        "suggested_questions_provider", "suggested_questions_api_key", "suggested_questions_model_id",
+        "suggested_questions_base_url", "suggested_questions_system_prompt",
+        "suggested_questions_template_questions",
+        "llm_provider", "llm_api_key", "llm_model_id", "llm_base_url",
+    ])
+
     # 检查功能是否启用
-    enabled = get_setting(db, "suggested_questions_enabled")
+    enabled = settings["suggested_questions_enabled"]
     if enabled != "true":
         return {"questions": []}
 
     # 获取配置
-    count = int(get_setting(db, "suggested_questions_count") or "3")
-    max_rounds = int(get_setting(db, "suggested_questions_max_rounds") or "5")
+    count = int(settings["suggested_questions_count"] or "3")
+    max_rounds = int(settings["suggested_questions_max_rounds"] or "5")
 
     # 获取历史消息
-    messages = get_conversation_messages(db, conversation_id, current_user)
+    messages = list_conversation_messages(db, conversation)
 
     # 如果没有消息，返回空列表
     if not messages:
         return {"questions": []}
 
-    # 限制消息轮数（按对话轮次计算）
-    limited_messages = []
-    user_msg_count = 0
-    for msg in reversed(messages):
-        if msg.role == "user":
-            user_msg_count += 1
-            if user_msg_count > max_rounds:
-                break
-        limited_messages.insert(0, msg)
-
-    # 构建消息历史
-    message_history = [
-        {"role": msg.role, "content": msg.content}
-        for msg in limited_messages
-    ]
-
     # 获取推荐问题专用的 LLM 配置
-    provider = get_setting(db, "suggested_questions_provider") or get_setting(db, "llm_provider") or "deepseek"
-    api_key = (get_setting(db, "suggested_questions_api_key") or get_setting(db, "llm_api_key") or "").strip()
-    model_id = (get_setting(db, "suggested_questions_model_id") or get_setting(db, "llm_model_id") or "").strip()
-    base_url = (get_setting(db, "suggested_questions_base_url") or get_setting(db, "llm_base_url") or "").strip() or None
+    provider = settings["suggested_questions_provider"] or settings["llm_provider"] or "deepseek"
+    api_key = (settings["suggested_questions_api_key"] or settings["llm_api_key"] or "").strip()
+    model_id = (settings["suggested_questions_model_id"] or settings["llm_model_id"] or "").strip()
+    base_url = (settings["suggested_questions_base_url"] or settings["llm_base_url"] or "").strip() or None
 
     # 默认的系统提示词
     default_prompt = """你是一个智能助手，负责根据用户的对话历史，推测用户接下来可能想问的问题。
@@ -276,11 +582,16 @@ async def get_suggested_questions_endpoint(
 2. 问题2
 3. 问题3"""
 
-    system_prompt = get_setting(db, "suggested_questions_system_prompt") or default_prompt
+    # 问诊档案取自完整历史；限制消息轮数（按对话轮次计算，起点按轮数对齐以便复用前缀缓存）
+    profile_block, profile_changes = get_profile_prompt(db, conversation_id)
+    system_prompt, message_history = build_prompt(
+        settings["suggested_questions_system_prompt"] or default_prompt, messages, profile_block, profile_changes
+    )
+    message_history = select_recent_rounds(message_history, max_rounds)
 
     if not api_key:
         # 如果没有配置 API Key，直接使用模板问题
-        template_questions_str = get_setting(db, "suggested_questions_template_questions") or "[]"
+        template_questions_str = settings["suggested_questions_template_questions"] or "[]"
         try:
             template_questions = json.loads(template_questions_str)
             if template_questions and len(template_questions) > 0:
@@ -308,7 +619,7 @@ async def get_suggested_questions_endpoint(
         return {"questions": questions[:count]}
 
     # 降级机制：使用模板问题
-    template_questions_str = get_setting(db, "suggested_questions_template_questions") or "[]"
+    template_questions_str = settings["suggested_questions_template_questions"] or "[]"
     try:
         template_questions = json.loads(template_questions_str)
         if template_questions and len(template_questions) > 0:
@@ -0,0 +1,122 @@
+"""
+知识库路由（无需认证）
+数据只在启动时加载，ETag 由数据版本与查询参数生成，浏览器与 CDN 均可缓存
+"""
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Header, Query, Response
+
+from core.http_cache import PUBLIC_REVALIDATE, etag_matches, make_etag, not_modified, set_cache_headers
+from schemas.knowledge import AutocompleteResponse, LookupResponse, SyndromeMatchResponse
+from services.knowledge import MAX_SUGGESTIONS, get_knowledge_base
+
+router = APIRouter(prefix="/api/knowledge", tags=["知识库"])
+
+TermKind = Literal["disease", "syndrome", "symptom"]
+
+
+def _cached(response: Response, if_none_match: Optional[str], *parts: object) -> Optional[Response]:
+    """设置缓存头，客户端缓存仍有效时返回 304 响应"""
+
+    etag = make_etag("knowledge", get_knowledge_base().version, *parts)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PUBLIC_REVALIDATE)
+    set_cache_headers(response, etag, PUBLIC_REVALIDATE)
+    return None
+
+
+@router.get("/diseases")
+def get_disease_tree(if_none_match: Optional[str] = Header(None)):
+    """
+    获取完整的疾病 → 证型 → 症状树
+
+    Args:
+        if_none_match: 浏览器缓存的 ETag
+
+    Returns:
+        疾病树（预先序列化），数据未变化时返回 304
+    """
+    response = Response(content=get_knowledge_base().tree_json, media_type="application/json")
+    return _cached(response, if_none_match, "diseases") or response
+
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+def autocomplete(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=50, description="输入的前缀（名称、别名、英文名或拼音）"),
+    kind: Optional[TermKind] = Query(None, description="只补全该类型的条目"),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    按前缀补全疾病、证型与症状
+
+    Args:
+        response: 响应对象（用于设置缓存头）
+        q: 输入的前缀
+        kind: 条目类型
+        limit: 返回数量
+        if_none_match: 浏览器缓存的 ETag
+
+    Returns:
+        补全结果（精确匹配在前），数据未变化时返回 304
+    """
+    cached = _cached(response, if_none_match, "autocomplete", q, kind, limit)
+    if cached is not None:
+        return cached
+    knowledge_base = get_knowledge_base()
+    items = [knowledge_base.term_to_dict(term, matched) for term, matched in knowledge_base.autocomplete(q, kind, limit)]
+    return {"query": q, "items": items}
+
+
+@router.get("/lookup", response_model=LookupResponse)
+def lookup(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=50, description="名称、别名、英文名或拼音"),
+    kind: Optional[TermKind] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    精确查找条目（如“消渴”返回“2型糖尿病”）
+
+    Args:
+        response: 响应对象（用于设置缓存头）
+        q: 查找的名称
+        kind: 条目类型
+        if_none_match: 浏览器缓存的 ETag
+
+    Returns:
+        匹配的条目，数据未变化时返回 304
+    """
+    cached = _cached(response, if_none_match, "lookup", q, kind)
+    if cached is not None:
+        return cached
+    knowledge_base = get_knowledge_base()
+    return {"query": q, "items": [knowledge_base.term_to_dict(term) for term in knowledge_base.lookup(q, kind)]}
+
+
+@router.get("/syndromes", response_model=SyndromeMatchResponse)
+def match_syndromes(
+    response: Response,
+    symptoms: List[str] = Query(..., max_length=50, description="症状名称，可重复传入"),
+    diseases: List[str] = Query([], max_length=20, description="只匹配这些疾病（ID）的证型"),
+    limit: int = Query(5, ge=1, le=MAX_SUGGESTIONS),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    根据症状匹配中医证型（仅供参考）
+
+    Args:
+        response: 响应对象（用于设置缓存头）
+        symptoms: 症状名称
+        diseases: 疾病 ID
+        limit: 返回数量
+        if_none_match: 浏览器缓存的 ETag
+
+    Returns:
+        按得分降序排列的证型，数据未变化时返回 304
+    """
+    cached = _cached(response, if_none_match, "syndromes", ",".join(symptoms), ",".join(diseases), limit)
+    if cached is not None:
+        return cached
+    return {"items": get_knowledge_base().match_syndromes(symptoms, diseases, limit)}
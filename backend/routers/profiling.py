@@ -0,0 +1,136 @@
+"""
+性能分析路由（需要管理员权限）
+分析作用于处理该请求的进程；多 worker 部署时响应中的 pid 标明实际被分析的 worker
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from core.config import get_settings
+from core.profiling import cpu_profiler, memory_profiler
+from schemas.profiling import CpuProfileStatus, MemorySnapshotResponse
+from services.auth import get_current_admin_user
+
+router = APIRouter(prefix="/api/admin/profiling", tags=["性能分析"])
+
+COLLAPSED_MEDIA_TYPE = "text/plain; charset=utf-8"
+
+
+@router.post("/cpu/start", response_model=CpuProfileStatus)
+def start_cpu_profile(
+    seconds: float = Query(10, gt=0, description="采样时长（秒）"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="采样间隔（毫秒）"),
+    include_idle: bool = Query(False, description="是否包含空闲等待中的线程"),
+    current_admin=Depends(get_current_admin_user),
+):
+    """
+    开始 CPU 采样，到时自动停止
+
+    Args:
+        seconds: 采样时长
+        interval_ms: 采样间隔
+        include_idle: 是否包含空闲线程
+        current_admin: 当前管理员
+
+    Returns:
+        采样状态
+    """
+    settings = get_settings()
+    if seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"采样时长不能超过 {settings.PROFILING_MAX_SECONDS} 秒",
+        )
+
+    if not cpu_profiler.start(seconds, interval_ms / 1000, include_idle):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="已有 CPU 采样正在进行",
+        )
+
+    return cpu_profiler.status()
+
+
+@router.post("/cpu/stop", response_model=CpuProfileStatus)
+def stop_cpu_profile(current_admin=Depends(get_current_admin_user)):
+    """提前结束 CPU 采样"""
+
+    cpu_profiler.stop()
+    return cpu_profiler.status()
+
+
+@router.get("/cpu", response_model=CpuProfileStatus)
+def get_cpu_profile_status(current_admin=Depends(get_current_admin_user)):
+    """获取 CPU 采样状态"""
+
+    return cpu_profiler.status()
+
+
+@router.get("/cpu/collapsed", response_class=PlainTextResponse)
+def get_cpu_profile_collapsed(current_admin=Depends(get_current_admin_user)):
+    """
+    获取最近一次 CPU 采样的折叠栈（每行 "栈 采样次数"，可用 flamegraph.pl / speedscope 生成火焰图）
+    """
+
+    return PlainTextResponse(cpu_profiler.collapsed(), media_type=COLLAPSED_MEDIA_TYPE)
+
+
+@router.post("/memory/start", status_code=status.HTTP_204_NO_CONTENT)
+def start_memory_profile(
+    frames: Optional[int] = Query(None, ge=1, le=100, description="每次分配记录的调用栈深度"),
+    current_admin=Depends(get_current_admin_user),
+):
+    """
+    开启 tracemalloc 内存跟踪（跟踪期间内存分配会变慢，分析完成后请及时停止）
+
+    Args:
+        frames: 调用栈深度，默认使用配置值
+        current_admin: 当前管理员
+    """
+    depth = frames or get_settings().PROFILING_TRACEMALLOC_FRAMES
+    if not memory_profiler.start(depth):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="内存跟踪已开启",
+        )
+
+
+@router.post("/memory/snapshot", response_model=MemorySnapshotResponse)
+def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=200, description="返回的分配位置数量"),
+    group_by: str = Query("lineno", pattern="^(lineno|traceback)$", description="分组方式"),
+    current_admin=Depends(get_current_admin_user),
+):
+    """
+    拍摄内存快照，返回占用最多的分配位置；已有快照时按相对上一次快照的增长排序
+
+    Args:
+        limit: 返回的分配位置数量
+        group_by: lineno 按行分组，traceback 按调用栈分组
+        current_admin: 当前管理员
+
+    Returns:
+        内存快照摘要
+    """
+    try:
+        return memory_profiler.snapshot(limit, group_by)
+    except RuntimeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="内存跟踪未开启，请先调用 /memory/start",
+        )
+
+
+@router.get("/memory/collapsed", response_class=PlainTextResponse)
+def get_memory_collapsed(current_admin=Depends(get_current_admin_user)):
+    """获取最近一次内存快照的折叠栈（值为仍占用的字节数）"""
+
+    return PlainTextResponse(memory_profiler.collapsed(), media_type=COLLAPSED_MEDIA_TYPE)
+
+
+@router.post("/memory/stop", status_code=status.HTTP_204_NO_CONTENT)
+def stop_memory_profile(current_admin=Depends(get_current_admin_user)):
+    """停止内存跟踪并释放快照"""
+
+    memory_profiler.stop()
@@ -1,28 +1,50 @@
 """
 公共路由（无需认证）
 """
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from core.database import get_db
+from core.http_cache import (
+    PUBLIC_IMMUTABLE,
+    PUBLIC_REVALIDATE,
+    etag_matches,
+    make_etag,
+    not_modified,
+    set_cache_headers,
+)
 from schemas.settings import PublicSettings
-from services.settings import get_setting
+from services.assets import ASSET_SECURITY_HEADERS, get_asset, get_logo_url
+from services.settings import get_setting, get_settings_version
 
 router = APIRouter(prefix="/api/public", tags=["公共接口"])
 
 
 @router.get("/settings", response_model=PublicSettings)
-def get_public_settings(db: Session = Depends(get_db)):
+def get_public_settings(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
     """
     获取公共设置（网站名称、Logo 等）
     
     Args:
+        response: 响应对象（用于设置缓存头）
+        if_none_match: 浏览器缓存的 ETag
         db: 数据库会话
         
     Returns:
-        公共设置信息
+        公共设置信息，设置未变化时返回 304
     """
+    etag = make_etag("public-settings", get_settings_version(db))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, PUBLIC_REVALIDATE)
+    set_cache_headers(response, etag, PUBLIC_REVALIDATE)
+
     website_name = get_setting(db, "website_name") or "慢性病诊疗方案推荐系统"
-    website_logo = get_setting(db, "website_logo") or ""
+    website_logo = get_logo_url(db)
     large_font_scale = float(get_setting(db, "large_font_scale") or "1.5")
 
     return PublicSettings(
@@ -31,3 +53,45 @@ def get_public_settings(db: Session = Depends(get_db)):
         large_font_scale=large_font_scale
     )
 
+
+
+@router.get("/assets/{digest}")
+def get_public_asset(
+    digest: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """
+    获取静态资源（如网站 Logo）
+
+    地址中包含内容哈希，内容不会变化，因此允许浏览器永久缓存；
+    响应附带沙箱 CSP 与 nosniff，上传的 SVG 不能在接口同源下执行脚本
+
+    Args:
+        digest: 资源内容的 SHA-256 摘要
+        if_none_match: 浏览器缓存的 ETag
+        db: 数据库会话
+
+    Returns:
+        资源的二进制内容
+    """
+    etag = f'"{digest}"'
+
+    # 内容由哈希决定，ETag 匹配时无需查询数据库
+    if etag_matches(if_none_match, etag):
+        response = not_modified(etag, PUBLIC_IMMUTABLE)
+        response.headers.update(ASSET_SECURITY_HEADERS)
+        return response
+
+    asset = get_asset(db, digest)
+    if not asset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="资源不存在"
+        )
+
+    return Response(
+        content=asset.data,
+        media_type=asset.content_type,
+        headers={"ETag": etag, "Cache-Control": PUBLIC_IMMUTABLE, **ASSET_SECURITY_HEADERS},
+    )
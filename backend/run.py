@@ -1,27 +1,109 @@
 """
 后端服务启动脚本
 从环境变量读取配置并启动 uvicorn 服务器
+
+使用方法：
+    python run.py                 # 开发模式（DEBUG=True 时启用热重载）
+    python run.py --prod          # 生产模式（多 worker，优先使用 uvloop / httptools）
+    python run.py --prod --workers 4
 """
+import argparse
+import importlib.util
+import inspect
+import os
+import tempfile
+
 import uvicorn
 from core.config import get_settings
+from core.metrics import clear_snapshots
+
+# SQLite 同一时刻只允许一个写入者，worker 过多只会增加锁等待
+MAX_AUTO_WORKERS = 8
+
+
+def auto_workers() -> int:
+    """按 CPU 核数确定 worker 数量"""
+    return max(1, min(os.cpu_count() or 1, MAX_AUTO_WORKERS))
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def run_dev(settings) -> None:
+    """开发模式：单进程，调试模式下启用热重载"""
+    uvicorn.run(
+        "main:app",
+        host=settings.BACKEND_HOST,
+        port=settings.BACKEND_PORT,
+        reload=settings.DEBUG,  # 调试模式下启用热重载
+    )
+
+
+def run_prod(settings, workers: int) -> None:
+    """生产模式：多 worker、无热重载，并按配置回收 worker"""
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+
+    # 多个 worker 需要共享指标快照目录，否则 /api/metrics 只能看到处理该请求的 worker
+    if workers > 1 and settings.METRICS_ENABLED and not settings.METRICS_DIR:
+        metrics_dir = os.path.join(tempfile.gettempdir(), f"cdhcprs-metrics-{settings.BACKEND_PORT}")
+        os.environ["METRICS_DIR"] = metrics_dir  # worker 进程启动时读取
+    else:
+        metrics_dir = settings.METRICS_DIR
+    if metrics_dir:
+        clear_snapshots(metrics_dir)
+
+    print(f"Worker 数量: {workers}")
+    print(f"事件循环: {loop}，HTTP 解析: {http}")
+    if settings.SERVER_MAX_REQUESTS > 0:
+        print(f"Worker 回收: 每处理约 {settings.SERVER_MAX_REQUESTS} 个请求后重启")
+    if metrics_dir:
+        print(f"指标快照目录: {metrics_dir}")
+    if settings.DEBUG:
+        print("[WARN] 生产模式下建议设置 DEBUG=False")
+    print("-" * 60)
+
+    options = dict(
+        host=settings.BACKEND_HOST,
+        port=settings.BACKEND_PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+        # 推送长连接不会自行结束，需限制停止时的等待时间
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT or None,
+    )
+    # 较早的 uvicorn 版本不支持抖动参数
+    if settings.SERVER_MAX_REQUESTS > 0 and "limit_max_requests_jitter" in inspect.signature(uvicorn.Config).parameters:
+        options["limit_max_requests_jitter"] = settings.SERVER_MAX_REQUESTS_JITTER
+
+    uvicorn.run("main:app", **options)
 
 
 def main():
     """主函数：从配置中读取 host 和 port 并启动服务器"""
+    parser = argparse.ArgumentParser(description="启动后端服务")
+    parser.add_argument("--prod", action="store_true", help="生产模式（多 worker，不启用热重载）")
+    parser.add_argument("--workers", type=int, default=None, help="worker 数量（默认读取 SERVER_WORKERS，0 表示按 CPU 核数）")
+    args = parser.parse_args()
+
     settings = get_settings()
 
     print(f"正在启动 {settings.APP_NAME} 后端服务...")
     print(f"服务地址: http://{settings.BACKEND_HOST}:{settings.BACKEND_PORT}")
     print(f"API 文档: http://{settings.BACKEND_HOST}:{settings.BACKEND_PORT}/docs")
     print(f"调试模式: {'开启' if settings.DEBUG else '关闭'}")
-    print("-" * 60)
 
-    uvicorn.run(
-        "main:app",
-        host=settings.BACKEND_HOST,
-        port=settings.BACKEND_PORT,
-        reload=settings.DEBUG,  # 调试模式下启用热重载
-    )
+    if args.prod:
+        workers = args.workers if args.workers is not None else settings.SERVER_WORKERS
+        print("运行模式: 生产")
+        run_prod(settings, workers if workers > 0 else auto_workers())
+    else:
+        print("-" * 60)
+        run_dev(settings)
 
 
 if __name__ == "__main__":
@@ -1,31 +1,62 @@
 # Schemas package
 from .user import (
     UserBase, UserCreate, UserLogin, UserUpdate, UserResponse,
-    Token, TokenData
+    UserSearchResponse, UserFilter, AdminUserBulkAction, Token, TokenData
 )
 from .conversation import (
-    ConversationBase, ConversationCreate, ConversationUpdate, ConversationResponse
+    ConversationBase, ConversationCreate, ConversationUpdate, ConversationResponse,
+    ConversationBulkDelete, AdminConversationBulkDelete
+)
+from .message import (
+    MessageBase, MessageCreate, MessageResponse, MessageLatestResponse, MessageSyncResponse
 )
-from .message import MessageBase, MessageCreate, MessageResponse
 from .settings import (
     SystemSettingBase, SystemSettingResponse,
     PublicSettings, AdminSettings, AdminSettingsUpdate,
     TestConnectionRequest, TestConnectionResponse,
     ModelOption, ModelListResponse, ModelListRequest
 )
+from .search import SearchResult, SearchResponse
+from .job import JobResponse, BulkPreviewResponse
+from .profiling import CpuProfileStatus, AllocationSite, MemorySnapshotResponse
+from .analytics import AnalyticsSummary, DailyAnalytics, DiseaseAnalytics, AnalyticsResponse
+from .profile import PatientProfileBase, PatientProfileUpdate, PatientProfileResponse
+from .knowledge import (
+    KnowledgeTerm, AutocompleteResponse, LookupResponse, SyndromeMatch, SyndromeMatchResponse
+)
+from .usage import (
+    UsageSummary, UsageGroup, UsageResponse, MessageUsage, ConversationUsageResponse,
+    TokenQuotaUpdate, TokenQuotaResponse,
+)
 
 __all__ = [
     # User schemas
     "UserBase", "UserCreate", "UserLogin", "UserUpdate", "UserResponse",
-    "Token", "TokenData",
+    "UserSearchResponse", "UserFilter", "AdminUserBulkAction", "Token", "TokenData",
     # Conversation schemas
     "ConversationBase", "ConversationCreate", "ConversationUpdate", "ConversationResponse",
+    "ConversationBulkDelete", "AdminConversationBulkDelete",
     # Message schemas
-    "MessageBase", "MessageCreate", "MessageResponse",
+    "MessageBase", "MessageCreate", "MessageResponse", "MessageLatestResponse", "MessageSyncResponse",
     # Settings schemas
     "SystemSettingBase", "SystemSettingResponse",
     "PublicSettings", "AdminSettings", "AdminSettingsUpdate",
     "TestConnectionRequest", "TestConnectionResponse",
     "ModelOption", "ModelListResponse", "ModelListRequest",
+    # Search schemas
+    "SearchResult", "SearchResponse",
+    # Job schemas
+    "JobResponse", "BulkPreviewResponse",
+    # Profiling schemas
+    "CpuProfileStatus", "AllocationSite", "MemorySnapshotResponse",
+    # Analytics schemas
+    "AnalyticsSummary", "DailyAnalytics", "DiseaseAnalytics", "AnalyticsResponse",
+    # Profile schemas
+    "PatientProfileBase", "PatientProfileUpdate", "PatientProfileResponse",
+    # Knowledge schemas
+    "KnowledgeTerm", "AutocompleteResponse", "LookupResponse", "SyndromeMatch", "SyndromeMatchResponse",
+    # Usage schemas
+    "UsageSummary", "UsageGroup", "UsageResponse", "MessageUsage", "ConversationUsageResponse",
+    "TokenQuotaUpdate", "TokenQuotaResponse",
 ]
 
@@ -0,0 +1,34 @@
+"""
+统计相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class AnalyticsSummary(BaseModel):
+    """统计指标 Schema"""
+    active_users: int = Field(..., description="活跃用户数（发送过消息的用户）")
+    new_users: int = Field(..., description="新注册用户数")
+    conversations: int = Field(..., description="新建对话数")
+    messages: int = Field(..., description="消息数")
+    avg_reply_length: float = Field(..., description="平均回复长度（字符）")
+
+
+class DailyAnalytics(AnalyticsSummary):
+    """每日统计 Schema"""
+    day: str = Field(..., description="日期 (YYYY-MM-DD)")
+
+
+class DiseaseAnalytics(BaseModel):
+    """疾病统计 Schema"""
+    disease: str
+    conversations: int = Field(..., description="涉及该疾病的对话数")
+
+
+class AnalyticsResponse(BaseModel):
+    """统计响应 Schema"""
+    start: str
+    end: str
+    daily: List[DailyAnalytics]
+    totals: AnalyticsSummary = Field(..., description="区间合计（活跃用户按用户去重）")
+    diseases: List[DiseaseAnalytics] = Field(..., description="各疾病的对话数（按对话数降序）")
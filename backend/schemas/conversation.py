@@ -1,9 +1,11 @@
 """
 对话相关的 Pydantic Schemas
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+from .user import UserFilter
 
 
 class ConversationBase(BaseModel):
@@ -32,3 +34,32 @@ class ConversationResponse(ConversationBase):
     class Config:
         from_attributes = True
 
+
+
+class ConversationBulkDelete(BaseModel):
+    """批量删除对话 Schema（用户）"""
+    conversation_ids: Optional[List[int]] = Field(None, max_length=10000, description="要删除的对话 ID 列表")
+    all: bool = Field(False, description="是否删除全部对话（忽略 conversation_ids）")
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if not self.all and not self.conversation_ids:
+            raise ValueError("请指定要删除的对话")
+        return self
+
+
+class AdminConversationBulkDelete(BaseModel):
+    """批量删除对话 Schema（管理员，各条件取交集）"""
+    conversation_ids: Optional[List[int]] = Field(None, max_length=10000, description="要删除的对话 ID 列表")
+    user_id: Optional[int] = Field(None, description="只删除该用户的对话")
+    users: Optional[UserFilter] = Field(None, description="只删除符合条件的用户的对话")
+    created_after: Optional[datetime] = Field(None, description="对话创建时间不早于")
+    created_before: Optional[datetime] = Field(None, description="对话创建时间早于")
+    dry_run: bool = Field(False, description="只统计匹配的对话数，不执行删除")
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.user_id is None and not self.conversation_ids and self.users is None
+                and self.created_after is None and self.created_before is None):
+            raise ValueError("请指定对话 ID 列表或筛选条件")
+        return self
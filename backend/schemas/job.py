@@ -0,0 +1,27 @@
+"""
+后台任务相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class JobResponse(BaseModel):
+    """后台任务响应 Schema"""
+    id: int
+    kind: str = Field(..., description="任务类型")
+    status: str = Field(..., description="任务状态 (pending/running/succeeded/failed)")
+    total: int = Field(..., description="预计处理的数量")
+    processed: int = Field(..., description="已处理的数量")
+    result: Optional[Dict[str, Any]] = Field(None, description="任务结果")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class BulkPreviewResponse(BaseModel):
+    """批量操作试运行响应 Schema"""
+    dry_run: bool = True
+    matched: int = Field(..., description="匹配的数量")
+    sample_ids: List[int] = Field(..., description="部分匹配项的 ID（按 ID 升序）")
@@ -0,0 +1,40 @@
+"""
+知识库相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class KnowledgeTerm(BaseModel):
+    """知识库条目 Schema"""
+    kind: str = Field(..., description="类型：disease / syndrome / symptom")
+    id: str = Field(..., description="条目 ID（症状为名称）")
+    name: str
+    name_en: Optional[str] = None
+    disease_id: Optional[str] = Field(None, description="证型所属疾病 ID")
+    disease_name: Optional[str] = None
+    symptom_types: List[str] = Field(default_factory=list, description="症状类型：tcm（中医症状）/ western（西医症状、指标）")
+    matched: Optional[str] = Field(None, description="通过别名、英文名或拼音匹配时为匹配到的原文")
+
+
+class AutocompleteResponse(BaseModel):
+    """自动补全响应 Schema"""
+    query: str
+    items: List[KnowledgeTerm]
+
+
+class LookupResponse(BaseModel):
+    """精确查找响应 Schema"""
+    query: str
+    items: List[KnowledgeTerm]
+
+
+class SyndromeMatch(KnowledgeTerm):
+    """证型匹配结果 Schema"""
+    score: int = Field(..., description="匹配得分（中医症状 2 分，西医症状 / 指标 1 分）")
+    matched_symptoms: List[str]
+
+
+class SyndromeMatchResponse(BaseModel):
+    """证型匹配响应 Schema"""
+    items: List[SyndromeMatch]
@@ -3,7 +3,7 @@
 """
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class MessageBase(BaseModel):
@@ -15,7 +15,9 @@ class MessageBase(BaseModel):
 class MessageCreate(BaseModel):
     """消息创建 Schema"""
     content: str = Field(..., min_length=1, description="用户消息内容")
-    user_info: Optional[str] = Field(None, description="用户个人信息（可选）")
+    user_info: Optional[str] = Field(
+        None, description="用户个人信息（可选，旧版客户端使用；新版通过 /conversations/{id}/profile 保存结构化问诊档案）"
+    )
 
 
 class MessageResponse(MessageBase):
@@ -27,3 +29,17 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+
+
+class MessageLatestResponse(BaseModel):
+    """最新消息探测 Schema"""
+    latest_id: Optional[int] = Field(None, description="最后一条消息的 ID（无消息时为空）")
+    count: int = Field(..., description="消息总数")
+    is_archived: bool = Field(..., description="对话是否已归档（归档后消息 ID 会变化，需重新全量同步）")
+
+
+class MessageSyncResponse(MessageLatestResponse):
+    """消息增量同步 Schema"""
+    messages: List[MessageResponse] = Field(..., description="ID 大于游标的消息（按 ID 升序）")
+    has_more: bool = Field(..., description="是否还有未返回的新消息（以最后一条消息 ID 为游标继续同步）")
+    reset: bool = Field(..., description="本地缓存已失效（消息被删除、截断、对话已归档或游标不属于该对话），需丢弃缓存并全量同步")
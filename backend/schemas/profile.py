@@ -0,0 +1,30 @@
+"""
+问诊档案相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Literal, Optional
+
+
+class PatientProfileBase(BaseModel):
+    """问诊档案基础 Schema"""
+    age: Optional[int] = Field(None, ge=0, le=120, description="年龄")
+    gender: Optional[Literal["male", "female", "other"]] = Field(None, description="性别")
+    diseases: List[str] = Field(default_factory=list, max_length=20, description="疾病史（疾病名称，多选）")
+    symptoms: List[str] = Field(default_factory=list, max_length=50, description="近期症状（症状名称，多选）")
+    tcm_syndrome: Optional[str] = Field(
+        None, max_length=100, description="根据症状初步推断的中医证型（仅供参考，由大模型最终判断）"
+    )
+    main_complaint: Optional[str] = Field(None, max_length=400, description="主诉")
+
+
+class PatientProfileUpdate(PatientProfileBase):
+    """保存问诊档案 Schema（整体替换）"""
+
+
+class PatientProfileResponse(PatientProfileBase):
+    """问诊档案响应 Schema"""
+    conversation_id: int
+    version: int = Field(..., description="档案版本，每次实际修改加 1")
+    changed: bool = Field(False, description="本次保存是否修改了档案")
+    updated_at: Optional[datetime] = None
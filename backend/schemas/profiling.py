@@ -0,0 +1,37 @@
+"""
+性能分析相关的 Pydantic Schemas
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CpuProfileStatus(BaseModel):
+    """CPU 采样状态 Schema"""
+    pid: int = Field(..., description="被分析的进程 ID（多 worker 部署时为处理该请求的 worker）")
+    running: bool = Field(..., description="是否正在采样")
+    started_at: Optional[float] = Field(None, description="开始时间（Unix 时间戳）")
+    finished_at: Optional[float] = Field(None, description="结束时间（Unix 时间戳）")
+    seconds: float = Field(..., description="计划采样时长（秒）")
+    interval_ms: float = Field(..., description="采样间隔（毫秒）")
+    samples: int = Field(..., description="已采样次数")
+    stacks: int = Field(..., description="不同调用栈的数量")
+
+
+class AllocationSite(BaseModel):
+    """内存分配位置 Schema"""
+    site: str = Field(..., description="分配位置（文件:行号，按调用栈分组时为最近的若干帧）")
+    size: int = Field(..., description="当前占用字节数")
+    count: int = Field(..., description="当前分配块数")
+    size_diff: int = Field(..., description="相对上一次快照的字节数变化")
+    count_diff: int = Field(..., description="相对上一次快照的分配块数变化")
+
+
+class MemorySnapshotResponse(BaseModel):
+    """内存快照响应 Schema"""
+    pid: int = Field(..., description="被分析的进程 ID")
+    compared: bool = Field(..., description="是否与上一次快照进行了比较")
+    traced_current: int = Field(..., description="tracemalloc 跟踪到的当前内存（字节）")
+    traced_peak: int = Field(..., description="tracemalloc 跟踪到的峰值内存（字节）")
+    total_size: int = Field(..., description="快照中的总占用（字节）")
+    top: List[AllocationSite]
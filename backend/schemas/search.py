@@ -0,0 +1,25 @@
+"""
+全文检索相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class SearchResult(BaseModel):
+    """检索结果 Schema"""
+    conversation_id: int
+    conversation_title: str
+    user_id: int
+    message_id: Optional[int] = Field(None, description="命中的消息 ID（命中对话标题时为空）")
+    role: Optional[str] = Field(None, description="消息角色 (user/assistant)")
+    snippet: str = Field(..., description="命中内容摘要（关键词以 Markdown 粗体标记）")
+    created_at: datetime
+    score: float = Field(..., description="相关度得分（越大越相关）")
+
+
+class SearchResponse(BaseModel):
+    """检索响应 Schema"""
+    results: List[SearchResult]
+    next_cursor: Optional[str] = Field(None, description="下一页游标（cursor），没有下一页时为空")
+    has_more: bool = Field(..., description="是否还有下一页")
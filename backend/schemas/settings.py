@@ -126,6 +126,6 @@ class ModelListRequest(BaseModel):
 class LogoUploadResponse(BaseModel):
     """Logo 上传响应 Schema"""
 
-    logo_url: str = Field(..., description="Logo 的 Data URL（Base64 编码）")
+    logo_url: str = Field(..., description="Logo 的访问地址（包含内容哈希，可长期缓存）")
 
 
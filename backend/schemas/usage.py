@@ -0,0 +1,73 @@
+"""
+Token 用量相关的 Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class UsageSummary(BaseModel):
+    """用量合计 Schema"""
+    requests: int = Field(..., description="生成次数")
+    estimated_requests: int = Field(..., description="供应商未返回用量、按字符数估算的次数")
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = Field(..., description="命中前缀缓存的提示词 token 数（包含在 prompt_tokens 中）")
+    uncached_prompt_tokens: int = Field(..., description="未命中前缀缓存的提示词 token 数")
+    cache_hit_rate: float = Field(..., description="提示词的前缀缓存命中比例（0-1，估算的用量按未命中计）")
+    total_tokens: int
+    avg_latency_ms: float = Field(..., description="平均生成耗时（毫秒）")
+
+
+class UsageGroup(UsageSummary):
+    """分组用量 Schema"""
+    key: str = Field(..., description="分组值（用户 ID、供应商、模型、日期或对话 ID）")
+    label: Optional[str] = Field(None, description="按用户分组时为用户名")
+
+
+class UsageResponse(BaseModel):
+    """用量统计响应 Schema"""
+    start: str
+    end: str
+    group_by: str
+    totals: UsageSummary
+    items: List[UsageGroup]
+
+
+class MessageUsage(BaseModel):
+    """单次生成用量 Schema"""
+    id: int
+    message_id: Optional[int] = None
+    provider: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    estimated: bool
+    first_token_ms: Optional[float] = Field(None, description="首个内容片段的等待时间（毫秒）")
+    latency_ms: float = Field(..., description="生成总耗时（毫秒）")
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ConversationUsageResponse(BaseModel):
+    """对话用量响应 Schema"""
+    conversation_id: int
+    totals: UsageSummary
+    items: List[MessageUsage]
+
+
+class TokenQuotaUpdate(BaseModel):
+    """更新用户配额 Schema"""
+    daily_tokens: Optional[int] = Field(None, ge=0, description="每日 token 数，0 表示不限制，null 表示使用默认配额")
+
+
+class TokenQuotaResponse(BaseModel):
+    """用户配额响应 Schema"""
+    user_id: int
+    daily_tokens: Optional[int] = Field(None, description="单独设置的每日配额，null 表示使用默认配额")
+    default_daily_tokens: int = Field(..., description="默认每日配额（TOKEN_DAILY_QUOTA），0 表示不限制")
+    effective_daily_tokens: int = Field(..., description="实际生效的每日配额，0 表示不限制")
+    used_today: int = Field(..., description="当天已用 token 数")
@@ -1,9 +1,9 @@
 """
 用户相关的 Pydantic Schemas
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 
 class UserBase(BaseModel):
@@ -39,6 +39,36 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserSearchResponse(BaseModel):
+    """用户检索响应 Schema"""
+    items: List[UserResponse]
+    total: int = Field(..., description="匹配的用户数（超过统计上限时为上限值）")
+    total_exact: bool = Field(..., description="total 是否为精确值")
+    next_cursor: Optional[int] = Field(None, description="下一页游标（before_id），没有下一页时为空")
+
+
+class UserFilter(BaseModel):
+    """批量操作的用户筛选条件 Schema（各条件取交集，管理员账户始终排除）"""
+    user_ids: Optional[List[int]] = Field(None, max_length=10000, description="用户 ID 列表")
+    username_prefix: Optional[str] = Field(None, min_length=1, max_length=50, description="用户名前缀")
+    registered_after: Optional[datetime] = Field(None, description="注册时间不早于")
+    registered_before: Optional[datetime] = Field(None, description="注册时间早于")
+    is_banned: Optional[bool] = Field(None, description="封禁状态")
+
+    @model_validator(mode="after")
+    def check_conditions(self):
+        if not (self.user_ids or self.username_prefix or self.registered_after
+                or self.registered_before or self.is_banned is not None):
+            raise ValueError("请至少指定一个筛选条件")
+        return self
+
+
+class AdminUserBulkAction(UserFilter):
+    """批量操作用户 Schema"""
+    action: Literal["ban", "unban", "delete"] = Field(..., description="操作 (ban/unban/delete)")
+    dry_run: bool = Field(False, description="只统计匹配的用户数，不执行操作")
+
+
 class Token(BaseModel):
     """Token Schema"""
     access_token: str
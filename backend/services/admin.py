@@ -1,15 +1,37 @@
 """
 管理员服务模块
 """
+from datetime import datetime, timezone
+from sqlalchemy import column, func, select, table, text
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List
+from typing import Dict, List, Optional
+from core.tracing import traced
 from models.user import User
 from models.conversation import Conversation
 from models.message import Message
+from services.archive import (
+    delete_archived_conversation,
+    delete_archived_user_data,
+    get_all_archived_conversations,
+    get_archived_conversation,
+    get_archived_messages,
+)
+from services.events import emit_event
+from services.search import (
+    TRIGRAM_MIN_LENGTH,
+    USER_FTS_TABLE,
+    build_trigram_query,
+    prefix_bounds,
+    user_search_index_available,
+)
 from services.settings import get_all_settings, update_multiple_settings
 
+# 用户检索统计总数的上限：超过后只返回下限，避免统计大量匹配行
+USER_COUNT_LIMIT = 10000
 
+
+@traced()
 def get_all_users(db: Session) -> List[User]:
     """
     获取所有用户
@@ -24,6 +46,89 @@ def get_all_users(db: Session) -> List[User]:
     return users
 
 
+def _to_utc_naive(value: datetime) -> datetime:
+    """转换为数据库中存储的 UTC 时间（不带时区）"""
+
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@traced()
+def search_users(
+    db: Session,
+    q: Optional[str] = None,
+    match: str = "prefix",
+    role: Optional[str] = None,
+    is_banned: Optional[bool] = None,
+    registered_after: Optional[datetime] = None,
+    registered_before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+) -> Dict:
+    """
+    检索用户（按 ID 倒序，即注册先后倒序，使用游标分页）
+
+    用户名匹配均不区分大小写：前缀匹配使用 lower(username) 索引的范围条件；子串匹配使用
+    trigram 全文索引，子串短于 3 个字符或索引不可用时退化为扫描。每页只读取 limit + 1 行，
+    总数统计到 USER_COUNT_LIMIT 为止，页面耗时不随用户规模增长
+
+    Args:
+        db: 数据库会话
+        q: 用户名关键词
+        match: 匹配方式（prefix 前缀 / contains 子串）
+        role: 角色
+        is_banned: 封禁状态
+        registered_after: 注册时间不早于
+        registered_before: 注册时间早于
+        before_id: 游标（上一页最后一个用户的 ID）
+        limit: 每页条数
+
+    Returns:
+        包含 items、total、total_exact 与 next_cursor 的字典
+    """
+    query = db.query(User)
+
+    if q:
+        if match == "prefix":
+            lower, upper = prefix_bounds(q.lower())
+            username = func.lower(User.username)
+            query = query.filter(username >= lower, username < upper)
+        elif len(q) >= TRIGRAM_MIN_LENGTH and user_search_index_available(db):
+            matched_ids = select(column("rowid"))\
+                .select_from(table(USER_FTS_TABLE))\
+                .where(text(f"{USER_FTS_TABLE} MATCH :trigram_query"))
+            query = query.filter(User.id.in_(matched_ids)).params(trigram_query=build_trigram_query(q))
+        else:
+            query = query.filter(func.instr(func.lower(User.username), q.lower()) > 0)
+    if role is not None:
+        query = query.filter(User.role == role)
+    if is_banned is not None:
+        query = query.filter(User.is_banned == is_banned)
+    if registered_after is not None:
+        query = query.filter(User.created_at >= _to_utc_naive(registered_after))
+    if registered_before is not None:
+        query = query.filter(User.created_at < _to_utc_naive(registered_before))
+
+    counted = db.query(func.count())\
+        .select_from(query.with_entities(User.id).limit(USER_COUNT_LIMIT + 1).subquery())\
+        .scalar()
+
+    if before_id is not None:
+        query = query.filter(User.id < before_id)
+    users = query.order_by(User.id.desc()).limit(limit + 1).all()
+
+    has_more = len(users) > limit
+    users = users[:limit]
+    return {
+        "items": users,
+        "total": min(counted, USER_COUNT_LIMIT),
+        "total_exact": counted <= USER_COUNT_LIMIT,
+        "next_cursor": users[-1].id if has_more else None,
+    }
+
+
+@traced()
 def update_user_ban_status(db: Session, user_id: int, is_banned: bool) -> User:
     """
     更新用户封禁状态
@@ -60,6 +165,7 @@ def update_user_ban_status(db: Session, user_id: int, is_banned: bool) -> User:
     return user
 
 
+@traced()
 def delete_user(db: Session, user_id: int) -> None:
     """
     删除用户
@@ -85,10 +191,12 @@ def delete_user(db: Session, user_id: int) -> None:
             detail="不能删除管理员账户"
         )
     
+    delete_archived_user_data(db, user.id)
     db.delete(user)
     db.commit()
 
 
+@traced()
 def get_all_conversations(db: Session) -> List[Conversation]:
     """
     获取所有对话
@@ -102,10 +210,20 @@ def get_all_conversations(db: Session) -> List[Conversation]:
     conversations = db.query(Conversation)\
         .order_by(Conversation.created_at.desc())\
         .all()
+
+    # 合并归档对话
+    archived = get_all_archived_conversations(db)
+    if archived:
+        conversations = sorted(
+            conversations + archived,
+            key=lambda conversation: conversation.created_at,
+            reverse=True,
+        )
     
     return conversations
 
 
+@traced()
 def get_conversation_messages_by_admin(db: Session, conversation_id: int) -> List[Message]:
     """
     管理员获取指定对话的全部消息
@@ -123,12 +241,18 @@ def get_conversation_messages_by_admin(db: Session, conversation_id: int) -> Lis
 
     conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
 
+    if not conversation:
+        conversation = get_archived_conversation(db, conversation_id)
+
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="对话不存在",
         )
 
+    if conversation.is_archived:
+        return get_archived_messages(db, conversation_id)
+
     messages = (
         db.query(Message)
         .filter(Message.conversation_id == conversation_id)
@@ -139,6 +263,7 @@ def get_conversation_messages_by_admin(db: Session, conversation_id: int) -> Lis
     return messages
 
 
+@traced()
 def delete_conversation_by_admin(db: Session, conversation_id: int) -> None:
     """
     管理员删除对话
@@ -154,12 +279,22 @@ def delete_conversation_by_admin(db: Session, conversation_id: int) -> None:
         .filter(Conversation.id == conversation_id)\
         .first()
 
+    if not conversation:
+        conversation = get_archived_conversation(db, conversation_id)
+
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="对话不存在"
         )
 
+    emit_event(db, "conversation.deleted", {"conversation_id": conversation_id}, conversation.user_id)
+
+    if conversation.is_archived:
+        delete_archived_conversation(db, conversation_id)
+        db.commit()
+        return
+
     # 显式删除所有关联的消息（确保即使外键约束未生效也能正确删除）
     db.query(Message)\
         .filter(Message.conversation_id == conversation_id)\
@@ -178,9 +313,11 @@ def disable_all_conversations(db: Session) -> None:
         db: 数据库会话
     """
     db.query(Conversation).update({"is_active": False})
+    emit_event(db, "conversations.invalidated", {"reason": "model_changed"})
     db.commit()
 
 
+@traced()
 def update_system_settings_with_model_check(
     db: Session,
     settings_dict: dict
@@ -0,0 +1,349 @@
+"""
+统计汇总服务模块
+写入用户、对话与消息时在同一事务内累加按天的汇总表（会话 after_flush 钩子），保存问诊档案时记录涉及的疾病，
+管理员统计接口只读取汇总表，不扫描消息表；启用前的历史数据通过 rebuild_analytics 补算
+"""
+import json
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, DefaultDict, Dict, List, Optional, Tuple
+
+from sqlalchemy import event as sa_event
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from core.compression import decompress_value
+from core.config import get_settings
+from core.database import ARCHIVE_SCHEMA, SessionLocal, archive_enabled, engine
+from core.tracing import traced
+from models.analytics import DailyActiveUser, DailyStat, DiseaseDailyStat
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+
+# 旧版客户端把问诊档案以该标记开头附加在用户消息中，其中“疾病史”一行列出所选疾病（中英文界面标签不同）
+PATIENT_INFO_MARKER = "【患者信息】"
+_DISEASE_LINE_RE = re.compile(r"^(?:疾病史|Disease History)\s*[:：]\s*(.+)$", re.MULTILINE)
+_DISEASE_SEPARATOR_RE = re.compile(r"[、,，]")
+
+DAILY_COLUMNS = (
+    "active_users",
+    "new_users",
+    "conversations",
+    "messages",
+    "user_messages",
+    "assistant_messages",
+    "assistant_chars",
+)
+ANALYTICS_TABLES = (
+    "analytics_daily",
+    "analytics_daily_users",
+    "analytics_conversation_diseases",
+    "analytics_disease_daily",
+)
+
+
+def extract_diseases(content: str) -> List[str]:
+    """从用户消息附带的问诊档案中提取疾病名称"""
+
+    if PATIENT_INFO_MARKER not in content:
+        return []
+    match = _DISEASE_LINE_RE.search(content.split(PATIENT_INFO_MARKER, 1)[1])
+    if not match:
+        return []
+    return [name.strip() for name in _DISEASE_SEPARATOR_RE.split(match.group(1)) if name.strip()]
+
+
+def analytics_day(now: Optional[datetime] = None) -> str:
+    """按统计时区计算日期（YYYY-MM-DD）"""
+
+    now = now or datetime.now(timezone.utc)
+    return (now + timedelta(hours=get_settings().ANALYTICS_UTC_OFFSET_HOURS)).date().isoformat()
+
+
+def _day_modifier() -> str:
+    """SQLite date() 的时区偏移修饰符（数据库中的时间为 UTC）"""
+
+    return f"{round(get_settings().ANALYTICS_UTC_OFFSET_HOURS * 60):+d} minutes"
+
+
+def _add_daily(conn, day: str, deltas: Dict[str, int]) -> None:
+    """累加某一天的汇总计数"""
+
+    columns = [column for column in DAILY_COLUMNS if deltas.get(column)]
+    if not columns:
+        return
+    conn.execute(
+        text(
+            f"INSERT INTO analytics_daily (day, {', '.join(columns)}) "
+            f"VALUES (:day, {', '.join(':' + column for column in columns)}) "
+            f"ON CONFLICT(day) DO UPDATE SET {', '.join(f'{c} = {c} + excluded.{c}' for c in columns)}"
+        ),
+        {"day": day, **{column: deltas[column] for column in columns}},
+    )
+
+
+def _add_disease(conn, day: str, conversation_id: int, disease: str) -> None:
+    """记录对话涉及的疾病（每个对话每种疾病只计一次）"""
+
+    inserted = conn.execute(
+        text(
+            "INSERT OR IGNORE INTO analytics_conversation_diseases (conversation_id, disease) "
+            "VALUES (:conversation_id, :disease)"
+        ),
+        {"conversation_id": conversation_id, "disease": disease},
+    ).rowcount
+    if inserted:
+        conn.execute(
+            text(
+                "INSERT INTO analytics_disease_daily (day, disease, conversations) VALUES (:day, :disease, 1) "
+                "ON CONFLICT(day, disease) DO UPDATE SET conversations = conversations + 1"
+            ),
+            {"day": day, "disease": disease},
+        )
+
+
+def record_conversation_diseases(conn, conversation_id: int, diseases: List[str]) -> None:
+    """保存问诊档案时记录对话涉及的疾病（与档案写入在同一事务内）"""
+
+    day = analytics_day()
+    for disease in diseases:
+        _add_disease(conn, day, conversation_id, disease)
+
+
+def _record_message(conn, day: str, message: Message, deltas: DefaultDict[str, int]) -> None:
+    content = message.content or ""
+    deltas["messages"] += 1
+
+    if message.role == "assistant":
+        deltas["assistant_messages"] += 1
+        deltas["assistant_chars"] += len(content)
+        return
+    if message.role != "user":
+        return
+
+    deltas["user_messages"] += 1
+    # 当天首次发送消息的用户计入活跃用户
+    deltas["active_users"] += conn.execute(
+        text(
+            "INSERT OR IGNORE INTO analytics_daily_users (day, user_id) "
+            "SELECT :day, user_id FROM conversations WHERE id = :conversation_id"
+        ),
+        {"day": day, "conversation_id": message.conversation_id},
+    ).rowcount
+    for disease in extract_diseases(content):
+        _add_disease(conn, day, message.conversation_id, disease)
+
+
+@sa_event.listens_for(SessionLocal, "after_flush")
+def _record_new_rows(session: Session, flush_context) -> None:
+    """在写入新用户、对话与消息的同一事务内累加汇总表（随事务提交或回滚）"""
+
+    if not get_settings().ANALYTICS_ENABLED:
+        return
+
+    new_rows = [row for row in session.new if isinstance(row, (User, Conversation, Message))]
+    if not new_rows:
+        return
+
+    conn = session.connection()
+    day = analytics_day()
+    deltas: DefaultDict[str, int] = defaultdict(int)
+    for row in new_rows:
+        if isinstance(row, User):
+            deltas["new_users"] += 1
+        elif isinstance(row, Conversation):
+            deltas["conversations"] += 1
+        else:
+            _record_message(conn, day, row, deltas)
+    _add_daily(conn, day, deltas)
+
+
+def _schemas() -> List[str]:
+    """主库与（启用时的）归档库表前缀"""
+
+    return ["main", ARCHIVE_SCHEMA] if archive_enabled() else ["main"]
+
+
+def rebuild_analytics(
+    batch_size: int = 2000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, int]:
+    """
+    根据现有数据（含归档库）重新汇总统计表
+
+    计数在 SQL 中按天聚合，回复字数与疾病需要解压消息内容，按 ID 分批读取；
+    整个过程在一个事务内完成，期间会阻塞其他写入，应在低峰期执行
+
+    Args:
+        batch_size: 每批读取的消息数
+        progress: 进度回调，参数为已读取的消息数
+
+    Returns:
+        汇总的天数与消息数
+    """
+    modifier = _day_modifier()
+    scanned = 0
+
+    with engine.begin() as conn:
+        for table in ANALYTICS_TABLES:
+            conn.execute(text(f"DELETE FROM {table}"))
+
+        conn.execute(
+            text(
+                "INSERT INTO analytics_daily (day, new_users) "
+                "SELECT date(created_at, :modifier), COUNT(*) FROM users GROUP BY 1"
+            ),
+            {"modifier": modifier},
+        )
+
+        assistant_chars: DefaultDict[str, int] = defaultdict(int)
+        # (对话 ID, 疾病) -> 首次出现的日期
+        diseases: Dict[Tuple[int, str], str] = {}
+
+        for schema in _schemas():
+            for statement in (
+                "INSERT INTO analytics_daily (day, conversations) "
+                f"SELECT date(created_at, :modifier), COUNT(*) FROM {schema}.conversations GROUP BY 1 "
+                "ON CONFLICT(day) DO UPDATE SET conversations = conversations + excluded.conversations",
+
+                "INSERT INTO analytics_daily (day, messages, user_messages, assistant_messages) "
+                "SELECT date(created_at, :modifier), COUNT(*), "
+                "SUM(role = 'user'), SUM(role = 'assistant') "
+                f"FROM {schema}.messages GROUP BY 1 "
+                "ON CONFLICT(day) DO UPDATE SET "
+                "messages = messages + excluded.messages, "
+                "user_messages = user_messages + excluded.user_messages, "
+                "assistant_messages = assistant_messages + excluded.assistant_messages",
+
+                "INSERT OR IGNORE INTO analytics_daily_users (day, user_id) "
+                "SELECT DISTINCT date(m.created_at, :modifier), c.user_id "
+                f"FROM {schema}.messages m JOIN {schema}.conversations c ON c.id = m.conversation_id "
+                "WHERE m.role = 'user'",
+            ):
+                conn.execute(text(statement), {"modifier": modifier})
+
+            cursor = 0
+            while True:
+                rows = conn.execute(
+                    text(
+                        "SELECT id, conversation_id, role, content, date(created_at, :modifier) AS day "
+                        f"FROM {schema}.messages WHERE id > :cursor ORDER BY id LIMIT :limit"
+                    ),
+                    {"modifier": modifier, "cursor": cursor, "limit": batch_size},
+                ).all()
+                if not rows:
+                    break
+                for row in rows:
+                    content = decompress_value(row.content) or ""
+                    if row.role == "assistant":
+                        assistant_chars[row.day] += len(content)
+                    elif row.role == "user":
+                        for disease in extract_diseases(content):
+                            key = (row.conversation_id, disease)
+                            if key not in diseases or row.day < diseases[key]:
+                                diseases[key] = row.day
+                cursor = rows[-1].id
+                scanned += len(rows)
+                if progress:
+                    progress(scanned)
+
+        conn.execute(
+            text(
+                "INSERT INTO analytics_daily (day, active_users) "
+                "SELECT day, COUNT(*) FROM analytics_daily_users GROUP BY day "
+                "ON CONFLICT(day) DO UPDATE SET active_users = excluded.active_users"
+            )
+        )
+        for day, chars in assistant_chars.items():
+            _add_daily(conn, day, {"assistant_chars": chars})
+        # 结构化问诊档案（当前版本与放在提示词前缀中的首个版本，含归档库）按档案创建日期计入
+        for schema in _schemas():
+            for row in conn.execute(
+                text(
+                    "SELECT conversation_id, data, baseline, date(created_at, :modifier) AS day "
+                    f"FROM {schema}.patient_profiles"
+                ),
+                {"modifier": modifier},
+            ):
+                for snapshot in (row.data, row.baseline):
+                    for disease in json.loads(snapshot).get("diseases") or []:
+                        key = (row.conversation_id, disease)
+                        if key not in diseases or row.day < diseases[key]:
+                            diseases[key] = row.day
+
+        for (conversation_id, disease), day in diseases.items():
+            _add_disease(conn, day, conversation_id, disease)
+
+        days = conn.execute(text("SELECT COUNT(*) FROM analytics_daily")).scalar()
+
+    return {"days": days, "messages": scanned}
+
+
+def _average(total: int, count: int) -> float:
+    return round(total / count, 1) if count else 0.0
+
+
+@traced()
+def get_analytics(db: Session, days: int = 30) -> Dict:
+    """
+    读取最近若干天的统计（只查询汇总表）
+
+    Args:
+        db: 数据库会话
+        days: 天数（含今天）
+
+    Returns:
+        每日统计、区间合计与各疾病的对话数
+    """
+    end = date.fromisoformat(analytics_day())
+    start = end - timedelta(days=days - 1)
+    start_day = start.isoformat()
+
+    rows = {
+        row.day: row
+        for row in db.query(DailyStat).filter(DailyStat.day >= start_day).all()
+    }
+
+    daily = []
+    totals = {column: 0 for column in DAILY_COLUMNS}
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        row = rows.get(day)
+        values = {column: getattr(row, column) if row else 0 for column in DAILY_COLUMNS}
+        for column in DAILY_COLUMNS:
+            totals[column] += values[column]
+        daily.append({
+            "day": day,
+            "active_users": values["active_users"],
+            "new_users": values["new_users"],
+            "conversations": values["conversations"],
+            "messages": values["messages"],
+            "avg_reply_length": _average(values["assistant_chars"], values["assistant_messages"]),
+        })
+
+    # 区间内的活跃用户需按用户去重，不能直接累加每日活跃数
+    active_users = db.query(func.count(func.distinct(DailyActiveUser.user_id)))\
+        .filter(DailyActiveUser.day >= start_day)\
+        .scalar()
+
+    diseases = db.query(DiseaseDailyStat.disease, func.sum(DiseaseDailyStat.conversations).label("conversations"))\
+        .filter(DiseaseDailyStat.day >= start_day)\
+        .group_by(DiseaseDailyStat.disease)\
+        .order_by(func.sum(DiseaseDailyStat.conversations).desc())\
+        .all()
+
+    return {
+        "start": start_day,
+        "end": end.isoformat(),
+        "daily": daily,
+        "totals": {
+            "active_users": active_users,
+            "new_users": totals["new_users"],
+            "conversations": totals["conversations"],
+            "messages": totals["messages"],
+            "avg_reply_length": _average(totals["assistant_chars"], totals["assistant_messages"]),
+        },
+        "diseases": [{"disease": row.disease, "conversations": row.conversations} for row in diseases],
+    }
@@ -0,0 +1,307 @@
+"""
+对话归档服务模块
+将长期未使用或已失效的对话（连同消息与问诊档案）迁移到附加的归档数据库，读取时按需回退查询
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import ARCHIVE_SCHEMA, ArchiveBase, archive_enabled, engine
+from models.archive import (
+    ArchivedConversation,
+    ArchivedMessage,
+    ArchivedPatientProfile,
+    ArchivedPatientProfileChange,
+)
+
+
+def init_archive_database() -> bool:
+    """
+    创建归档数据库中的表
+
+    Returns:
+        是否启用了归档
+    """
+    if not archive_enabled():
+        return False
+
+    ArchiveBase.metadata.create_all(bind=engine)
+    return True
+
+
+def get_archived_conversation(db: Session, conversation_id: int) -> Optional[ArchivedConversation]:
+    """获取归档对话，未启用归档时返回 None"""
+
+    if not archive_enabled():
+        return None
+
+    return db.query(ArchivedConversation)\
+        .filter(ArchivedConversation.id == conversation_id)\
+        .first()
+
+
+def get_archived_user_conversations(db: Session, user_id: int) -> List[ArchivedConversation]:
+    """获取用户的归档对话"""
+
+    if not archive_enabled():
+        return []
+
+    return db.query(ArchivedConversation)\
+        .filter(ArchivedConversation.user_id == user_id)\
+        .order_by(ArchivedConversation.created_at.desc())\
+        .all()
+
+
+def get_archived_conversations_version(db: Session, user_id: int) -> Tuple[int, Optional[int]]:
+    """用户归档对话的版本标记（数量、最大 ID），未启用归档时为 (0, None)"""
+
+    if not archive_enabled():
+        return 0, None
+
+    count, max_id = db.query(func.count(ArchivedConversation.id), func.max(ArchivedConversation.id))\
+        .filter(ArchivedConversation.user_id == user_id)\
+        .one()
+    return count, max_id
+
+
+def get_all_archived_conversations(db: Session) -> List[ArchivedConversation]:
+    """获取所有归档对话"""
+
+    if not archive_enabled():
+        return []
+
+    return db.query(ArchivedConversation)\
+        .order_by(ArchivedConversation.created_at.desc())\
+        .all()
+
+
+def get_archived_messages(db: Session, conversation_id: int) -> List[ArchivedMessage]:
+    """获取归档对话的消息"""
+
+    return db.query(ArchivedMessage)\
+        .filter(ArchivedMessage.conversation_id == conversation_id)\
+        .order_by(ArchivedMessage.created_at.asc())\
+        .all()
+
+
+def get_archived_messages_since(
+    db: Session, conversation_id: int, after_id: int, limit: int
+) -> List[ArchivedMessage]:
+    """获取归档对话中 ID 大于游标的消息（按 ID 升序，最多 limit 条）"""
+
+    return db.query(ArchivedMessage)\
+        .filter(ArchivedMessage.conversation_id == conversation_id, ArchivedMessage.id > after_id)\
+        .order_by(ArchivedMessage.id.asc())\
+        .limit(limit)\
+        .all()
+
+
+def get_archived_messages_version(
+    db: Session, conversation_id: int, up_to_id: Optional[int] = None
+) -> Tuple[int, Optional[int]]:
+    """归档对话消息的版本标记（数量、最大 ID），可只统计 ID 不超过 up_to_id 的消息"""
+
+    query = db.query(func.count(ArchivedMessage.id), func.max(ArchivedMessage.id))\
+        .filter(ArchivedMessage.conversation_id == conversation_id)
+    if up_to_id is not None:
+        query = query.filter(ArchivedMessage.id <= up_to_id)
+    count, max_id = query.one()
+    return count, max_id
+
+
+def get_archived_profile(db: Session, conversation_id: int) -> Optional[ArchivedPatientProfile]:
+    """获取归档对话的问诊档案"""
+
+    if not archive_enabled():
+        return None
+
+    return db.query(ArchivedPatientProfile)\
+        .filter(ArchivedPatientProfile.conversation_id == conversation_id)\
+        .first()
+
+
+def delete_archived_conversation(db: Session, conversation_id: int) -> None:
+    """删除归档对话及其消息与问诊档案（调用方负责提交）"""
+
+    for model in (ArchivedMessage, ArchivedPatientProfileChange, ArchivedPatientProfile):
+        db.query(model)\
+            .filter(model.conversation_id == conversation_id)\
+            .delete(synchronize_session=False)
+    db.query(ArchivedConversation)\
+        .filter(ArchivedConversation.id == conversation_id)\
+        .delete(synchronize_session=False)
+
+
+def delete_archived_user_data(db: Session, user_id: int) -> None:
+    """
+    删除用户的全部归档数据（调用方负责提交）
+
+    归档库与主库之间没有外键，删除用户时需显式清理
+    """
+    if not archive_enabled():
+        return
+
+    conversation_ids = db.query(ArchivedConversation.id)\
+        .filter(ArchivedConversation.user_id == user_id)
+    for model in (ArchivedMessage, ArchivedPatientProfileChange, ArchivedPatientProfile):
+        db.query(model)\
+            .filter(model.conversation_id.in_(conversation_ids.scalar_subquery()))\
+            .delete(synchronize_session=False)
+    db.query(ArchivedConversation)\
+        .filter(ArchivedConversation.user_id == user_id)\
+        .delete(synchronize_session=False)
+
+
+def _find_archive_candidates(
+    conn, cutoff: datetime, include_inactive: bool, limit: int, after_id: int = 0
+) -> List[int]:
+    """
+    查找需要归档的对话 ID（按最后一条消息的时间判断是否长期未使用）
+
+    只查找 ID 大于 after_id 的对话：调用方在批次之间传入上一批的最大 ID，
+    每批从上次停下的位置继续扫描，不会反复检查前面不需要归档的对话
+    """
+
+    # 最后一条消息通过 conversation_id 索引按 id 倒序一次定位，避免聚合全部消息
+    last_activity = (
+        "COALESCE((SELECT m.created_at FROM messages m "
+        "WHERE m.conversation_id = c.id ORDER BY m.id DESC LIMIT 1), c.created_at)"
+    )
+    conditions = [f"{last_activity} < :cutoff"]
+    if include_inactive:
+        conditions.append("c.is_active = 0")
+
+    rows = conn.execute(
+        text(
+            f"SELECT c.id FROM conversations c WHERE c.id > :after_id AND ({' OR '.join(conditions)}) "
+            "ORDER BY c.id LIMIT :limit"
+        ),
+        {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S"), "limit": limit, "after_id": after_id},
+    ).all()
+    return [row[0] for row in rows]
+
+
+def _copy_profiles(conn, id_list: str, params: Dict[str, int]) -> None:
+    """
+    把一批对话的问诊档案与修改记录复制到归档库（须在消息复制之后、删除之前执行）
+
+    归档库重新分配了消息 ID，修改记录的 after_message_id 按消息在对话中的序号映射为归档库中的 ID
+    （对应的消息已被删除时取之前最近的一条，之前没有消息时为 0）
+    """
+    conn.execute(
+        text(
+            f"INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.patient_profiles "
+            "(conversation_id, user_id, data, baseline, version, created_at, updated_at) "
+            "SELECT conversation_id, user_id, data, baseline, version, created_at, updated_at "
+            f"FROM patient_profiles WHERE conversation_id IN ({id_list})"
+        ),
+        params,
+    )
+    conn.execute(
+        text(f"DELETE FROM {ARCHIVE_SCHEMA}.patient_profile_changes WHERE conversation_id IN ({id_list})"),
+        params,
+    )
+    conn.execute(
+        text(
+            "WITH archived AS ("
+            "SELECT conversation_id, id, ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY id) AS position "
+            f"FROM {ARCHIVE_SCHEMA}.messages WHERE conversation_id IN ({id_list})) "
+            f"INSERT INTO {ARCHIVE_SCHEMA}.patient_profile_changes "
+            "(conversation_id, version, after_message_id, diff, created_at) "
+            "SELECT ch.conversation_id, ch.version, COALESCE(a.id, 0), ch.diff, ch.created_at "
+            "FROM patient_profile_changes ch "
+            "LEFT JOIN archived a ON a.conversation_id = ch.conversation_id AND a.position = ("
+            "SELECT COUNT(*) FROM messages m "
+            "WHERE m.conversation_id = ch.conversation_id AND m.id <= ch.after_message_id) "
+            f"WHERE ch.conversation_id IN ({id_list}) ORDER BY ch.id"
+        ),
+        params,
+    )
+
+
+def archive_conversations(
+    batch_size: int = 100,
+    max_batches: Optional[int] = None,
+    older_than_days: Optional[int] = None,
+    include_inactive: Optional[bool] = None,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict[str, int]:
+    """
+    分批将对话迁移到归档数据库
+
+    每批在独立的短事务中完成复制与删除，批次之间释放写锁，
+    不会长时间阻塞在线写入。
+
+    Args:
+        batch_size: 每批归档的对话数
+        max_batches: 最多执行的批次数，None 表示直到没有待归档对话
+        older_than_days: 超过该天数无新消息即归档，默认读取配置
+        include_inactive: 是否归档已失效对话，默认读取配置
+        progress: 每批完成后的回调，参数为当前统计
+
+    Returns:
+        统计信息（conversations/messages/batches）
+    """
+    settings = get_settings()
+    stats = {"conversations": 0, "messages": 0, "batches": 0}
+
+    if not init_archive_database():
+        return stats
+
+    if older_than_days is None:
+        older_than_days = settings.ARCHIVE_AFTER_DAYS
+    if include_inactive is None:
+        include_inactive = settings.ARCHIVE_INACTIVE
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    last_id = 0
+    while max_batches is None or stats["batches"] < max_batches:
+        with engine.begin() as conn:
+            ids = _find_archive_candidates(conn, cutoff, include_inactive, batch_size, last_id)
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            params = {f"id{i}": conversation_id for i, conversation_id in enumerate(ids)}
+            id_list = ", ".join(f":id{i}" for i in range(len(ids)))
+
+            conn.execute(
+                text(
+                    f"INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.conversations "
+                    "(id, user_id, title, is_active, created_at, archived_at) "
+                    "SELECT id, user_id, title, 0, created_at, CURRENT_TIMESTAMP "
+                    f"FROM conversations WHERE id IN ({id_list})"
+                ),
+                params,
+            )
+            # messages 表未使用 AUTOINCREMENT，ID 可能被复用，因此归档库重新分配消息 ID；
+            # 先清理同一对话的残留数据，保证中断后重跑不会产生重复
+            conn.execute(
+                text(f"DELETE FROM {ARCHIVE_SCHEMA}.messages WHERE conversation_id IN ({id_list})"),
+                params,
+            )
+            moved = conn.execute(
+                text(
+                    f"INSERT INTO {ARCHIVE_SCHEMA}.messages "
+                    "(conversation_id, role, content, created_at) "
+                    "SELECT conversation_id, role, content, created_at "
+                    f"FROM messages WHERE conversation_id IN ({id_list}) ORDER BY id"
+                ),
+                params,
+            ).rowcount
+            _copy_profiles(conn, id_list, params)
+            conn.execute(text(f"DELETE FROM messages WHERE conversation_id IN ({id_list})"), params)
+            # 问诊档案及其修改记录随对话级联删除
+            conn.execute(text(f"DELETE FROM conversations WHERE id IN ({id_list})"), params)
+
+        stats["conversations"] += len(ids)
+        stats["messages"] += moved
+        stats["batches"] += 1
+        if progress:
+            progress(dict(stats))
+
+    return stats
@@ -0,0 +1,169 @@
+"""
+静态资源服务模块
+Logo 等图片以二进制形式按内容哈希存储，通过带哈希的 URL 提供，可被浏览器长期缓存
+"""
+import base64
+import binascii
+import hashlib
+import io
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from models.asset import Asset
+from services.settings import get_setting, update_setting
+
+try:  # Pillow 为可选依赖：uv sync --extra images
+    from PIL import Image
+except ImportError:  # pragma: no cover - 未安装时原样保存
+    Image = None
+
+ASSET_URL_PREFIX = "/api/public/assets/"
+
+# 不做缩放/转码的类型（矢量图与可能的动图）
+_PASSTHROUGH_TYPES = {"image/svg+xml", "image/gif"}
+
+# 资源与接口同源，SVG 中可以嵌入脚本：禁止执行脚本与加载外部内容，并禁止浏览器猜测类型
+ASSET_SECURITY_HEADERS = {
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    "X-Content-Type-Options": "nosniff",
+}
+
+
+def asset_url(digest: str) -> str:
+    """资源的访问地址（内容变化时地址随之变化）"""
+
+    return f"{ASSET_URL_PREFIX}{digest}"
+
+
+def _digest_from_url(url: Optional[str]) -> Optional[str]:
+    """从资源地址中解析内容哈希，非本服务的地址返回 None"""
+
+    if not url or not url.startswith(ASSET_URL_PREFIX):
+        return None
+    return url[len(ASSET_URL_PREFIX):] or None
+
+
+def process_image(content: bytes, content_type: str) -> Tuple[bytes, str]:
+    """
+    按配置缩放并重新编码位图（未安装 Pillow 或无需处理时原样返回）
+
+    Args:
+        content: 原始图片数据
+        content_type: 原始 MIME 类型
+
+    Returns:
+        (处理后的数据, MIME 类型)
+    """
+    settings = get_settings()
+    if Image is None or content_type in _PASSTHROUGH_TYPES:
+        return content, content_type
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except Exception:  # noqa: BLE001 - 无法解析时原样保存
+        return content, content_type
+
+    image_format = image.format or "PNG"
+    max_dimension = settings.LOGO_MAX_DIMENSION
+    needs_resize = max_dimension > 0 and max(image.size) > max_dimension
+    if not needs_resize and not settings.LOGO_CONVERT_WEBP:
+        return content, content_type
+
+    if needs_resize:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if settings.LOGO_CONVERT_WEBP:
+        image.save(output, format="WEBP", quality=settings.LOGO_WEBP_QUALITY, method=6)
+        processed, processed_type = output.getvalue(), "image/webp"
+    else:
+        image.save(output, format=image_format)
+        processed, processed_type = output.getvalue(), content_type
+
+    # 仅转码且结果反而更大时保留原图
+    if not needs_resize and len(processed) >= len(content):
+        return content, content_type
+    return processed, processed_type
+
+
+def save_asset(db: Session, data: bytes, content_type: str) -> Asset:
+    """按内容哈希保存资源（相同内容只存一份）"""
+
+    digest = hashlib.sha256(data).hexdigest()
+    asset = db.get(Asset, digest)
+    if asset is None:
+        asset = Asset(digest=digest, content_type=content_type, data=data)
+        db.add(asset)
+        db.commit()
+        db.refresh(asset)
+    return asset
+
+
+def get_asset(db: Session, digest: str) -> Optional[Asset]:
+    """根据内容哈希获取资源"""
+
+    return db.execute(select(Asset).where(Asset.digest == digest)).scalar_one_or_none()
+
+
+def delete_asset(db: Session, digest: str) -> None:
+    """删除资源（不存在时忽略）"""
+
+    asset = db.get(Asset, digest)
+    if asset is not None:
+        db.delete(asset)
+        db.commit()
+
+
+def replace_logo(db: Session, content: bytes, content_type: str) -> str:
+    """
+    保存新的网站 Logo 并更新设置，同时删除旧的 Logo 资源
+
+    Returns:
+        新 Logo 的访问地址
+    """
+    previous_digest = _digest_from_url(get_setting(db, "website_logo"))
+
+    data, data_type = process_image(content, content_type)
+    asset = save_asset(db, data, data_type)
+    url = asset_url(asset.digest)
+    update_setting(db, "website_logo", url)
+
+    if previous_digest and previous_digest != asset.digest:
+        delete_asset(db, previous_digest)
+    return url
+
+
+def get_logo_url(db: Session) -> str:
+    """获取网站 Logo 地址（只读；旧版本的 Data URL 由 migrate_legacy_logo 迁移）"""
+
+    return get_setting(db, "website_logo") or ""
+
+
+def migrate_legacy_logo(db: Session) -> bool:
+    """
+    将旧版本以 Base64 Data URL 形式保存在设置中的 Logo 迁移为二进制资源
+
+    由 init_db.py 执行（升级后重新运行即可），公共接口只读取设置，不写数据库；
+    迁移前 Data URL 仍可直接作为图片地址使用
+
+    Returns:
+        是否执行了迁移
+    """
+    value = get_setting(db, "website_logo") or ""
+    if not value.startswith("data:"):
+        return False
+
+    header, _, payload = value.partition(",")
+    content_type = header[len("data:"):].split(";", 1)[0] or "application/octet-stream"
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return False
+
+    asset = save_asset(db, data, content_type)
+    update_setting(db, "website_logo", asset_url(asset.digest))
+    return True
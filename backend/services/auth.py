@@ -8,6 +8,7 @@ from typing import Optional
 from models.user import User
 from core.security import hash_password, verify_password, create_access_token, decode_access_token
 from core.database import get_db
+from core.tracing import traced
 from schemas.user import UserCreate, Token
 
 # OAuth2 密码流
@@ -110,6 +111,7 @@ def login_user(db: Session, username: str, password: str) -> Token:
     return Token(access_token=access_token, token_type="bearer")
 
 
+@traced("auth")
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
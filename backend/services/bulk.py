@@ -0,0 +1,354 @@
+"""
+批量操作服务模块
+批量删除、批量封禁等操作以集合语句按有界批次、短事务执行，作为后台任务运行并汇报进度
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import ARCHIVE_SCHEMA, archive_enabled
+from models.job import BackgroundJob
+from models.user import User
+from schemas.user import UserFilter
+from services.cleanup import run_batches
+from services.events import publish_event
+from services.jobs import JobFunc, ProgressReporter, create_job, submit_job
+from services.search import prefix_bounds
+
+DELETE_CONVERSATIONS_JOB = "delete_conversations"
+BAN_USERS_JOB = "ban_users"
+UNBAN_USERS_JOB = "unban_users"
+DELETE_USERS_JOB = "delete_users"
+
+# 试运行时返回的示例 ID 数量
+PREVIEW_SAMPLE_SIZE = 20
+
+# 批次之间的间隔（秒），让出写锁
+BATCH_SLEEP_SECONDS = 0.05
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    """转换为数据库中的时间格式（UTC，可 JSON 序列化）"""
+
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def user_filters(user_filter: UserFilter) -> Dict:
+    """把用户筛选条件转换为任务参数"""
+
+    return {
+        "user_ids": user_filter.user_ids,
+        "username_prefix": user_filter.username_prefix,
+        "registered_after": _format_time(user_filter.registered_after),
+        "registered_before": _format_time(user_filter.registered_before),
+        "is_banned": user_filter.is_banned,
+    }
+
+
+def conversation_filters(
+    user_id: Optional[int] = None,
+    conversation_ids: Optional[List[int]] = None,
+    users: Optional[UserFilter] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> Dict:
+    """把对话筛选条件转换为任务参数（各条件取交集）"""
+
+    return {
+        "user_id": user_id,
+        "conversation_ids": conversation_ids,
+        "users": user_filters(users) if users is not None else None,
+        "created_after": _format_time(created_after),
+        "created_before": _format_time(created_before),
+    }
+
+
+def _user_filter(filters: Dict) -> Tuple[str, Dict]:
+    """构造用户筛选条件（管理员账户始终排除）"""
+
+    conditions = []
+    params: Dict = {}
+    if filters.get("user_ids"):
+        conditions.append("u.id IN (SELECT value FROM json_each(:user_ids))")
+        params["user_ids"] = json.dumps(filters["user_ids"])
+    prefix = filters.get("username_prefix")
+    if prefix:
+        # 与用户检索一致不区分大小写，写成范围条件以使用 lower(username) 索引
+        conditions.append("lower(u.username) >= :username_prefix AND lower(u.username) < :username_prefix_end")
+        params["username_prefix"], params["username_prefix_end"] = prefix_bounds(prefix.lower())
+    if filters.get("registered_after"):
+        conditions.append("u.created_at >= :registered_after")
+        params["registered_after"] = filters["registered_after"]
+    if filters.get("registered_before"):
+        conditions.append("u.created_at < :registered_before")
+        params["registered_before"] = filters["registered_before"]
+    if filters.get("is_banned") is not None:
+        conditions.append("u.is_banned = :is_banned")
+        params["is_banned"] = bool(filters["is_banned"])
+    if not conditions:
+        raise ValueError("必须至少指定一个用户筛选条件")
+    conditions.append("u.role != 'admin'")
+    return " AND ".join(conditions), params
+
+
+def _conversation_filter(filters: Dict) -> Tuple[str, Dict]:
+    """构造对话筛选条件（对话 ID 列表以 JSON 数组传入，避免超长的 IN 参数列表）"""
+
+    conditions = []
+    params: Dict = {}
+    if filters.get("user_id") is not None:
+        conditions.append("c.user_id = :user_id")
+        params["user_id"] = filters["user_id"]
+    if filters.get("conversation_ids") is not None:
+        conditions.append("c.id IN (SELECT value FROM json_each(:conversation_ids))")
+        params["conversation_ids"] = json.dumps(filters["conversation_ids"])
+    if filters.get("users"):
+        user_condition, user_params = _user_filter(filters["users"])
+        conditions.append(f"c.user_id IN (SELECT u.id FROM main.users u WHERE {user_condition})")
+        params.update(user_params)
+    if filters.get("created_after"):
+        conditions.append("c.created_at >= :created_after")
+        params["created_after"] = filters["created_after"]
+    if filters.get("created_before"):
+        conditions.append("c.created_at < :created_before")
+        params["created_before"] = filters["created_before"]
+    if not conditions:
+        raise ValueError("必须指定用户、对话 ID 列表或筛选条件")
+    return " AND ".join(conditions), params
+
+
+def _schemas() -> List[str]:
+    """主库与（启用时的）归档库表前缀"""
+
+    return ["main", ARCHIVE_SCHEMA] if archive_enabled() else ["main"]
+
+
+def _preview(db: Session, tables: List[str], id_column: str, condition: str, params: Dict) -> Dict:
+    """统计匹配数量并取前若干个 ID（试运行）"""
+
+    matched = 0
+    sample_ids: List[int] = []
+    for table in tables:
+        matched += db.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {condition}"), params).scalar()
+        sample_ids.extend(db.execute(
+            text(f"SELECT {id_column} FROM {table} WHERE {condition} ORDER BY {id_column} LIMIT :sample_size"),
+            {**params, "sample_size": PREVIEW_SAMPLE_SIZE},
+        ).scalars())
+    return {"dry_run": True, "matched": matched, "sample_ids": sorted(sample_ids)[:PREVIEW_SAMPLE_SIZE]}
+
+
+# ========== 对话 ==========
+
+def count_conversations(db: Session, filters: Dict) -> int:
+    """统计符合条件的对话数量（含归档库）"""
+
+    condition, params = _conversation_filter(filters)
+    return sum(
+        db.execute(text(f"SELECT COUNT(*) FROM {schema}.conversations c WHERE {condition}"), params).scalar()
+        for schema in _schemas()
+    )
+
+
+def preview_conversations(db: Session, filters: Dict) -> Dict:
+    """试运行批量删除对话：返回匹配的对话数量与部分对话 ID"""
+
+    condition, params = _conversation_filter(filters)
+    tables = [f"{schema}.conversations c" for schema in _schemas()]
+    return _preview(db, tables, "c.id", condition, params)
+
+
+def delete_conversations(params: Dict, report: ProgressReporter) -> Dict[str, int]:
+    """
+    分批删除对话及其消息（后台任务函数）
+
+    Args:
+        params: 对话筛选条件（见 conversation_filters），至少指定一项
+        report: 进度回调
+
+    Returns:
+        删除统计（conversations/batches）
+    """
+    condition, query_params = _conversation_filter(params)
+    batch_size = get_settings().BULK_DELETE_BATCH_SIZE
+
+    deleted = batches = 0
+    for schema in _schemas():
+        offset = deleted
+
+        def progress(task: str, stats: Dict[str, int]) -> None:
+            report(offset + stats["deleted"])
+
+        stats = run_batches(
+            task=f"{DELETE_CONVERSATIONS_JOB}_{schema}",
+            select_sql=(
+                f"SELECT c.id FROM {schema}.conversations c "
+                f"WHERE c.id > :cursor AND {condition} "
+                "ORDER BY c.id LIMIT :limit"
+            ),
+            # 归档库没有外键级联，问诊档案需显式删除
+            delete_statements=[
+                f"DELETE FROM {schema}.messages WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {schema}.patient_profile_changes WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {schema}.patient_profiles WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {schema}.conversations WHERE id IN (SELECT id FROM temp.cleanup_ids)",
+            ],
+            params=query_params,
+            batch_size=batch_size,
+            dry_run=False,
+            sleep_seconds=BATCH_SLEEP_SECONDS,
+            state_file=None,
+            progress=progress,
+        )
+        deleted += stats["deleted"]
+        batches += stats["batches"]
+
+    if deleted:
+        # 按用户删除时只通知该用户，按其他条件删除时通知所有在线用户刷新列表
+        publish_event("conversations.changed", {"deleted": deleted}, params.get("user_id"))
+
+    return {"conversations": deleted, "batches": batches}
+
+
+def start_delete_conversations_job(db: Session, user: User, filters: Dict) -> BackgroundJob:
+    """
+    创建并提交批量删除对话任务（立即返回）
+
+    Args:
+        db: 数据库会话
+        user: 发起任务的用户
+        filters: 对话筛选条件（见 conversation_filters）
+
+    Returns:
+        任务对象
+    """
+    total = count_conversations(db, filters)
+    job = create_job(db, DELETE_CONVERSATIONS_JOB, user, filters, total)
+    submit_job(job, delete_conversations)
+    return job
+
+
+# ========== 用户 ==========
+
+def _user_action_filter(action: str, filters: Dict) -> Tuple[str, Dict]:
+    """构造批量用户操作的筛选条件（封禁/解封时跳过状态已符合的用户）"""
+
+    condition, params = _user_filter(filters)
+    if action == "ban":
+        condition += " AND u.is_banned = 0"
+    elif action == "unban":
+        condition += " AND u.is_banned = 1"
+    return condition, params
+
+
+def preview_users(db: Session, action: str, filters: Dict) -> Dict:
+    """试运行批量用户操作：返回将受影响的用户数量与部分用户 ID"""
+
+    condition, params = _user_action_filter(action, filters)
+    return _preview(db, ["main.users u"], "u.id", condition, params)
+
+
+def _run_user_batches(
+    action: str,
+    filters: Dict,
+    statements: List[str],
+    report: ProgressReporter,
+) -> Dict[str, int]:
+    condition, query_params = _user_action_filter(action, filters)
+
+    def progress(task: str, stats: Dict[str, int]) -> None:
+        report(stats["deleted"])
+
+    stats = run_batches(
+        task=f"{action}_users",
+        select_sql=(
+            "SELECT u.id FROM main.users u "
+            f"WHERE u.id > :cursor AND {condition} "
+            "ORDER BY u.id LIMIT :limit"
+        ),
+        delete_statements=statements,
+        params=query_params,
+        batch_size=get_settings().BULK_USER_BATCH_SIZE,
+        dry_run=False,
+        sleep_seconds=BATCH_SLEEP_SECONDS,
+        state_file=None,
+        progress=progress,
+    )
+    return {"users": stats["deleted"], "batches": stats["batches"]}
+
+
+def ban_users(params: Dict, report: ProgressReporter) -> Dict[str, int]:
+    """分批封禁用户（后台任务函数）"""
+
+    return _run_user_batches(
+        "ban",
+        params,
+        ["UPDATE main.users SET is_banned = 1 WHERE id IN (SELECT id FROM temp.cleanup_ids)"],
+        report,
+    )
+
+
+def unban_users(params: Dict, report: ProgressReporter) -> Dict[str, int]:
+    """分批解封用户（后台任务函数）"""
+
+    return _run_user_batches(
+        "unban",
+        params,
+        ["UPDATE main.users SET is_banned = 0 WHERE id IN (SELECT id FROM temp.cleanup_ids)"],
+        report,
+    )
+
+
+def delete_users(params: Dict, report: ProgressReporter) -> Dict[str, int]:
+    """
+    分批删除用户及其全部对话与消息（后台任务函数）
+
+    每批用户的消息、对话（含归档库）与用户记录在同一个短事务内删除；
+    归档库与主库之间没有外键，需显式清理
+    """
+    user_conversations = "SELECT id FROM {schema}.conversations WHERE user_id IN (SELECT id FROM temp.cleanup_ids)"
+    statements = []
+    for schema in reversed(_schemas()):
+        statements += [
+            f"DELETE FROM {schema}.messages WHERE conversation_id IN ({user_conversations.format(schema=schema)})",
+            f"DELETE FROM {schema}.patient_profile_changes "
+            f"WHERE conversation_id IN ({user_conversations.format(schema=schema)})",
+            f"DELETE FROM {schema}.patient_profiles WHERE conversation_id IN ({user_conversations.format(schema=schema)})",
+            f"DELETE FROM {schema}.conversations WHERE user_id IN (SELECT id FROM temp.cleanup_ids)",
+        ]
+    statements.append("DELETE FROM main.users WHERE id IN (SELECT id FROM temp.cleanup_ids)")
+    return _run_user_batches("delete", params, statements, report)
+
+
+USER_JOBS: Dict[str, Tuple[str, JobFunc]] = {
+    "ban": (BAN_USERS_JOB, ban_users),
+    "unban": (UNBAN_USERS_JOB, unban_users),
+    "delete": (DELETE_USERS_JOB, delete_users),
+}
+
+
+def start_user_bulk_job(db: Session, user: User, action: str, filters: Dict) -> BackgroundJob:
+    """
+    创建并提交批量用户操作任务（立即返回）
+
+    Args:
+        db: 数据库会话
+        user: 发起任务的管理员
+        action: 操作（ban/unban/delete）
+        filters: 用户筛选条件（见 user_filters）
+
+    Returns:
+        任务对象
+    """
+    kind, func = USER_JOBS[action]
+    total = preview_users(db, action, filters)["matched"]
+    job = create_job(db, kind, user, filters, total)
+    submit_job(job, func)
+    return job
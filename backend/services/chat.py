@@ -1,14 +1,27 @@
 """
 对话管理服务模块
 """
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from core.tracing import traced
 from models.conversation import Conversation
 from models.message import Message
 from models.user import User
+from services.archive import (
+    delete_archived_conversation,
+    get_archived_conversation,
+    get_archived_conversations_version,
+    get_archived_messages,
+    get_archived_messages_since,
+    get_archived_messages_version,
+    get_archived_user_conversations,
+)
+from services.events import emit_event
 
 
+@traced()
 def create_conversation(db: Session, user: User, title: str) -> Conversation:
     """
     创建新对话
@@ -28,12 +41,15 @@ def create_conversation(db: Session, user: User, title: str) -> Conversation:
     )
     
     db.add(conversation)
+    db.flush()
+    emit_event(db, "conversation.created", {"conversation_id": conversation.id}, user.id)
     db.commit()
     db.refresh(conversation)
     
     return conversation
 
 
+@traced()
 def get_user_conversations(db: Session, user: User) -> List[Conversation]:
     """
     获取用户的所有对话
@@ -49,10 +65,44 @@ def get_user_conversations(db: Session, user: User) -> List[Conversation]:
         .filter(Conversation.user_id == user.id)\
         .order_by(Conversation.created_at.desc())\
         .all()
+
+    # 合并归档对话
+    archived = get_archived_user_conversations(db, user.id)
+    if archived:
+        conversations = sorted(
+            conversations + archived,
+            key=lambda conversation: conversation.created_at,
+            reverse=True,
+        )
     
     return conversations
 
 
+@traced()
+def get_user_conversations_version(db: Session, user: User) -> Tuple:
+    """
+    用户对话列表的版本标记
+    
+    只通过 user_id 索引做聚合（数量、最大 ID、有效对话数），无需加载对话内容；
+    新建、删除、归档以及模型切换导致的失效都会改变标记
+    
+    Args:
+        db: 数据库会话
+        user: 用户对象
+        
+    Returns:
+        版本标记元组
+    """
+    count, max_id, active = db.query(
+        func.count(Conversation.id),
+        func.max(Conversation.id),
+        func.sum(Conversation.is_active),
+    ).filter(Conversation.user_id == user.id).one()
+
+    return (count, max_id, active or 0, *get_archived_conversations_version(db, user.id))
+
+
+@traced()
 def get_conversation_by_id(db: Session, conversation_id: int, user: User) -> Conversation:
     """
     根据 ID 获取对话
@@ -63,7 +113,7 @@ def get_conversation_by_id(db: Session, conversation_id: int, user: User) -> Con
         user: 用户对象
         
     Returns:
-        对话对象
+        对话对象（主库中不存在时回退到归档库）
         
     Raises:
         HTTPException: 对话不存在或无权访问
@@ -71,6 +121,9 @@ def get_conversation_by_id(db: Session, conversation_id: int, user: User) -> Con
     conversation = db.query(Conversation)\
         .filter(Conversation.id == conversation_id)\
         .first()
+
+    if not conversation:
+        conversation = get_archived_conversation(db, conversation_id)
     
     if not conversation:
         raise HTTPException(
@@ -87,6 +140,7 @@ def get_conversation_by_id(db: Session, conversation_id: int, user: User) -> Con
     return conversation
 
 
+@traced()
 def get_conversation_messages(db: Session, conversation_id: int, user: User) -> List[Message]:
     """
     获取对话的所有消息
@@ -101,6 +155,23 @@ def get_conversation_messages(db: Session, conversation_id: int, user: User) ->
     """
     # 先验证对话权限
     conversation = get_conversation_by_id(db, conversation_id, user)
+    return list_conversation_messages(db, conversation)
+
+
+@traced()
+def list_conversation_messages(db: Session, conversation: Conversation) -> List[Message]:
+    """
+    获取已校验权限的对话的所有消息（调用方已取得对话对象时使用，避免重复查询对话）
+    
+    Args:
+        db: 数据库会话
+        conversation: 对话对象（主库或归档库）
+        
+    Returns:
+        消息列表
+    """
+    if conversation.is_archived:
+        return get_archived_messages(db, conversation.id)
     
     messages = db.query(Message)\
         .filter(Message.conversation_id == conversation.id)\
@@ -110,7 +181,123 @@ def get_conversation_messages(db: Session, conversation_id: int, user: User) ->
     return messages
 
 
-def create_message(db: Session, conversation_id: int, role: str, content: str) -> Message:
+def _message_stats(db: Session, conversation: Conversation, up_to_id: Optional[int] = None) -> Tuple[int, Optional[int]]:
+    """通过 conversation_id 索引统计消息数量与最大 ID，可只统计 ID 不超过 up_to_id 的消息"""
+
+    if conversation.is_archived:
+        return get_archived_messages_version(db, conversation.id, up_to_id)
+
+    query = db.query(func.count(Message.id), func.max(Message.id))\
+        .filter(Message.conversation_id == conversation.id)
+    if up_to_id is not None:
+        query = query.filter(Message.id <= up_to_id)
+    count, max_id = query.one()
+    return count, max_id
+
+
+@traced()
+def get_conversation_messages_version(db: Session, conversation: Conversation) -> Tuple:
+    """
+    对话消息列表的版本标记（是否归档、消息数量、最后一条消息 ID）
+    
+    消息写入后不会修改，通过 conversation_id 索引即可得到，无需加载消息内容
+    
+    Args:
+        db: 数据库会话
+        conversation: 已校验权限的对话对象
+        
+    Returns:
+        版本标记元组
+    """
+    return (conversation.is_archived, *_message_stats(db, conversation))
+
+
+@traced()
+def get_latest_message_info(db: Session, conversation_id: int, user: User) -> Dict[str, object]:
+    """
+    探测对话的最新消息（不加载消息内容）
+    
+    Args:
+        db: 数据库会话
+        conversation_id: 对话 ID
+        user: 用户对象
+        
+    Returns:
+        最后一条消息 ID、消息总数及是否归档
+    """
+    conversation = get_conversation_by_id(db, conversation_id, user)
+    count, latest_id = _message_stats(db, conversation)
+    return {"latest_id": latest_id, "count": count, "is_archived": conversation.is_archived}
+
+
+@traced()
+def sync_conversation_messages(
+    db: Session,
+    conversation_id: int,
+    user: User,
+    after_id: int = 0,
+    known_count: Optional[int] = None,
+    limit: int = 200,
+    archived: bool = False,
+) -> Dict[str, object]:
+    """
+    增量同步对话消息
+    
+    客户端保存已同步的最后一条消息 ID（游标）及本地消息数量，只拉取 ID 大于游标的新消息；
+    以下情况返回 reset 并从头开始同步：
+    - 对话已归档而游标是归档前取得的（归档时消息 ID 重新分配）
+    - 游标不是该对话中的消息 ID
+    - 游标之前的消息数量与本地不一致（消息被删除或截断）
+    
+    Args:
+        db: 数据库会话
+        conversation_id: 对话 ID
+        user: 用户对象
+        after_id: 游标（本地最后一条消息的 ID），0 表示全量同步
+        known_count: 本地已缓存的消息数量（可选，用于检测删除/截断）
+        limit: 单次返回的最大消息数
+        archived: 游标是否取自已归档的对话（即上次同步返回的 is_archived）
+        
+    Returns:
+        新消息列表及同步状态
+    """
+    conversation = get_conversation_by_id(db, conversation_id, user)
+    count, latest_id = _message_stats(db, conversation)
+
+    reset = False
+    if after_id > 0:
+        if conversation.is_archived and not archived:
+            reset = True
+        else:
+            # 游标之前的最大 ID 即游标本身时，游标才是该对话中的消息
+            known, cursor_id = _message_stats(db, conversation, up_to_id=after_id)
+            reset = cursor_id != after_id or (known_count is not None and known != known_count)
+    if reset:
+        after_id = 0
+
+    if conversation.is_archived:
+        messages = get_archived_messages_since(db, conversation.id, after_id, limit + 1)
+    else:
+        messages = db.query(Message)\
+            .filter(Message.conversation_id == conversation.id, Message.id > after_id)\
+            .order_by(Message.id.asc())\
+            .limit(limit + 1)\
+            .all()
+
+    return {
+        "messages": messages[:limit],
+        "latest_id": latest_id,
+        "count": count,
+        "is_archived": conversation.is_archived,
+        "has_more": len(messages) > limit,
+        "reset": reset,
+    }
+
+
+@traced()
+def create_message(
+    db: Session, conversation_id: int, role: str, content: str, user_id: Optional[int] = None
+) -> Message:
     """
     创建新消息
     
@@ -119,6 +306,7 @@ def create_message(db: Session, conversation_id: int, role: str, content: str) -
         conversation_id: 对话 ID
         role: 角色 (user/assistant)
         content: 消息内容
+        user_id: 对话所属用户，指定时向该用户的其他设备推送新消息事件
         
     Returns:
         创建的消息对象
@@ -130,12 +318,15 @@ def create_message(db: Session, conversation_id: int, role: str, content: str) -
     )
     
     db.add(message)
+    if user_id is not None:
+        emit_event(db, "message.created", {"conversation_id": conversation_id, "role": role}, user_id)
     db.commit()
     db.refresh(message)
     
     return message
 
 
+@traced()
 def delete_conversation(db: Session, conversation_id: int, user: User) -> None:
     """
     删除对话
@@ -147,6 +338,13 @@ def delete_conversation(db: Session, conversation_id: int, user: User) -> None:
     """
     conversation = get_conversation_by_id(db, conversation_id, user)
 
+    emit_event(db, "conversation.deleted", {"conversation_id": conversation_id}, user.id)
+
+    if conversation.is_archived:
+        delete_archived_conversation(db, conversation_id)
+        db.commit()
+        return
+
     # 显式删除所有关联的消息（确保即使外键约束未生效也能正确删除）
     db.query(Message)\
         .filter(Message.conversation_id == conversation_id)\
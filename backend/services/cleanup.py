@@ -0,0 +1,226 @@
+"""
+数据清理服务模块
+以有界批次、短事务的方式清理孤立消息并执行对话保留策略
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+from core.config import get_settings
+from core.database import ARCHIVE_SCHEMA, archive_enabled, engine
+
+ProgressCallback = Callable[[str, Dict[str, int]], None]
+
+
+def _load_checkpoint(state_file: Optional[str]) -> Dict[str, int]:
+    """读取断点（上次处理到的 ID）"""
+
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoint(state_file: Optional[str], checkpoint: Dict[str, int]) -> None:
+    """保存断点"""
+
+    if not state_file:
+        return
+    with open(state_file, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+
+
+def run_batches(
+    task: str,
+    select_sql: str,
+    delete_statements,
+    params: Dict,
+    batch_size: int,
+    dry_run: bool,
+    sleep_seconds: float,
+    state_file: Optional[str],
+    progress: Optional[ProgressCallback],
+) -> Dict[str, int]:
+    """
+    按 ID 游标分批执行删除
+
+    select_sql 需返回按 id 升序、id 大于 :cursor 的至多 :limit 个目标 ID；
+    每批 ID 通过临时表传给 delete_statements，在同一个短事务内完成。
+    """
+    checkpoint = _load_checkpoint(state_file)
+    cursor = 0 if dry_run else checkpoint.get(task, 0)
+    stats = {"matched": 0, "deleted": 0, "batches": 0, "cursor": cursor}
+
+    while True:
+        with engine.begin() as conn:
+            ids = [
+                row[0] for row in conn.execute(
+                    text(select_sql),
+                    {**params, "cursor": cursor, "limit": batch_size},
+                )
+            ]
+            if not ids:
+                break
+
+            if not dry_run:
+                conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS cleanup_ids (id INTEGER PRIMARY KEY)"))
+                conn.execute(text("DELETE FROM cleanup_ids"))
+                conn.execute(text("INSERT INTO cleanup_ids (id) VALUES (:id)"), [{"id": i} for i in ids])
+                results = [conn.execute(text(statement)) for statement in delete_statements]
+                # 以最后一条语句（目标表本身）的影响行数计为删除数
+                stats["deleted"] += max(results[-1].rowcount, 0)
+
+        cursor = ids[-1]
+        stats["matched"] += len(ids)
+        stats["batches"] += 1
+        stats["cursor"] = cursor
+
+        if not dry_run:
+            checkpoint[task] = cursor
+            _save_checkpoint(state_file, checkpoint)
+
+        if progress:
+            progress(task, dict(stats))
+
+        # 批次之间让出写锁，避免阻塞在线写入
+        if sleep_seconds > 0:
+            time.sleep(sleep_seconds)
+
+    if not dry_run and task in checkpoint:
+        # 本轮已完成，下次从头扫描
+        checkpoint.pop(task)
+        _save_checkpoint(state_file, checkpoint)
+
+    return stats
+
+
+def purge_orphaned_messages(
+    batch_size: int = 1000,
+    dry_run: bool = False,
+    sleep_seconds: float = 0.05,
+    state_file: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    分批删除孤立消息（所属对话已不存在）
+
+    Returns:
+        统计信息（matched/deleted/batches/cursor）
+    """
+    return run_batches(
+        task="orphaned_messages",
+        select_sql=(
+            "SELECT m.id FROM messages m "
+            "WHERE m.id > :cursor "
+            "AND NOT EXISTS (SELECT 1 FROM conversations c WHERE c.id = m.conversation_id) "
+            "ORDER BY m.id LIMIT :limit"
+        ),
+        delete_statements=[
+            "DELETE FROM messages WHERE id IN (SELECT id FROM temp.cleanup_ids)",
+        ],
+        params={},
+        batch_size=batch_size,
+        dry_run=dry_run,
+        sleep_seconds=sleep_seconds,
+        state_file=state_file,
+        progress=progress,
+    )
+
+
+def purge_expired_conversations(
+    retention_days: Optional[int] = None,
+    batch_size: int = 200,
+    dry_run: bool = False,
+    sleep_seconds: float = 0.05,
+    state_file: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, int]:
+    """
+    按保留策略分批删除长期无新消息的对话（含归档库）
+
+    Args:
+        retention_days: 保留天数，默认读取 RETENTION_DAYS，0 表示不清理
+
+    Returns:
+        统计信息（matched/deleted/batches/cursor），归档库的统计以 archived_ 为前缀
+    """
+    if retention_days is None:
+        retention_days = get_settings().RETENTION_DAYS
+    if retention_days <= 0:
+        return {"matched": 0, "deleted": 0, "batches": 0, "cursor": 0}
+
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+    options = dict(
+        batch_size=batch_size,
+        dry_run=dry_run,
+        sleep_seconds=sleep_seconds,
+        state_file=state_file,
+        progress=progress,
+    )
+
+    # 最后一条消息通过 conversation_id 索引按 id 倒序一次定位
+    stats = run_batches(
+        task="expired_conversations",
+        select_sql=(
+            "SELECT c.id FROM conversations c "
+            "WHERE c.id > :cursor AND COALESCE("
+            "(SELECT m.created_at FROM messages m WHERE m.conversation_id = c.id "
+            "ORDER BY m.id DESC LIMIT 1), c.created_at) < :cutoff "
+            "ORDER BY c.id LIMIT :limit"
+        ),
+        delete_statements=[
+            "DELETE FROM messages WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+            "DELETE FROM conversations WHERE id IN (SELECT id FROM temp.cleanup_ids)",
+        ],
+        params={"cutoff": cutoff},
+        **options,
+    )
+
+    if archive_enabled():
+        archived = run_batches(
+            task="expired_archived_conversations",
+            select_sql=(
+                f"SELECT c.id FROM {ARCHIVE_SCHEMA}.conversations c "
+                "WHERE c.id > :cursor AND COALESCE("
+                f"(SELECT m.created_at FROM {ARCHIVE_SCHEMA}.messages m WHERE m.conversation_id = c.id "
+                "ORDER BY m.id DESC LIMIT 1), c.created_at) < :cutoff "
+                "ORDER BY c.id LIMIT :limit"
+            ),
+            delete_statements=[
+                f"DELETE FROM {ARCHIVE_SCHEMA}.messages WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {ARCHIVE_SCHEMA}.patient_profile_changes "
+                "WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {ARCHIVE_SCHEMA}.patient_profiles WHERE conversation_id IN (SELECT id FROM temp.cleanup_ids)",
+                f"DELETE FROM {ARCHIVE_SCHEMA}.conversations WHERE id IN (SELECT id FROM temp.cleanup_ids)",
+            ],
+            params={"cutoff": cutoff},
+            **options,
+        )
+        stats.update({f"archived_{key}": value for key, value in archived.items()})
+
+    return stats
+
+
+def run_cleanup(
+    dry_run: bool = False,
+    batch_size: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    执行完整的清理流程（孤立消息 + 保留策略）
+
+    供应用内定时任务调用，批次大小默认读取 CLEANUP_BATCH_SIZE
+    """
+    if batch_size is None:
+        batch_size = get_settings().CLEANUP_BATCH_SIZE
+
+    return {
+        "orphaned_messages": purge_orphaned_messages(batch_size=batch_size, dry_run=dry_run, progress=progress),
+        "expired_conversations": purge_expired_conversations(
+            batch_size=max(batch_size // 5, 1), dry_run=dry_run, progress=progress
+        ),
+    }
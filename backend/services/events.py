@@ -0,0 +1,180 @@
+"""
+推送事件服务模块
+业务代码通过 emit_event 记录事件：事务提交后立即推送给本进程的连接，
+同时写入事件日志，由其他 worker 的 EventRelay 轮询转发给各自的连接
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import event as sa_event
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import SessionLocal, engine
+from core.events import broker
+from models.event import Event
+
+logger = logging.getLogger(__name__)
+
+# 本进程标识（进程号可能在 worker 回收后被复用，附加随机后缀）
+PROCESS_TOKEN = f"{os.getpid()}-{os.urandom(4).hex()}"
+
+# 单次转发的最大事件数
+RELAY_BATCH_SIZE = 500
+
+
+def emit_event(db: Session, event_type: str, data: Dict[str, object], user_id: Optional[int] = None) -> None:
+    """
+    记录推送事件（随调用方的事务一起提交，回滚时不推送）
+
+    Args:
+        db: 数据库会话
+        event_type: 事件类型
+        data: 事件数据（可 JSON 序列化）
+        user_id: 接收用户，为空表示广播给所有用户
+    """
+    if not get_settings().EVENTS_ENABLED:
+        return
+
+    db.add(Event(
+        user_id=user_id,
+        type=event_type,
+        data=json.dumps(data, ensure_ascii=False),
+        origin=PROCESS_TOKEN,
+    ))
+    db.info.setdefault("pending_events", []).append(({"type": event_type, "data": data}, user_id))
+
+
+@sa_event.listens_for(SessionLocal, "after_commit")
+def _publish_committed_events(session: Session) -> None:
+    for payload, user_id in session.info.pop("pending_events", []):
+        broker.publish(payload, user_id)
+
+
+@sa_event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_events(session: Session) -> None:
+    session.info.pop("pending_events", None)
+
+
+def publish_event(event_type: str, data: Dict[str, object], user_id: Optional[int] = None) -> None:
+    """在独立事务中记录并推送事件（供不持有会话的后台任务使用）"""
+
+    db = SessionLocal()
+    try:
+        emit_event(db, event_type, data, user_id)
+        db.commit()
+    finally:
+        db.close()
+
+
+def migrate_events_table() -> bool:
+    """
+    将旧版事件表重建为 AUTOINCREMENT 表（保留现有事件）
+
+    旧表的 ID 可被复用：空闲超过保留时间后事件全部被清理，新事件的 ID 从 1 重新开始，
+    各 worker 持有的转发游标大于新 ID，会一直跳过其他 worker 的事件
+
+    Returns:
+        是否执行了迁移
+    """
+    table = Event.__table__
+    with engine.begin() as conn:
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": table.name},
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            return False
+
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_legacy"))
+        table.create(conn)
+        columns = ", ".join(column.name for column in table.columns)
+        # 保留原 ID，AUTOINCREMENT 计数从现有最大 ID 继续
+        conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_legacy"))
+        conn.execute(text(f"DROP TABLE {table.name}_legacy"))
+    return True
+
+
+def prune_events(retention_minutes: Optional[float] = None) -> Dict[str, int]:
+    """删除超过保留时间的事件日志（定时任务）"""
+
+    if retention_minutes is None:
+        retention_minutes = get_settings().EVENTS_RETENTION_MINUTES
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=retention_minutes)
+
+    db = SessionLocal()
+    try:
+        deleted = db.query(Event)\
+            .filter(Event.created_at < cutoff.replace(tzinfo=None))\
+            .delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return {"deleted": deleted}
+
+
+class EventRelay:
+    """轮询事件日志，把其他 worker 产生的事件转发给本进程的连接"""
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+
+    def _latest_id(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(func.max(Event.id)).scalar() or 0
+        finally:
+            db.close()
+
+    def _poll(self) -> None:
+        db = SessionLocal()
+        try:
+            if not broker.connection_count:
+                # 没有连接时只推进游标，不读取事件内容
+                self._last_id = db.query(func.max(Event.id)).scalar() or self._last_id
+                return
+
+            rows = db.query(Event.id, Event.user_id, Event.type, Event.data, Event.origin)\
+                .filter(Event.id > self._last_id)\
+                .order_by(Event.id.asc())\
+                .limit(RELAY_BATCH_SIZE)\
+                .all()
+        finally:
+            db.close()
+
+        for row in rows:
+            self._last_id = row.id
+            if row.origin != PROCESS_TOKEN:
+                broker.publish({"type": row.type, "data": json.loads(row.data)}, row.user_id)
+
+    async def _run_forever(self, interval: float) -> None:
+        self._last_id = await asyncio.to_thread(self._latest_id)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self._poll)
+            except Exception:  # noqa: BLE001
+                logger.exception("转发推送事件失败")
+
+    def start(self, interval: float) -> None:
+        """在当前事件循环中启动轮询"""
+
+        self._task = asyncio.create_task(self._run_forever(interval), name="events:relay")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+event_relay = EventRelay()
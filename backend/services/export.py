@@ -0,0 +1,126 @@
+"""
+对话导出服务模块
+以 NDJSON 流式导出用户的全部对话（含问诊档案）与消息：一次有序查询、分批读取游标，内存占用与历史记录多少无关
+"""
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from sqlalchemy import false, literal_column, select, true, union_all
+from sqlalchemy.orm import Session
+
+from core.database import archive_enabled
+from core.serialization import dumps
+from models.archive import ArchivedConversation, ArchivedMessage, ArchivedPatientProfile
+from models.conversation import Conversation
+from models.message import Message
+from models.profile import PatientProfile
+from models.user import User
+
+EXPORT_FORMAT_VERSION = 1
+
+# 每次从游标读取的行数
+FETCH_SIZE = 500
+# 累积到该字节数后再输出一个分片，减少分片数量
+CHUNK_SIZE = 64 * 1024
+
+
+def _export_query(user_id: int, after_id: int):
+    """主库与归档库的对话-档案-消息连接查询，按对话 ID、消息 ID 排序"""
+
+    def rows(conversation_model, profile_model, message_model, archived):
+        return select(
+            conversation_model.id.label("conversation_id"),
+            conversation_model.title.label("title"),
+            conversation_model.is_active.label("is_active"),
+            conversation_model.created_at.label("conversation_created_at"),
+            (true() if archived else false()).label("is_archived"),
+            profile_model.data.label("profile"),
+            message_model.id.label("message_id"),
+            message_model.role.label("role"),
+            message_model.content.label("content"),
+            message_model.created_at.label("message_created_at"),
+        ).outerjoin(
+            profile_model, profile_model.conversation_id == conversation_model.id
+        ).outerjoin(
+            message_model, message_model.conversation_id == conversation_model.id
+        ).where(
+            conversation_model.user_id == user_id,
+            conversation_model.id > after_id,
+        )
+
+    query = rows(Conversation, PatientProfile, Message, False)
+    if archive_enabled():
+        query = union_all(query, rows(ArchivedConversation, ArchivedPatientProfile, ArchivedMessage, True))
+    return query.order_by(literal_column("conversation_id"), literal_column("message_id"))
+
+
+def iter_user_export(db: Session, user: User, after_id: Optional[int] = None) -> Iterator[bytes]:
+    """
+    逐块生成用户对话的 NDJSON 导出内容
+
+    每行一条记录：首行为 export 头，随后每个对话一行 conversation（含问诊档案），紧跟其消息的 message 行，
+    末行为 end（包含统计与最后一个对话 ID）。下载中断时可用最后一个完整对话的 ID 作为
+    after_id 续传
+
+    Args:
+        db: 数据库会话
+        user: 用户对象
+        after_id: 只导出 ID 大于该值的对话
+
+    Yields:
+        UTF-8 编码的 NDJSON 分片
+    """
+    buffer = bytearray()
+
+    def write(record) -> None:
+        buffer.extend(dumps(record))
+        buffer.extend(b"\n")
+
+    write({
+        "type": "export",
+        "version": EXPORT_FORMAT_VERSION,
+        "user_id": user.id,
+        "exported_at": datetime.now(timezone.utc),
+        "after_id": after_id,
+    })
+
+    conversations = messages = 0
+    current_id = None
+    result = db.execute(_export_query(user.id, after_id or 0).execution_options(yield_per=FETCH_SIZE))
+    for row in result:
+        if row.conversation_id != current_id:
+            current_id = row.conversation_id
+            conversations += 1
+            write({
+                "type": "conversation",
+                "id": row.conversation_id,
+                "title": row.title,
+                "is_active": bool(row.is_active),
+                "is_archived": bool(row.is_archived),
+                "created_at": row.conversation_created_at,
+                "profile": json.loads(row.profile) if row.profile else None,
+            })
+
+        if row.message_id is not None:
+            messages += 1
+            write({
+                "type": "message",
+                "id": row.message_id,
+                "conversation_id": row.conversation_id,
+                "role": row.role,
+                "content": row.content,
+                "created_at": row.message_created_at,
+            })
+
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    write({
+        "type": "end",
+        "conversations": conversations,
+        "messages": messages,
+        "last_conversation_id": current_id,
+    })
+    yield bytes(buffer)
@@ -0,0 +1,197 @@
+"""
+后台任务服务模块
+任务记录保存在数据库中（任意 worker 均可查询进度），任务本身在单线程执行器中依次运行，
+避免多个批量写入任务同时争用 SQLite 写锁。执行器在进程内，worker 重启时未完成的任务
+随进程丢失，由重新启动的 worker 标记为失败
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, engine
+from models.job import BackgroundJob
+from models.user import User
+from services.events import PROCESS_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# 进度回调：参数为已处理数量
+ProgressReporter = Callable[[int], None]
+JobFunc = Callable[[Dict, ProgressReporter], Dict]
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background-job")
+
+
+def create_job(db: Session, kind: str, user: User, params: Dict, total: int) -> BackgroundJob:
+    """
+    创建任务记录
+
+    Args:
+        db: 数据库会话
+        kind: 任务类型
+        user: 发起任务的用户
+        params: 任务参数（可 JSON 序列化）
+        total: 预计处理的数量
+
+    Returns:
+        任务对象
+    """
+    job = BackgroundJob(
+        kind=kind,
+        user_id=user.id,
+        status="pending",
+        total=total,
+        params=json.dumps(params, ensure_ascii=False),
+        owner=PROCESS_TOKEN,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int, user: User) -> BackgroundJob:
+    """
+    获取任务（管理员可查看所有任务，普通用户只能查看自己发起的任务）
+
+    Raises:
+        HTTPException: 任务不存在或无权访问
+    """
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+
+    if not job or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在"
+        )
+
+    return job
+
+
+def _update_job(job_id: int, **values) -> None:
+    """在独立的短事务中更新任务状态"""
+
+    db = SessionLocal()
+    try:
+        db.query(BackgroundJob).filter(BackgroundJob.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run(job_id: int, params: Dict, func: JobFunc) -> None:
+    _update_job(job_id, status="running", started_at=datetime.now(timezone.utc))
+
+    def report(processed: int) -> None:
+        _update_job(job_id, processed=processed)
+
+    try:
+        result = func(params, report)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("后台任务 %d 执行失败", job_id)
+        _update_job(job_id, status="failed", error=str(exc), finished_at=datetime.now(timezone.utc))
+        return
+
+    _update_job(
+        job_id,
+        status="succeeded",
+        result=json.dumps(result, ensure_ascii=False),
+        finished_at=datetime.now(timezone.utc),
+    )
+
+
+def submit_job(job: BackgroundJob, func: JobFunc) -> None:
+    """
+    提交任务到后台执行器（立即返回）
+
+    Args:
+        job: 已创建的任务记录
+        func: 任务函数，接收任务参数与进度回调，返回结果字典
+    """
+    _executor.submit(_run, job.id, json.loads(job.params), func)
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """任务所属进程是否仍在运行（进程标识格式为 "<pid>-<随机串>"）"""
+
+    if not owner or owner == PROCESS_TOKEN:
+        # 本进程刚启动，执行器中还没有任何任务
+        return False
+    pid = owner.split("-", 1)[0]
+    if not pid.isdigit() or int(pid) == os.getpid():
+        # 与本进程 PID 相同但随机串不同：容器重启后 PID 被复用
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def fail_orphaned_jobs() -> int:
+    """
+    将所属进程已退出的未完成任务标记为失败（worker 启动时调用）
+
+    Returns:
+        标记的任务数量
+    """
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(BackgroundJob)
+            .filter(BackgroundJob.status.in_(("pending", "running")))
+            .all()
+        )
+        orphaned = [job for job in jobs if not _owner_alive(job.owner)]
+        for job in orphaned:
+            job.status = "failed"
+            job.error = "服务重启，任务已中断"
+            job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+    finally:
+        db.close()
+
+    if orphaned:
+        logger.warning("%d 个后台任务因服务重启中断", len(orphaned))
+    return len(orphaned)
+
+
+def migrate_jobs_table() -> bool:
+    """
+    为已有的任务表补充 owner 列
+
+    Returns:
+        是否执行了迁移
+    """
+    with engine.begin() as conn:
+        columns = {column["name"] for column in inspect(conn).get_columns(BackgroundJob.__tablename__)}
+        if "owner" in columns:
+            return False
+        conn.execute(text(f"ALTER TABLE {BackgroundJob.__tablename__} ADD COLUMN owner VARCHAR"))
+    return True
+
+
+def job_to_dict(job: BackgroundJob) -> Dict[str, Optional[object]]:
+    """转换为响应数据（解析 JSON 字段）"""
+
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,375 @@
+"""
+中医知识库服务模块
+加载“疾病 → 证型 → 症状”数据（内置数据来自《问诊档案设计方案.md》，可通过 KNOWLEDGE_BASE_FILES 追加），
+启动时一次性构建索引：名称/别名/英文名/拼音的精确查找表、症状 → 证型倒排索引、
+按前缀排序的自动补全键表（短前缀的结果预先算好），查询时不再遍历数据
+"""
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+from core.config import get_settings
+
+try:  # pypinyin 为可选依赖：uv sync --extra pinyin
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # pragma: no cover - 未安装时只索引数据文件中提供的拼音
+    lazy_pinyin = None
+
+BUILTIN_DATA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tcm_knowledge.json")
+
+KINDS = ("disease", "syndrome", "symptom")
+MAX_SUGGESTIONS = 50
+HOT_RANGE_SIZE = 256  # 匹配的键超过该数量的前缀预先计算补全结果，其余在查询时排序
+_MAX_CHAR = chr(0x10FFFF)
+SYMPTOM_WEIGHTS = {"tcm": 2, "western": 1}  # 与前端证型推断一致：中医症状权重更高
+
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿]")
+_PAREN_RE = re.compile(r"^(.+?)[（(](.+?)[）)]$")
+_KEY_STRIP_RE = re.compile(r"[\s·'’\-]")
+
+
+def normalize_key(text: str) -> str:
+    """查找键：全角转半角、转小写、去除空白与连接符"""
+
+    return _KEY_STRIP_RE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def _variants(text: str) -> List[str]:
+    """名称及其括号内外的部分（如“肺热津伤型（上消）”也可通过“上消”查找）"""
+
+    match = _PAREN_RE.match(text.strip())
+    return [text, match.group(1), match.group(2)] if match else [text]
+
+
+@dataclass(frozen=True)
+class Term:
+    """知识库条目（疾病、证型或症状）"""
+
+    kind: str
+    id: str  # 症状以名称作为 ID
+    name: str
+    name_en: Optional[str] = None
+    disease_id: Optional[str] = None  # 证型所属疾病
+
+    @property
+    def rank(self) -> Tuple[int, int, str, str]:
+        """补全结果排序：疾病、证型、症状依次在前，名称短的在前"""
+
+        return KINDS.index(self.kind), len(self.name), self.name, self.id
+
+
+def _read_data_files(paths: Sequence[str]) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """读取并合并数据文件（同 ID 的疾病以后读取的为准）"""
+
+    diseases: Dict[str, Dict] = {}
+    pinyin: Dict[str, List[str]] = defaultdict(list)
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for disease in data.get("diseases", []):
+            diseases[disease["id"]] = disease
+        # 可选的拼音表 {"名称": "pinyin" 或 ["全拼", "首字母"]}，用于未安装 pypinyin 或需要校正读音时
+        for term, values in (data.get("pinyin") or {}).items():
+            pinyin[term].extend([values] if isinstance(values, str) else values)
+    return list(diseases.values()), pinyin
+
+
+class KnowledgeBase:
+    """构建完成后只读，可在多个线程中并发查询"""
+
+    def __init__(self, diseases: List[Dict], pinyin: Dict[str, List[str]]):
+        self.diseases = diseases
+        self.terms: List[Term] = []
+        self._term_ids: Dict[Tuple[str, str], int] = {}
+        self._exact: Dict[str, List[Tuple[int, str]]] = defaultdict(list)  # 查找键 -> [(条目序号, 匹配的原文)]
+        self._symptom_types: Dict[str, set] = defaultdict(set)
+        # 症状 -> [(证型 ID, 权重)]
+        self.symptom_syndromes: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.disease_symptoms: Dict[str, List[str]] = {}
+        self._pinyin = pinyin
+        entries: List[Tuple[str, int, str]] = []  # (查找键, 条目序号, 匹配的原文)
+
+        for disease in diseases:
+            disease_index = self._add_term(Term("disease", disease["id"], disease["name"], disease.get("name_en")))
+            self._index(entries, disease_index, [disease["name"], *disease.get("aliases", [])], disease.get("name_en"))
+            symptoms: Dict[str, None] = {}
+            for syndrome in disease.get("syndromes", []):
+                syndrome_index = self._add_term(
+                    Term("syndrome", syndrome["id"], syndrome["name"], syndrome.get("name_en"), disease["id"])
+                )
+                self._index(
+                    entries, syndrome_index, [syndrome["name"], *syndrome.get("aliases", [])], syndrome.get("name_en")
+                )
+                for symptom_type, weight in SYMPTOM_WEIGHTS.items():
+                    for symptom in syndrome.get(f"{symptom_type}_symptoms", []):
+                        key = ("symptom", symptom)
+                        if key not in self._term_ids:
+                            self._index(entries, self._add_term(Term("symptom", symptom, symptom)), [symptom])
+                        self._symptom_types[symptom].add(symptom_type)
+                        self.symptom_syndromes[symptom].append((syndrome["id"], weight))
+                        symptoms[symptom] = None
+            self.disease_symptoms[disease["id"]] = list(symptoms)
+
+        # 名称与查找键完全相同的条目排在别名、括号内外部分等其他方式匹配到的条目之前
+        # （“血压升高”不能被解析为“血压升高（收缩压/舒张压超过正常值）”）
+        for key, matches in self._exact.items():
+            matches.sort(key=lambda match: normalize_key(self.terms[match[0]].name) != key)
+        entries.sort(key=lambda entry: (entry[0], self.terms[entry[1]].rank))
+        self._keys = [entry[0] for entry in entries]
+        self._entries = [(entry[1], entry[2]) for entry in entries]
+        self._hot = self._build_hot_prefixes()
+        self.tree = self._build_tree()
+        self.version = hashlib.sha1(
+            json.dumps([diseases, pinyin, lazy_pinyin is not None], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self.tree_json = json.dumps({"version": self.version, **self.tree}, ensure_ascii=False).encode("utf-8")
+
+    def _add_term(self, term: Term) -> int:
+        self._term_ids[(term.kind, term.id)] = len(self.terms)
+        self.terms.append(term)
+        return len(self.terms) - 1
+
+    def _index(self, entries: List, index: int, names: Iterable[str], name_en: Optional[str] = None) -> None:
+        """为条目生成精确查找键与补全键（名称、别名、括号内外部分、英文名、拼音全拼与首字母）"""
+
+        sources: Dict[str, str] = {}
+        for name in names:
+            for variant in _variants(name):
+                sources.setdefault(normalize_key(variant), variant)
+                for spelled in self._spell(variant):
+                    sources.setdefault(normalize_key(spelled), variant)
+        if name_en:
+            # 英文名从每个单词开始都可以补全（“diab” → “Type 2 Diabetes”）
+            words = name_en.split()
+            for position, word in enumerate(words):
+                if word[0].isalpha():
+                    sources.setdefault(normalize_key(" ".join(words[position:])), name_en)
+
+        for key, source in sources.items():
+            if not key:
+                continue
+            self._exact[key].append((index, source))
+            entries.append((key, index, source))
+
+    def _spell(self, text: str) -> List[str]:
+        spelled = list(self._pinyin.get(text, []))
+        if lazy_pinyin is not None and _CJK_RE.search(text):
+            spelled.append("".join(lazy_pinyin(text)))
+            spelled.append("".join(lazy_pinyin(text, style=Style.FIRST_LETTER)))
+        return spelled
+
+    def _top_matches(self, start: int, end: int, kind: Optional[str], limit: int) -> List[Tuple[int, str]]:
+        """有序键表 [start, end) 范围内排序最靠前的条目"""
+
+        found: Dict[int, str] = {}
+        for index, source in self._entries[start:end]:
+            if kind is None or self.terms[index].kind == kind:
+                found.setdefault(index, source)
+        return heapq.nsmallest(limit, found.items(), key=lambda item: self.terms[item[0]].rank)
+
+    def _build_hot_prefixes(self) -> Dict[Tuple[Optional[str], str], List[Tuple[int, str]]]:
+        """
+        预先计算匹配范围较大的前缀（按类型与不限类型）的补全结果
+
+        沿有序键表逐字符向下划分（相当于只展开前缀树中较大的分支），
+        同一长度的前缀范围互不重叠，构建耗时与键数 × 展开深度成正比
+        """
+        hot: Dict[Tuple[Optional[str], str], List[Tuple[int, str]]] = {}
+        pending = [("", 0, len(self._keys))]
+        while pending:
+            prefix, start, end = pending.pop()
+            if prefix:
+                for kind in (None, *KINDS):
+                    hot[(kind, prefix)] = self._top_matches(start, end, kind, MAX_SUGGESTIONS)
+
+            position = start  # 与前缀完全相同的键排在范围最前，跳过
+            while position < end and len(self._keys[position]) == len(prefix):
+                position += 1
+            while position < end:
+                child = self._keys[position][:len(prefix) + 1]
+                child_end = bisect_left(self._keys, child + _MAX_CHAR, position, end)
+                if child_end - position > HOT_RANGE_SIZE:
+                    pending.append((child, position, child_end))
+                position = child_end
+        return hot
+
+    def _build_tree(self) -> Dict:
+        """完整的疾病树（公共接口直接返回预先序列化的结果）"""
+
+        diseases = []
+        for disease in self.diseases:
+            diseases.append({
+                "id": disease["id"],
+                "name": disease["name"],
+                "name_en": disease.get("name_en"),
+                "aliases": disease.get("aliases", []),
+                "syndromes": [
+                    {
+                        "id": syndrome["id"],
+                        "name": syndrome["name"],
+                        "name_en": syndrome.get("name_en"),
+                        "tcm_symptoms": syndrome.get("tcm_symptoms", []),
+                        "western_symptoms": syndrome.get("western_symptoms", []),
+                    }
+                    for syndrome in disease.get("syndromes", [])
+                ],
+                "symptoms": self.disease_symptoms[disease["id"]],
+            })
+        return {"diseases": diseases}
+
+    def term(self, kind: str, term_id: str) -> Optional[Term]:
+        index = self._term_ids.get((kind, term_id))
+        return self.terms[index] if index is not None else None
+
+    def term_to_dict(self, term: Term, matched: Optional[str] = None) -> Dict:
+        """条目转为接口返回的字典"""
+
+        disease = self.term("disease", term.disease_id) if term.disease_id else None
+        return {
+            "kind": term.kind,
+            "id": term.id,
+            "name": term.name,
+            "name_en": term.name_en,
+            "disease_id": term.disease_id,
+            "disease_name": disease.name if disease else None,
+            "symptom_types": sorted(self._symptom_types.get(term.id, ())) if term.kind == "symptom" else [],
+            "matched": matched if matched is not None and matched != term.name else None,
+        }
+
+    def lookup(self, query: str, kind: Optional[str] = None) -> List[Term]:
+        """按名称、别名、英文名或拼音精确查找（如“消渴”对应“2型糖尿病”），名称完全相同的条目在前"""
+
+        terms = [self.terms[index] for index, _ in self._exact.get(normalize_key(query), [])]
+        return [term for term in terms if kind is None or term.kind == kind]
+
+    def autocomplete(self, query: str, kind: Optional[str] = None, limit: int = 10) -> List[Tuple[Term, str]]:
+        """
+        前缀补全（名称、别名、英文名、拼音）
+
+        精确匹配的条目排在最前，其余按疾病、证型、症状与名称长度排序；
+        匹配范围较大的前缀直接读取预先计算的结果，其余在有序键表中二分定位匹配范围后排序
+
+        Returns:
+            [(条目, 匹配的原文), ...]
+        """
+        key = normalize_key(query)
+        if not key:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        matches: Dict[int, str] = {}
+        for index, source in self._exact.get(key, []):
+            if len(matches) >= limit:
+                break
+            if kind is None or self.terms[index].kind == kind:
+                matches.setdefault(index, source)
+
+        candidates = self._hot.get((kind, key))
+        if candidates is None:
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + _MAX_CHAR, lo=start)
+            candidates = self._top_matches(start, end, kind, limit)
+
+        for index, source in candidates:
+            if len(matches) >= limit:
+                break
+            matches.setdefault(index, source)
+        return [(self.terms[index], source) for index, source in list(matches.items())[:limit]]
+
+    def match_syndromes(
+        self, symptoms: Sequence[str], disease_ids: Sequence[str] = (), limit: int = 5
+    ) -> List[Dict]:
+        """
+        根据症状匹配证型（症状 → 证型倒排索引；中医症状计 2 分，西医症状/指标计 1 分）
+
+        Args:
+            symptoms: 症状名称（也可以是症状的拼音等查找键）
+            disease_ids: 只在这些疾病的证型中匹配，为空时不限
+            limit: 返回数量
+
+        Returns:
+            按得分降序排列的证型与匹配到的症状
+        """
+        scores: Dict[str, int] = defaultdict(int)
+        matched: Dict[str, List[str]] = defaultdict(list)
+        for query in dict.fromkeys(symptoms):
+            for term in self.lookup(query, "symptom"):
+                for syndrome_id, weight in self.symptom_syndromes[term.id]:
+                    if term.name in matched[syndrome_id]:
+                        continue
+                    scores[syndrome_id] += weight
+                    matched[syndrome_id].append(term.name)
+
+        allowed = set(disease_ids)
+        results = []
+        for syndrome_id, score in scores.items():
+            syndrome = self.term("syndrome", syndrome_id)
+            if allowed and syndrome.disease_id not in allowed:
+                continue
+            results.append({
+                **self.term_to_dict(syndrome),
+                "score": score,
+                "matched_symptoms": matched[syndrome_id],
+            })
+        results.sort(key=lambda item: (-item["score"], item["name"]))
+        return results[:limit]
+
+
+_knowledge_base: Optional[KnowledgeBase] = None
+_lock = threading.Lock()
+
+
+def data_files() -> List[str]:
+    """内置数据文件与 KNOWLEDGE_BASE_FILES 中配置的文件"""
+
+    extra = [path.strip() for path in get_settings().KNOWLEDGE_BASE_FILES.split(",") if path.strip()]
+    return [BUILTIN_DATA_FILE, *extra]
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """获取知识库（首次调用时加载并构建索引）"""
+
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase(*_read_data_files(data_files()))
+    return _knowledge_base
+
+
+def canonical_profile_terms(diseases: Sequence[str], symptoms: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    校验问诊档案中的疾病与症状，并将别名统一为标准名称
+
+    Raises:
+        HTTPException: 存在知识库中没有的疾病或症状
+    """
+    knowledge_base = get_knowledge_base()
+    resolved = []
+    for kind, names in (("disease", diseases), ("symptom", symptoms)):
+        canonical = []
+        unknown = []
+        for name in names:
+            terms = knowledge_base.lookup(name, kind)
+            if terms:
+                canonical.append(terms[0].name)
+            else:
+                unknown.append(name)
+        if unknown:
+            label = "疾病" if kind == "disease" else "症状"
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"未知的{label}：{'、'.join(unknown)}",
+            )
+        resolved.append(list(dict.fromkeys(canonical)))
+    return resolved[0], resolved[1]
@@ -5,11 +5,25 @@ from __future__ import annotations
 
 import json
 import re
+import time
 from dataclasses import dataclass
 from typing import AsyncGenerator, Dict, List, Optional, Tuple
 
 from openai import AsyncOpenAI
 
+from core.metrics import (
+    LLM_ACTIVE_STREAMS,
+    LLM_REQUESTS,
+    LLM_STREAM_DURATION,
+    LLM_TIME_TO_FIRST_TOKEN,
+    LLM_TOKENS,
+    LLM_TOKENS_PER_SECOND,
+)
+
+# 估算 token 数：中日韩字符约 1 token/字，其余字符约 4 字符/token，每条消息另计格式开销
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+MESSAGE_TOKEN_OVERHEAD = 4
+
 
 class LLMServiceError(RuntimeError):
     """自定义异常：LLM 供应商配置错误"""
@@ -22,20 +36,24 @@ class ProviderConfig:
     key: str
     default_base_url: Optional[str] = None
     requires_base_url: bool = False
+    stream_usage: bool = False  # 是否支持 stream_options.include_usage（在最后一个片段返回用量）
 
 
 _PROVIDER_REGISTRY: Dict[str, ProviderConfig] = {
     "deepseek": ProviderConfig(
         key="deepseek",
         default_base_url="https://api.deepseek.com/v1",
+        stream_usage=True,
     ),
     "qwen": ProviderConfig(
         key="qwen",
         default_base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        stream_usage=True,
     ),
     "openai": ProviderConfig(
         key="openai",
         default_base_url="https://api.openai.com/v1",
+        stream_usage=True,
     ),
     "openaiful": ProviderConfig(
         key="openaiful",
@@ -48,6 +66,71 @@ _PROVIDER_REGISTRY: Dict[str, ProviderConfig] = {
 }
 
 
+@dataclass
+class LLMUsage:
+    """一次调用的 token 用量与耗时（供应商未返回用量时按字符数估算）"""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # 命中供应商前缀缓存的提示词 token 数（包含在 prompt_tokens 中）
+    estimated: bool = False
+    first_token_ms: Optional[float] = None
+    latency_ms: float = 0.0
+    outcome: str = "cancelled"
+    reported: bool = False  # 用量是否由供应商返回
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def prompt_cache(self) -> str:
+        """前缀缓存命中情况（hit/miss，估算的用量为 unknown）"""
+
+        if self.estimated:
+            return "unknown"
+        return "hit" if self.cached_tokens else "miss"
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符粗略估算 token 数"""
+
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    """估算消息列表（含系统提示词）的提示词 token 数"""
+
+    return sum(estimate_tokens(message.get("content") or "") + MESSAGE_TOKEN_OVERHEAD for message in messages)
+
+
+def _read_usage(usage, target: LLMUsage) -> None:
+    """读取供应商返回的用量（缓存命中数：OpenAI/通义在 prompt_tokens_details 中，DeepSeek 为 prompt_cache_hit_tokens）"""
+
+    target.prompt_tokens = usage.prompt_tokens or 0
+    target.completion_tokens = usage.completion_tokens or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    target.cached_tokens = cached or 0
+    target.estimated = False
+    target.reported = True
+
+
+def _observe_tokens(provider: str, operation: str, usage: LLMUsage) -> None:
+    """按命中缓存、未命中缓存的提示词与生成内容分别累计 token 数"""
+
+    LLM_TOKENS.inc(usage.cached_tokens, provider=provider, operation=operation, kind="prompt_cached")
+    LLM_TOKENS.inc(
+        usage.prompt_tokens - usage.cached_tokens, provider=provider, operation=operation, kind="prompt_uncached"
+    )
+    LLM_TOKENS.inc(usage.completion_tokens, provider=provider, operation=operation, kind="completion")
+
+
 def _normalize_base_url(raw: str) -> str:
     """清洗并标准化 Base URL"""
 
@@ -100,33 +183,88 @@ async def stream_llm_response(
     system_prompt: str,
     messages: List[Dict[str, str]],
     base_url: Optional[str] = None,
+    usage: Optional[LLMUsage] = None,
 ) -> AsyncGenerator[str, None]:
-    """流式调用大语言模型，返回内容片段"""
+    """
+    流式调用大语言模型，返回内容片段
+
+    Args:
+        usage: 可选，生成结束后写入本次调用的 token 用量与耗时
+    """
 
     full_messages = [{"role": "system", "content": system_prompt}]
     full_messages.extend(messages)
+    provider_label = provider.lower().strip()
+    usage = usage if usage is not None else LLMUsage()
+    config = _PROVIDER_REGISTRY.get(provider_label)
+    options = {"stream_options": {"include_usage": True}} if config and config.stream_usage else {}
 
     try:
         client = _create_async_client(provider, api_key, base_url)
     except LLMServiceError as exc:
+        LLM_REQUESTS.inc(provider=provider_label, operation="chat", outcome="config_error")
+        usage.outcome = "config_error"
         yield f"\n\n[错误] {exc}"
         return
 
+    started = time.perf_counter()
+    first_chunk_at = None
+    chunks = 0
+    completion = []
+    outcome = "cancelled"  # 客户端断开时生成器被关闭，不会走到下面的赋值
+    LLM_ACTIVE_STREAMS.inc(provider=provider_label)
+
     try:
         stream = await client.chat.completions.create(
             model=model,
             messages=full_messages,
             stream=True,
             temperature=0.7,
+            **options,
         )
 
         async for chunk in stream:
+            # 用量通常在最后一个（choices 为空的）片段返回，部分兼容接口不请求也会返回
+            if getattr(chunk, "usage", None):
+                _read_usage(chunk.usage, usage)
             if chunk.choices and chunk.choices[0].delta.content:
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                chunks += 1
+                completion.append(chunk.choices[0].delta.content)
                 yield chunk.choices[0].delta.content
 
+        outcome = "success"
+
     except Exception as exc:  # noqa: BLE001
+        outcome = "error"
         yield f"\n\n[错误] 调用大模型失败: {exc}"
 
+    finally:
+        finished = time.perf_counter()
+        LLM_ACTIVE_STREAMS.dec(provider=provider_label)
+        LLM_REQUESTS.inc(provider=provider_label, operation="chat", outcome=outcome)
+        LLM_STREAM_DURATION.observe(finished - started, provider=provider_label)
+        if first_chunk_at is not None and finished > first_chunk_at and chunks > 1:
+            LLM_TOKENS_PER_SECOND.observe(chunks / (finished - first_chunk_at), provider=provider_label)
+
+        # 供应商未返回用量时按字符数估算；调用失败或没有生成任何内容时不估算，
+        # 避免供应商故障时把用户没有收到的回复计入配额
+        if not usage.reported and completion and outcome in ("success", "cancelled"):
+            usage.prompt_tokens = estimate_prompt_tokens(full_messages)
+            usage.completion_tokens = estimate_tokens("".join(completion))
+            usage.cached_tokens = 0
+            usage.estimated = True
+        usage.outcome = outcome
+        usage.latency_ms = round((finished - started) * 1000, 2)
+        if first_chunk_at is not None:
+            usage.first_token_ms = round((first_chunk_at - started) * 1000, 2)
+            # 用量在流末尾才返回，首字耗时在此按是否命中前缀缓存分组记录
+            LLM_TIME_TO_FIRST_TOKEN.observe(
+                first_chunk_at - started, provider=provider_label, prompt_cache=usage.prompt_cache
+            )
+        _observe_tokens(provider_label, "chat", usage)
+
 
 async def test_llm_connection(
     provider: str,
@@ -271,6 +409,11 @@ async def generate_suggested_questions(
                 temperature=0.8,
                 max_tokens=500,
             )
+            LLM_REQUESTS.inc(provider=provider.lower().strip(), operation="suggest", outcome="success")
+            if response.usage:
+                usage = LLMUsage()
+                _read_usage(response.usage, usage)
+                _observe_tokens(provider.lower().strip(), "suggest", usage)
 
             if not response.choices or not response.choices[0].message.content:
                 if attempt < max_retries:
@@ -292,6 +435,7 @@ async def generate_suggested_questions(
             return False, [], f"无法从大模型返回中提取推荐问题，原始返回：{content[:200]}"
 
         except Exception as exc:  # noqa: BLE001
+            LLM_REQUESTS.inc(provider=provider.lower().strip(), operation="suggest", outcome="error")
             if attempt < max_retries:
                 continue
             return False, [], f"调用大模型失败: {exc}"
@@ -0,0 +1,188 @@
+"""
+数据库维护服务模块
+在低峰期执行 WAL 检查点、统计信息更新、增量回收与全文索引合并，
+每次运行受时间预算约束，每一步都是独立的短事务，不会长时间持有写锁
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from core.activity import tracker
+from core.config import get_settings
+from core.database import engine
+from services.search import sync_search_index
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+# 单次 ANALYZE 每个索引最多采样的行数，限制统计耗时
+ANALYSIS_LIMIT = 1000
+
+
+def in_maintenance_window(now: Optional[datetime] = None) -> bool:
+    """
+    当前时间是否处于配置的维护窗口（如 "02:00-05:00"，支持跨零点，留空表示任意时间）
+    """
+    window = get_settings().MAINTENANCE_WINDOW.strip()
+    if not window:
+        return True
+
+    start_text, end_text = window.split("-", 1)
+    start = datetime.strptime(start_text.strip(), "%H:%M").time()
+    end = datetime.strptime(end_text.strip(), "%H:%M").time()
+    current = (now or datetime.now()).time()
+
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+def is_low_traffic() -> bool:
+    """是否处于低峰期（维护窗口内，且当前没有过多进行中的请求）"""
+
+    settings = get_settings()
+    return in_maintenance_window() and tracker.in_flight <= settings.MAINTENANCE_MAX_ACTIVE_REQUESTS
+
+
+def checkpoint_wal(mode: str = "PASSIVE") -> Optional[Dict[str, int]]:
+    """
+    执行 WAL 检查点
+
+    PASSIVE 模式不会等待读写事务，可随时执行；TRUNCATE 会在完成后截断 WAL 文件
+
+    Returns:
+        检查点结果，非 WAL 模式时返回 None
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA journal_mode").scalar() != "wal":
+            return None
+        busy, log_frames, checkpointed = conn.exec_driver_sql(
+            f"PRAGMA main.wal_checkpoint({mode})"
+        ).one()
+    return {"busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+def _fts_tables(conn) -> List[str]:
+    """列出已创建的全文索引表"""
+
+    rows = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'conversations_fts')")
+    ).all()
+    return [row[0] for row in rows]
+
+
+def incremental_vacuum(pages: int) -> int:
+    """
+    增量回收一批空闲页（单独的短事务）
+
+    incremental_vacuum 每执行一步只回收一页，需要把语句执行完才会回收 pages 页
+
+    Args:
+        pages: 最多回收的页数
+
+    Returns:
+        实际回收的页数
+    """
+    with engine.connect() as conn:
+        before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        if before == 0:
+            return 0
+        conn.commit()
+        # executescript 会把语句执行完；execute 只执行第一步（只回收一页）
+        conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return before - after
+
+
+def run_maintenance(force: bool = False, time_budget: Optional[float] = None) -> Dict[str, object]:
+    """
+    执行一轮数据库维护
+
+    Args:
+        force: 忽略低峰期判断（命令行手动执行时使用）
+        time_budget: 本轮时间预算（秒），默认读取 MAINTENANCE_TIME_BUDGET_SECONDS
+
+    Returns:
+        本轮执行情况
+    """
+    settings = get_settings()
+    if time_budget is None:
+        time_budget = settings.MAINTENANCE_TIME_BUDGET_SECONDS
+
+    started = time.monotonic()
+    result: Dict[str, object] = {"steps": []}
+
+    def remaining() -> float:
+        return time_budget - (time.monotonic() - started)
+
+    # 检查点随时可以执行（PASSIVE 不阻塞读写）
+    result["checkpoint"] = checkpoint_wal("PASSIVE")
+
+    # 为不经过应用的写入方（命令行、脚本、恢复工具）登记的待索引行建立索引，通常没有待处理的行
+    indexed = sync_search_index(time_budget=max(remaining(), 0))
+    if any(indexed.values()):
+        result["indexed"] = indexed
+
+    if not force and not is_low_traffic():
+        result["skipped"] = "非低峰期"
+        return result
+
+    # 1. 更新统计信息：PRAGMA optimize 只分析统计过期的表，配合 analysis_limit 控制耗时
+    if remaining() > 0:
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            has_stat = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            ).first()
+            conn.exec_driver_sql("PRAGMA optimize" if has_stat else "ANALYZE")
+            conn.commit()
+        result["steps"].append("optimize" if has_stat else "analyze")
+
+    # 2. 增量回收空闲页（需要 auto_vacuum=INCREMENTAL），每次只回收有限的页数
+    freed = 0
+    with engine.connect() as conn:
+        auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    if auto_vacuum == AUTO_VACUUM_INCREMENTAL:
+        while remaining() > 0:
+            step = incremental_vacuum(settings.MAINTENANCE_VACUUM_PAGES)
+            freed += step
+            if step == 0:
+                break
+        result["steps"].append("incremental_vacuum")
+    result["freed_pages"] = freed
+
+    # 3. 合并全文索引的 b-tree 段（merge 命令每次只做有限的工作）
+    with engine.connect() as conn:
+        fts_tables = _fts_tables(conn)
+    for table in fts_tables:
+        if remaining() <= 0:
+            break
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {table}({table}, rank) VALUES ('merge', 64)"))
+        result["steps"].append(f"merge:{table}")
+
+    # 4. 低峰期截断 WAL 文件，避免 WAL 持续增长
+    if remaining() > 0:
+        result["checkpoint"] = checkpoint_wal("TRUNCATE")
+
+    result["elapsed"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def enable_incremental_vacuum() -> bool:
+    """
+    将数据库切换为 auto_vacuum=INCREMENTAL
+
+    已有数据的数据库需要执行一次完整 VACUUM 才能生效，耗时较长且会持有写锁，
+    请在停机维护时执行
+
+    Returns:
+        是否执行了切换
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL:
+            return False
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+    return True
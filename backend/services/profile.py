@@ -0,0 +1,221 @@
+"""
+问诊档案服务模块
+档案按对话保存为结构化记录，并渲染为固定格式的文本块：
+首次发送消息前的最后一版放在提示词前缀中（只出现一次），之后的修改只追加差异，不重复发送整份档案；
+对话归档时档案随之迁移到归档库
+"""
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.tracing import traced
+from models.archive import ArchivedPatientProfile
+from models.conversation import Conversation
+from models.message import Message
+from models.profile import PatientProfile, PatientProfileChange
+from services.analytics import record_conversation_diseases
+from services.archive import get_archived_profile
+from services.events import emit_event
+from services.knowledge import canonical_profile_terms
+
+PROFILE_MARKER = "【患者信息】"
+PROFILE_UPDATE_MARKER = "【患者信息更新】"
+GENDER_LABELS = {"male": "男", "female": "女", "other": "其他"}
+LIST_SEPARATOR = "、"
+
+# (字段, 标签)，按渲染顺序排列；标签与前端中文界面一致，统计服务按“疾病史”一行识别疾病
+PROFILE_FIELDS = (
+    ("age", "年龄"),
+    ("gender", "性别"),
+    ("diseases", "疾病史"),
+    ("symptoms", "近期症状"),
+    ("tcm_syndrome", "中医证型（初步分析）"),
+    ("main_complaint", "主诉"),
+)
+LIST_FIELDS = ("diseases", "symptoms")
+
+
+def normalize_profile(data: Dict) -> Dict:
+    """规范化档案：去除首尾空白与重复项，空值统一为 None / 空列表"""
+
+    normalized: Dict = {}
+    for field, _ in PROFILE_FIELDS:
+        value = data.get(field)
+        if field in LIST_FIELDS:
+            items = [item.strip() for item in value or [] if item and item.strip()]
+            normalized[field] = list(dict.fromkeys(items))
+        elif isinstance(value, str):
+            normalized[field] = value.strip() or None
+        else:
+            normalized[field] = value
+    return normalized
+
+
+def _format_value(field: str, value) -> str:
+    if field in LIST_FIELDS:
+        return LIST_SEPARATOR.join(value)
+    if field == "age":
+        return f"{value}岁"
+    if field == "gender":
+        return GENDER_LABELS.get(value, value)
+    return str(value)
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == []
+
+
+def render_profile(data: Dict) -> Optional[str]:
+    """渲染档案文本块（各字段一行，未填写的字段省略），档案为空时返回 None"""
+
+    lines = [
+        f"{label}: {_format_value(field, data.get(field))}"
+        for field, label in PROFILE_FIELDS
+        if not _is_empty(data.get(field))
+    ]
+    if not lines:
+        return None
+    return "\n".join([PROFILE_MARKER, *lines])
+
+
+def render_profile_diff(old: Dict, new: Dict) -> Optional[str]:
+    """渲染两版档案的差异（列表字段只列出新增与移除项），没有差异时返回 None"""
+
+    lines = []
+    for field, label in PROFILE_FIELDS:
+        before, after = old.get(field), new.get(field)
+        if field in LIST_FIELDS:
+            added = [item for item in after or [] if item not in (before or [])]
+            removed = [item for item in before or [] if item not in (after or [])]
+            parts = []
+            if added:
+                parts.append(f"新增 {LIST_SEPARATOR.join(added)}")
+            if removed:
+                parts.append(f"移除 {LIST_SEPARATOR.join(removed)}")
+            if parts:
+                lines.append(f"{label}: {'；'.join(parts)}")
+        elif before != after:
+            if _is_empty(after):
+                lines.append(f"{label}: 已清除")
+            elif _is_empty(before):
+                lines.append(f"{label}: {_format_value(field, after)}")
+            else:
+                lines.append(f"{label}: {_format_value(field, before)} → {_format_value(field, after)}")
+    if not lines:
+        return None
+    return "\n".join([PROFILE_UPDATE_MARKER, *lines])
+
+
+def get_profile(db: Session, conversation_id: int) -> Optional[PatientProfile]:
+    """获取对话的问诊档案"""
+
+    return db.query(PatientProfile).filter(PatientProfile.conversation_id == conversation_id).first()
+
+
+def resolve_profile(db: Session, conversation) -> Union[PatientProfile, ArchivedPatientProfile, None]:
+    """获取对话的问诊档案（归档对话从归档库读取）"""
+
+    if conversation.is_archived:
+        return get_archived_profile(db, conversation.id)
+    return get_profile(db, conversation.id)
+
+
+def profile_to_dict(profile: Union[PatientProfile, ArchivedPatientProfile], changed: bool = False) -> Dict:
+    """档案转为接口返回的字典"""
+
+    return {
+        **json.loads(profile.data),
+        "conversation_id": profile.conversation_id,
+        "version": profile.version,
+        "changed": changed,
+        "updated_at": profile.updated_at,
+    }
+
+
+@traced()
+def save_profile(db: Session, conversation: Conversation, data: Dict) -> Tuple[PatientProfile, bool]:
+    """
+    保存对话的问诊档案（整体替换）
+
+    疾病与症状须为知识库中的条目（别名统一为标准名称）；
+    对话还没有消息时直接替换前缀中的档案；已有消息时前缀保持不变，
+    把与上一版的差异记录下来，附加在下一条用户消息之前
+
+    Args:
+        db: 数据库会话
+        conversation: 对话对象
+        data: 档案字段
+
+    Returns:
+        Tuple[档案, 是否有实际修改]
+    """
+    new_data = normalize_profile(data)
+    new_data["diseases"], new_data["symptoms"] = canonical_profile_terms(new_data["diseases"], new_data["symptoms"])
+    profile = get_profile(db, conversation.id)
+    old_data = json.loads(profile.data) if profile else normalize_profile({})
+    if profile is not None and old_data == new_data:
+        return profile, False
+
+    last_message_id = db.query(func.max(Message.id))\
+        .filter(Message.conversation_id == conversation.id)\
+        .scalar()
+    serialized = json.dumps(new_data, ensure_ascii=False)
+
+    if profile is None:
+        profile = PatientProfile(
+            conversation_id=conversation.id,
+            user_id=conversation.user_id,
+            data=serialized,
+            baseline="{}",
+            version=1,
+        )
+        db.add(profile)
+    else:
+        profile.data = serialized
+        profile.version += 1
+
+    if last_message_id is None:
+        profile.baseline = serialized
+    else:
+        diff = render_profile_diff(old_data, new_data)
+        if diff:
+            db.add(PatientProfileChange(
+                conversation_id=conversation.id,
+                version=profile.version,
+                after_message_id=last_message_id,
+                diff=diff,
+            ))
+
+    if get_settings().ANALYTICS_ENABLED:
+        db.flush()
+        record_conversation_diseases(db.connection(), conversation.id, new_data["diseases"])
+    emit_event(
+        db, "profile.updated", {"conversation_id": conversation.id, "version": profile.version}, conversation.user_id
+    )
+    db.commit()
+    db.refresh(profile)
+    return profile, True
+
+
+def get_profile_prompt(db: Session, conversation_id: int) -> Tuple[Optional[str], List[Tuple[int, str]]]:
+    """
+    获取组装提示词所需的档案文本
+
+    Args:
+        db: 数据库会话
+        conversation_id: 对话 ID
+
+    Returns:
+        Tuple[前缀中的档案文本块, [(修改时最后一条消息的 ID, 差异文本), ...]]
+    """
+    profile = get_profile(db, conversation_id)
+    if profile is None:
+        return None, []
+    changes = db.query(PatientProfileChange.after_message_id, PatientProfileChange.diff)\
+        .filter(PatientProfileChange.conversation_id == conversation_id)\
+        .order_by(PatientProfileChange.id)\
+        .all()
+    return render_profile(json.loads(profile.baseline)), [(row.after_message_id, row.diff) for row in changes]
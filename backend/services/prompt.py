@@ -0,0 +1,93 @@
+"""
+提示词组装服务模块
+按“系统提示词 + 问诊档案 → 历史消息（按时间顺序，档案修改以差异插入）→ 新消息”的固定顺序组装，
+相邻两次请求之间只在末尾追加内容，供应商可以复用已缓存的前缀（DeepSeek、OpenAI 等对命中部分减价并加快首字响应）
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.message import Message
+
+USER_INFO_TAG = "[用户信息]"
+QUESTION_TAG = "[问题]"
+
+
+def compose_user_message(content: str, user_info: Optional[str] = None) -> str:
+    """拼接保存到数据库的用户消息（旧版客户端提交的问诊档案文本放在问题之前）"""
+
+    if not user_info:
+        return content
+    return f"{USER_INFO_TAG}\n{user_info}\n\n{QUESTION_TAG}\n{content}"
+
+
+def split_user_message(content: str) -> Tuple[Optional[str], str]:
+    """拆分用户消息中附带的问诊档案，返回 (档案, 问题)"""
+
+    prefix = f"{USER_INFO_TAG}\n"
+    separator = f"\n\n{QUESTION_TAG}\n"
+    if not content.startswith(prefix) or separator not in content:
+        return None, content
+    user_info, question = content[len(prefix):].split(separator, 1)
+    return user_info.strip() or None, question
+
+
+def build_prompt(
+    system_prompt: str,
+    messages: Sequence[Message],
+    profile_block: Optional[str] = None,
+    profile_changes: Sequence[Tuple[int, str]] = (),
+) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    组装发送给大模型的系统提示词与历史消息
+
+    问诊档案放在系统提示词之后，只出现一次；对话开始后的档案修改以差异文本附加在修改后的第一条用户消息之前，
+    前缀保持不变。旧版客户端附加在用户消息中的档案同样移到系统提示词之后（以最近一次提交的为准），
+    历史消息只保留问题本身
+
+    Args:
+        system_prompt: 系统提示词
+        messages: 按时间顺序排列的历史消息
+        profile_block: 结构化问诊档案渲染的文本块
+        profile_changes: [(修改时最后一条消息的 ID, 差异文本), ...]，按修改顺序排列
+
+    Returns:
+        Tuple[系统提示词（含问诊档案）, 历史消息列表]
+    """
+    user_info = None
+    history = []
+    pending = list(profile_changes)
+    for message in messages:
+        content = message.content
+        if message.role == "user":
+            attached, content = split_user_message(content)
+            user_info = attached or user_info
+            notes = [diff for after_message_id, diff in pending if after_message_id < message.id]
+            if notes:
+                pending = pending[len(notes):]
+                content = "\n\n".join([*notes, content])
+        history.append({"role": message.role, "content": content})
+
+    user_info = profile_block or user_info
+    if user_info:
+        system_prompt = f"{system_prompt}\n\n{USER_INFO_TAG}\n{user_info}"
+    return system_prompt, history
+
+
+def select_recent_rounds(messages: List[Dict[str, str]], max_rounds: int) -> List[Dict[str, str]]:
+    """
+    截取最近的若干轮对话（一轮从一条用户消息开始）
+
+    起点按 max_rounds 对齐而不是逐轮滑动，保留的轮数在 max_rounds 到 2 * max_rounds - 1 之间；
+    连续 max_rounds 次请求的起点相同，前缀缓存不会因为每轮丢弃最早的消息而失效
+
+    Args:
+        messages: build_prompt 返回的历史消息
+        max_rounds: 至少保留的轮数
+
+    Returns:
+        截取后的消息列表
+    """
+    starts = [index for index, message in enumerate(messages) if message["role"] == "user"]
+    if max_rounds <= 0 or len(starts) <= max_rounds:
+        return messages
+    first_round = (len(starts) - max_rounds) // max_rounds * max_rounds
+    return messages[starts[first_round]:]
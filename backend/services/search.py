@@ -0,0 +1,506 @@
+"""
+全文检索服务模块
+基于 SQLite FTS5 的消息内容与对话标题检索，以及用户名子串检索（trigram）
+
+消息与标题的索引文本（中文二元组）由 Python 生成并保存在外部内容表中，触发器只使用 SQL：
+新增的行登记为待索引，删除或修改时按保存的索引文本删除旧词条。因此 sqlite3 命令行、维护脚本、
+备份恢复工具等不经过应用的写入方不依赖应用注册的函数；应用通过 ORM 写入的行在同一事务内建立索引，
+其他写入方登记的待索引行由维护任务补建
+"""
+import re
+import time
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.database import engine
+from core.fts import build_match_query, extract_terms, to_index_text
+from core.tracing import traced
+from models.conversation import Conversation
+from models.message import Message
+
+SNIPPET_RADIUS = 40
+
+# 所有者列保存 "u<用户 ID>" 词条，检索个人对话时作为 MATCH 条件，只遍历该用户的倒排列表
+OWNER_COLUMN = "owner"
+
+# 索引来源：源表 -> (FTS 表, 索引文本列, 源表中被索引的列, 所有者表达式)
+# 所有者表达式中的 {row} 为源表的行（触发器中为 new）
+SEARCH_SOURCES: Dict[str, Tuple[str, str, str, str]] = {
+    "messages": (
+        "messages_fts", "body", "content",
+        "(SELECT 'u' || c.user_id FROM conversations c WHERE c.id = {row}.conversation_id)",
+    ),
+    "conversations": ("conversations_fts", "title", "title", "'u' || {row}.user_id"),
+}
+_SOURCE_MODELS = {Message: "messages", Conversation: "conversations"}
+
+
+def _content_table(fts_table: str) -> str:
+    """保存索引文本的外部内容表（索引文本为 NULL 表示待索引）"""
+
+    return f"{fts_table}_content"
+
+
+def _schema_statements(table: str) -> List[str]:
+    """索引表、外部内容表与同步触发器（仅使用 SQL）"""
+
+    fts_table, column, source_column, owner = SEARCH_SOURCES[table]
+    content = _content_table(fts_table)
+    # 已建立索引的行需用写入时的索引文本删除词条
+    delete_terms = (
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}, {OWNER_COLUMN}) "
+        f"SELECT 'delete', id, {column}, {OWNER_COLUMN} FROM {content} "
+        f"WHERE id = old.id AND {column} IS NOT NULL;"
+    )
+    return [
+        f"CREATE TABLE IF NOT EXISTS {content} (id INTEGER PRIMARY KEY, {OWNER_COLUMN} TEXT, {column} TEXT)",
+        f"CREATE INDEX IF NOT EXISTS {content}_pending ON {content}(id) WHERE {column} IS NULL",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} "
+        f"USING fts5({column}, {OWNER_COLUMN}, content='{content}', content_rowid='id')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {content}(id, {OWNER_COLUMN}) VALUES (new.id, {owner.format(row="new")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+            {delete_terms}
+            DELETE FROM {content} WHERE id = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {source_column} ON {table} BEGIN
+            {delete_terms}
+            UPDATE {content} SET {column} = NULL WHERE id = old.id;
+        END
+        """,
+    ]
+
+
+# 用户名子串检索：trigram 分词的外部内容表（不重复保存用户名），需要 SQLite 3.34+
+USER_FTS_TABLE = "users_fts"
+# trigram 索引只能匹配不少于 3 个字符的子串
+TRIGRAM_MIN_LENGTH = 3
+
+_USER_SCHEMA_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {USER_FTS_TABLE}
+    USING fts5(username, content='users', content_rowid='id', tokenize='trigram')
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO {USER_FTS_TABLE}(rowid, username) VALUES (new.id, new.username);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO {USER_FTS_TABLE}({USER_FTS_TABLE}, rowid, username) VALUES ('delete', old.id, old.username);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF username ON users BEGIN
+        INSERT INTO {USER_FTS_TABLE}({USER_FTS_TABLE}, rowid, username) VALUES ('delete', old.id, old.username);
+        INSERT INTO {USER_FTS_TABLE}(rowid, username) VALUES (new.id, new.username);
+    END
+    """,
+]
+
+_user_fts_available: Optional[bool] = None
+
+
+def init_search_index(batch_size: int = 1000) -> bool:
+    """
+    创建全文索引表与同步触发器，首次创建时为已有数据建立索引
+
+    旧版本的索引（触发器调用应用注册的函数生成索引文本）会被删除后重建
+
+    Returns:
+        是否为首次创建
+    """
+    global _search_index_available
+
+    with engine.begin() as conn:
+        tables = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+        exists = _content_table(SEARCH_SOURCES["messages"][0]) in tables
+        for table, (fts_table, *_) in SEARCH_SOURCES.items():
+            if not exists:
+                for suffix in ("insert", "delete", "update"):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}"))
+                conn.execute(text(f"DROP TABLE IF EXISTS {fts_table}"))
+            for statement in _schema_statements(table):
+                conn.execute(text(statement))
+    _search_index_available = True
+
+    if exists:
+        return False
+
+    rebuild_search_index(batch_size)
+    return True
+
+
+def init_user_search_index() -> bool:
+    """
+    创建用户名子串索引与同步触发器，首次创建时为已有用户建立索引
+
+    SQLite 版本过低（不支持 trigram 分词器）时跳过，检索退化为扫描
+
+    Returns:
+        是否为首次创建
+    """
+    global _user_fts_available
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": USER_FTS_TABLE},
+            ).first()
+            for statement in _USER_SCHEMA_STATEMENTS:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {USER_FTS_TABLE}({USER_FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError:
+        _user_fts_available = False
+        return False
+
+    _user_fts_available = True
+    return not exists
+
+
+def user_search_index_available(db: Session) -> bool:
+    """用户名子串索引是否已创建（结果缓存在进程内）"""
+
+    global _user_fts_available
+
+    if _user_fts_available is None:
+        _user_fts_available = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": USER_FTS_TABLE},
+        ).first() is not None
+    return _user_fts_available
+
+
+def build_trigram_query(value: str) -> str:
+    """将子串转换为 trigram 索引的短语查询"""
+
+    return '"' + value.replace('"', '""') + '"'
+
+
+def prefix_bounds(prefix: str) -> Tuple[str, str]:
+    """
+    前缀匹配的范围条件上下界（prefix <= value < upper）
+
+    写成范围条件可以使用普通 B 树索引（默认大小写不敏感的 LIKE 不走索引）
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def rebuild_search_index(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    重建全文索引：清空后把所有行登记为待索引，再分批建立索引（每批使用独立的短事务）
+
+    Returns:
+        已索引的消息数与对话数
+    """
+    for table, (fts_table, column, _, owner) in SEARCH_SOURCES.items():
+        content = _content_table(fts_table)
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('delete-all')"))
+            conn.execute(text(f"DELETE FROM {content}"))
+
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                upper_id = conn.execute(
+                    text(
+                        f"SELECT MAX(id) FROM (SELECT id FROM {table} "
+                        "WHERE id > :last_id ORDER BY id LIMIT :limit)"
+                    ),
+                    {"last_id": last_id, "limit": batch_size},
+                ).scalar()
+                if upper_id is None:
+                    break
+                conn.execute(
+                    text(
+                        f"INSERT INTO {content}(id, {OWNER_COLUMN}) "
+                        f"SELECT s.id, {owner.format(row='s')} FROM {table} s "
+                        "WHERE s.id > :last_id AND s.id <= :upper_id"
+                    ),
+                    {"last_id": last_id, "upper_id": upper_id},
+                )
+            last_id = upper_id
+
+    return sync_search_index(batch_size)
+
+
+def index_pending_rows(conn, table: str, ids: Optional[Iterable[int]] = None, limit: Optional[int] = None) -> int:
+    """
+    为待索引的行生成索引文本并写入全文索引（在调用方的事务中执行）
+
+    Args:
+        conn: 数据库连接
+        table: 源表（messages / conversations）
+        ids: 只处理这些行，None 表示按 ID 顺序处理
+        limit: 最多处理的行数
+
+    Returns:
+        建立索引的行数
+    """
+    fts_table, column, source_column, _ = SEARCH_SOURCES[table]
+    content = _content_table(fts_table)
+
+    conditions = [f"d.{column} IS NULL"]
+    if ids is not None:
+        ids = [int(row_id) for row_id in ids]
+        if not ids:
+            return 0
+        conditions.append(f"d.id IN ({', '.join(map(str, ids))})")
+    query = (
+        f"SELECT d.id, s.{source_column} FROM {content} d JOIN {table} s ON s.id = d.id "
+        f"WHERE {' AND '.join(conditions)} ORDER BY d.id"
+    )
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+
+    rows = conn.execute(text(query)).all()
+    if not rows:
+        return 0
+
+    conn.execute(
+        text(f"UPDATE {content} SET {column} = :body WHERE id = :id"),
+        [{"id": row_id, "body": to_index_text(value)} for row_id, value in rows],
+    )
+    id_list = ", ".join(str(row_id) for row_id, _ in rows)
+    conn.execute(
+        text(
+            f"INSERT INTO {fts_table}(rowid, {column}, {OWNER_COLUMN}) "
+            f"SELECT id, {column}, {OWNER_COLUMN} FROM {content} WHERE id IN ({id_list})"
+        )
+    )
+    return len(rows)
+
+
+def sync_search_index(batch_size: int = 1000, time_budget: Optional[float] = None) -> Dict[str, int]:
+    """
+    为其他写入方登记的待索引行建立索引（分批执行，每批使用独立的短事务）
+
+    Args:
+        batch_size: 每批处理的行数
+        time_budget: 时间预算（秒），None 表示处理完为止
+
+    Returns:
+        各源表建立索引的行数
+    """
+    stats = {table: 0 for table in SEARCH_SOURCES}
+    with engine.connect() as conn:
+        if not _search_index_ready(conn):
+            return stats
+
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    for table in SEARCH_SOURCES:
+        while deadline is None or time.monotonic() < deadline:
+            with engine.begin() as conn:
+                indexed = index_pending_rows(conn, table, limit=batch_size)
+            stats[table] += indexed
+            if indexed < batch_size:
+                break
+    return stats
+
+
+_search_index_available: Optional[bool] = None
+
+
+def _search_index_ready(conn) -> bool:
+    """全文索引是否已创建（结果缓存在进程内）"""
+
+    global _search_index_available
+
+    if _search_index_available is None:
+        _search_index_available = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": _content_table(SEARCH_SOURCES["messages"][0])},
+        ).first() is not None
+    return _search_index_available
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flushed_rows(session: Session, flush_context) -> None:
+    """通过 ORM 新增或修改的消息与对话在同一事务内建立索引"""
+
+    flushed: Dict[str, List[int]] = {}
+    for instance in chain(session.new, session.dirty):
+        table = _SOURCE_MODELS.get(type(instance))
+        if table is not None and instance.id is not None:
+            flushed.setdefault(table, []).append(instance.id)
+    if not flushed:
+        return
+
+    conn = session.connection()
+    if not _search_index_ready(conn):
+        return
+    for table, ids in flushed.items():
+        index_pending_rows(conn, table, ids)
+
+
+def _encode_cursor(offset: int, bounds: Tuple[int, int]) -> str:
+    return f"{offset}:{bounds[0]}:{bounds[1]}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, Tuple[int, int]]:
+    try:
+        offset, message_bound, title_bound = (int(part) for part in cursor.split(":"))
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+    return offset, (message_bound, title_bound)
+
+
+def _candidate_query(source: int, table: str, candidates: int) -> str:
+    """单个索引中参与排序的命中：ID 不超过首页时的上界，限制数量时只取其中最近的若干条"""
+
+    fts_table = SEARCH_SOURCES[table][0]
+    score = f"bm25({fts_table}, 1.0, 0.0)"
+    where = f"{fts_table} MATCH :{table}_match AND rowid <= :{table}_bound"
+    if not candidates:
+        return f"SELECT {source} AS source, rowid AS id, {score} AS score FROM {fts_table} WHERE {where}"
+    # FTS5 按 rowid 倒序直接遍历倒排列表，只为最近的命中计算得分
+    return (
+        f"SELECT {source} AS source, id, score FROM ("
+        f"SELECT rowid AS id, {score} AS score FROM {fts_table} WHERE {where} "
+        f"ORDER BY rowid DESC LIMIT {int(candidates)})"
+    )
+
+
+def _make_snippet(content: str, terms: List[str]) -> str:
+    """截取首个关键词附近的文本，并用 Markdown 粗体标记关键词"""
+
+    lowered = content.lower()
+    positions = [lowered.find(term) for term in terms if term and lowered.find(term) >= 0]
+    center = min(positions) if positions else 0
+
+    start = max(center - SNIPPET_RADIUS, 0)
+    end = min(center + SNIPPET_RADIUS * 2, len(content))
+    snippet = " ".join(content[start:end].split())
+
+    if terms:
+        # 相邻的关键词合并为一段高亮
+        pattern = re.compile(
+            "(?:" + "|".join(re.escape(term) for term in terms) + ")+",
+            re.IGNORECASE,
+        )
+        snippet = pattern.sub(lambda match: f"**{match.group()}**", snippet)
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(content) else ""
+    return f"{prefix}{snippet}{suffix}"
+
+
+@traced()
+def search_conversations(
+    db: Session,
+    query: str,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Dict:
+    """
+    检索消息内容与对话标题
+
+    检索个人对话时所有者词条与关键词一起作为 MATCH 条件，耗时只与该用户的数据量相关；
+    消息与标题各取最近的 SEARCH_MAX_CANDIDATES 条命中按相关度排序，常见词的检索耗时不随数据量增长。
+    游标记录首页时两个索引的 ID 上界，翻页期间新写入的消息不会改变参与排序的命中；
+    bm25 得分随全库统计变化，不能作为翻页键，因此在这批固定的命中内按位置翻页
+
+    Args:
+        db: 数据库会话
+        query: 检索关键词（空格分隔，AND 关系）
+        user_id: 仅检索该用户的对话，None 表示全部（管理员）
+        cursor: 上一页返回的 next_cursor
+        limit: 每页条数
+
+    Returns:
+        包含 results、next_cursor 与 has_more 的字典，结果按相关度排序
+    """
+    match = build_match_query(query)
+    if not match:
+        return {"results": [], "next_cursor": None, "has_more": False}
+
+    owner = f"{OWNER_COLUMN} : u{int(user_id)} AND " if user_id is not None else ""
+    params = {
+        "messages_match": f"{owner}body : ({match})",
+        "conversations_match": f"{owner}title : ({match})",
+        "limit": limit + 1,
+    }
+    if cursor:
+        offset, bounds = _decode_cursor(cursor)
+    else:
+        offset = 0
+        bounds = tuple(
+            bound or 0
+            for bound in db.execute(text(
+                f"SELECT (SELECT max(id) FROM {_content_table('messages_fts')}), "
+                f"(SELECT max(id) FROM {_content_table('conversations_fts')})"
+            )).one()
+        )
+    params["messages_bound"], params["conversations_bound"] = bounds
+    params["offset"] = offset
+
+    candidates = max(get_settings().SEARCH_MAX_CANDIDATES, 0)
+    rows = db.execute(
+        text(
+            f"SELECT source, id, score FROM ("
+            f"{_candidate_query(0, 'messages', candidates)} "
+            f"UNION ALL "
+            f"{_candidate_query(1, 'conversations', candidates)}"
+            f") ORDER BY score, source, id LIMIT :limit OFFSET :offset"
+        ),
+        params,
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(offset + limit, bounds) if has_more else None
+
+    # 仅为当前页加载消息与对话（消息内容由模型层自动解压）
+    message_ids = [row.id for row in rows if row.source == 0]
+    messages = {
+        message.id: message
+        for message in db.query(Message).filter(Message.id.in_(message_ids)).all()
+    } if message_ids else {}
+    conversation_ids = {row.id for row in rows if row.source == 1}
+    conversation_ids.update(message.conversation_id for message in messages.values())
+    conversations = {
+        conversation.id: conversation
+        for conversation in db.query(Conversation).filter(Conversation.id.in_(conversation_ids)).all()
+    } if conversation_ids else {}
+
+    terms = extract_terms(query)
+    results = []
+    for row in rows:
+        message = messages.get(row.id) if row.source == 0 else None
+        conversation = conversations.get(message.conversation_id if message else row.id)
+        if conversation is None or (row.source == 0 and message is None):
+            continue
+
+        results.append({
+            "conversation_id": conversation.id,
+            "conversation_title": conversation.title,
+            "user_id": conversation.user_id,
+            "message_id": message.id if message else None,
+            "role": message.role if message else None,
+            "snippet": _make_snippet(message.content if message else conversation.title, terms),
+            "created_at": message.created_at if message else conversation.created_at,
+            "score": -row.score,
+        })
+
+    return {"results": results, "next_cursor": next_cursor, "has_more": has_more}
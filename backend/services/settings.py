@@ -1,14 +1,19 @@
 """
 系统设置服务模块
 """
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from core.tracing import traced
 from models.system_setting import SystemSetting
 
+# 每次修改设置时递增，用于生成公共设置的 ETag
+SETTINGS_VERSION_KEY = "settings_version"
 
+
+@traced()
 def get_setting(db: Session, key: str) -> Optional[str]:
     """获取单个系统设置"""
 
@@ -18,6 +23,19 @@ def get_setting(db: Session, key: str) -> Optional[str]:
     return result.value if result else None
 
 
+@traced()
+def get_setting_values(db: Session, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+    """一次查询获取多个系统设置（不存在的键值为 None）"""
+
+    keys = list(keys)
+    results = db.execute(
+        select(SystemSetting).where(SystemSetting.key.in_(keys))
+    ).scalars().all()
+    values = {setting.key: setting.value for setting in results}
+    return {key: values.get(key) for key in keys}
+
+
+@traced()
 def get_all_settings(db: Session) -> Dict[str, str]:
     """获取所有系统设置"""
 
@@ -25,6 +43,28 @@ def get_all_settings(db: Session) -> Dict[str, str]:
     return {setting.key: setting.value for setting in results}
 
 
+@traced()
+def get_settings_version(db: Session) -> int:
+    """获取设置版本号（尚未修改过设置时为 0）"""
+
+    value = get_setting(db, SETTINGS_VERSION_KEY)
+    return int(value) if value and value.isdigit() else 0
+
+
+def _bump_settings_version(db: Session) -> None:
+    """递增设置版本号（与设置修改在同一事务中提交）"""
+
+    version = db.execute(
+        select(SystemSetting).where(SystemSetting.key == SETTINGS_VERSION_KEY)
+    ).scalar_one_or_none()
+
+    if version:
+        version.value = str(int(version.value) + 1 if version.value.isdigit() else 1)
+    else:
+        db.add(SystemSetting(key=SETTINGS_VERSION_KEY, value="1"))
+
+
+@traced()
 def update_setting(db: Session, key: str, value: str) -> SystemSetting:
     """更新单个系统设置"""
 
@@ -38,11 +78,13 @@ def update_setting(db: Session, key: str, value: str) -> SystemSetting:
         setting = SystemSetting(key=key, value=value)
         db.add(setting)
 
+    _bump_settings_version(db)
     db.commit()
     db.refresh(setting)
     return setting
 
 
+@traced()
 def update_multiple_settings(db: Session, settings_dict: Dict[str, Optional[str]]) -> None:
     """批量更新系统设置（忽略值为 None 的键）"""
 
@@ -61,4 +103,5 @@ def update_multiple_settings(db: Session, settings_dict: Dict[str, Optional[str]
         else:
             db.add(SystemSetting(key=key, value=value))
 
+    _bump_settings_version(db)
     db.commit()
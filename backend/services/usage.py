@@ -0,0 +1,357 @@
+"""
+Token 用量服务模块
+记录每次生成的用量并累加按天的汇总表，按用户、对话、供应商与模型聚合；
+每日配额在内存中计数（定期从汇总表重新同步），发送消息前的检查不需要查询数据库
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, text
+from sqlalchemy.orm import Session
+
+from core.config import get_settings
+from core.tracing import traced
+from models.usage import TokenUsage, TokenUsageDaily, UserTokenQuota
+from models.user import User
+from services.analytics import analytics_day
+from services.llm import LLMUsage
+
+USAGE_COLUMNS = ("requests", "estimated_requests", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms")
+
+
+@dataclass
+class _QuotaEntry:
+    day: str
+    used: int
+    limit: int
+    synced_at: float
+
+
+class QuotaTracker:
+    """
+    每日 token 配额计数器
+
+    首次检查或超过 TOKEN_QUOTA_SYNC_SECONDS 后从汇总表读取当天已用量，
+    之间本进程记录的用量直接累加到内存；多 worker 部署时其他进程的用量在下次同步时计入
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, _QuotaEntry] = {}
+        self._lock = threading.Lock()
+        self._overrides: Optional[Tuple[bool, float]] = None  # (是否存在单独设置的配额, 同步时间)
+
+    def enforced(self, db: Session) -> bool:
+        """
+        是否配置了任何配额（默认配额或单独设置的非零配额）
+
+        未配置时发送消息无需同步用量；是否存在单独配额按同步间隔缓存，
+        多 worker 部署时其他进程设置的配额最多延迟该时长生效
+        """
+        settings = get_settings()
+        if settings.TOKEN_DAILY_QUOTA > 0:
+            return True
+        cached = self._overrides
+        if cached is None or time.monotonic() - cached[1] > settings.TOKEN_QUOTA_SYNC_SECONDS:
+            exists = db.query(UserTokenQuota.user_id).filter(UserTokenQuota.daily_tokens > 0).first() is not None
+            cached = self._overrides = (exists, time.monotonic())
+        return cached[0]
+
+    def _sync(self, db: Session, user_id: int, day: str) -> _QuotaEntry:
+        used = db.query(
+            func.coalesce(func.sum(TokenUsageDaily.prompt_tokens + TokenUsageDaily.completion_tokens), 0)
+        ).filter(TokenUsageDaily.day == day, TokenUsageDaily.user_id == user_id).scalar()
+        override = db.query(UserTokenQuota.daily_tokens).filter(UserTokenQuota.user_id == user_id).scalar()
+        limit = override if override is not None else get_settings().TOKEN_DAILY_QUOTA
+        entry = _QuotaEntry(day=day, used=int(used), limit=limit, synced_at=time.monotonic())
+        with self._lock:
+            self._entries[user_id] = entry
+        return entry
+
+    def get(self, db: Session, user_id: int) -> _QuotaEntry:
+        """获取用户当天的用量与配额（必要时从数据库同步）"""
+
+        day = analytics_day()
+        entry = self._entries.get(user_id)
+        if (
+            entry is None
+            or entry.day != day
+            or time.monotonic() - entry.synced_at > get_settings().TOKEN_QUOTA_SYNC_SECONDS
+        ):
+            entry = self._sync(db, user_id, day)
+        return entry
+
+    def add(self, user_id: int, day: str, tokens: int) -> None:
+        """累加本进程记录的用量"""
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.day == day:
+                entry.used += tokens
+
+    def invalidate(self, user_id: int) -> None:
+        """配额变更后丢弃缓存，下次检查时重新同步"""
+
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._overrides = None
+
+
+quota_tracker = QuotaTracker()
+
+
+def check_token_quota(db: Session, user: User) -> None:
+    """
+    发送消息前检查当天的 token 配额（管理员不受限制，未配置任何配额时不同步用量）
+
+    Raises:
+        HTTPException: 当天用量已达到配额
+    """
+    if user.role == "admin" or not quota_tracker.enforced(db):
+        return
+    entry = quota_tracker.get(db, user.id)
+    if entry.limit > 0 and entry.used >= entry.limit:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="今日 token 用量已达上限，请明天再试",
+        )
+
+
+def record_usage(
+    db: Session,
+    usage: LLMUsage,
+    user_id: int,
+    conversation_id: int,
+    provider: str,
+    model: str,
+    message_id: Optional[int] = None,
+) -> TokenUsage:
+    """
+    记录一次生成的用量，并在同一事务内累加当天的汇总
+
+    Args:
+        db: 数据库会话
+        usage: 流式生成写入的用量
+        user_id: 用户 ID
+        conversation_id: 对话 ID
+        provider: LLM 提供商
+        model: 模型名称
+        message_id: 助手消息 ID
+
+    Returns:
+        用量记录
+    """
+    provider = provider.lower().strip()
+    day = analytics_day()
+    row = TokenUsage(
+        message_id=message_id,
+        conversation_id=conversation_id,
+        user_id=user_id,
+        provider=provider,
+        model=model,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=usage.cached_tokens,
+        estimated=usage.estimated,
+        first_token_ms=usage.first_token_ms,
+        latency_ms=usage.latency_ms,
+    )
+    db.add(row)
+    db.execute(
+        text(
+            f"INSERT INTO token_usage_daily (day, user_id, provider, model, {', '.join(USAGE_COLUMNS)}) "
+            "VALUES (:day, :user_id, :provider, :model, 1, :estimated, "
+            ":prompt_tokens, :completion_tokens, :cached_tokens, :latency_ms) "
+            "ON CONFLICT(day, user_id, provider, model) DO UPDATE SET "
+            + ", ".join(f"{c} = {c} + excluded.{c}" for c in USAGE_COLUMNS)
+        ),
+        {
+            "day": day,
+            "user_id": user_id,
+            "provider": provider,
+            "model": model,
+            "estimated": int(usage.estimated),
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "cached_tokens": usage.cached_tokens,
+            "latency_ms": usage.latency_ms,
+        },
+    )
+    db.commit()
+    quota_tracker.add(user_id, day, usage.total_tokens)
+    return row
+
+
+def _summarize(row) -> Dict:
+    """汇总行转为接口返回的用量字典"""
+
+    requests = row.requests or 0
+    prompt_tokens = row.prompt_tokens or 0
+    cached_tokens = row.cached_tokens or 0
+    return {
+        "requests": requests,
+        "estimated_requests": row.estimated_requests or 0,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": row.completion_tokens or 0,
+        "cached_tokens": cached_tokens,
+        "uncached_prompt_tokens": prompt_tokens - cached_tokens,
+        "cache_hit_rate": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+        "total_tokens": prompt_tokens + (row.completion_tokens or 0),
+        "avg_latency_ms": round((row.latency_ms or 0) / requests, 1) if requests else 0.0,
+    }
+
+
+def _sums(model) -> list:
+    """用量合计列（明细表按行计数，汇总表累加计数列）"""
+
+    if model is TokenUsage:
+        requests = func.count(TokenUsage.id)
+        estimated = func.sum(case((TokenUsage.estimated, 1), else_=0))
+    else:
+        requests = func.sum(TokenUsageDaily.requests)
+        estimated = func.sum(TokenUsageDaily.estimated_requests)
+    return [
+        requests.label("requests"),
+        estimated.label("estimated_requests"),
+        func.sum(model.prompt_tokens).label("prompt_tokens"),
+        func.sum(model.completion_tokens).label("completion_tokens"),
+        func.sum(model.cached_tokens).label("cached_tokens"),
+        func.sum(model.latency_ms).label("latency_ms"),
+    ]
+
+
+@traced()
+def get_usage(db: Session, days: int = 30, group_by: str = "user", limit: int = 50) -> Dict:
+    """
+    读取最近若干天的 token 用量
+
+    按用户、供应商、模型与日期分组时只查询汇总表；按对话分组时查询区间内的用量明细
+
+    Args:
+        db: 数据库会话
+        days: 天数（含今天）
+        group_by: 分组方式（user/provider/model/day/conversation）
+        limit: 返回的分组数上限（按总用量降序，按日期分组时按日期排列）
+
+    Returns:
+        区间合计与各分组的用量
+    """
+    end = date.fromisoformat(analytics_day())
+    start_day = (end - timedelta(days=days - 1)).isoformat()
+
+    totals = db.query(*_sums(TokenUsageDaily)).filter(TokenUsageDaily.day >= start_day).one()
+
+    if group_by == "conversation":
+        # 明细表的 created_at 为 UTC，按统计时区换算区间起点
+        offset = timedelta(hours=get_settings().ANALYTICS_UTC_OFFSET_HOURS)
+        model = TokenUsage
+        key = TokenUsage.conversation_id
+        query = db.query(key.label("key"), *_sums(model))\
+            .filter(TokenUsage.created_at >= datetime.fromisoformat(start_day) - offset)
+    else:
+        model = TokenUsageDaily
+        key = {
+            "user": TokenUsageDaily.user_id,
+            "provider": TokenUsageDaily.provider,
+            "model": TokenUsageDaily.model,
+            "day": TokenUsageDaily.day,
+        }[group_by]
+        query = db.query(key.label("key"), *_sums(model)).filter(TokenUsageDaily.day >= start_day)
+
+    query = query.group_by(key)
+    if group_by == "day":
+        query = query.order_by(key)
+    else:
+        query = query.order_by((func.sum(model.prompt_tokens) + func.sum(model.completion_tokens)).desc())
+    rows = query.limit(limit).all()
+
+    labels: Dict = {}
+    if group_by == "user" and rows:
+        labels = dict(db.query(User.id, User.username).filter(User.id.in_([row.key for row in rows])).all())
+
+    return {
+        "start": start_day,
+        "end": end.isoformat(),
+        "group_by": group_by,
+        "totals": _summarize(totals),
+        "items": [
+            {"key": str(row.key), "label": labels.get(row.key), **_summarize(row)}
+            for row in rows
+        ],
+    }
+
+
+@traced()
+def get_conversation_usage(db: Session, conversation_id: int) -> Dict:
+    """
+    读取对话中每次生成的用量明细与合计
+
+    Args:
+        db: 数据库会话
+        conversation_id: 对话 ID
+
+    Returns:
+        合计与按时间排列的明细
+    """
+    rows = db.query(TokenUsage)\
+        .filter(TokenUsage.conversation_id == conversation_id)\
+        .order_by(TokenUsage.id)\
+        .all()
+    totals = db.query(*_sums(TokenUsage)).filter(TokenUsage.conversation_id == conversation_id).one()
+    return {"conversation_id": conversation_id, "totals": _summarize(totals), "items": rows}
+
+
+def _ensure_user(db: Session, user_id: int) -> None:
+    if db.query(User.id).filter(User.id == user_id).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在",
+        )
+
+
+def _quota_response(db: Session, user_id: int, override: Optional[int]) -> Dict:
+    entry = quota_tracker.get(db, user_id)
+    return {
+        "user_id": user_id,
+        "daily_tokens": override,
+        "default_daily_tokens": get_settings().TOKEN_DAILY_QUOTA,
+        "effective_daily_tokens": entry.limit,
+        "used_today": entry.used,
+    }
+
+
+def get_user_quota(db: Session, user_id: int) -> Dict:
+    """获取用户的每日配额设置与当天已用量"""
+
+    _ensure_user(db, user_id)
+    override = db.query(UserTokenQuota.daily_tokens).filter(UserTokenQuota.user_id == user_id).scalar()
+    return _quota_response(db, user_id, override)
+
+
+def set_user_quota(db: Session, user_id: int, daily_tokens: Optional[int]) -> Dict:
+    """
+    设置用户的每日配额
+
+    Args:
+        db: 数据库会话
+        user_id: 用户 ID
+        daily_tokens: 每日 token 数（0 表示不限制，None 表示恢复默认配额）
+
+    Returns:
+        更新后的配额设置与当天已用量
+    """
+    _ensure_user(db, user_id)
+    row = db.query(UserTokenQuota).filter(UserTokenQuota.user_id == user_id).first()
+    if daily_tokens is None:
+        if row is not None:
+            db.delete(row)
+    elif row is None:
+        db.add(UserTokenQuota(user_id=user_id, daily_tokens=daily_tokens))
+    else:
+        row.daily_tokens = daily_tokens
+    db.commit()
+    quota_tracker.invalidate(user_id)
+    return _quota_response(db, user_id, daily_tokens)
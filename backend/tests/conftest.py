@@ -0,0 +1,48 @@
+"""
+测试公共配置
+在导入应用模块之前指向临时数据库（含归档数据库），整个测试会话共用一份初始化后的数据
+运行：cd backend && uv run --with pytest python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="cdhcprs-test-")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["ARCHIVE_DATABASE_PATH"] = os.path.join(_tmp_dir, "archive.db")
+os.environ["METRICS_DIR"] = ""
+os.environ["TRACE_EXPORT_FILE"] = ""
+os.environ["KNOWLEDGE_BASE_FILES"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from core.database import SessionLocal  # noqa: E402
+from init_db import init_database  # noqa: E402
+from main import app  # noqa: E402
+
+init_database()
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/auth/token", data={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,178 @@
+"""
+管理员：用户检索与批量操作
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import services.bulk
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.admin import search_users
+
+
+def _users(db, *usernames: str) -> None:
+    db.add_all([User(username=name, hashed_password="x") for name in usernames])
+    db.commit()
+
+
+def _wait_for_job(client, job_id: int, headers: dict) -> dict:
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/api/admin/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def _bulk_users(client, headers, **body) -> dict:
+    response = client.post("/api/admin/users/bulk", json=body, headers=headers)
+    assert response.status_code == 202, response.text
+    job = _wait_for_job(client, response.json()["id"], headers)
+    assert job["status"] == "succeeded", job["error"]
+    return job
+
+
+@pytest.fixture
+def no_batch_sleep(monkeypatch):
+    monkeypatch.setattr(services.bulk, "BATCH_SLEEP_SECONDS", 0)
+    monkeypatch.setattr(services.bulk.get_settings(), "BULK_USER_BATCH_SIZE", 2)
+
+
+def test_user_prefix_search_ignores_case(client, admin_headers, db):
+    _users(db, "CaseMix-1", "casemix-2", "CASEMIX-3", "other-casemix")
+
+    for q in ("casemix", "CaseMix", "CASEMIX-"):
+        page = search_users(db, q=q, match="prefix")
+        assert sorted(u.username for u in page["items"]) == ["CASEMIX-3", "CaseMix-1", "casemix-2"]
+    # 子串匹配同样不区分大小写
+    assert len(search_users(db, q="SEMIX", match="contains")["items"]) == 4
+
+    # 批量操作的用户名前缀与检索结果一致
+    response = client.post(
+        "/api/admin/users/bulk",
+        json={"action": "ban", "username_prefix": "CASEmix", "dry_run": True},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["matched"] == 3
+
+
+def test_user_prefix_search_uses_index(db):
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM users WHERE lower(username) >= :lower AND lower(username) < :upper"
+    ), {"lower": "ab", "upper": "ac"}).all()
+    assert any("ix_users_username_lower" in row[-1] for row in plan)
+
+
+def test_bulk_ban_and_unban_skip_admins(client, admin_headers, db, no_batch_sleep):
+    db.add_all([
+        User(username="BulkBan-root", hashed_password="x", role="admin"),
+        User(username="bulkban-1", hashed_password="x"),
+        User(username="bulkban-2", hashed_password="x"),
+        User(username="BULKBAN-3", hashed_password="x"),
+        User(username="bulkban-4", hashed_password="x", is_banned=True),
+    ])
+    db.commit()
+    users = {u.username: u for u in db.query(User).filter(User.username.ilike("bulkban-%"))}
+
+    preview = client.post(
+        "/api/admin/users/bulk",
+        json={"action": "ban", "username_prefix": "bulkBAN", "dry_run": True},
+        headers=admin_headers,
+    )
+    assert preview.status_code == 200
+    expected = sorted(users[name].id for name in ("bulkban-1", "bulkban-2", "BULKBAN-3"))
+    assert preview.json() == {"dry_run": True, "matched": 3, "sample_ids": expected}
+    db.expire_all()
+    assert not users["bulkban-1"].is_banned  # 试运行不修改数据
+
+    job = _bulk_users(client, admin_headers, action="ban", username_prefix="bulkban")
+    assert job["kind"] == "ban_users"
+    assert job["total"] == job["processed"] == 3
+    assert job["result"] == {"users": 3, "batches": 2}
+    db.expire_all()
+    assert all(users[name].is_banned for name in users if name != "BulkBan-root")
+    assert users["BulkBan-root"].is_banned is False
+
+    # 管理员账户即使显式指定也不受影响
+    root_id = users["BulkBan-root"].id
+    job = _bulk_users(client, admin_headers, action="ban", user_ids=[root_id])
+    assert job["result"]["users"] == 0
+
+    job = _bulk_users(
+        client, admin_headers, action="unban", user_ids=[users["bulkban-1"].id, users["bulkban-4"].id]
+    )
+    assert job["result"]["users"] == 2
+    db.expire_all()
+    assert [users[name].is_banned for name in ("bulkban-1", "bulkban-2", "bulkban-4")] == [False, True, False]
+
+
+def test_bulk_delete_users_removes_their_conversations(client, admin_headers, db, no_batch_sleep):
+    registered = datetime.utcnow() + timedelta(days=3650)
+    spam = [User(username=f"bulkdel-{i}", hashed_password="x", created_at=registered) for i in range(3)]
+    kept = User(username="bulkdel-early", hashed_password="x")
+    db.add_all([*spam, kept])
+    db.commit()
+    conversations = [Conversation(user_id=u.id, title="垃圾") for u in [*spam, kept]]
+    db.add_all(conversations)
+    db.commit()
+    db.add_all([Message(conversation_id=c.id, role="user", content="广告") for c in conversations])
+    db.commit()
+    spam_ids = [u.id for u in spam]
+    spam_conversation_ids = [c.id for c in conversations[:3]]
+    kept_id = kept.id
+
+    filters = {"username_prefix": "bulkdel-", "registered_after": (registered - timedelta(days=1)).isoformat()}
+    preview = client.post(
+        "/api/admin/users/bulk", json={"action": "delete", "dry_run": True, **filters}, headers=admin_headers
+    ).json()
+    assert preview["matched"] == 3 and preview["sample_ids"] == spam_ids
+
+    job = _bulk_users(client, admin_headers, action="delete", **filters)
+    assert job["result"]["users"] == 3
+
+    db.expire_all()
+    assert db.query(User).filter(User.id.in_(spam_ids)).count() == 0
+    assert db.query(Conversation).filter(Conversation.user_id.in_(spam_ids)).count() == 0
+    assert db.query(Message).filter(Message.conversation_id.in_(spam_conversation_ids)).count() == 0
+    assert db.query(Conversation).filter(Conversation.user_id == kept_id).count() == 1
+
+
+def test_admin_bulk_deletes_conversations_by_user_filter(client, admin_headers, db, monkeypatch):
+    monkeypatch.setattr(services.bulk, "BATCH_SLEEP_SECONDS", 0)
+    _users(db, "bulkconv-1", "bulkconv-2")
+    owners = db.query(User).filter(User.username.like("bulkconv-%")).order_by(User.id).all()
+    old = Conversation(user_id=owners[0].id, title="旧", created_at=datetime(2020, 1, 1))
+    new = Conversation(user_id=owners[0].id, title="新")
+    other = Conversation(user_id=owners[1].id, title="旧", created_at=datetime(2020, 1, 1))
+    db.add_all([old, new, other])
+    db.commit()
+    old_id, new_id, other_id = old.id, new.id, other.id
+
+    body = {"users": {"user_ids": [owners[0].id]}, "created_before": "2021-01-01T00:00:00"}
+    preview = client.post(
+        "/api/admin/conversations/bulk-delete", json={**body, "dry_run": True}, headers=admin_headers
+    )
+    assert preview.status_code == 200
+    assert preview.json()["sample_ids"] == [old_id]
+
+    response = client.post("/api/admin/conversations/bulk-delete", json=body, headers=admin_headers)
+    assert response.status_code == 202
+    job = _wait_for_job(client, response.json()["id"], admin_headers)
+    assert job["result"]["conversations"] == 1
+
+    db.expire_all()
+    remaining = {c.id for c in db.query(Conversation).filter(Conversation.id.in_([old_id, new_id, other_id]))}
+    assert remaining == {new_id, other_id}
+
+
+def test_bulk_operations_require_filters(client, admin_headers):
+    assert client.post("/api/admin/users/bulk", json={"action": "ban"}, headers=admin_headers).status_code == 422
+    assert client.post(
+        "/api/admin/users/bulk", json={"action": "promote", "user_ids": [1]}, headers=admin_headers
+    ).status_code == 422
+    assert client.post("/api/admin/conversations/bulk-delete", json={}, headers=admin_headers).status_code == 422
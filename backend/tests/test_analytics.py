@@ -0,0 +1,148 @@
+"""
+运营统计：按天增量汇总与重新汇总
+"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from core.config import get_settings
+from models.analytics import DailyStat, DiseaseDailyStat
+from models.archive import ArchivedMessage
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.analytics import DAILY_COLUMNS, analytics_day, extract_diseases, rebuild_analytics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_MESSAGE = "头晕乏力\n\n【患者信息】\n年龄：60\n疾病史：糖尿病、 冠心病\n症状：头晕"
+
+
+def _today(db) -> dict:
+    db.expire_all()
+    row = db.get(DailyStat, analytics_day())
+    return {column: getattr(row, column) if row else 0 for column in DAILY_COLUMNS}
+
+
+def _diseases(db) -> dict:
+    db.expire_all()
+    rows = db.query(DiseaseDailyStat).filter(DiseaseDailyStat.day == analytics_day())
+    return {row.disease: row.conversations for row in rows}
+
+
+def _diff(after: dict, before: dict) -> dict:
+    return {key: after.get(key, 0) - before.get(key, 0) for key in after if after.get(key, 0) != before.get(key, 0)}
+
+
+def test_extract_diseases():
+    assert extract_diseases(LEGACY_MESSAGE) == ["糖尿病", "冠心病"]
+    assert extract_diseases("【患者信息】\nDisease History: Hypertension, Gout") == ["Hypertension", "Gout"]
+    assert extract_diseases("疾病史：糖尿病") == []  # 没有问诊档案标记
+
+
+def test_analytics_day_uses_configured_offset(monkeypatch):
+    settings = get_settings()
+    now = datetime(2024, 1, 1, 20, 0, tzinfo=timezone.utc)
+    monkeypatch.setattr(settings, "ANALYTICS_UTC_OFFSET_HOURS", 8)
+    assert analytics_day(now) == "2024-01-02"
+    monkeypatch.setattr(settings, "ANALYTICS_UTC_OFFSET_HOURS", -5)
+    assert analytics_day(now) == "2024-01-01"
+
+
+def test_rollups_are_updated_with_writes(client, admin_headers, db):
+    before, diseases_before = _today(db), _diseases(db)
+
+    user = User(username="analytics-user", hashed_password="x")
+    db.add(user)
+    db.flush()
+    conversation = Conversation(user_id=user.id, title="统计")
+    db.add(conversation)
+    db.flush()
+    db.add_all([
+        Message(conversation_id=conversation.id, role="user", content=LEGACY_MESSAGE),
+        Message(conversation_id=conversation.id, role="assistant", content="建议监测血糖"),
+        Message(conversation_id=conversation.id, role="user", content="【患者信息】\n疾病史：糖尿病"),
+    ])
+    db.commit()
+
+    assert _diff(_today(db), before) == {
+        "active_users": 1,  # 同一用户当天多次发送只计一次
+        "new_users": 1,
+        "conversations": 1,
+        "messages": 3,
+        "user_messages": 2,
+        "assistant_messages": 1,
+        "assistant_chars": len("建议监测血糖"),
+    }
+    assert _diff(_diseases(db), diseases_before) == {"糖尿病": 1, "冠心病": 1}
+
+    # 汇总随事务回滚
+    before = _today(db)
+    db.add(Message(conversation_id=conversation.id, role="assistant", content="回滚"))
+    db.flush()
+    db.rollback()
+    assert _today(db) == before
+
+    # 结构化问诊档案中的疾病按对话计数
+    conversation_id = client.post("/api/chat/conversations", json={"title": "档案"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}/profile"
+    for diseases in (["高血压"], ["高血压", "2型糖尿病"]):
+        assert client.put(url, json={"age": 50, "diseases": diseases}, headers=admin_headers).status_code == 200
+    assert _diff(_diseases(db), diseases_before) == {"糖尿病": 1, "冠心病": 1, "高血压": 1, "2型糖尿病": 1}
+
+
+def test_rebuild_matches_incremental_rollups(client, admin_headers, db):
+    rebuild_analytics(batch_size=7)
+    assert db.query(func.sum(DailyStat.messages)).scalar() == (
+        db.query(Message).count() + db.query(ArchivedMessage).count()
+    )
+    assert db.query(func.sum(DailyStat.new_users)).scalar() == db.query(User).count()
+
+    conversation_id = client.post("/api/chat/conversations", json={"title": "重算"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}/profile"
+    assert client.put(url, json={"diseases": ["高血压"]}, headers=admin_headers).status_code == 200
+    db.add_all([
+        Message(conversation_id=conversation_id, role="user", content=LEGACY_MESSAGE),
+        Message(conversation_id=conversation_id, role="assistant", content="注意休息"),
+    ])
+    db.commit()
+    incremental, incremental_diseases = _today(db), _diseases(db)
+
+    scanned = []
+    stats = rebuild_analytics(batch_size=7, progress=scanned.append)
+    assert stats["messages"] == scanned[-1]
+    assert scanned == sorted(scanned)
+    assert _today(db) == incremental
+    assert _diseases(db) == incremental_diseases
+
+
+def test_analytics_endpoint_reads_rollups(client, admin_headers):
+    response = client.get("/api/admin/analytics", params={"days": 7}, headers=admin_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert [day["day"] for day in result["daily"]][-1] == result["end"] == analytics_day()
+    assert len(result["daily"]) == 7
+
+    today = result["daily"][-1]
+    assert today["messages"] > 0 and today["avg_reply_length"] > 0
+    assert result["totals"]["messages"] == sum(day["messages"] for day in result["daily"])
+    assert result["totals"]["active_users"] >= today["active_users"] > 0
+    counts = [item["conversations"] for item in result["diseases"]]
+    assert counts == sorted(counts, reverse=True)
+
+    assert client.get("/api/admin/analytics", params={"days": 0}, headers=admin_headers).status_code == 422
+
+
+def test_cli_prints_summary():
+    result = subprocess.run(
+        [sys.executable, "analytics_db.py", "--days", "3"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert analytics_day() in result.stdout
+    assert "合计" in result.stdout
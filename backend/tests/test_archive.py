@@ -0,0 +1,123 @@
+"""
+对话归档
+"""
+import json
+
+import services.archive
+
+from models.archive import ArchivedConversation, ArchivedMessage, ArchivedPatientProfileChange
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.archive import archive_conversations
+
+PROFILE = {"age": 60, "gender": "female", "diseases": ["2型糖尿病"], "symptoms": ["口渴"]}
+
+
+def _conversation_with_profile(client, admin_headers, db) -> int:
+    conversation_id = client.post("/api/chat/conversations", json={"title": "归档测试"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}/profile"
+    assert client.put(url, json=PROFILE, headers=admin_headers).status_code == 200
+
+    db.add_all([
+        Message(conversation_id=conversation_id, role="user", content="问题"),
+        Message(conversation_id=conversation_id, role="assistant", content="回答"),
+    ])
+    db.commit()
+    # 对话开始后的修改记录为差异
+    assert client.put(url, json={**PROFILE, "symptoms": ["口渴", "多尿"]}, headers=admin_headers).json()["version"] == 2
+    return conversation_id
+
+
+def _archive(db, conversation_id: int) -> None:
+    db.query(Conversation).filter(Conversation.id == conversation_id).update({"is_active": False})
+    db.commit()
+    archive_conversations(older_than_days=100000, include_inactive=True)
+    assert db.get(Conversation, conversation_id) is None
+
+
+def test_profile_survives_archiving(client, admin_headers, db):
+    conversation_id = _conversation_with_profile(client, admin_headers, db)
+    _archive(db, conversation_id)
+
+    profile = client.get(f"/api/chat/conversations/{conversation_id}/profile", headers=admin_headers).json()
+    assert profile["diseases"] == ["2型糖尿病"]
+    assert profile["symptoms"] == ["口渴", "多尿"]
+    assert profile["version"] == 2
+
+    # 修改记录指向归档库中重新分配 ID 后的最后一条消息
+    change = db.query(ArchivedPatientProfileChange)\
+        .filter(ArchivedPatientProfileChange.conversation_id == conversation_id)\
+        .one()
+    last_message = db.query(ArchivedMessage)\
+        .filter(ArchivedMessage.conversation_id == conversation_id)\
+        .order_by(ArchivedMessage.id.desc())\
+        .first()
+    assert change.after_message_id == last_message.id
+    assert "新增 多尿" in change.diff
+
+
+def test_export_includes_archived_profile(client, admin_headers, db):
+    conversation_id = _conversation_with_profile(client, admin_headers, db)
+    _archive(db, conversation_id)
+
+    records = [json.loads(line) for line in client.get("/api/chat/export", headers=admin_headers).text.splitlines()]
+    conversation = next(r for r in records if r["type"] == "conversation" and r["id"] == conversation_id)
+    assert conversation["is_archived"] is True
+    assert conversation["profile"]["symptoms"] == ["口渴", "多尿"]
+
+
+def test_archive_batches_resume_after_last_id(db, monkeypatch):
+    admin = db.query(User).filter(User.username == "admin").one()
+    conversations = [Conversation(user_id=admin.id, title=f"分批 {i}", is_active=i % 3 != 0) for i in range(9)]
+    db.add_all(conversations)
+    db.commit()
+    inactive = [c.id for c in conversations if not c.is_active]
+    active = [c.id for c in conversations if c.is_active]
+
+    cursors = []
+    find = services.archive._find_archive_candidates
+
+    def recording(conn, cutoff, include_inactive, limit, after_id=0):
+        cursors.append(after_id)
+        return find(conn, cutoff, include_inactive, limit, after_id)
+
+    monkeypatch.setattr(services.archive, "_find_archive_candidates", recording)
+    archive_conversations(batch_size=1, older_than_days=100000, include_inactive=True)
+
+    # 每批从上一批的最大 ID 之后继续查找
+    assert cursors == sorted(set(cursors)) and cursors[0] == 0
+    assert db.query(Conversation).filter(Conversation.id.in_(inactive)).count() == 0
+    assert db.query(ArchivedConversation).filter(ArchivedConversation.id.in_(inactive)).count() == len(inactive)
+    assert db.query(Conversation).filter(Conversation.id.in_(active)).count() == len(active)
+
+
+def test_sync_cursor_is_reset_after_archiving(client, admin_headers, db):
+    conversation_id = _conversation_with_profile(client, admin_headers, db)
+    url = f"/api/chat/conversations/{conversation_id}/messages/sync"
+    synced = client.get(url, headers=admin_headers).json()
+    assert [m["content"] for m in synced["messages"]] == ["问题", "回答"]
+    cursor = synced["latest_id"]
+
+    # 游标不是该对话中的消息
+    assert client.get(url, params={"after_id": cursor - 1}, headers=admin_headers).json()["reset"] is False
+    assert client.get(url, params={"after_id": cursor + 1}, headers=admin_headers).json()["reset"] is True
+
+    _archive(db, conversation_id)
+
+    # 归档前的游标：即使恰好等于归档后的某个消息 ID 也需全量同步
+    archived_ids = [
+        m.id for m in db.query(ArchivedMessage).filter(ArchivedMessage.conversation_id == conversation_id)
+    ]
+    for after_id in (cursor, archived_ids[0]):
+        response = client.get(url, params={"after_id": after_id}, headers=admin_headers).json()
+        assert response["reset"] is True
+        assert response["is_archived"] is True
+        assert [m["content"] for m in response["messages"]] == ["问题", "回答"]
+
+    # 全量同步后以归档后的游标继续增量同步
+    response = client.get(
+        url, params={"after_id": archived_ids[-1], "archived": True, "known_count": 2}, headers=admin_headers
+    ).json()
+    assert response["reset"] is False
+    assert response["messages"] == []
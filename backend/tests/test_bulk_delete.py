@@ -0,0 +1,117 @@
+"""
+批量删除对话：后台分批任务与进度查询
+"""
+import time
+
+import pytest
+
+import services.bulk
+from models.conversation import Conversation
+from models.message import Message
+
+
+def _login(client, username: str) -> dict:
+    client.post("/api/auth/register", json={"username": username, "password": "secret123"})
+    response = client.post("/api/auth/token", data={"username": username, "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _conversations(client, db, headers, count: int) -> list:
+    ids = []
+    for i in range(count):
+        conversation_id = client.post("/api/chat/conversations", json={"title": f"批量 {i}"}, headers=headers).json()["id"]
+        db.add_all([
+            Message(conversation_id=conversation_id, role="user", content="问题"),
+            Message(conversation_id=conversation_id, role="assistant", content="回答"),
+        ])
+        ids.append(conversation_id)
+    db.commit()
+    return ids
+
+
+def _wait_for_job(client, url: str, headers: dict) -> dict:
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(url, headers=headers).json()
+        if job["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def _remaining(db, ids: list) -> list:
+    db.expire_all()
+    return [c.id for c in db.query(Conversation).filter(Conversation.id.in_(ids)).order_by(Conversation.id)]
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(services.bulk, "BATCH_SLEEP_SECONDS", 0)
+    monkeypatch.setattr(services.bulk.get_settings(), "BULK_DELETE_BATCH_SIZE", 2)
+
+
+def test_user_bulk_deletes_selected_conversations(client, db):
+    headers = _login(client, "bulk_delete_user")
+    ids = _conversations(client, db, headers, 5)
+
+    response = client.post("/api/chat/conversations/bulk-delete", json={"conversation_ids": ids[:3]}, headers=headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "delete_conversations"
+    assert job["total"] == 3
+
+    job = _wait_for_job(client, f"/api/chat/jobs/{job['id']}", headers)
+    assert job["status"] == "succeeded", job["error"]
+    assert job["processed"] == 3
+    assert job["result"] == {"conversations": 3, "batches": 2}
+    assert _remaining(db, ids) == ids[3:]
+    assert db.query(Message).filter(Message.conversation_id.in_(ids[:3])).count() == 0
+
+    response = client.post("/api/chat/conversations/bulk-delete", json={"all": True}, headers=headers)
+    job = _wait_for_job(client, f"/api/chat/jobs/{response.json()['id']}", headers)
+    assert job["result"]["conversations"] == 2
+    assert _remaining(db, ids) == []
+
+
+def test_user_bulk_delete_only_touches_own_conversations(client, admin_headers, db):
+    headers = _login(client, "bulk_delete_owner")
+    other_headers = _login(client, "bulk_delete_other")
+    own = _conversations(client, db, headers, 1)
+    other = _conversations(client, db, other_headers, 1)
+
+    response = client.post(
+        "/api/chat/conversations/bulk-delete", json={"conversation_ids": own + other}, headers=headers
+    ).json()
+    assert response["total"] == 1
+    job_url = f"/api/chat/jobs/{response['id']}"
+    assert _wait_for_job(client, job_url, headers)["result"]["conversations"] == 1
+    assert _remaining(db, own + other) == other
+
+    # 任务只对发起人与管理员可见
+    assert client.get(job_url, headers=other_headers).status_code == 404
+    assert client.get(job_url, headers=admin_headers).status_code == 200
+
+
+def test_user_bulk_delete_requires_target(client):
+    headers = _login(client, "bulk_delete_empty")
+    assert client.post("/api/chat/conversations/bulk-delete", json={}, headers=headers).status_code == 422
+    assert client.post(
+        "/api/chat/conversations/bulk-delete", json={"conversation_ids": []}, headers=headers
+    ).status_code == 422
+
+
+def test_admin_bulk_deletes_conversations_by_id(client, admin_headers, db):
+    headers = _login(client, "bulk_delete_admin_target")
+    ids = _conversations(client, db, headers, 3)
+
+    response = client.post(
+        "/api/admin/conversations/bulk-delete", json={"conversation_ids": ids[1:]}, headers=admin_headers
+    )
+    assert response.status_code == 202
+    job = _wait_for_job(client, f"/api/admin/jobs/{response.json()['id']}", admin_headers)
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"]["conversations"] == 2
+    assert _remaining(db, ids) == ids[:1]
+
+    assert client.post(
+        "/api/admin/conversations/bulk-delete", json={"conversation_ids": ids}, headers=headers
+    ).status_code == 403
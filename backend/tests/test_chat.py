@@ -0,0 +1,130 @@
+"""
+对话接口：热点接口的查询次数预算、流式响应中断时的用量计量
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import services.llm
+from core.query_inspector import assert_max_queries, capture_queries
+from models.message import Message
+from models.usage import TokenUsage
+from models.user import User
+from routers.chat import send_message
+from schemas.message import MessageCreate
+from services.settings import update_setting
+
+
+class FakeStream:
+    """模拟 OpenAI 兼容接口的流式响应"""
+
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.pieces:
+            raise StopAsyncIteration
+        delta = SimpleNamespace(content=self.pieces.pop(0))
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch, db):
+    async def create(**kwargs):
+        return FakeStream(["舌淡", "苔白"])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(services.llm, "_create_async_client", lambda *args, **kwargs: client)
+    update_setting(db, "llm_api_key", "test-key")
+
+
+@pytest.fixture
+def conversation_id(client, admin_headers):
+    response = client.post("/api/chat/conversations", json={"title": "查询预算"}, headers=admin_headers)
+    return response.json()["id"]
+
+
+# 发送一条消息的实测查询次数：
+# 用户与对话 2，系统设置、历史消息与问诊档案 3，两条消息各自写入与刷新 4、推送事件 2，
+# 全文索引 6，统计 3，用量记录 2
+SEND_MESSAGE_QUERIES = 22
+
+
+def _send(client, admin_headers, conversation_id: int, content: str):
+    with capture_queries() as stats:
+        response = client.post(
+            f"/api/chat/conversations/{conversation_id}/messages",
+            json={"content": content},
+            headers=admin_headers,
+        )
+    assert response.status_code == 200
+    assert response.text == "舌淡苔白"
+    return stats
+
+
+def test_send_message_has_no_repeated_queries(client, admin_headers, fake_llm, conversation_id):
+    stats = _send(client, admin_headers, conversation_id, "最近总是乏力")
+    assert stats.duplicates() == []
+    assert stats.count == SEND_MESSAGE_QUERIES, stats.statements
+
+
+def test_send_message_queries_do_not_grow_with_history(client, admin_headers, db, fake_llm, conversation_id):
+    db.add_all([
+        Message(conversation_id=conversation_id, role="user" if i % 2 == 0 else "assistant", content=f"历史消息 {i}")
+        for i in range(60)
+    ])
+    db.commit()
+
+    counts = [_send(client, admin_headers, conversation_id, f"第 {i} 轮").count for i in range(5)]
+    assert counts == [SEND_MESSAGE_QUERIES] * 5
+
+
+def test_read_endpoints_query_budget(client, admin_headers, conversation_id):
+    with assert_max_queries(5):
+        assert client.get("/api/chat/conversations", headers=admin_headers).status_code == 200
+    with assert_max_queries(4):
+        response = client.get(f"/api/chat/conversations/{conversation_id}/messages", headers=admin_headers)
+        assert response.status_code == 200
+
+
+def test_disconnect_still_records_usage(db, fake_llm, conversation_id):
+    admin = db.query(User).filter(User.username == "admin").one()
+    response = asyncio.run(send_message(conversation_id, MessageCreate(content="口干多饮"), admin, db))
+
+    async def read_first_chunk_then_disconnect():
+        first = await response.body_iterator.__anext__()
+        await response.body_iterator.aclose()
+        return first
+
+    assert asyncio.run(read_first_chunk_then_disconnect()) == "舌淡"
+
+    usage = db.query(TokenUsage).filter(TokenUsage.conversation_id == conversation_id).one()
+    assert usage.estimated
+    assert usage.message_id is None
+    assert usage.prompt_tokens > 0 and usage.completion_tokens > 0
+    # 未完成的回复不保存为助手消息
+    roles = [row.role for row in db.query(Message.role).filter(Message.conversation_id == conversation_id)]
+    assert roles == ["user"]
+
+
+def test_provider_error_is_not_billed(client, admin_headers, db, monkeypatch, conversation_id):
+    async def create(**kwargs):
+        raise ConnectionError("upstream unavailable")
+
+    failing = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(services.llm, "_create_async_client", lambda *args, **kwargs: failing)
+    update_setting(db, "llm_api_key", "test-key")
+
+    response = client.post(
+        f"/api/chat/conversations/{conversation_id}/messages",
+        json={"content": "最近总是乏力"},
+        headers=admin_headers,
+    )
+    assert "[错误]" in response.text
+
+    usage = db.query(TokenUsage).filter(TokenUsage.conversation_id == conversation_id).one()
+    assert (usage.prompt_tokens, usage.completion_tokens, usage.estimated) == (0, 0, False)
@@ -0,0 +1,95 @@
+"""
+数据清理：孤立消息与保留策略
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+from core.database import engine
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.cleanup import purge_expired_conversations, purge_orphaned_messages
+
+
+def _orphaned_messages(count: int):
+    """模拟外键未生效时留下的孤立消息"""
+
+    raw = sqlite3.connect(engine.url.database)
+    raw.execute("PRAGMA foreign_keys=OFF")
+    missing = raw.execute("SELECT COALESCE(MAX(id), 0) + 1000 FROM conversations").fetchone()[0]
+    ids = []
+    for i in range(count):
+        cursor = raw.execute(
+            "INSERT INTO messages (conversation_id, role, content, created_at) "
+            "VALUES (?, 'user', ?, CURRENT_TIMESTAMP)",
+            (missing, f"孤立消息 {i}"),
+        )
+        ids.append(cursor.lastrowid)
+    raw.commit()
+    raw.close()
+    return ids
+
+
+def _remaining(db, ids):
+    return sorted(row[0] for row in db.query(Message.id).filter(Message.id.in_(ids)))
+
+
+def test_orphaned_messages_are_purged_in_batches(db):
+    orphans = _orphaned_messages(5)
+
+    preview = purge_orphaned_messages(batch_size=2, dry_run=True, sleep_seconds=0)
+    assert preview["matched"] >= 5 and preview["deleted"] == 0
+    assert _remaining(db, orphans) == orphans
+
+    batches = []
+    stats = purge_orphaned_messages(
+        batch_size=2, sleep_seconds=0, progress=lambda task, current: batches.append(current["matched"])
+    )
+    assert stats["deleted"] == stats["matched"] >= 5
+    assert stats["batches"] == len(batches) >= 3
+    assert _remaining(db, orphans) == []
+
+
+def test_orphan_purge_resumes_from_checkpoint(db, tmp_path):
+    orphans = _orphaned_messages(4)
+    state_file = tmp_path / "cleanup-state.json"
+    # 上一次运行在第二条之后中断
+    state_file.write_text(json.dumps({"orphaned_messages": orphans[1]}), encoding="utf-8")
+
+    purge_orphaned_messages(batch_size=1, sleep_seconds=0, state_file=str(state_file))
+    assert _remaining(db, orphans) == orphans[:2]
+    # 完成后清除断点，下次从头扫描
+    assert json.loads(state_file.read_text(encoding="utf-8")) == {}
+
+    purge_orphaned_messages(batch_size=10, sleep_seconds=0, state_file=str(state_file))
+    assert _remaining(db, orphans) == []
+
+
+def test_expired_conversations_are_purged(db):
+    user = User(username="cleanup-retention", hashed_password="x")
+    db.add(user)
+    db.flush()
+    old = datetime.utcnow() - timedelta(days=400)
+    expired = Conversation(user_id=user.id, title="过期", created_at=old)
+    recent_reply = Conversation(user_id=user.id, title="近期仍有新消息", created_at=old)
+    fresh = Conversation(user_id=user.id, title="新对话")
+    db.add_all([expired, recent_reply, fresh])
+    db.flush()
+    db.add_all([
+        Message(conversation_id=expired.id, role="user", content="旧消息", created_at=old),
+        Message(conversation_id=recent_reply.id, role="user", content="旧消息", created_at=old),
+        Message(conversation_id=recent_reply.id, role="assistant", content="新回复"),
+    ])
+    db.commit()
+    expired_id, recent_id, fresh_id = ids = [expired.id, recent_reply.id, fresh.id]
+
+    preview = purge_expired_conversations(retention_days=365, dry_run=True, sleep_seconds=0)
+    assert preview["matched"] >= 1 and preview["deleted"] == 0
+    assert purge_expired_conversations(retention_days=0)["matched"] == 0
+
+    purge_expired_conversations(retention_days=365, sleep_seconds=0)
+    db.expire_all()
+    remaining = [row[0] for row in db.query(Conversation.id).filter(Conversation.id.in_(ids)).order_by(Conversation.id)]
+    assert remaining == [recent_id, fresh_id]
+    assert db.query(Message).filter(Message.conversation_id == expired_id).count() == 0
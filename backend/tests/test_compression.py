@@ -0,0 +1,59 @@
+"""
+消息内容透明压缩
+"""
+import pytest
+from sqlalchemy import text
+
+import core.compression
+from core.compression import CODEC_ZLIB, CODEC_ZSTD, compress_text, decompress_value, is_compressed, resolve_codec
+from core.config import get_settings
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.search import search_conversations
+
+LONG_TEXT = "患者主诉头晕乏力，舌淡苔白，脉细弱。建议健脾益气，注意饮食清淡，规律作息。" * 40
+
+
+def test_compress_round_trip_respects_threshold():
+    compressed = compress_text(LONG_TEXT, CODEC_ZLIB, threshold=1024)
+    assert is_compressed(compressed)
+    assert len(compressed) < len(LONG_TEXT.encode("utf-8"))
+    assert decompress_value(compressed) == LONG_TEXT
+
+    # 未达到阈值的文本与未压缩的历史数据保持原样
+    assert compress_text("口干多饮", CODEC_ZLIB, threshold=1024) == "口干多饮"
+    assert decompress_value("未压缩的历史数据") == "未压缩的历史数据"
+
+
+def test_zstd_falls_back_to_zlib_without_zstandard(monkeypatch):
+    monkeypatch.setattr(core.compression, "zstandard", None)
+    assert resolve_codec("zstd") == CODEC_ZLIB
+    assert resolve_codec("none") is None
+
+
+@pytest.mark.skipif(core.compression.zstandard is None, reason="未安装 zstandard")
+def test_zstd_round_trip():
+    compressed = compress_text(LONG_TEXT, CODEC_ZSTD, threshold=1024)
+    assert decompress_value(compressed) == LONG_TEXT
+
+
+def test_compressed_messages_are_transparent_and_searchable(db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "MESSAGE_COMPRESSION", "zlib")
+    user = User(username="compression-user", hashed_password="x")
+    db.add(user)
+    db.flush()
+    conversation = Conversation(user_id=user.id, title="压缩")
+    db.add(conversation)
+    db.flush()
+    message = Message(conversation_id=conversation.id, role="assistant", content=LONG_TEXT + "证属肝阳上亢")
+    db.add(message)
+    db.commit()
+
+    stored = db.execute(text("SELECT typeof(content) FROM messages WHERE id = :id"), {"id": message.id}).scalar()
+    assert stored == "blob"
+
+    db.expire_all()
+    assert db.get(Message, message.id).content.endswith("证属肝阳上亢")
+    results = search_conversations(db, "肝阳上亢", user.id)["results"]
+    assert [result["message_id"] for result in results] == [message.id]
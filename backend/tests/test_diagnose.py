@@ -0,0 +1,72 @@
+"""
+数据库诊断脚本的性能报告
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from sqlalchemy import create_engine
+
+from core.database import Base, engine
+from diagnose_db import SERVICE_QUERIES, collect_performance_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_report_covers_service_queries():
+    report = collect_performance_report(engine.url.database)
+
+    assert {"pragmas", "row_counts", "distributions", "statistics", "query_plans"} <= set(report)
+    with sqlite3.connect(engine.url.database) as raw:
+        assert report["row_counts"]["users"] == raw.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    plans = {plan["name"]: plan for plan in report["query_plans"]}
+    assert list(plans) == [name for name, _, _ in SERVICE_QUERIES]
+    assert not [name for name, plan in plans.items() if "error" in plan]
+    # 热点查询使用索引
+    for name in ("auth.get_current_user", "admin.search_users", "chat.get_conversation_by_id"):
+        assert plans[name]["full_scan"] is False
+    assert any("ix_users_username_lower" in step for step in plans["admin.search_users_prefix"]["plan"])
+
+
+def test_report_flags_stale_statistics(tmp_path):
+    path = str(tmp_path / "stats.db")
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{path}"))
+
+    assert collect_performance_report(path)["statistics"] == {"analyzed": False, "tables": {}, "stale": True}
+
+    with sqlite3.connect(path) as raw:
+        raw.executemany(
+            "INSERT INTO users (username, hashed_password, role, is_banned, created_at) "
+            "VALUES (?, 'x', 'user', 0, CURRENT_TIMESTAMP)",
+            ((f"stat{i}",) for i in range(10)),
+        )
+        raw.execute("ANALYZE")
+    statistics = collect_performance_report(path)["statistics"]
+    assert statistics["analyzed"] and not statistics["stale"]
+    assert statistics["tables"]["users"]["actual_rows"] == 10
+
+    with sqlite3.connect(path) as raw:
+        raw.executemany(
+            "INSERT INTO users (username, hashed_password, role, is_banned, created_at) "
+            "VALUES (?, 'x', 'user', 0, CURRENT_TIMESTAMP)",
+            ((f"more{i}",) for i in range(20)),
+        )
+    statistics = collect_performance_report(path)["statistics"]
+    assert statistics["stale"] and statistics["tables"]["users"]["stale"]
+
+
+def test_cli_writes_json_report(tmp_path):
+    output = tmp_path / "report.json"
+    result = subprocess.run(
+        [sys.executable, "diagnose_db.py", engine.url.database, "--perf", "--json", str(output)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "数据库性能报告" in result.stdout
+    assert json.loads(output.read_text(encoding="utf-8"))["database"] == os.path.abspath(engine.url.database)
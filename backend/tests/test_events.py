@@ -0,0 +1,68 @@
+"""
+推送事件：事件日志与跨 worker 转发
+"""
+import asyncio
+
+from sqlalchemy import text
+
+from core.database import engine
+from core.events import broker
+from models.event import Event
+from services.events import EventRelay, migrate_events_table, prune_events
+
+
+def _log_event(db, user_id: int, event_type: str) -> None:
+    """模拟其他 worker 写入的事件"""
+
+    db.add(Event(user_id=user_id, type=event_type, data="{}", origin="other-worker"))
+    db.commit()
+
+
+def test_relay_delivers_events_after_log_is_pruned(db):
+    user_id = 990001
+    relay = EventRelay()
+
+    async def scenario():
+        subscription = broker.subscribe(user_id)
+        try:
+            relay._last_id = relay._latest_id()
+            _log_event(db, user_id, "before.prune")
+            relay._poll()
+            assert subscription.queue.get_nowait()["type"] == "before.prune"
+
+            # 空闲超过保留时间，事件日志被清空
+            prune_events(retention_minutes=-1)
+            assert db.query(Event).count() == 0
+
+            _log_event(db, user_id, "after.prune")
+            relay._poll()
+            return subscription.queue.get_nowait()["type"]
+        finally:
+            broker.unsubscribe(subscription)
+
+    assert asyncio.run(scenario()) == "after.prune"
+
+
+def test_legacy_events_table_is_migrated(db):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE events"))
+        conn.execute(text(
+            "CREATE TABLE events (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER, type VARCHAR NOT NULL, "
+            "data TEXT NOT NULL, origin VARCHAR NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+        ))
+        conn.execute(text("CREATE INDEX ix_events_created_at ON events (created_at)"))
+        conn.execute(text("INSERT INTO events (id, type, data, origin) VALUES (41, 'legacy', '{}', 'old')"))
+
+    assert migrate_events_table()
+    assert not migrate_events_table()
+
+    with engine.connect() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'events'")).scalar()
+    assert "AUTOINCREMENT" in sql.upper()
+    assert [row.id for row in db.query(Event.id)] == [41]
+
+    # 清空后新事件的 ID 继续增长
+    db.query(Event).delete()
+    db.commit()
+    _log_event(db, 1, "after.migration")
+    assert db.query(Event.id).scalar() == 42
@@ -0,0 +1,91 @@
+"""
+对话流式导出（NDJSON）
+"""
+import json
+
+import pytest
+
+import services.export
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.export import iter_user_export
+
+USERNAME = "export_user"
+
+
+@pytest.fixture(scope="module")
+def export_user(client):
+    client.post("/api/auth/register", json={"username": USERNAME, "password": "secret123"})
+    response = client.post("/api/auth/token", data={"username": USERNAME, "password": "secret123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    conversation_ids = []
+    for i in range(3):
+        created = client.post("/api/chat/conversations", json={"title": f"导出 {i}"}, headers=headers).json()
+        conversation_ids.append(created["id"])
+    return headers, conversation_ids
+
+
+def _records(text: str):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_export_streams_conversations_in_order(client, admin_headers, export_user, db):
+    headers, conversation_ids = export_user
+    for conversation_id in conversation_ids[:2]:
+        db.add_all([
+            Message(conversation_id=conversation_id, role="user", content=f"问题 {conversation_id}"),
+            Message(conversation_id=conversation_id, role="assistant", content=f"回答 {conversation_id}"),
+        ])
+    db.commit()
+
+    response = client.get("/api/chat/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"].startswith('attachment; filename="conversations-')
+
+    records = _records(response.text)
+    assert [r["type"] for r in records] == [
+        "export",
+        "conversation", "message", "message",
+        "conversation", "message", "message",
+        "conversation",
+        "end",
+    ]
+    assert records[0]["after_id"] is None
+    assert [r["id"] for r in records if r["type"] == "conversation"] == conversation_ids
+    assert [r["content"] for r in records[2:4]] == [f"问题 {conversation_ids[0]}", f"回答 {conversation_ids[0]}"]
+    assert all(r["conversation_id"] == conversation_ids[1] for r in records[5:7])
+    assert records[-1] == {
+        "type": "end",
+        "conversations": 3,
+        "messages": 4,
+        "last_conversation_id": conversation_ids[-1],
+    }
+
+    # 只导出当前用户的对话
+    admin_export = _records(client.get("/api/chat/export", headers=admin_headers).text)
+    assert not set(conversation_ids) & {r["id"] for r in admin_export if r["type"] == "conversation"}
+
+
+def test_export_resumes_after_id(client, export_user):
+    headers, conversation_ids = export_user
+    records = _records(client.get("/api/chat/export", params={"after_id": conversation_ids[0]}, headers=headers).text)
+    assert records[0]["after_id"] == conversation_ids[0]
+    assert [r["id"] for r in records if r["type"] == "conversation"] == conversation_ids[1:]
+    assert records[-1]["conversations"] == 2
+
+    assert client.get("/api/chat/export", params={"after_id": -1}, headers=headers).status_code == 422
+    assert client.get("/api/chat/export").status_code == 401
+
+
+def test_export_is_chunked(export_user, db, monkeypatch):
+    monkeypatch.setattr(services.export, "CHUNK_SIZE", 64)
+    user = db.query(User).filter(User.username == USERNAME).one()
+
+    chunks = list(iter_user_export(db, user))
+    assert len(chunks) > 3
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    records = _records(b"".join(chunks).decode("utf-8"))
+    assert records[-1]["conversations"] == db.query(Conversation).filter(Conversation.user_id == user.id).count()
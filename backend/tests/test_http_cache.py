@@ -0,0 +1,70 @@
+"""
+读接口的条件请求（ETag / 304）
+"""
+from core.http_cache import _etag_matches, make_etag
+from models.message import Message
+from services.settings import update_setting
+
+
+def _revalidate(client, url, headers=None):
+    """先正常请求取得 ETag，再携带 If-None-Match 请求"""
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    second = client.get(url, headers={**(headers or {}), "If-None-Match": etag})
+    return etag, second
+
+
+def test_etag_weak_comparison():
+    etag = make_etag("messages", 1, 2)
+    assert etag.startswith('W/"')
+    assert _etag_matches(etag, etag)
+    assert _etag_matches(etag[2:], etag)
+    assert _etag_matches(f'"other", {etag}', etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches(None, etag)
+    assert not _etag_matches(make_etag("messages", 1, 3), etag)
+
+
+def test_conversation_list_is_revalidated(client, admin_headers):
+    url = "/api/chat/conversations"
+    etag, cached = _revalidate(client, url, admin_headers)
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert cached.headers["cache-control"] == "private, no-cache"
+
+    created = client.post(url, json={"title": "缓存失效"}, headers=admin_headers).json()
+    changed = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert created["id"] in [conversation["id"] for conversation in changed.json()]
+
+    etag = changed.headers["etag"]
+    assert client.delete(f"/api/chat/conversations/{created['id']}", headers=admin_headers).status_code == 204
+    assert client.get(url, headers={**admin_headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_messages_are_revalidated(client, admin_headers, db):
+    conversation_id = client.post("/api/chat/conversations", json={"title": "消息缓存"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}/messages"
+    etag, cached = _revalidate(client, url, admin_headers)
+    assert cached.status_code == 304
+
+    db.add(Message(conversation_id=conversation_id, role="user", content="新消息"))
+    db.commit()
+    changed = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [message["content"] for message in changed.json()] == ["新消息"]
+
+
+def test_public_settings_are_revalidated(client, db):
+    url = "/api/public/settings"
+    etag, cached = _revalidate(client, url)
+    assert cached.status_code == 304
+    assert cached.headers["cache-control"] == "public, no-cache"
+
+    update_setting(db, "website_name", "条件请求测试")
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["website_name"] == "条件请求测试"
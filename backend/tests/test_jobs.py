@@ -0,0 +1,72 @@
+"""
+后台任务：worker 重启后遗留任务的处理
+"""
+import os
+
+from sqlalchemy import text
+
+from core.database import engine
+from models.job import BackgroundJob
+from services.events import PROCESS_TOKEN
+from services.jobs import fail_orphaned_jobs, migrate_jobs_table
+
+
+def _dead_pid() -> int:
+    pid = 4_000_000
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid += 1
+
+
+def test_orphaned_jobs_are_failed_on_startup(db):
+    owners = {
+        "dead": f"{_dead_pid()}-deadbeef",
+        "reused_pid": f"{os.getpid()}-00000000",  # 容器重启后复用了相同 PID
+        "legacy": None,
+        "live": f"{os.getppid()}-feedface",
+    }
+    jobs = {}
+    for name, owner in owners.items():
+        jobs[name] = BackgroundJob(kind="test", user_id=1, status="running", owner=owner)
+        db.add(jobs[name])
+    finished = BackgroundJob(kind="test", user_id=1, status="succeeded", owner=owners["dead"])
+    db.add(finished)
+    db.commit()
+
+    assert fail_orphaned_jobs() == 3
+
+    db.expire_all()
+    for name in ("dead", "reused_pid", "legacy"):
+        assert jobs[name].status == "failed"
+        assert jobs[name].error
+        assert jobs[name].finished_at is not None
+    assert jobs["live"].status == "running"
+    assert finished.status == "succeeded"
+
+    jobs["live"].status = "succeeded"
+    db.commit()
+
+
+def test_new_jobs_record_their_owner(client, admin_headers, db):
+    response = client.post(
+        "/api/admin/users/bulk",
+        json={"action": "ban", "username_prefix": "no-such-user-for-jobs-test"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 202, response.text
+
+    job = db.get(BackgroundJob, response.json()["id"])
+    assert job.owner == PROCESS_TOKEN
+
+
+def test_jobs_table_gets_owner_column():
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE background_jobs DROP COLUMN owner"))
+
+    assert migrate_jobs_table() is True
+    assert migrate_jobs_table() is False
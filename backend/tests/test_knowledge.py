@@ -0,0 +1,27 @@
+"""
+知识库查找与问诊档案规范化
+"""
+from services.knowledge import canonical_profile_terms, get_knowledge_base
+
+# 前端症状列表中既有“X”又有“X（说明）”的两组症状
+PAREN_PAIRS = [
+    ("血压升高", "血压升高（收缩压/舒张压超过正常值）"),
+    ("血糖升高", "血糖升高（空腹/餐后）"),
+]
+
+
+def test_lookup_prefers_exact_name():
+    knowledge_base = get_knowledge_base()
+    for plain, detailed in PAREN_PAIRS:
+        assert knowledge_base.lookup(plain, "symptom")[0].name == plain
+        assert knowledge_base.lookup(detailed, "symptom")[0].name == detailed
+
+
+def test_canonical_profile_terms_keeps_both_variants():
+    for plain, detailed in PAREN_PAIRS:
+        _, symptoms = canonical_profile_terms([], [plain, detailed])
+        assert symptoms == [plain, detailed]
+
+
+def test_lookup_alias():
+    assert [term.name for term in get_knowledge_base().lookup("消渴", "disease")] == ["2型糖尿病"]
@@ -0,0 +1,37 @@
+"""
+数据库维护
+"""
+from sqlalchemy import text
+
+from core.database import engine
+from services.maintenance import AUTO_VACUUM_INCREMENTAL, incremental_vacuum
+
+
+def _freelist_count() -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+
+def test_incremental_vacuum_frees_configured_pages():
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == AUTO_VACUUM_INCREMENTAL
+
+    # 写入后删除一张临时表，产生足够多的空闲页
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE vacuum_probe (payload TEXT)"))
+        conn.execute(
+            text("INSERT INTO vacuum_probe (payload) VALUES (:payload)"),
+            [{"payload": "x" * 2000} for _ in range(400)],
+        )
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE vacuum_probe"))
+
+    before = _freelist_count()
+    assert before > 50
+
+    assert incremental_vacuum(50) == 50
+    assert _freelist_count() == before - 50
+
+    assert incremental_vacuum(before) == before - 50
+    assert _freelist_count() == 0
+    assert incremental_vacuum(50) == 0
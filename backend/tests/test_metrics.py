@@ -0,0 +1,91 @@
+"""
+运行指标：访问控制、HTTP 指标与多进程快照汇总
+"""
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.config import Settings, get_settings
+from core.metrics import DEAD_SNAPSHOT, HTTP_REQUESTS, MetricsMiddleware, render_metrics
+
+
+def _dead_pid() -> int:
+    pid = 4_000_000
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid += 1
+
+
+def _write(directory, pid: int, published: int) -> None:
+    snapshot = {
+        "events_published_total": [[["test.dead"], published]],
+        "llm_active_streams": [[["dead-provider"], 3]],
+    }
+    with open(os.path.join(directory, f"metrics-{pid}.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+
+
+def test_metrics_are_disabled_by_default(client):
+    assert Settings.model_fields["METRICS_ENABLED"].default is False
+    assert client.get("/api/metrics").status_code == 404
+
+
+def test_metrics_token_is_checked(client, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "metrics-token")
+
+    assert client.get("/api/metrics").status_code == 401
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer metrics-token"})
+    assert response.status_code == 200
+    assert "# TYPE http_requests_total counter" in response.text
+
+
+def test_dead_worker_snapshots_are_folded(tmp_path):
+    directory = str(tmp_path)
+    first, second = _dead_pid(), _dead_pid() + 1
+    _write(directory, first, 5)
+    _write(directory, second, 2)
+    open(os.path.join(directory, f"metrics-{first}.json.tmp"), "w").close()
+
+    output = render_metrics(directory)
+    assert 'events_published_total{type="test.dead"} 7' in output
+    assert 'provider="dead-provider"' not in output  # 已退出进程的仪表盘不计入
+
+    files = set(os.listdir(directory))
+    assert DEAD_SNAPSHOT in files
+    assert not any(name.startswith((f"metrics-{first}.", f"metrics-{second}.")) for name in files)
+
+    # 之后被回收的 worker 继续累加到同一个累计快照
+    _write(directory, first, 1)
+    assert 'events_published_total{type="test.dead"} 8' in render_metrics(directory)
+    assert len([name for name in os.listdir(directory) if name.endswith(".json")]) == 2
+
+
+def test_http_metrics_use_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    for item_id in (1, 2, 3):
+        assert client.get(f"/metrics-test/{item_id}").status_code == 200
+    assert client.get("/metrics-test-missing").status_code == 404
+
+    requests = HTTP_REQUESTS.collect()
+    assert requests[("GET", "/metrics-test/{item_id}", "200")] == 3
+    assert requests[("GET", "<unmatched>", "404")] >= 1
+
+    output = render_metrics()
+    assert 'http_request_duration_seconds_count{method="GET",route="/metrics-test/{item_id}"} 3' in output
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/metrics-test/{item_id}",le="+Inf"} 3' in output
@@ -0,0 +1,102 @@
+"""
+问诊档案：结构化保存、前缀中只出现一次、修改以差异附加
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import services.llm
+from models.message import Message
+from models.profile import PatientProfileChange
+from services.profile import PROFILE_MARKER, PROFILE_UPDATE_MARKER, render_profile, render_profile_diff
+from services.settings import update_setting
+
+
+def _login(client, username: str) -> dict:
+    client.post("/api/auth/register", json={"username": username, "password": "secret123"})
+    response = client.post("/api/auth/token", data={"username": username, "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def recorded_llm(monkeypatch, db):
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs["messages"])
+
+        async def chunks():
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="好的"))])
+
+        return chunks()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(services.llm, "_create_async_client", lambda *args, **kwargs: client)
+    update_setting(db, "llm_api_key", "test-key")
+    return requests
+
+
+def test_render_profile_and_diff():
+    old = {"age": 60, "gender": "female", "diseases": ["高血压"], "symptoms": ["头晕"], "main_complaint": None}
+    new = {"age": 61, "gender": "female", "diseases": ["高血压"], "symptoms": ["口渴"], "main_complaint": "乏力"}
+
+    assert render_profile(old) == f"{PROFILE_MARKER}\n年龄: 60岁\n性别: 女\n疾病史: 高血压\n近期症状: 头晕"
+    assert render_profile({"diseases": []}) is None
+    assert render_profile_diff(old, new) == (
+        f"{PROFILE_UPDATE_MARKER}\n年龄: 60岁 → 61岁\n近期症状: 新增 口渴；移除 头晕\n主诉: 乏力"
+    )
+    assert render_profile_diff(new, {**new, "main_complaint": None}).endswith("主诉: 已清除")
+    assert render_profile_diff(old, dict(old)) is None
+
+
+def test_profile_is_saved_and_normalized(client, admin_headers):
+    conversation_id = client.post("/api/chat/conversations", json={"title": "档案"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}/profile"
+    assert client.get(url, headers=admin_headers).json() is None
+
+    body = {"age": 60, "diseases": ["消渴", "2型糖尿病"], "symptoms": [" 口渴 ", "口渴"], "main_complaint": "  "}
+    saved = client.put(url, json=body, headers=admin_headers).json()
+    assert saved["diseases"] == ["2型糖尿病"]  # 别名统一为标准名称并去重
+    assert saved["symptoms"] == ["口渴"]
+    assert saved["main_complaint"] is None
+    assert (saved["version"], saved["changed"]) == (1, True)
+
+    # 内容相同时不增加版本
+    unchanged = client.put(url, json=body, headers=admin_headers).json()
+    assert (unchanged["version"], unchanged["changed"]) == (1, False)
+    assert client.get(url, headers=admin_headers).json()["diseases"] == ["2型糖尿病"]
+
+    response = client.put(url, json={"diseases": ["不存在的病"]}, headers=admin_headers)
+    assert response.status_code == 400
+    assert "不存在的病" in response.json()["detail"]
+
+    other = _login(client, "profile_other")
+    assert client.get(url, headers=other).status_code == 403
+    assert client.put(url, json=body, headers=other).status_code == 403
+
+
+def test_profile_is_sent_once_and_changes_as_diff(client, admin_headers, db, recorded_llm):
+    conversation_id = client.post("/api/chat/conversations", json={"title": "注入"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}"
+
+    # 对话开始前的修改直接替换前缀中的档案
+    client.put(f"{url}/profile", json={"age": 59, "symptoms": ["头晕"]}, headers=admin_headers)
+    client.put(f"{url}/profile", json={"age": 60, "symptoms": ["头晕"]}, headers=admin_headers)
+    client.post(f"{url}/messages", json={"content": "最近头晕"}, headers=admin_headers)
+
+    # 对话开始后的修改记录为差异，附加在下一条用户消息之前
+    updated = client.put(f"{url}/profile", json={"age": 60, "symptoms": ["头晕", "口渴"]}, headers=admin_headers).json()
+    assert updated["version"] == 3
+    change = db.query(PatientProfileChange).filter(PatientProfileChange.conversation_id == conversation_id).one()
+    assert change.diff == f"{PROFILE_UPDATE_MARKER}\n近期症状: 新增 口渴"
+    client.post(f"{url}/messages", json={"content": "还口渴"}, headers=admin_headers)
+
+    first, second = recorded_llm[-2:]
+    assert first[0]["content"].endswith(f"{PROFILE_MARKER}\n年龄: 60岁\n近期症状: 头晕")
+    assert second[:len(first)] == first
+    assert [m["content"] for m in second[1:]] == ["最近头晕", "好的", f"{change.diff}\n\n还口渴"]
+    assert sum(PROFILE_MARKER in m["content"] for m in second) == 1
+
+    # 保存的消息中不包含档案文本
+    stored = [m.content for m in db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.id)]
+    assert stored == ["最近头晕", "好的", "还口渴", "好的"]
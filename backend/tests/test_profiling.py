@@ -0,0 +1,91 @@
+"""
+管理员按需 CPU / 内存分析接口
+"""
+import threading
+import time
+
+import pytest
+
+from core.profiling import cpu_profiler, memory_profiler
+
+URL = "/api/admin/profiling"
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.fixture
+def user_headers(client):
+    client.post("/api/auth/register", json={"username": "profiling_user", "password": "secret123"})
+    response = client.post("/api/auth/token", data={"username": "profiling_user", "password": "secret123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_profiling_requires_admin(client, user_headers):
+    assert client.get(f"{URL}/cpu").status_code == 401
+    assert client.get(f"{URL}/cpu", headers=user_headers).status_code == 403
+    assert client.post(f"{URL}/memory/start", headers=user_headers).status_code == 403
+
+
+def test_cpu_profile_samples_busy_thread(client, admin_headers):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        started = client.post(f"{URL}/cpu/start", params={"seconds": 5, "interval_ms": 5}, headers=admin_headers)
+        assert started.status_code == 200
+        assert started.json()["running"] is True
+
+        conflict = client.post(f"{URL}/cpu/start", params={"seconds": 1}, headers=admin_headers)
+        assert conflict.status_code == 409
+
+        time.sleep(0.3)
+        stopped = client.post(f"{URL}/cpu/stop", headers=admin_headers).json()
+    finally:
+        stop.set()
+        worker.join()
+        cpu_profiler.stop()
+
+    assert stopped["running"] is False
+    assert stopped["samples"] > 0
+    assert client.get(f"{URL}/cpu", headers=admin_headers).json()["samples"] == stopped["samples"]
+
+    collapsed = client.get(f"{URL}/cpu/collapsed", headers=admin_headers).text
+    busy = [line for line in collapsed.splitlines() if line.startswith("busy-worker;")]
+    assert busy and all("busy_loop (test_profiling.py:" in line for line in busy)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+
+def test_cpu_profile_duration_is_limited(client, admin_headers):
+    response = client.post(f"{URL}/cpu/start", params={"seconds": 10_000}, headers=admin_headers)
+    assert response.status_code == 400
+    assert cpu_profiler.running is False
+
+
+def test_memory_snapshots_are_compared(client, admin_headers):
+    assert client.post(f"{URL}/memory/snapshot", headers=admin_headers).status_code == 400
+
+    assert client.post(f"{URL}/memory/start", headers=admin_headers).status_code == 204
+    try:
+        assert client.post(f"{URL}/memory/start", headers=admin_headers).status_code == 409
+
+        first = client.post(f"{URL}/memory/snapshot", headers=admin_headers).json()
+        assert first["compared"] is False
+        assert first["traced_current"] > 0
+
+        retained = [bytearray(1024) for _ in range(2000)]
+        second = client.post(f"{URL}/memory/snapshot", params={"limit": 5}, headers=admin_headers).json()
+        assert second["compared"] is True
+        assert len(second["top"]) <= 5
+        growth = next(item for item in second["top"] if "test_profiling.py" in item["site"])
+        assert growth["size_diff"] >= 1024 * len(retained)
+
+        collapsed = client.get(f"{URL}/memory/collapsed", headers=admin_headers).text
+        assert "test_profiling.py:" in collapsed
+    finally:
+        memory_profiler.stop()
+
+    assert client.post(f"{URL}/memory/stop", headers=admin_headers).status_code == 204
+    assert client.post(f"{URL}/memory/snapshot", headers=admin_headers).status_code == 400
@@ -0,0 +1,129 @@
+"""
+提示词组装：稳定前缀与前缀缓存命中的用量统计
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import services.llm
+from core.metrics import LLM_TOKENS
+from models.message import Message
+from models.usage import TokenUsage
+from services.llm import LLMUsage, _read_usage
+from services.prompt import USER_INFO_TAG, build_prompt, compose_user_message, select_recent_rounds
+from services.settings import update_setting
+
+SYSTEM_PROMPT = "你是一位专业的中医医生。"
+
+
+def _messages(*pairs) -> list:
+    return [Message(id=index + 1, role=role, content=content) for index, (role, content) in enumerate(pairs)]
+
+
+def _history(rounds: int) -> list:
+    history = []
+    for i in range(rounds):
+        history += [{"role": "user", "content": f"问题 {i}"}, {"role": "assistant", "content": f"回答 {i}"}]
+    return history
+
+
+def test_profile_is_moved_into_prefix():
+    messages = _messages(
+        ("user", compose_user_message("头晕", "年龄：60")),
+        ("assistant", "多休息"),
+        ("user", compose_user_message("还有口干", "年龄：61")),
+    )
+    system_prompt, history = build_prompt(SYSTEM_PROMPT, messages)
+
+    # 以最近一次提交的档案为准，只出现一次
+    assert system_prompt == f"{SYSTEM_PROMPT}\n\n{USER_INFO_TAG}\n年龄：61"
+    assert [m["content"] for m in history] == ["头晕", "多休息", "还有口干"]
+
+    # 结构化问诊档案优先
+    system_prompt, _ = build_prompt(SYSTEM_PROMPT, messages, profile_block="年龄：62")
+    assert system_prompt.endswith("年龄：62")
+    assert build_prompt(SYSTEM_PROMPT, _messages(("user", "头晕")))[0] == SYSTEM_PROMPT
+
+
+def test_profile_changes_are_appended_after_prefix():
+    messages = _messages(("user", "头晕"), ("assistant", "多休息"), ("user", "口干"), ("assistant", "多饮水"))
+    before = build_prompt(SYSTEM_PROMPT, messages[:2], "年龄：60")
+    after = build_prompt(SYSTEM_PROMPT, messages, "年龄：60", [(2, "症状：新增 口干")])
+
+    assert after[0] == before[0]
+    assert after[1][:2] == before[1]
+    assert after[1][2]["content"] == "症状：新增 口干\n\n口干"
+
+
+def test_select_recent_rounds_moves_start_in_blocks():
+    assert select_recent_rounds(_history(3), 3) == _history(3)
+    assert select_recent_rounds(_history(3), 0) == _history(3)
+
+    kept = [len(select_recent_rounds(_history(rounds), 3)) // 2 for rounds in range(3, 13)]
+    assert all(3 <= count <= 5 for count in kept)
+
+    # 起点每 max_rounds 轮才移动一次：其余请求都以上一次请求的全部消息为前缀
+    reused = 0
+    previous = select_recent_rounds(_history(3), 3)
+    for rounds in range(4, 13):
+        current = select_recent_rounds(_history(rounds), 3)
+        reused += current[:len(previous)] == previous
+        previous = current
+    assert reused == 6
+
+
+@pytest.mark.parametrize("usage, cached", [
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_tokens_details=SimpleNamespace(cached_tokens=64)), 64),
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_cache_hit_tokens=96), 96),
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_tokens_details=None), 0),
+])
+def test_read_usage_reports_cached_tokens(usage, cached):
+    target = LLMUsage(estimated=True)
+    _read_usage(usage, target)
+    assert (target.prompt_tokens, target.cached_tokens, target.reported) == (120, cached, True)
+    assert target.prompt_cache == ("hit" if cached else "miss")
+
+
+def test_send_message_records_cached_tokens(client, admin_headers, db, monkeypatch):
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs["messages"])
+        cached = 0 if len(requests) == 1 else 48
+        usage = SimpleNamespace(
+            prompt_tokens=100, completion_tokens=10, prompt_tokens_details=SimpleNamespace(cached_tokens=cached)
+        )
+
+        async def chunks():
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="舌淡"))])
+            yield SimpleNamespace(usage=usage, choices=[])
+
+        return chunks()
+
+    llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(services.llm, "_create_async_client", lambda *args, **kwargs: llm_client)
+    update_setting(db, "llm_api_key", "test-key")
+
+    conversation_id = client.post("/api/chat/conversations", json={"title": "前缀缓存"}, headers=admin_headers).json()["id"]
+    url = f"/api/chat/conversations/{conversation_id}"
+    assert client.put(f"{url}/profile", json={"age": 58}, headers=admin_headers).status_code == 200
+    cached_before = LLM_TOKENS.collect().get(("deepseek", "chat", "prompt_cached"), 0)
+
+    for content in ("头晕", "口干"):
+        assert client.post(f"{url}/messages", json={"content": content}, headers=admin_headers).text == "舌淡"
+
+    # 第二次请求以第一次请求的全部消息为前缀，只在末尾追加
+    first, second = requests
+    assert second[:len(first)] == first
+    assert [m["role"] for m in second] == ["system", "user", "assistant", "user"]
+    assert USER_INFO_TAG in first[0]["content"]
+    assert all(USER_INFO_TAG not in m["content"] for m in second[1:])
+
+    rows = db.query(TokenUsage).filter(TokenUsage.conversation_id == conversation_id).order_by(TokenUsage.id).all()
+    assert [(row.cached_tokens, row.estimated) for row in rows] == [(0, False), (48, False)]
+    assert LLM_TOKENS.collect()[("deepseek", "chat", "prompt_cached")] - cached_before == 48
+
+    totals = client.get(f"/api/admin/conversations/{conversation_id}/usage", headers=admin_headers).json()["totals"]
+    assert totals["cached_tokens"] == 48
+    assert totals["uncached_prompt_tokens"] == 152
+    assert totals["cache_hit_rate"] == 0.24
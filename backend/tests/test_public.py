@@ -0,0 +1,37 @@
+"""
+公共接口
+"""
+import base64
+
+from services.assets import asset_url, migrate_legacy_logo, save_asset
+from services.settings import get_setting, update_setting
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+
+def test_asset_response_is_sandboxed(client, db):
+    url = asset_url(save_asset(db, SVG, "image/svg+xml").digest)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "sandbox" in response.headers["content-security-policy"]
+    assert "default-src 'none'" in response.headers["content-security-policy"]
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert "sandbox" in cached.headers["content-security-policy"]
+
+
+def test_public_settings_do_not_migrate_legacy_logo(client, db):
+    data_url = "data:image/png;base64," + base64.b64encode(b"legacy-logo").decode()
+    update_setting(db, "website_logo", data_url)
+
+    assert client.get("/api/public/settings").json()["website_logo"] == data_url
+    db.expire_all()
+    assert get_setting(db, "website_logo") == data_url
+
+    assert migrate_legacy_logo(db)
+    assert get_setting(db, "website_logo").startswith("/api/public/assets/")
+    assert not migrate_legacy_logo(db)
+    update_setting(db, "website_logo", "")
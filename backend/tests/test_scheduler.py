@@ -0,0 +1,104 @@
+"""
+多 worker 生产模式：定时任务的单进程执行与 worker 配置
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+import run
+from core.config import get_settings
+from core.scheduler import LeaderLock, PeriodicJob, Scheduler
+
+HOLD_LOCK = (
+    "import sys\n"
+    "from core.scheduler import LeaderLock\n"
+    "lock = LeaderLock(sys.argv[1])\n"
+    "assert lock.acquire()\n"
+    "print('locked', flush=True)\n"
+    "sys.stdin.read()\n"
+)
+
+
+def test_leader_lock_is_exclusive_across_processes(tmp_path):
+    path = str(tmp_path / "locks" / "scheduler.lock")
+    holder = subprocess.Popen(
+        [sys.executable, "-c", HOLD_LOCK, path],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        lock = LeaderLock(path)
+        assert lock.acquire() is False
+        assert lock.held is False
+    finally:
+        holder.stdin.close()  # 持有锁的进程退出，系统自动释放锁
+        holder.wait(timeout=10)
+
+    assert lock.acquire() is True
+    assert lock.acquire() is True
+    with open(path, "r") as f:
+        assert f.read() == str(os.getpid())
+    lock.release()
+    assert lock.held is False
+
+
+def test_only_one_scheduler_runs_jobs(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    runs = {"first": 0, "second": 0}
+
+    def make_scheduler(name: str) -> Scheduler:
+        scheduler = Scheduler()
+        scheduler.add_job(PeriodicJob(
+            name="count",
+            interval_seconds=0.01,
+            func=lambda: runs.__setitem__(name, runs[name] + 1),
+            initial_delay=0,
+        ))
+        return scheduler
+
+    async def scenario():
+        first, second = make_scheduler("first"), make_scheduler("second")
+        first.start(lock_path=path, retry_seconds=0.02)
+        second.start(lock_path=path, retry_seconds=0.02)
+        await asyncio.sleep(0.2)
+        assert runs["first"] > 0 and runs["second"] == 0
+
+        # 执行进程退出后由其他进程接替
+        await first.stop()
+        stopped_at = runs["first"]
+        await asyncio.sleep(0.2)
+        await second.stop()
+        assert runs["first"] == stopped_at
+        assert runs["second"] > 0
+
+    asyncio.run(scenario())
+
+
+def test_auto_workers_is_capped(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    assert run.auto_workers() == run.MAX_AUTO_WORKERS
+    monkeypatch.setattr(os, "cpu_count", lambda: None)
+    assert run.auto_workers() == 1
+
+
+def test_prod_mode_shares_metrics_directory(monkeypatch, tmp_path):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "METRICS_DIR", "")
+    monkeypatch.setattr(settings, "SERVER_MAX_REQUESTS", 1000)
+    monkeypatch.setattr(run.tempfile, "gettempdir", lambda: str(tmp_path))
+    monkeypatch.setenv("METRICS_DIR", "")
+    calls = []
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **options: calls.append((app, options)))
+
+    run.run_prod(settings, 4)
+
+    (app, options), = calls
+    assert app == "main:app"
+    assert options["workers"] == 4
+    assert options["limit_max_requests"] == 1000
+    assert os.environ["METRICS_DIR"] == str(tmp_path / f"cdhcprs-metrics-{settings.BACKEND_PORT}")
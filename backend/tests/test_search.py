@@ -0,0 +1,102 @@
+"""
+全文检索
+"""
+import sqlite3
+
+from core.config import get_settings
+from core.database import engine
+from models.conversation import Conversation
+from models.message import Message
+from models.user import User
+from services.search import search_conversations, sync_search_index
+
+
+def _user(db, username: str) -> User:
+    user = db.query(User).filter(User.username == username).first()
+    if user is None:
+        user = User(username=username, hashed_password="x", role="user")
+        db.add(user)
+        db.commit()
+    return user
+
+
+def _conversation(db, user: User, title: str, contents) -> Conversation:
+    conversation = Conversation(user_id=user.id, title=title)
+    db.add(conversation)
+    db.flush()
+    db.add_all(Message(conversation_id=conversation.id, role="user", content=content) for content in contents)
+    db.commit()
+    return conversation
+
+
+def test_writers_without_app_functions(db):
+    """不经过应用的写入方（未注册任何函数的 sqlite3 连接）可以写入与删除，索引由同步补建"""
+
+    user = _user(db, "search-raw")
+    conversation = _conversation(db, user, "外部写入", [])
+
+    raw = sqlite3.connect(engine.url.database)
+    raw.execute("PRAGMA foreign_keys=ON")
+    raw.execute(
+        "INSERT INTO messages (conversation_id, role, content, created_at) "
+        "VALUES (?, 'user', '外部工具写入的舌苔厚腻记录', CURRENT_TIMESTAMP)",
+        (conversation.id,),
+    )
+    raw.commit()
+
+    assert search_conversations(db, "舌苔厚腻", user.id)["results"] == []
+    assert sync_search_index()["messages"] == 1
+    results = search_conversations(db, "舌苔厚腻", user.id)["results"]
+    assert [result["conversation_id"] for result in results] == [conversation.id]
+
+    raw.execute("UPDATE messages SET content = '修改后的内容' WHERE conversation_id = ?", (conversation.id,))
+    raw.execute("DELETE FROM conversations WHERE id = ?", (conversation.id,))
+    raw.commit()
+    raw.close()
+    assert search_conversations(db, "舌苔厚腻", user.id)["results"] == []
+
+
+def test_user_search_is_scoped_and_paginated(db):
+    owner = _user(db, "search-owner")
+    other = _user(db, "search-other")
+    _conversation(db, other, "他人对话", ["夜间盗汗明显"] * 5)
+    own_ids = {
+        _conversation(db, owner, f"对话 {i}", ["夜间盗汗明显", "口干"]).id
+        for i in range(7)
+    }
+
+    seen = []
+    cursor = None
+    while True:
+        page = search_conversations(db, "盗汗", owner.id, cursor, limit=3)
+        assert len(page["results"]) <= 3
+        seen.extend((result["conversation_id"], result["message_id"]) for result in page["results"])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        cursor = page["next_cursor"]
+        # 翻页期间新写入的消息不影响已开始的检索
+        _conversation(db, owner, "翻页期间新建", ["夜间盗汗明显"])
+
+    assert len(seen) == len(set(seen)) == 7
+    assert {conversation_id for conversation_id, _ in seen} == own_ids
+
+    # 管理员检索全部用户（含翻页期间新建的对话）
+    assert len(search_conversations(db, "盗汗", None, limit=100)["results"]) == 12 + 2
+
+
+def test_search_ranks_most_recent_candidates(db, monkeypatch):
+    monkeypatch.setattr(get_settings(), "SEARCH_MAX_CANDIDATES", 3)
+    user = _user(db, "search-candidates")
+    messages = [
+        _conversation(db, user, "候选", ["脉弦细数"]).id
+        for _ in range(5)
+    ]
+
+    page = search_conversations(db, "弦细", user.id, limit=10)
+    assert sorted(result["conversation_id"] for result in page["results"]) == messages[-3:]
+
+
+def test_search_endpoint_rejects_invalid_cursor(client, admin_headers):
+    response = client.get("/api/chat/search", params={"q": "盗汗", "cursor": "x"}, headers=admin_headers)
+    assert response.status_code == 400
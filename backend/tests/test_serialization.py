@@ -0,0 +1,83 @@
+"""
+JSON 序列化与响应压缩
+"""
+import json
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import core.http_compression
+import core.serialization
+from core.http_compression import CompressionMiddleware, negotiate_encoding
+from core.serialization import CONVERSATION_FIELDS, dumps, serialize_rows
+
+PAYLOAD = {"items": [{"id": i, "content": "舌淡苔白，脉细弱", "created_at": datetime(2024, 5, 1, 8, 30, i)} for i in range(60)]}
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(json.loads(dumps(PAYLOAD)))
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["舌淡" * 600, "苔白" * 600]), media_type="text/plain")
+
+    return app
+
+
+def test_fallback_serializer_matches_orjson(monkeypatch):
+    expected = json.loads(dumps(PAYLOAD))
+    monkeypatch.setattr(core.serialization, "orjson", None)
+    fallback = dumps(PAYLOAD)
+    assert json.loads(fallback) == expected
+    assert b"\\u" not in fallback  # 中文按 UTF-8 输出，不转义
+
+
+def test_serialize_rows_uses_schema_field_order():
+    class Row:
+        title, id, user_id, is_active, created_at = "标题", 1, 2, True, datetime(2024, 1, 1)
+
+    assert list(json.loads(serialize_rows([Row()], CONVERSATION_FIELDS))[0]) == list(CONVERSATION_FIELDS)
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(core.http_compression, "brotli", None)
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("*") == "gzip"
+
+    monkeypatch.setattr(core.http_compression, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+
+
+def test_large_responses_are_compressed(monkeypatch):
+    monkeypatch.setattr(core.http_compression, "brotli", None)
+    client = TestClient(_app())
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(dumps(PAYLOAD))
+    assert response.json() == json.loads(dumps(PAYLOAD))
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_responses_pass_through():
+    client = TestClient(_app())
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "舌淡" * 600 + "苔白" * 600
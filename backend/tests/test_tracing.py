@@ -0,0 +1,77 @@
+"""
+请求追踪：Server-Timing 响应头与 OTLP/JSON 导出
+"""
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.tracing import JsonlExporter, TracingMiddleware, span, traced
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@traced()
+def load_item(item_id: int) -> dict:
+    with span("item.format", item_id=item_id):
+        return {"id": item_id}
+
+
+def _client(exporter=None, sample_rate: float = 0.0) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, sample_rate=sample_rate, exporter=exporter)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        load_item(item_id)
+        return load_item(item_id)
+
+    return TestClient(app)
+
+
+def _exported(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_server_timing_merges_repeated_spans():
+    timing = _client().get("/items/1").headers["server-timing"]
+    entries = {entry.split(";")[0]: entry for entry in timing.split(", ")}
+    assert set(entries) == {"test_tracing.load_item", "item.format", "total"}
+    assert 'desc="x2"' in entries["test_tracing.load_item"]
+
+
+def test_sampled_traces_are_exported(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlExporter(str(path), max_bytes=1024 * 1024, backup_count=1)
+    client = _client(exporter)
+
+    client.get("/items/1")  # 采样率为 0 且未携带 traceparent：不导出
+    client.get("/items/2", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    client.get("/items/3", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    exporter.close()
+
+    records = _exported(path)
+    assert len(records) == 1
+    spans = records[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {item["traceId"] for item in spans} == {TRACE_ID}
+
+    root = next(item for item in spans if item["kind"] == 2)
+    assert root["name"] == "GET /items/{item_id}"
+    assert root["parentSpanId"] == PARENT_ID
+    attributes = {attr["key"]: attr["value"] for attr in root["attributes"]}
+    assert attributes["http.status_code"] == {"intValue": "200"}
+    assert attributes["http.target"] == {"stringValue": "/items/2"}
+
+    by_id = {item["spanId"]: item for item in spans}
+    formats = [item for item in spans if item["name"] == "item.format"]
+    assert len(formats) == 2
+    for item in formats:
+        assert by_id[item["parentSpanId"]]["name"] == "test_tracing.load_item"
+        assert by_id[by_id[item["parentSpanId"]]["parentSpanId"]] is root
+
+
+def test_app_returns_server_timing(client, admin_headers):
+    response = client.get("/api/chat/conversations", headers=admin_headers)
+    assert "chat.get_user_conversations" in response.headers["server-timing"]
@@ -0,0 +1,43 @@
+"""
+Token 配额
+"""
+import pytest
+from fastapi import HTTPException
+
+from core.query_inspector import capture_queries
+from models.user import User
+from services.usage import check_token_quota, quota_tracker, record_usage, set_user_quota
+from services.llm import LLMUsage
+
+
+def _user(db, username: str) -> User:
+    user = db.query(User).filter(User.username == username).first()
+    if user is None:
+        user = User(username=username, hashed_password="x", role="user")
+        db.add(user)
+        db.commit()
+    return user
+
+
+def test_quota_check_is_skipped_without_limits(db):
+    user = _user(db, "quota-free")
+    quota_tracker.invalidate(user.id)
+
+    with capture_queries() as stats:
+        for _ in range(3):
+            check_token_quota(db, user)
+    # 只查询一次是否存在单独配额，不同步用户用量
+    assert stats.count == 1
+
+
+def test_user_quota_is_enforced(db):
+    user = _user(db, "quota-limited")
+    set_user_quota(db, user.id, 100)
+    record_usage(db, LLMUsage(prompt_tokens=80, completion_tokens=30), user.id, 0, "deepseek", "deepseek-chat")
+
+    with pytest.raises(HTTPException) as exc:
+        check_token_quota(db, user)
+    assert exc.value.status_code == 429
+
+    set_user_quota(db, user.id, None)
+    check_token_quota(db, user)
@@ -1,4 +1,5 @@
 import api from './index'
+import type { BackgroundJob } from './chat'
 
 export interface AdminUser {
   id: number
@@ -93,15 +94,83 @@ export interface LogoUploadResponse {
   logo_url: string
 }
 
+export interface UserSearchParams {
+  q?: string
+  match?: 'prefix' | 'contains'
+  role?: 'user' | 'admin'
+  is_banned?: boolean
+  registered_after?: string
+  registered_before?: string
+  before_id?: number
+  limit?: number
+}
+
+export interface UserSearchResponse {
+  items: AdminUser[]
+  total: number
+  total_exact: boolean
+  next_cursor: number | null
+}
+
+export interface UserFilterPayload {
+  user_ids?: number[]
+  username_prefix?: string
+  registered_after?: string
+  registered_before?: string
+  is_banned?: boolean
+}
+
+export interface BulkUserActionPayload extends UserFilterPayload {
+  action: 'ban' | 'unban' | 'delete'
+}
+
+export interface BulkConversationDeletePayload {
+  conversation_ids?: number[]
+  user_id?: number
+  users?: UserFilterPayload
+  created_after?: string
+  created_before?: string
+}
+
+export interface BulkPreview {
+  dry_run: true
+  matched: number
+  sample_ids: number[]
+}
+
 export const adminAPI = {
   getUsers: () => api.get<AdminUser[]>('/api/admin/users'),
 
+  // 服务端筛选与游标分页（before_id 传上一页返回的 next_cursor）
+  searchUsers: (params: UserSearchParams) => {
+    return api.get<UserSearchResponse>('/api/admin/users/search', { params })
+  },
+
   updateUser: (userId: number, data: { is_banned?: boolean }) => {
     return api.put<AdminUser>(`/api/admin/users/${userId}`, data)
   },
 
   deleteUser: (userId: number) => api.delete(`/api/admin/users/${userId}`),
 
+  // 批量操作：preview 只统计匹配数量（dry_run），其余返回后台任务
+  previewBulkUserAction: (payload: BulkUserActionPayload) => {
+    return api.post<BulkPreview>('/api/admin/users/bulk', { ...payload, dry_run: true })
+  },
+
+  bulkUserAction: (payload: BulkUserActionPayload) => {
+    return api.post<BackgroundJob>('/api/admin/users/bulk', payload)
+  },
+
+  previewBulkDeleteConversations: (payload: BulkConversationDeletePayload) => {
+    return api.post<BulkPreview>('/api/admin/conversations/bulk-delete', { ...payload, dry_run: true })
+  },
+
+  bulkDeleteConversations: (payload: BulkConversationDeletePayload) => {
+    return api.post<BackgroundJob>('/api/admin/conversations/bulk-delete', payload)
+  },
+
+  getJob: (jobId: number) => api.get<BackgroundJob>(`/api/admin/jobs/${jobId}`),
+
   getAllConversations: () => api.get<ConversationSummary[]>('/api/admin/conversations'),
 
   deleteConversation: (conversationId: number) => {
@@ -2,6 +2,58 @@ import api, { API_BASE_URL } from './index'
 
 const buildUrl = (path: string) => `${API_BASE_URL}${path}`
 
+export interface BackgroundJob {
+  id: number
+  kind: string
+  status: 'pending' | 'running' | 'succeeded' | 'failed'
+  total: number
+  processed: number
+  result: Record<string, unknown> | null
+  error: string | null
+  created_at: string
+  started_at: string | null
+  finished_at: string | null
+}
+
+// 轮询任务的最长时间：服务重启后任务会被标记为失败，此上限兜底避免页面一直等待
+export const JOB_WAIT_TIMEOUT_MS = 10 * 60 * 1000
+
+// 每秒轮询一次任务进度，直至任务结束或超过最长等待时间
+export const waitForJob = async (
+  job: BackgroundJob,
+  fetchJob: (jobId: number) => Promise<{ data: BackgroundJob }>,
+  onProgress?: (job: BackgroundJob) => void,
+  timeoutMs = JOB_WAIT_TIMEOUT_MS,
+): Promise<BackgroundJob> => {
+  const deadline = Date.now() + timeoutMs
+  while (job.status === 'pending' || job.status === 'running') {
+    if (Date.now() >= deadline) {
+      throw new Error(`Background job ${job.id} did not finish in time`)
+    }
+    onProgress?.(job)
+    await new Promise((resolve) => setTimeout(resolve, 1000))
+    ;({ data: job } = await fetchJob(job.id))
+  }
+  return job
+}
+
+// 结构化问诊档案（疾病与症状均为名称）
+export interface PatientProfilePayload {
+  age: number | null
+  gender: string | null
+  diseases: string[]
+  symptoms: string[]
+  tcm_syndrome: string | null
+  main_complaint: string | null
+}
+
+export interface PatientProfileRecord extends PatientProfilePayload {
+  conversation_id: number
+  version: number
+  changed: boolean
+  updated_at: string | null
+}
+
 export const chatAPI = {
   createConversation: (title: string) => {
     return api.post('/api/chat/conversations', { title })
@@ -19,21 +71,49 @@ export const chatAPI = {
     return api.get(`/api/chat/conversations/${conversationId}/messages`)
   },
 
-  sendMessage: (conversationId: number, content: string, userInfo?: string) => {
+  sendMessage: (conversationId: number, content: string) => {
     return fetch(buildUrl(`/api/chat/conversations/${conversationId}/messages`), {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         Authorization: `Bearer ${localStorage.getItem('token') ?? ''}`,
       },
-      body: JSON.stringify({ content, user_info: userInfo }),
+      body: JSON.stringify({ content }),
     })
   },
 
+  // 问诊档案保存在服务端，对话开始后的修改只以差异形式发送给大模型
+  getProfile: (conversationId: number) => {
+    return api.get<PatientProfileRecord | null>(`/api/chat/conversations/${conversationId}/profile`)
+  },
+
+  saveProfile: (conversationId: number, profile: PatientProfilePayload) => {
+    return api.put<PatientProfileRecord>(`/api/chat/conversations/${conversationId}/profile`, profile)
+  },
+
   deleteConversation: (id: number) => {
     return api.delete(`/api/chat/conversations/${id}`)
   },
 
+  // 批量删除对话（后台任务），返回任务信息
+  bulkDeleteConversations: (payload: { conversation_ids?: number[]; all?: boolean }) => {
+    return api.post<BackgroundJob>('/api/chat/conversations/bulk-delete', payload)
+  },
+
+  getJob: (jobId: number) => {
+    return api.get<BackgroundJob>(`/api/chat/jobs/${jobId}`)
+  },
+
+  // 流式导出全部对话（NDJSON），afterId 用于中断后续传
+  exportConversations: (afterId?: number) => {
+    const query = afterId ? `?after_id=${afterId}` : ''
+    return fetch(buildUrl(`/api/chat/export${query}`), {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem('token') ?? ''}`,
+      },
+    })
+  },
+
   getSuggestedQuestions: (conversationId: number) => {
     return api.get(`/api/chat/conversations/${conversationId}/suggested-questions`)
   },
@@ -0,0 +1,116 @@
+import { API_BASE_URL } from './index'
+
+export interface ServerEvent {
+  type: string
+  data: Record<string, unknown>
+}
+
+interface EventStreamOptions {
+  onEvent: (event: ServerEvent) => void
+  // 连接（重新）建立后调用，调用方应在此重新同步断线期间可能错过的状态
+  onOpen?: () => void
+  // 服务端未启用推送（404）时调用，调用方可退回轮询
+  onUnsupported?: () => void
+}
+
+const MIN_BACKOFF_MS = 1000
+const MAX_BACKOFF_MS = 30000
+
+const parseBlock = (block: string): ServerEvent | null => {
+  let type = 'message'
+  const dataLines: string[] = []
+  for (const line of block.split('\n')) {
+    if (line.startsWith(':')) continue // 心跳注释
+    if (line.startsWith('event:')) type = line.slice(6).trim()
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart())
+  }
+  if (dataLines.length === 0) return null
+  try {
+    return { type, data: JSON.parse(dataLines.join('\n')) }
+  } catch {
+    return null
+  }
+}
+
+/**
+ * 订阅服务端推送（SSE）
+ * 使用 fetch 读取流以便携带 Authorization 头；断线后按指数退避（带随机抖动）重连，
+ * 服务端到期主动结束的连接立即重连
+ * @returns 关闭订阅的函数
+ */
+export const connectEventStream = (options: EventStreamOptions) => {
+  let controller: AbortController | null = null
+  let closed = false
+  let backoff = MIN_BACKOFF_MS
+  let retryTimer: number | null = null
+
+  const scheduleReconnect = (delay: number) => {
+    if (closed) return
+    retryTimer = window.setTimeout(connect, delay)
+  }
+
+  const connect = async () => {
+    controller = new AbortController()
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/chat/events`, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('token') ?? ''}`,
+          Accept: 'text/event-stream',
+        },
+        signal: controller.signal,
+      })
+      if (response.status === 404) {
+        options.onUnsupported?.()
+        return
+      }
+      if (!response.ok || !response.body) {
+        throw new Error(`Event stream failed with status ${response.status}`)
+      }
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let opened = false
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        let boundary = buffer.indexOf('\n\n')
+        while (boundary !== -1) {
+          const event = parseBlock(buffer.slice(0, boundary))
+          buffer = buffer.slice(boundary + 2)
+          boundary = buffer.indexOf('\n\n')
+          if (!event) continue
+          if (event.type === 'ready') {
+            if (!opened) {
+              opened = true
+              backoff = MIN_BACKOFF_MS
+              options.onOpen?.()
+            }
+          } else {
+            options.onEvent(event)
+          }
+        }
+      }
+
+      // 服务端正常结束（连接到期），立即重连
+      scheduleReconnect(0)
+    } catch (error) {
+      if (closed) return
+      console.error('Event stream disconnected:', error)
+      const delay = backoff + Math.random() * backoff * 0.5
+      backoff = Math.min(backoff * 2, MAX_BACKOFF_MS)
+      scheduleReconnect(delay)
+    }
+  }
+
+  connect()
+
+  return () => {
+    closed = true
+    if (retryTimer !== null) clearTimeout(retryTimer)
+    controller?.abort()
+  }
+}
@@ -15,6 +15,10 @@ const getBaseUrl = () => {
 
 export const API_BASE_URL = getBaseUrl()
 
+// 后端返回的资源地址（如 Logo）为相对路径，本地开发时需补全为后端地址
+export const resolveAssetUrl = (url: string) =>
+  url && url.startsWith('/') ? `${API_BASE_URL}${url}` : url
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   timeout: 30000,